@@ -0,0 +1,106 @@
+# agent_dialog.py
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QFormLayout,
+    QVBoxLayout,
+    QLineEdit,
+    QSpinBox,
+    QListWidget,
+    QListWidgetItem,
+    QLabel,
+    QMessageBox,
+)
+
+from data_manager import LOCAL_TARGET
+from remote_agent import DEFAULT_PORT
+
+
+class AgentDialog(QDialog):
+    """添加或编辑一个执行主机：在该主机上运行 python -m remote_agent 后填写它的地址和令牌"""
+
+    def __init__(self, agent=None, parent=None):
+        super().__init__(parent)
+        agent = agent or {}
+        self.setWindowTitle("编辑执行主机" if agent else "添加执行主机")
+        self.resize(420, 200)
+        layout = QFormLayout(self)
+        self.name_edit = QLineEdit(agent.get("name", ""))
+        self.host_edit = QLineEdit(agent.get("host", "127.0.0.1"))
+        self.port_spin = QSpinBox()
+        self.port_spin.setRange(1, 65535)
+        self.port_spin.setValue(int(agent.get("port", DEFAULT_PORT)))
+        self.token_edit = QLineEdit(agent.get("token", ""))
+        self.token_edit.setEchoMode(QLineEdit.EchoMode.Password)
+        self.token_edit.setPlaceholderText("代理启动时打印的令牌")
+        layout.addRow("名称:", self.name_edit)
+        layout.addRow("地址:", self.host_edit)
+        layout.addRow("端口:", self.port_spin)
+        layout.addRow("令牌:", self.token_edit)
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def accept(self):
+        if not self.name_edit.text().strip() or not self.host_edit.text().strip():
+            QMessageBox.warning(self, "提示", "请填写执行主机的名称和地址。")
+            return
+        super().accept()
+
+    def values(self):
+        return {
+            "name": self.name_edit.text().strip(),
+            "host": self.host_edit.text().strip(),
+            "port": self.port_spin.value(),
+            "token": self.token_edit.text(),
+        }
+
+
+class TargetDialog(QDialog):
+    """选择一个项目的执行目标：运行时在每个选中的目标上各执行一次"""
+
+    def __init__(self, item, agents, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"“{item['name']}”的执行目标")
+        self.resize(360, 360)
+        selected = set(item.get("targets") or [LOCAL_TARGET])
+        layout = QVBoxLayout(self)
+        self.list_widget = QListWidget()
+        for target_id, name in [(LOCAL_TARGET, "本机")] + [
+            (a["id"], f"{a['name']} ({a['host']}:{a['port']})") for a in agents
+        ]:
+            entry = QListWidgetItem(name)
+            entry.setData(Qt.ItemDataRole.UserRole, target_id)
+            entry.setFlags(entry.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            entry.setCheckState(
+                Qt.CheckState.Checked if target_id in selected else Qt.CheckState.Unchecked
+            )
+            self.list_widget.addItem(entry)
+        layout.addWidget(self.list_widget)
+        if not agents:
+            layout.addWidget(QLabel("<font color='gray'>可以在“主机”菜单中添加执行主机</font>"))
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def accept(self):
+        if not self.targets():
+            QMessageBox.warning(self, "提示", "请至少选择一个执行目标。")
+            return
+        super().accept()
+
+    def targets(self):
+        """选中的执行目标 id；只选了本机时返回空列表（与没有设置相同）"""
+        targets = [
+            self.list_widget.item(n).data(Qt.ItemDataRole.UserRole)
+            for n in range(self.list_widget.count())
+            if self.list_widget.item(n).checkState() == Qt.CheckState.Checked
+        ]
+        return [] if targets == [LOCAL_TARGET] else targets
@@ -0,0 +1,308 @@
+# ansi_parser.py
+import codecs
+import re
+
+# 样式为 (前景色, 背景色, 属性位) 元组，默认样式用 None 表示；
+# 颜色为 0-255 的调色板序号，或 RGB_BASE + 0xRRGGBB 表示的真彩色，None 表示默认颜色
+RGB_BASE = 256
+BOLD = 1
+DIM = 2
+ITALIC = 4
+UNDERLINE = 8
+INVERSE = 16
+STRIKE = 32
+
+_SGR_SET = {1: BOLD, 2: DIM, 3: ITALIC, 4: UNDERLINE, 7: INVERSE, 9: STRIKE}
+_SGR_CLEAR = {22: BOLD | DIM, 23: ITALIC, 24: UNDERLINE, 27: INVERSE, 29: STRIKE}
+
+# 一个完整的控制序列：CSI、OSC（以 BEL 或 ST 结束）或其他转义（如 ESC ( B、ESC 7、ESC =），
+# 以及回车和退格；
+# 用于 split，结果中文本和控制序列交替出现
+_CONTROL = re.compile(
+    r"(\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[ -/]*[0-~])|[\r\x08])"
+)
+_CSI = re.compile(r"\x1b\[([0-?]*)[ -/]*([@-~])\Z")
+# (当前样式, SGR 序列) -> 新样式；各解析器共用，大多数程序只使用少数几种组合
+_SGR_CACHE = {}
+_SGR_CACHE_LIMIT = 4096
+# 被读取边界切开、尚不完整的转义序列，需要留到下一块
+_INCOMPLETE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*\x1b?|[ -/]+)?\Z")
+
+
+def line_text(entry):
+    """行记录的纯文本：无样式的行直接是 str，带样式的行是 ((文本, 样式), ...)"""
+    if isinstance(entry, str):
+        return entry
+    return "".join(text for text, _ in entry)
+
+
+def _entry(spans, merge=False):
+    if not spans:
+        return ""
+    if len(spans) == 1:
+        return spans[0][0] if spans[0][1] is None else (spans[0],)
+    if not merge:
+        return tuple(spans)
+    # 覆盖写入后可能出现相邻的同样式片段，合并后结果与输出被切分的位置无关
+    merged = [spans[0]]
+    for text, style in spans[1:]:
+        if style == merged[-1][1]:
+            merged[-1] = (merged[-1][0] + text, style)
+        elif text:
+            merged.append((text, style))
+    if len(merged) == 1 and merged[0][1] is None:
+        return merged[0][0]
+    return tuple(merged)
+
+
+def _slice(spans, start, end):
+    """截取当前行 [start, end) 列的片段"""
+    result = []
+    pos = 0
+    for text, style in spans:
+        length = len(text)
+        if pos + length > start and pos < end:
+            result.append((text[max(0, start - pos):end - pos], style))
+        pos += length
+        if pos >= end:
+            break
+    return result
+
+
+def _apply_sgr(style, params):
+    """返回在 style 上应用 SGR 参数后的新样式"""
+    if style is None:
+        fg = bg = None
+        flags = 0
+    else:
+        fg, bg, flags = style
+    try:
+        codes = [int(p) if p else 0 for p in params.replace(":", ";").split(";")]
+    except ValueError:
+        return style
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 0:
+            fg = bg = None
+            flags = 0
+        elif code in _SGR_SET:
+            flags |= _SGR_SET[code]
+        elif code in _SGR_CLEAR:
+            flags &= ~_SGR_CLEAR[code]
+        elif 30 <= code <= 37:
+            fg = code - 30
+        elif 90 <= code <= 97:
+            fg = code - 90 + 8
+        elif 40 <= code <= 47:
+            bg = code - 40
+        elif 100 <= code <= 107:
+            bg = code - 100 + 8
+        elif code == 39:
+            fg = None
+        elif code == 49:
+            bg = None
+        elif code in (38, 48) and i + 1 < len(codes):
+            color = None
+            if codes[i + 1] == 5 and i + 2 < len(codes):
+                color = codes[i + 2] & 0xFF
+                i += 2
+            elif codes[i + 1] == 2 and i + 4 < len(codes):
+                r, g, b = (c & 0xFF for c in codes[i + 2:i + 5])
+                color = RGB_BASE + (r << 16 | g << 8 | b)
+                i += 4
+            if code == 38:
+                fg = color
+            else:
+                bg = color
+        i += 1
+    return None if fg is None and bg is None and not flags else (fg, bg, flags)
+
+
+class AnsiParser:
+    """流式 ANSI/VT 输出解析器
+
+    feed() 接收原始字节块，解码后按转义序列、回车和退格切分；跨块保留解码器状态、
+    不完整的转义序列、当前样式以及当前行的内容和光标位置。
+    SGR 序列转换为带样式的文本片段；回车、退格、光标左右移动和擦除行（ESC[K）直接修改当前行，
+    因此进度条在原处刷新，而不是产生大量新行。其他控制序列会被丢弃。
+    """
+
+    def __init__(self, encoding="utf-8"):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.style = None
+        self._pending = ""
+        # 当前行：[(文本, 样式), ...]，以及行长度和光标所在列
+        self._spans = []
+        self._length = 0
+        self._col = 0
+        # 当前行发生过覆盖写入或擦除时为真，结束该行时需要合并片段
+        self._rewritten = False
+
+    def feed(self, data, final=False):
+        """处理一块原始输出，返回 (新完成的行, 当前未完成的行)"""
+        text = self._pending + self.decoder.decode(data, final=final)
+        self._pending = ""
+        if not final:
+            esc = text.rfind("\x1b")
+            if esc >= 0 and _INCOMPLETE.match(text, esc):
+                self._pending = text[esc:]
+                text = text[:esc]
+        lines = []
+        if "\r\n" in text:
+            # 回车紧跟换行不会改变行内容
+            text = text.replace("\r\n", "\n")
+        if "\x1b" not in text and "\r" not in text and "\x08" not in text:
+            self._write_text(text, lines)
+            return lines, self.partial()
+        parts = _CONTROL.split(text)
+        if parts[0]:
+            self._write_text(parts[0], lines)
+        # 循环中把状态放在局部变量里，调用其他方法前后再与属性同步
+        style = self.style
+        spans = self._spans
+        length = self._length
+        col = self._col
+        cache_get = _SGR_CACHE.get
+        it = iter(parts)
+        next(it)
+        for control, following in zip(it, it):
+            if control == "\r":
+                col = 0
+            elif control[-1] == "m" and control[1] == "[":
+                key = (style, control)
+                new_style = cache_get(key, False)
+                if new_style is False:
+                    new_style = _apply_sgr(style, control[2:-1])
+                    if len(_SGR_CACHE) >= _SGR_CACHE_LIMIT:
+                        _SGR_CACHE.clear()
+                    _SGR_CACHE[key] = new_style
+                style = new_style
+            elif control == "\x08":
+                if col:
+                    col -= 1
+            elif col == 0 and (control == "\x1b[K" or control == "\x1b[0K"):
+                # 进度条常用的“回到行首并清空整行”
+                spans = []
+                length = 0
+                self._rewritten = False
+            else:
+                match = _CSI.match(control)
+                if match is not None:
+                    self._spans, self._length, self._col = spans, length, col
+                    self._csi(match.group(1), match.group(2))
+                    spans, length, col = self._spans, self._length, self._col
+            if not following:
+                continue
+            if col == length and "\n" not in following:
+                # 最常见的情况：在行尾追加一段不含换行的文本
+                if spans and spans[-1][1] == style:
+                    spans[-1] = (spans[-1][0] + following, style)
+                else:
+                    spans.append((following, style))
+                length += len(following)
+                col = length
+            else:
+                self.style = style
+                self._spans, self._length, self._col = spans, length, col
+                self._write_text(following, lines)
+                spans, length, col = self._spans, self._length, self._col
+        self.style = style
+        self._spans, self._length, self._col = spans, length, col
+        return lines, self.partial()
+
+    def partial(self):
+        return _entry(self._spans, self._rewritten)
+
+    def end_line(self):
+        """结束当前行并返回其行记录"""
+        entry = self.partial()
+        self._spans = []
+        self._length = 0
+        self._col = 0
+        self._rewritten = False
+        return entry
+
+    def _write_text(self, text, lines):
+        if "\n" not in text:
+            self._write(text)
+            return
+        parts = text.split("\n")
+        self._write(parts[0])
+        lines.append(self.end_line())
+        style = self.style
+        middle = parts[1:-1]
+        if style is None:
+            lines.extend(middle)
+        else:
+            lines.extend([((part, style),) if part else "" for part in middle])
+        self._write(parts[-1])
+
+    def _write(self, text):
+        if not text:
+            return
+        col = self._col
+        length = len(text)
+        if col == self._length:
+            spans = self._spans
+            if spans and spans[-1][1] == self.style:
+                spans[-1] = (spans[-1][0] + text, self.style)
+            else:
+                spans.append((text, self.style))
+            self._length += length
+        else:
+            self._rewritten = True
+            if col > self._length:
+                self._spans.append((" " * (col - self._length), None))
+                self._length = col
+            end = col + length
+            self._spans = (
+                _slice(self._spans, 0, col)
+                + [(text, self.style)]
+                + _slice(self._spans, end, self._length)
+            )
+            self._length = max(self._length, end)
+        self._col = col + length
+
+    def _erase(self, start, end):
+        """把 [start, end) 列替换为空格；end 为 None 表示到行尾并截断"""
+        if end is None:
+            if start == 0:
+                self._spans = []
+                self._length = 0
+                self._rewritten = False
+                return
+            self._rewritten = True
+            if start < self._length:
+                self._spans = _slice(self._spans, 0, start)
+                self._length = start
+            return
+        self._rewritten = True
+        end = min(end, self._length)
+        if start < end:
+            self._spans = (
+                _slice(self._spans, 0, start)
+                + [(" " * (end - start), None)]
+                + _slice(self._spans, end, self._length)
+            )
+
+    def _csi(self, params, final):
+        if final == "K":
+            mode = params or "0"
+            if mode == "0":
+                self._erase(self._col, None)
+            elif mode == "1":
+                self._erase(0, self._col + 1)
+            elif mode == "2":
+                self._erase(0, None)
+        elif final in "CDG":
+            try:
+                n = int(params) if params else 1
+            except ValueError:
+                return
+            if final == "C":
+                self._col += n
+            elif final == "D":
+                self._col = max(0, self._col - n)
+            else:
+                self._col = max(0, n - 1)
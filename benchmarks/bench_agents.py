@@ -0,0 +1,142 @@
+# benchmarks/bench_agents.py
+# 用法: python -m benchmarks.bench_agents [执行主机数 ...]
+# 在本机启动若干个 remote_agent 进程作为执行主机（仅 POSIX）：
+#   throughput 大量输出在本机和经由执行主机时的吞吐量；
+#   fan_out 一个短命令同时在所有执行主机上执行，首次（需要建立连接）和复用连接时的总耗时；
+#   backpressure 界面一直不确认输出时收到的输出量：额度用完后执行主机暂停读取，之后不再增长
+import json
+import subprocess
+import sys
+import threading
+import time
+
+from execution_pool import ExecutionPool, PoolListener, RunSpec
+from remote_agent import AgentError, WINDOW, check
+
+BASE_PORT = 17400
+TOKEN = "bench"
+OUTPUT_MB = 50
+FAN_OUT_ROUNDS = 5
+BIG_OUTPUT = f"head -c {OUTPUT_MB * 1000000} /dev/zero | tr '\\0' 'x' | fold -w 100"
+
+
+class _Listener(PoolListener):
+    def __init__(self, ack=True):
+        self.ack = ack
+        self.pool = None
+        self.done = threading.Event()
+
+    def on_run_output(self, run, output):
+        if self.ack:
+            self.pool.mark_batch_applied(run)
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+def _start_agents(count):
+    agents = []
+    for n in range(count):
+        agents.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "remote_agent", "--port", str(BASE_PORT + n), "--token", TOKEN],
+                stderr=subprocess.DEVNULL,
+            )
+        )
+    targets = [
+        {"id": f"a{n}", "name": f"agent{n}", "host": "127.0.0.1", "port": BASE_PORT + n, "token": TOKEN}
+        for n in range(count)
+    ]
+    deadline = time.monotonic() + 10
+    for target in targets:
+        while True:
+            try:
+                check(target, timeout=1)
+                break
+            except AgentError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+    return agents, targets
+
+
+def _run(pool, listener, specs, timeout=120):
+    listener.done.clear()
+    start = time.perf_counter()
+    batch = pool.submit(specs)
+    listener.done.wait(timeout)
+    return batch, (time.perf_counter() - start) * 1000
+
+
+def throughput(target):
+    results = {}
+    for name, spec_target in (("local", None), ("agent", target)):
+        listener = _Listener()
+        pool = ExecutionPool(listener=listener)
+        listener.pool = pool
+        batch, elapsed = _run(pool, listener, [RunSpec(BIG_OUTPUT, "bash", target=spec_target)])
+        pool.shutdown()
+        run = batch.runs[0]
+        results[name] = {
+            "elapsed_ms": round(elapsed, 2),
+            "mb_per_s": round(run.stats["bytes"] / 1e6 / (elapsed / 1000), 1),
+            "dropped_bytes": run.stats["dropped_bytes"],
+        }
+    return results
+
+
+def fan_out(targets):
+    listener = _Listener()
+    pool = ExecutionPool(max_workers=len(targets), listener=listener)
+    listener.pool = pool
+    specs = lambda: [RunSpec("echo ok", "bash", target=t) for t in targets]
+    _, cold = _run(pool, listener, specs())
+    warm = sorted(_run(pool, listener, specs())[1] for _ in range(FAN_OUT_ROUNDS))
+    pool.shutdown()
+    return {
+        "targets": len(targets),
+        "cold_ms": round(cold, 2),
+        "warm_p50_ms": round(warm[len(warm) // 2], 2),
+    }
+
+
+def backpressure(target):
+    listener = _Listener(ack=False)
+    pool = ExecutionPool(listener=listener, grace_period=0)
+    listener.pool = pool
+    batch = pool.submit([RunSpec("yes line", "bash", target=target)])
+    time.sleep(1.0)
+    first = batch.runs[0].stats["bytes"]
+    time.sleep(1.0)
+    second = batch.runs[0].stats["bytes"]
+    pool.cancel_all()
+    listener.done.wait(10)
+    pool.shutdown()
+    return {
+        "received_1s_bytes": first,
+        "received_2s_bytes": second,
+        "window_bytes": WINDOW,
+        "stalled": second == first,
+        "cancelled": batch.runs[0].status,
+    }
+
+
+def run(counts=(1, 4, 8)):
+    if sys.platform == "win32":
+        raise SystemExit("bench_agents 只支持 POSIX 系统")
+    agents, targets = _start_agents(max(counts))
+    try:
+        return {
+            "throughput": throughput(targets[0]),
+            "fan_out": {count: fan_out(targets[:count]) for count in counts},
+            "backpressure": backpressure(targets[0]),
+        }
+    finally:
+        for agent in agents:
+            agent.terminate()
+            agent.wait()
+
+
+if __name__ == "__main__":
+    counts = tuple(int(a) for a in sys.argv[1:]) or (1, 4, 8)
+    print(json.dumps(run(counts), indent=2))
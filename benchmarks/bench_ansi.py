@@ -0,0 +1,80 @@
+# benchmarks/bench_ansi.py
+# 用法: python -m benchmarks.bench_ansi [输出大小MB]
+# 对比旧的正则去色方式与流式 ANSI 解析器处理多 MB 输出的耗时
+import codecs
+import json
+import sys
+
+from ansi_parser import AnsiParser
+from benchmarks.common import measure
+from execution_pool import ANSI_ESCAPE_PATTERN
+from log_buffer import LogBuffer
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_output(kind, size):
+    """生成约 size 字节的输出"""
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        if kind == "plain":
+            part = f"compiling src/module_{n}.c -o build/module_{n}.o\n"
+        elif kind == "colored":
+            part = (
+                f"\x1b[1;32m[ OK ]\x1b[0m test_case_{n} "
+                f"\x1b[2m({n % 97} ms)\x1b[0m \x1b[38;5;{n % 256}m模块 {n}\x1b[0m\n"
+            )
+        else:
+            # 进度条：每行之前有 100 次原地刷新
+            bar = n % 100
+            part = f"\r\x1b[K下载中 {bar:3d}% |\x1b[32m{'█' * (bar // 4)}\x1b[0m{' ' * (25 - bar // 4)}|"
+            if bar == 99:
+                part += "\n"
+        parts.append(part)
+        total += len(part.encode("utf-8"))
+        n += 1
+    data = "".join(parts).encode("utf-8")
+    return [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+def regex_path(chunks):
+    """旧方式：增量解码后用正则删除转义序列，再按行切分"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = LogBuffer(max_lines=10**9)
+    for chunk in chunks:
+        buffer.append_text(ANSI_ESCAPE_PATTERN.sub("", decoder.decode(chunk)))
+    return buffer
+
+
+def parser_path(chunks):
+    parser = AnsiParser("utf-8")
+    buffer = LogBuffer(max_lines=10**9)
+    for chunk in chunks:
+        buffer.append_output(*parser.feed(chunk))
+    return buffer
+
+
+def run(size_mb=4):
+    size = int(size_mb * 1024 * 1024)
+    results = {}
+    for kind in ("plain", "colored", "progress"):
+        chunks = make_output(kind, size)
+        result = {}
+        for name, func in (("regex", regex_path), ("parser", parser_path)):
+            timing = measure(lambda: func(chunks), repeat=3)
+            buffer = func(chunks)
+            timing["mb_per_s"] = round(size / 1024 / 1024 / (timing["median_ms"] / 1000), 1)
+            timing["lines"] = buffer.display_count()
+            timing["longest_line"] = max(
+                len(buffer.line(i)) for i in range(buffer.display_count())
+            )
+            result[name] = timing
+        results[kind] = result
+    return results
+
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(json.dumps(run(size_mb), indent=2, ensure_ascii=False))
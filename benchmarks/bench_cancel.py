@@ -0,0 +1,82 @@
+# benchmarks/bench_cancel.py
+# 用法: python -m benchmarks.bench_cancel [并发执行数 ...]
+# 同时运行大量执行后全部取消，测量从取消到整棵进程树退出的耗时（仅 POSIX）：
+#   graceful 子进程收到 SIGTERM 后自行退出；stubborn 子进程忽略 SIGTERM，宽限期后被强制结束；
+#   forced 宽限期为 0，直接强制结束（相当于原来的 SIGKILL）
+import json
+import sys
+import threading
+import time
+
+from execution_pool import ExecutionPool, PoolListener, RunSpec
+
+# stubborn 场景的宽限期（秒）
+STUBBORN_GRACE = 0.5
+
+SCENARIOS = {
+    "graceful": ("sleep 600 & sleep 600 & wait", 5.0),
+    "stubborn": ("trap '' TERM; sleep 600 & wait", STUBBORN_GRACE),
+    "forced": ("sleep 600 & sleep 600 & wait", 0),
+}
+
+
+class _Listener(PoolListener):
+    def __init__(self):
+        self.done = threading.Event()
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 2)
+
+
+def _leftovers(runs):
+    """进程树中仍有进程（僵尸进程除外）的执行数"""
+    return sum(1 for run in runs if run.tree.alive())
+
+
+def cancel_all(count, command, grace):
+    listener = _Listener()
+    pool = ExecutionPool(max_workers=count, listener=listener, grace_period=grace)
+    pool.start()
+    batch = pool.submit([RunSpec(command, "bash", name=f"run {n}") for n in range(count)])
+    while not all(run.tree is not None for run in batch.runs):
+        time.sleep(0.01)
+    # 让 shell 启动其子进程并设置好信号处理
+    time.sleep(0.3)
+    start = time.perf_counter()
+    pool.cancel_all()
+    listener.done.wait(grace + 30)
+    elapsed = (time.perf_counter() - start) * 1000
+    pool.shutdown()
+    latencies = [run.metrics["cancel_ms"] for run in batch.runs]
+    return {
+        "grace_s": grace,
+        "all_exited_ms": round(elapsed, 2),
+        "cancel_p50_ms": _percentile(latencies, 0.5),
+        "cancel_p95_ms": _percentile(latencies, 0.95),
+        "cancel_max_ms": _percentile(latencies, 1.0),
+        "forced": sum(1 for run in batch.runs if run.cancel_result["forced"]),
+        "remaining": sum(1 for run in batch.runs if run.cancel_result["remaining"]),
+        "leftover_groups": _leftovers(batch.runs),
+    }
+
+
+def run(counts=(100, 300)):
+    if sys.platform == "win32":
+        raise SystemExit("bench_cancel 只支持 POSIX 系统")
+    results = {}
+    for count in counts:
+        results[count] = {
+            name: cancel_all(count, command, grace)
+            for name, (command, grace) in SCENARIOS.items()
+        }
+    return results
+
+
+if __name__ == "__main__":
+    counts = tuple(int(a) for a in sys.argv[1:]) or (100, 300)
+    print(json.dumps(run(counts), indent=2))
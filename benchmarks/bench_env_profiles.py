@@ -0,0 +1,72 @@
+# benchmarks/bench_env_profiles.py
+# 用法: python -m benchmarks.bench_env_profiles [执行次数]
+# 对比每次执行前内联运行激活脚本与使用缓存的环境配置时，从提交到执行结束的单次延迟
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from benchmarks.common import measure
+from env_profiles import EnvironmentCache, new_profile
+from execution_pool import ExecutionPool, PoolListener, RunSpec
+
+# 与 conda 的 shell hook 类似：激活脚本先启动解释器计算出环境，再 eval 其输出
+ACTIVATE_SCRIPT = """eval "$('%s' -c 'print("export SDK_HOME=/opt/sdk; export PATH=/opt/sdk/bin:$PATH")')"
+"""
+
+
+class _Listener(PoolListener):
+    def __init__(self):
+        self.pool = None
+        self.done = threading.Event()
+
+    def on_run_output(self, run, output):
+        self.pool.mark_batch_applied(run)
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+def _latency(spec, runs, env_cache):
+    listener = _Listener()
+    pool = ExecutionPool(max_workers=1, listener=listener, env_cache=env_cache)
+    listener.pool = pool
+    failed = []
+
+    def run_once():
+        listener.done.clear()
+        batch = pool.submit([spec])
+        listener.done.wait(60)
+        if not batch.succeeded:
+            failed.append(batch.runs[0].return_code)
+
+    # 第一次执行（以及环境配置的捕获）不计入
+    run_once()
+    result = measure(run_once, repeat=runs)
+    pool.shutdown()
+    result["failed"] = len(failed)
+    return result
+
+
+def run(runs=30):
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "activate.sh"), "w") as f:
+            f.write(ACTIVATE_SCRIPT % sys.executable)
+        profile = new_profile("sdk", "bash", ". ./activate.sh", directory)
+        cache = EnvironmentCache(os.path.join(directory, "env_cache"))
+        return {
+            "runs": runs,
+            "inline_activation": _latency(
+                RunSpec('. ./activate.sh && echo "$SDK_HOME"', "bash", directory), runs, None
+            ),
+            "cached_profile": _latency(
+                RunSpec('echo "$SDK_HOME"', "bash", directory, env_profile=profile), runs, cache
+            ),
+            "cache": dict(cache.stats),
+        }
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    print(json.dumps(run(runs), indent=2, ensure_ascii=False))
@@ -0,0 +1,96 @@
+# benchmarks/bench_file_watch.py
+# 用法: python -m benchmarks.bench_file_watch [文件数 ...]
+# 文件监视：在有大量文件的目录树上开始监视的耗时、没有改动时的空闲 CPU 占用、
+# 单个文件改动到触发的延迟（减去合并等待时间），以及大量文件同时改动时合并成的触发次数
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from file_watch import FileWatcher, WatchSpec
+
+FILES_PER_DIR = 50
+DEBOUNCE_MS = 50
+IDLE_SECONDS = 2.0
+LATENCY_ROUNDS = 20
+BURST_FILES = 5000
+
+
+def _make_tree(root, count):
+    """count 个文件，每个目录 FILES_PER_DIR 个，目录分两级"""
+    for n in range(count):
+        directory = os.path.join(root, f"d{n // (FILES_PER_DIR * 40)}", f"e{n // FILES_PER_DIR}")
+        if n % FILES_PER_DIR == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, f"f{n}.py"), "w") as f:
+            f.write("x = 1\n")
+
+
+def bench(count):
+    root = tempfile.mkdtemp(prefix="bench-watch-")
+    try:
+        _make_tree(root, count)
+        triggers = []
+        triggered = threading.Event()
+
+        def on_trigger(item_id, paths):
+            triggers.append((time.perf_counter(), paths))
+            triggered.set()
+
+        watcher = FileWatcher(on_trigger)
+        start = time.perf_counter()
+        watcher.set_item("item", root, WatchSpec(["*.py"], DEBOUNCE_MS))
+        setup_ms = (time.perf_counter() - start) * 1000
+
+        time.sleep(0.2)
+        cpu = time.process_time()
+        time.sleep(IDLE_SECONDS)
+        idle_cpu_ms = (time.process_time() - cpu) * 1000
+
+        latencies = []
+        for n in range(LATENCY_ROUNDS):
+            triggered.clear()
+            path = os.path.join(root, "d0", "e0", f"f{n}.py")
+            start = time.perf_counter()
+            with open(path, "w") as f:
+                f.write("x = 2\n")
+            triggered.wait(5)
+            latencies.append((triggers[-1][0] - start) * 1000 - DEBOUNCE_MS)
+        latencies.sort()
+
+        del triggers[:]
+        triggered.clear()
+        start = time.perf_counter()
+        for n in range(min(BURST_FILES, count)):
+            path = os.path.join(root, f"d{n // (FILES_PER_DIR * 40)}", f"e{n // FILES_PER_DIR}", f"f{n}.py")
+            with open(path, "w") as f:
+                f.write("x = 3\n")
+        write_ms = (time.perf_counter() - start) * 1000
+        triggered.wait(10)
+        time.sleep(DEBOUNCE_MS / 1000 * 4)
+        watcher.close()
+        return {
+            "watched_dirs": watcher.watched_dirs(),
+            "setup_ms": round(setup_ms, 2),
+            "idle_cpu_ms_per_s": round(idle_cpu_ms / IDLE_SECONDS, 3),
+            "latency_p50_ms": round(latencies[len(latencies) // 2], 2),
+            "latency_max_ms": round(latencies[-1], 2),
+            "burst_files": min(BURST_FILES, count),
+            "burst_write_ms": round(write_ms, 2),
+            "burst_triggers": len(triggers),
+            "burst_paths": sum(len(paths) for _, paths in triggers),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run(counts=(10000, 100000)):
+    return {count: bench(count) for count in counts}
+
+
+if __name__ == "__main__":
+    counts = tuple(int(a) for a in sys.argv[1:]) or (10000, 100000)
+    print(json.dumps(run(counts), indent=2))
@@ -0,0 +1,53 @@
+# benchmarks/bench_history.py
+# 用法: python -m benchmarks.bench_history [行数 ...]
+# 执行历史归档：写入吞吐、打开归档的耗时，以及随机跳到任意一页（1000 行）的耗时
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.common import measure
+from run_history import ArchiveReader, ArchiveWriter
+
+PAGE_LINES = 1000
+
+
+def run(sizes=(1_000_000,)):
+    results = {}
+    for size in sizes:
+        lines = [f"[{n:08d}] compiling module_{n % 997}.c -> build/obj/module_{n % 997}.o" for n in range(size)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.gslog")
+            start = time.perf_counter()
+            writer = ArchiveWriter(path)
+            for pos in range(0, size, 1000):
+                writer.append(lines[pos:pos + 1000])
+            archive_bytes = writer.close()
+            write_s = time.perf_counter() - start
+            raw_bytes = sum(len(line) + 1 for line in lines)
+            open_ms = measure(lambda: ArchiveReader(path).close())
+            reader = ArchiveReader(path)
+            rng = random.Random(1)
+
+            def read_page():
+                first = rng.randrange(0, size - PAGE_LINES)
+                for n in range(first, first + PAGE_LINES):
+                    reader.entry(n)
+
+            page_ms = measure(read_page, repeat=20)
+            reader.close()
+        results[size] = {
+            "raw_mb": round(raw_bytes / 1024 / 1024, 1),
+            "archive_mb": round(archive_bytes / 1024 / 1024, 1),
+            "write_mb_per_s": round(raw_bytes / 1024 / 1024 / write_s, 1),
+            "open": open_ms,
+            "random_page": page_ms,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(a) for a in sys.argv[1:]) or (1_000_000,)
+    print(json.dumps(run(sizes), indent=2))
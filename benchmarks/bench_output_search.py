@@ -0,0 +1,54 @@
+# benchmarks/bench_output_search.py
+# 用法: python -m benchmarks.bench_output_search [行数]
+# 在后台线程中搜索输出缓冲区：第一段结果出现的延迟和扫描全部行的耗时（子串与正则）
+import json
+import sys
+import threading
+import time
+
+from log_buffer import LogBuffer
+from output_search import OutputSearchService, compile_query
+
+
+def _search(buffer, matcher):
+    done = threading.Event()
+    result = {"first_ms": None, "matches": 0}
+    start = time.perf_counter()
+
+    def on_results(generation, matches, scanned, total):
+        if result["first_ms"] is None:
+            result["first_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["matches"] += len(matches)
+        if scanned >= total:
+            result["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            done.set()
+
+    service = OutputSearchService(on_results)
+    service.search(buffer, matcher)
+    done.wait(120)
+    service.close()
+    return result
+
+
+def run(lines=1_000_000):
+    buffer = LogBuffer(max_lines=10000)
+    for start in range(0, lines, 10000):
+        buffer.append_output(
+            [
+                f"[{n:08d}] {'ERROR' if n % 5000 == 0 else 'INFO'} building target_{n % 997}"
+                for n in range(start, min(lines, start + 10000))
+            ],
+            "",
+        )
+    results = {
+        "substring": _search(buffer, compile_query("error")),
+        "substring_case": _search(buffer, compile_query("ERROR", case_sensitive=True)),
+        "regex": _search(buffer, compile_query(r"target_9\d\d$", regex=True)),
+    }
+    buffer.close()
+    return {"lines": lines, "results": results}
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(json.dumps(run(lines), indent=2))
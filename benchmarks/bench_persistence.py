@@ -0,0 +1,55 @@
+# benchmarks/bench_persistence.py
+# 用法: python -m benchmarks.bench_persistence [项目数 ...]
+# 完整保存和加载 data.json 的耗时随项目数的变化，以及只记录变更、在后台合并写入时的耗时
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.common import make_library, measure
+from data_manager import DataPersistence, JsonStorage, load_data, save_data
+
+
+def run(sizes=(10000,)):
+    results = {}
+    for size in sizes:
+        data = make_library(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "data.json")
+            save_data(data, path)
+            item = data["groups"][0]["items"][0]
+            # 旧方式：每次修改都在界面线程完整重写 data.json
+            full_save = measure(lambda: save_data(data, path))
+            load = measure(lambda: load_data(path))
+            file_kb = os.path.getsize(path) // 1024
+            # 新方式：界面线程只记录变更，写入在后台合并完成
+            persistence = DataPersistence(
+                data, JsonStorage(path, compact_threshold=10**9), delay=0
+            )
+            record = measure(
+                lambda: persistence.record("update_item", id=item["id"], fields={"name": "x"}),
+                repeat=100,
+            )
+            journal_flush = measure(
+                lambda: (
+                    persistence.record("update_item", id=item["id"], fields={"name": "y"}),
+                    persistence.flush(),
+                ),
+                repeat=20,
+            )
+            persistence.close()
+            load_with_journal = measure(lambda: load_data(path))
+        results[size] = {
+            "file_kb": file_kb,
+            "full_save": full_save,
+            "load": load,
+            "record": record,
+            "record_and_flush": journal_flush,
+            "load_with_journal": load_with_journal,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000]
+    print(json.dumps(run(sizes), indent=2, ensure_ascii=False))
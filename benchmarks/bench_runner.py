@@ -0,0 +1,138 @@
+# benchmarks/bench_runner.py
+# 用法: python -m benchmarks.bench_runner [输出行数]
+# 通过 CommandRunner 执行一个大量输出的子进程（仅 POSIX，无界面时使用 offscreen 平台）：
+#   throughput 界面只确认批次（signal）和追加到输出视图（view）时的吞吐量，普通文本与带颜色的输出各一次；
+#   latency 子进程写出一行到该行追加进输出视图的延迟，空闲时（idle）和同时有大量输出时（loaded）
+import json
+import os
+import shlex
+import sys
+import tempfile
+import time
+
+from PySide6.QtCore import QObject
+
+from ansi_parser import line_text
+from benchmarks.common import qt_app, wait_for
+from command_runner import CommandRunner
+from execution_pool import RunSpec
+from output_view import LogView
+
+LINES = 200000
+LINE_WIDTH = 100
+LATENCY_ROUNDS = 200
+
+# 子进程按 10000 行一块写出，避免子进程本身成为瓶颈
+THROUGHPUT_CHILD = """
+import sys
+line = PREFIX + b"x" * (WIDTH - len(PREFIX) - 1) + b"\\n"
+chunk = line * 10000
+for _ in range(LINES // 10000):
+    sys.stdout.buffer.write(chunk)
+"""
+
+# 每隔 5 毫秒写出一行带时间戳的标记行，loaded 时在标记行之间写出 FILLER 行填充
+LATENCY_CHILD = """
+import sys, time
+filler = b"y" * 99 + b"\\n"
+for _ in range(ROUNDS):
+    sys.stdout.buffer.write(filler * FILLER)
+    sys.stdout.buffer.write(b"@T %r\\n" % time.time())
+    sys.stdout.flush()
+    time.sleep(0.005)
+"""
+
+
+def _command(code, **values):
+    for name, value in values.items():
+        code = code.replace(name, repr(value))
+    return f"{shlex.quote(sys.executable)} -c {shlex.quote(code)}"
+
+
+class _Window(QObject):
+    """代替主窗口接收输出：信号从事件循环线程排队送到界面线程，与主窗口相同"""
+
+    def __init__(self, append=True, stamps=False):
+        super().__init__()
+        self.append = append
+        self.stamps = stamps
+        self.latencies = []
+        self.runner = CommandRunner(max_workers=1, record_history=False)
+        self.runner.output_signal.connect(self.on_output)
+        self.view = LogView()
+        self.view.resize(800, 600)
+        self.view.show()
+
+    def on_output(self, run, output):
+        if self.append:
+            self.view.append_output(*output)
+        if self.stamps:
+            now = time.time()
+            for entry in output[0]:
+                text = line_text(entry)
+                if text.startswith("@T "):
+                    self.latencies.append((now - float(text[3:])) * 1000)
+        self.runner.mark_batch_applied(run)
+
+    def execute(self, command):
+        batch = self.runner.submit([RunSpec(command, "bash")])
+        wait_for(self.runner.batch_finished_signal)
+        self.runner.stop()
+        self.view.close()
+        return batch.runs[0]
+
+
+def throughput(lines, prefix, append):
+    window = _Window(append)
+    command = _command(THROUGHPUT_CHILD, PREFIX=prefix, WIDTH=LINE_WIDTH, LINES=lines)
+    start = time.perf_counter()
+    run = window.execute(command)
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "mb_per_s": round(run.stats["bytes"] / 1e6 / elapsed, 1),
+        "lines_per_s": round(run.stats["lines"] / elapsed),
+        "batches": run.stats["batches"],
+        "dropped_bytes": run.stats["dropped_bytes"],
+    }
+
+
+def latency(filler):
+    window = _Window(stamps=True)
+    window.execute(_command(LATENCY_CHILD, ROUNDS=LATENCY_ROUNDS, FILLER=filler))
+    latencies = sorted(window.latencies)
+    return {
+        "samples": len(latencies),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+def run(lines=LINES):
+    if sys.platform == "win32":
+        raise SystemExit("bench_runner 只支持 POSIX 系统")
+    qt_app()
+    # 执行指标写入当前目录，放到临时目录中
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            return {
+                "throughput": {
+                    "signal": throughput(lines, b"", append=False),
+                    "view": throughput(lines, b"", append=True),
+                    "view_ansi": throughput(lines, b"\x1b[32mok\x1b[0m \x1b[1;31m!\x1b[0m ", append=True),
+                },
+                "latency": {
+                    "idle": latency(0),
+                    "loaded": latency(2000),
+                },
+            }
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else LINES
+    print(json.dumps(run(lines), indent=2))
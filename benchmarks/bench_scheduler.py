@@ -0,0 +1,100 @@
+# benchmarks/bench_scheduler.py
+# 用法: python -m benchmarks.bench_scheduler [计划数 ...]
+# 计划执行：加载大量计划的耗时、没有到期项目时的空闲 CPU 占用、cron 表达式计算下次时间的耗时，
+# 以及大量项目同时到期时从到期到回调的延迟
+import json
+import sys
+import threading
+import time
+
+from benchmarks.common import measure
+from scheduler import CronExpression, Schedule, Scheduler
+
+IDLE_SECONDS = 2.0
+BURST_SECONDS = 3.0
+CRON_SPECS = ["*/5 * * * *", "0 9 * * mon-fri", "30 2 1 * *", "15 */2 * * *"]
+
+
+def _entries(count, short=False):
+    entries = []
+    for n in range(count):
+        if short:
+            schedule = Schedule("1s")
+        elif n % 2:
+            schedule = Schedule(f"{1 + n % 12}h", jitter=60)
+        else:
+            schedule = Schedule(CRON_SPECS[n % len(CRON_SPECS)])
+        entries.append((f"item{n}", schedule, f"group{n % 50}"))
+    return entries
+
+
+def idle(count):
+    """计划都不在近期到期时，空闲期间整个进程消耗的 CPU 时间"""
+    scheduler = Scheduler(lambda item_id: None)
+    entries = _entries(count)
+    start = time.perf_counter()
+    scheduler.load(entries)
+    load_ms = (time.perf_counter() - start) * 1000
+    time.sleep(0.2)
+    cpu = time.process_time()
+    time.sleep(IDLE_SECONDS)
+    idle_cpu_ms = (time.process_time() - cpu) * 1000
+    start = time.perf_counter()
+    for item_id, schedule, group_id in entries[:1000]:
+        scheduler.set_item(item_id, Schedule("30m"), group_id)
+    update_us = (time.perf_counter() - start) * 1000 * 1000 / min(count, 1000)
+    scheduler.close()
+    return {
+        "load_ms": round(load_ms, 2),
+        "idle_cpu_ms_per_s": round(idle_cpu_ms / IDLE_SECONDS, 3),
+        "set_item_us": round(update_us, 2),
+    }
+
+
+def burst(count):
+    """所有计划每秒同时到期；回调中立即结束执行，测量到期到回调的延迟"""
+    lateness = []
+    lock = threading.Lock()
+    dues = {}
+    scheduler = None
+
+    def on_due(item_id):
+        with lock:
+            due = dues.pop(item_id, None)
+            if due is not None:
+                lateness.append((time.time() - due) * 1000)
+        scheduler.run_finished(item_id)
+
+    scheduler = Scheduler(on_due, max_runs=count, max_runs_per_group=0)
+    scheduler.load(_entries(count, short=True))
+    with lock:
+        dues.update((f"item{n}", scheduler.next_run(f"item{n}")) for n in range(count))
+    time.sleep(BURST_SECONDS)
+    scheduler.close()
+    stats = dict(scheduler.stats)
+    lateness.sort()
+    return {
+        "fired": stats["fired"],
+        # 只统计第一轮到期
+        "first_round_p50_ms": round(lateness[len(lateness) // 2], 2) if lateness else None,
+        "first_round_max_ms": round(lateness[-1], 2) if lateness else None,
+    }
+
+
+def run(counts=(1000, 10000)):
+    now = time.time()
+    results = {
+        # 每次新建表达式，不经过解析缓存，测量的是一次完整的计算
+        "cron_next": {
+            spec: measure(lambda s=spec: CronExpression(s).next_after(now), repeat=200)
+            for spec in CRON_SPECS
+        }
+    }
+    for count in counts:
+        results[count] = {"idle": idle(count), "burst": burst(count)}
+    return results
+
+
+if __name__ == "__main__":
+    counts = tuple(int(a) for a in sys.argv[1:]) or (1000, 10000)
+    print(json.dumps(run(counts), indent=2))
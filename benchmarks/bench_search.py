@@ -0,0 +1,39 @@
+# benchmarks/bench_search.py
+# 用法: python -m benchmarks.bench_search [项目数 ...]
+# 测量搜索索引的建立、单项更新和各类查询的耗时
+import json
+import sys
+
+from benchmarks.common import make_library, measure
+from search_index import SearchIndex
+
+QUERIES = ["命令 4711", "make", "project7", "projectt12", "echo all", "12", "zzz"]
+
+
+def run(sizes=(50000,)):
+    results = {}
+    for size in sizes:
+        data = make_library(size)
+        items = [i for g in data["groups"] for i in g["items"]]
+        index = SearchIndex()
+        result = {"build": measure(lambda: index.build(items), repeat=3)}
+        item = dict(items[size // 2])
+        counter = iter(range(10**9))
+
+        def update():
+            item["name"] = f"改名 {next(counter)}"
+            index.add(item)
+
+        result["update_one_item"] = measure(update, repeat=50)
+        result["queries"] = {}
+        for query in QUERIES:
+            timing = measure(lambda: index.search(query), repeat=10)
+            timing["matches"] = index.search(query)[0]
+            result["queries"][query] = timing
+        results[size] = result
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50000]
+    print(json.dumps(run(sizes), indent=2, ensure_ascii=False))
@@ -0,0 +1,61 @@
+# benchmarks/bench_shell_pool.py
+# 用法: python -m benchmarks.bench_shell_pool [执行次数] [shell]
+# 对比每次启动新 shell 与复用预热会话时，从提交到执行结束的单次延迟（默认 bash）
+import json
+import sys
+import threading
+
+from benchmarks.common import measure
+from execution_pool import ExecutionPool, PoolListener, RunSpec
+from shell_pool import ShellSessionPool
+
+
+class _Listener(PoolListener):
+    def __init__(self):
+        self.pool = None
+        self.done = threading.Event()
+
+    def on_run_output(self, run, output):
+        self.pool.mark_batch_applied(run)
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+def _latency(shell, runs, shell_pool):
+    listener = _Listener()
+    pool = ExecutionPool(max_workers=1, listener=listener, shell_pool=shell_pool)
+    listener.pool = pool
+    spec = RunSpec("echo hi", shell)
+    failed = []
+
+    def run_once():
+        listener.done.clear()
+        batch = pool.submit([spec])
+        listener.done.wait(30)
+        if not batch.succeeded:
+            failed.append(batch.runs[0].return_code)
+
+    pool.prewarm([spec])
+    run_once()
+    result = measure(run_once, repeat=runs)
+    pool.shutdown()
+    result["failed"] = len(failed)
+    if shell_pool is not None:
+        result["sessions"] = dict(shell_pool.stats)
+    return result
+
+
+def run(runs=50, shell="bash"):
+    return {
+        "shell": shell,
+        "runs": runs,
+        "spawn_per_run": _latency(shell, runs, None),
+        "warm_session": _latency(shell, runs, ShellSessionPool()),
+    }
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    shell = sys.argv[2] if len(sys.argv) > 2 else "bash"
+    print(json.dumps(run(runs, shell), indent=2, ensure_ascii=False))
@@ -0,0 +1,60 @@
+# benchmarks/bench_startup.py
+# 用法: python -m benchmarks.bench_startup [项目数 ...]
+# 冷启动：每次新开一个进程运行 main.py --profile-startup（无界面时使用 offscreen 平台），
+# 测量从启动进程到窗口第一次绘制后退出的总耗时，以及程序自己报告的各阶段耗时
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_library
+from data_manager import save_data
+
+ROUNDS = 5
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def start_once(cwd):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, MAIN, "--profile-startup"],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        timeout=120,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"main.py 退出码 {result.returncode}")
+    return elapsed, json.loads(result.stdout)
+
+
+def bench(size):
+    # 启动时从当前目录读取 data.json
+    with tempfile.TemporaryDirectory() as tmp:
+        save_data(make_library(size), os.path.join(tmp, "data.json"))
+        runs = [start_once(tmp) for _ in range(ROUNDS)]
+    first = runs[0][0]
+    runs.sort(key=lambda r: r[0])
+    elapsed, report = runs[len(runs) // 2]
+    return {
+        "first_process_ms": round(first, 2),
+        "process_min_ms": round(runs[0][0], 2),
+        "process_median_ms": round(elapsed, 2),
+        "first_paint_ms": report["total_ms"],
+        "phases_ms": report["phases_ms"],
+    }
+
+
+def run(sizes=(100, 10000)):
+    return {size: bench(size) for size in sizes}
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(a) for a in sys.argv[1:]) or (100, 10000)
+    print(json.dumps(run(sizes), indent=2, ensure_ascii=False))
@@ -0,0 +1,44 @@
+# benchmarks/bench_storage.py
+# 用法: python -m benchmarks.bench_storage [项目数 ...]
+# 对比 JSON 与 SQLite 存储的启动加载和单条修改耗时
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.common import make_library, measure
+from data_manager import JsonStorage
+from sqlite_storage import SqliteStorage
+
+
+def run(sizes=(50000,)):
+    results = {}
+    for size in sizes:
+        data = make_library(size)
+        item = data["groups"][len(data["groups"]) // 2]["items"][0]
+        result = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, storage in (
+                ("json", JsonStorage(os.path.join(tmp, "data.json"))),
+                ("sqlite", SqliteStorage(os.path.join(tmp, "data.db"))),
+            ):
+                storage.save(data)
+                storage.attach(data)
+                counter = iter(range(10**9))
+                result[name] = {
+                    "load": measure(storage.load),
+                    "rename_one_item": measure(
+                        lambda: storage.write_changes(
+                            [{"op": "update_item", "id": item["id"], "fields": {"name": f"n{next(counter)}"}}]
+                        ),
+                        repeat=20,
+                    ),
+                }
+                storage.close()
+        results[size] = result
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50000]
+    print(json.dumps(run(sizes), indent=2, ensure_ascii=False))
@@ -0,0 +1,90 @@
+# benchmarks/bench_tree.py
+# 用法: python -m benchmarks.bench_tree [项目数 ...]
+# 命令树（无界面时使用 offscreen 平台）：建立 store 索引、建立树模型并完成第一次布局、
+# 全部展开（分组的子项全部交给视图）、有大量项目时修改和删除单个项目的增量更新，
+# 以及主窗口加载 data.json 的各阶段耗时和 load_and_display_data 的耗时
+import json
+import os
+import sys
+import tempfile
+
+from PySide6.QtWidgets import QApplication, QTreeView
+
+from benchmarks.common import make_library, measure, qt_app
+from data_manager import CommandStore, save_data
+from tree_model import CommandTreeModel
+
+
+def model(size, repeat=5):
+    data = make_library(size)
+    result = {"store_ms": measure(lambda: CommandStore(data), repeat)}
+    view = QTreeView()
+    view.setUniformRowHeights(True)
+    view.resize(300, 600)
+    view.show()
+    # 模型订阅 store 后无法取消，每次测量使用各自的 store
+    stores = iter([CommandStore(data) for _ in range(repeat * 2)])
+
+    def populate():
+        store = next(stores)
+        view.setModel(CommandTreeModel(store, view))
+        QApplication.processEvents()
+        return store
+
+    result["model_ms"] = measure(populate, repeat)
+
+    def expand():
+        populate()
+        view.expandAll()
+        QApplication.processEvents()
+
+    result["expand_all_ms"] = measure(expand, repeat)
+    # 最后一次 expand 的模型已全部展开，之后的修改都经过视图
+    store = view.model()._store
+    item_ids = list(store.items)
+    result["update_item_ms"] = measure(
+        lambda: store.update_item(item_ids[size // 2], {"command": "echo changed"}), 20
+    )
+    result["delete_item_ms"] = measure(lambda: store.delete_item(item_ids.pop()), 20)
+    view.close()
+    return result
+
+
+def main_window(size):
+    from main_window import MainWindow
+
+    # 主窗口从当前目录读写 data.json、执行指标和历史记录
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        save_data(make_library(size), os.path.join(tmp, "data.json"))
+        os.chdir(tmp)
+        try:
+            window = MainWindow()
+            window.show()
+            QApplication.processEvents()
+            report = window.profiler.report()
+
+            def display():
+                window.load_and_display_data()
+                QApplication.processEvents()
+
+            result = {
+                "phases_ms": report["phases_ms"],
+                "construct_ms": report["total_ms"],
+                "load_and_display_data": measure(display),
+            }
+            window.close()
+            QApplication.processEvents()
+            return result
+        finally:
+            os.chdir(cwd)
+
+
+def run(sizes=(100, 10000, 100000)):
+    qt_app()
+    return {size: {"model": model(size), "main_window": main_window(size)} for size in sizes}
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(a) for a in sys.argv[1:]) or (100, 10000, 100000)
+    print(json.dumps(run(sizes), indent=2, ensure_ascii=False))
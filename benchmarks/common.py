@@ -0,0 +1,60 @@
+# benchmarks/common.py
+import os
+import time
+
+from data_manager import generate_id
+
+
+def make_library(item_count, items_per_group=100):
+    """生成包含 item_count 个项目的测试数据"""
+    data = {"favorites": [], "groups": [], "theme": "dark", "font_size": 12}
+    for start in range(0, item_count, items_per_group):
+        group = {"id": generate_id(), "name": f"分组 {start // items_per_group}", "items": []}
+        for n in range(start, min(start + items_per_group, item_count)):
+            group["items"].append(
+                {
+                    "id": generate_id(),
+                    "name": f"命令 {n}",
+                    "command": f"echo build-{n} && make -C project{n % 50} all",
+                    "shell": "cmd",
+                    "working_dir": f"D:\\work\\project{n % 50}",
+                }
+            )
+        data["groups"].append(group)
+    return data
+
+
+def measure(func, repeat=5):
+    """多次执行 func，返回最短和中位耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"min_ms": round(timings[0], 3), "median_ms": round(timings[len(timings) // 2], 3)}
+
+
+# qt_app 创建的 QApplication，保存在模块中使其在整个测量期间存活
+_app = None
+
+
+def qt_app():
+    """取得（或创建）QApplication；未指定平台时使用 offscreen，在没有显示器的 Linux 上也能运行"""
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    _app = QApplication.instance() or QApplication([])
+    return _app
+
+
+def wait_for(signal, timeout_ms=120000):
+    """运行事件循环，直到 signal 发出或超时"""
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    signal.connect(loop.quit)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec()
+    signal.disconnect(loop.quit)
@@ -0,0 +1,197 @@
+# benchmarks/suite.py
+# 用法: python -m benchmarks.suite [--only 名称 ...] [-o 结果.json] [--save-baseline 基线.json]
+#                                  [--baseline 基线.json] [--threshold 0.2]
+# 依次在单独的进程中运行各项基准测试（无界面时使用 offscreen 平台），以 JSON 输出全部结果：
+#   runner 执行器吞吐量和输出到界面的延迟；tree 命令树和主窗口加载；
+#   persistence data.json 保存和加载；startup main.py 冷启动
+# 指定 --baseline 时与保存的基线比较，耗时变长（或吞吐量下降）超过阈值的指标列为退化，有退化时退出码为 1
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 名称 -> (模块, 参数)
+BENCHMARKS = {
+    "runner": ("benchmarks.bench_runner", []),
+    "tree": ("benchmarks.bench_tree", ["100", "10000", "100000"]),
+    "persistence": ("benchmarks.bench_persistence", ["100", "10000", "100000"]),
+    "startup": ("benchmarks.bench_startup", ["100", "10000"]),
+}
+
+THRESHOLD = 0.2
+# 耗时的变化小于该值（毫秒）时不算退化，避免亚毫秒级的指标因抖动被误报
+MIN_DELTA_MS = 1.0
+
+
+def run_benchmark(module, args):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    result = subprocess.run(
+        [sys.executable, "-m", module] + args,
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        return {"error": f"退出码 {result.returncode}"}
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        return {"error": "输出不是 JSON"}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def environment():
+    try:
+        import PySide6
+
+        qt = PySide6.__version__
+    except ImportError:
+        qt = None
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pyside6": qt,
+    }
+
+
+def flatten(results, prefix=""):
+    """把嵌套的结果展开为 {"tree.10000.model.store_ms.min_ms": 2.1, ...}"""
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[path] = value
+    return metrics
+
+
+def direction(path):
+    """耗时越小越好返回 -1，吞吐量越大越好返回 1，其他指标（计数、大小）不比较返回 0"""
+    parts = path.split(".")
+    # measure() 的结果只比较最短耗时，它受干扰最小
+    if parts[-1] == "median_ms" and len(parts) > 1:
+        return 0
+    if parts[-1].endswith("_per_s"):
+        return 1
+    if any(part.endswith("_ms") for part in parts):
+        return -1
+    return 0
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """与基线逐项比较，返回退化、改进的指标和基线中有而这次没有的指标"""
+    now = flatten(current)
+    before = flatten(baseline)
+    regressions, improvements, missing = [], [], []
+    for path, old in sorted(before.items()):
+        sign = direction(path)
+        if sign == 0:
+            continue
+        if path not in now:
+            missing.append(path)
+            continue
+        new = now[path]
+        if old <= 0 or (sign < 0 and abs(new - old) < MIN_DELTA_MS):
+            continue
+        change = (new - old) / old
+        entry = {"metric": path, "baseline": old, "current": new, "change": f"{change:+.1%}"}
+        worse = change * -sign
+        if worse > threshold:
+            regressions.append(entry)
+        elif worse < -threshold:
+            improvements.append(entry)
+    return {
+        "threshold": threshold,
+        "regressions": regressions,
+        "improvements": improvements,
+        "missing": missing,
+    }
+
+
+def _print_comparison(comparison):
+    """比较结果的摘要输出到标准错误，标准输出只有 JSON"""
+    out = sys.stderr
+    for title, key in (("退化", "regressions"), ("改进", "improvements")):
+        entries = comparison[key]
+        print(f"{title}: {len(entries)} 项", file=out)
+        for entry in entries:
+            print(
+                f"  {entry['metric']}: {entry['baseline']} -> {entry['current']} ({entry['change']})",
+                file=out,
+            )
+    if comparison["missing"]:
+        print(f"基线中有但这次没有的指标: {len(comparison['missing'])} 项", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.suite", description="运行全部基准测试")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="只运行这些基准测试")
+    parser.add_argument("-o", "--output", help="结果写入该文件，而不是标准输出")
+    parser.add_argument("--save-baseline", metavar="FILE", help="同时把结果保存为基线")
+    parser.add_argument("--baseline", metavar="FILE", help="与该基线比较")
+    parser.add_argument(
+        "--threshold", type=float, default=THRESHOLD, help=f"判定为退化的变化比例（默认 {THRESHOLD}）"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        module, bench_args = BENCHMARKS[name]
+        print(f"正在运行 {name} ...", file=sys.stderr)
+        start = time.perf_counter()
+        results[name] = run_benchmark(module, bench_args)
+        print(f"  {name} 用时 {time.perf_counter() - start:.1f} 秒", file=sys.stderr)
+    report = {"environment": environment(), "results": results}
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if baseline is not None:
+        # 只比较这次运行了的基准测试
+        report["comparison"] = compare(
+            results, {name: baseline["results"].get(name, {}) for name in results}, args.threshold
+        )
+        _print_comparison(report["comparison"])
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failed = [name for name, result in results.items() if "error" in result]
+    if failed:
+        print(f"运行失败: {', '.join(failed)}", file=sys.stderr)
+        return 2
+    if baseline is not None and report["comparison"]["regressions"]:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,550 @@
+# cli.py
+# 用法:
+#   python -m cli list [--data 数据文件] [--json]
+#   python -m cli run 目标 [目标 ...] [--jobs N] [--pipeline] [--fail-fast] [--summary 文件|-] [--no-prefix]
+#                    [--no-metrics] [--no-history] [--grace 秒] [--data 数据文件]
+#   python -m cli schedule [目标 ...] [--jobs N] [--max-runs N] [--no-prefix] [--no-metrics] [--no-history]
+#                         [--grace 秒] [--data 数据文件]
+#   python -m cli watch [目标 ...] [--jobs N] [--no-prefix] [--no-metrics] [--no-history] [--grace 秒]
+#                      [--data 数据文件]
+# 目标为分组或项目的名称或 id，也可以写成 "分组名/项目名"；运行分组即运行其中所有项目。
+# 设置了执行目标的项目在每个目标（本机或运行 remote_agent 的执行主机）上各执行一次，全部成功才算成功。
+# --pipeline 按项目的依赖关系运行，依赖的项目会一起运行，结束时报告关键路径。
+# schedule 按项目设置的计划（固定间隔或 cron 表达式）常驻运行，不需要打开界面。
+# watch 监视项目工作目录中的文件，改动后按项目的设置重新执行，改动的文件通过 GUI_SHELL_CHANGED_FILES 传入。
+# Ctrl+C 先请求所有执行退出，超过 --grace 秒后强制结束；再按一次立即强制结束。
+# 不导入任何 Qt 模块，可以在 cron 和 CI 中使用。全部成功时退出码为 0，有失败或取消时为 1，目标无效时为 2。
+import argparse
+import json
+import sys
+import threading
+import time
+
+from ansi_parser import line_text
+from data_manager import open_storage
+
+
+class TargetError(Exception):
+    pass
+
+
+def _item_path(group, item):
+    return f"{group['name']}/{item['name']}"
+
+
+def find_items(data, target):
+    """按 id、分组名、项目名、"分组名/项目名" 的顺序查找目标，返回 [(分组, 项目), ...]"""
+    groups = data["groups"]
+    for group in groups:
+        if group["id"] == target:
+            return [(group, item) for item in group["items"]]
+        for item in group["items"]:
+            if item["id"] == target:
+                return [(group, item)]
+    named = [g for g in groups if g["name"] == target]
+    if len(named) == 1:
+        return [(named[0], item) for item in named[0]["items"]]
+    if len(named) > 1:
+        raise TargetError(
+            f"有多个分组名为 “{target}”，请改用 id:\n"
+            + "\n".join(f"  {g['id']}" for g in named)
+        )
+    matches = [(g, i) for g in groups for i in g["items"] if i["name"] == target]
+    if not matches:
+        # 名称中也可能含有 "/"，逐个位置尝试拆分为分组名和项目名
+        for pos, char in enumerate(target):
+            if char == "/":
+                group_name, item_name = target[:pos], target[pos + 1:]
+                matches.extend(
+                    (g, i)
+                    for g in groups
+                    if g["name"] == group_name
+                    for i in g["items"]
+                    if i["name"] == item_name
+                )
+    if len(matches) > 1:
+        raise TargetError(
+            f"有多个项目名为 “{target}”，请改用 id 或 “分组名/项目名”:\n"
+            + "\n".join(f"  {i['id']}  {_item_path(g, i)}" for g, i in matches)
+        )
+    if not matches:
+        raise TargetError(f"找不到分组或项目 “{target}”")
+    return matches
+
+
+class CliListener:
+    """把各执行的输出逐行写到 out，每行以执行名作为前缀
+
+    实现 execution_pool.PoolListener 的接口，回调在执行池的线程中调用。
+    """
+
+    def __init__(self, out, prefix=True):
+        self.out = out
+        self.prefix = prefix
+        self.pool = None
+        self.labels = {}
+        self.done = threading.Event()
+        self._partials = {}
+        self._lock = threading.Lock()
+
+    def set_runs(self, runs):
+        width = max((len(run.spec.name) for run in runs), default=0)
+        for run in runs:
+            self.labels[run.run_id] = f"[{run.spec.name.ljust(width)}] " if self.prefix else ""
+
+    def label(self, run):
+        return self.labels.get(run.run_id, "")
+
+    def _write(self, run, lines):
+        label = self.label(run)
+        text = "".join(f"{label}{line_text(line)}\n" for line in lines)
+        with self._lock:
+            self.out.write(text)
+            self.out.flush()
+
+    def on_run_output(self, run, output):
+        lines, partial = output
+        self._partials[run.run_id] = partial
+        if lines:
+            self._write(run, lines)
+        self.pool.mark_batch_applied(run)
+
+    def on_run_status(self, run):
+        if not run.done:
+            return
+        lines = []
+        partial = self._partials.pop(run.run_id, "")
+        if partial:
+            lines.append(partial)
+        if run.cancel_requested:
+            lines.append("--- 已取消 ---")
+        elif run.start_time is None:
+            lines.append("--- 依赖的项目未成功，已跳过 ---")
+        else:
+            lines.append(f"--- 返回码: {run.return_code}, 耗时 {run.duration or 0:.2f}s ---")
+        self._write(run, lines)
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+class ServiceListener(CliListener):
+    """常驻运行计划或文件监视时使用：每行以当前时间和执行名作为前缀，执行结束后调用 on_finished(run)"""
+
+    def __init__(self, out, width, prefix=True):
+        super().__init__(out, prefix)
+        self.width = width
+        self.on_finished = None
+
+    def label(self, run):
+        if not self.prefix:
+            return ""
+        return f"{time.strftime('%H:%M:%S')} [{run.spec.name.ljust(self.width)}] "
+
+    def on_run_status(self, run):
+        super().on_run_status(run)
+        if run.done:
+            self.on_finished(run)
+
+    def on_batch_finished(self, batch):
+        pass
+
+
+def summarize(batch, groups, elapsed):
+    from execution_pool import FINISHED, FAILED, CANCELLED, SKIPPED
+
+    runs = []
+    counts = {FINISHED: 0, FAILED: 0, CANCELLED: 0, SKIPPED: 0}
+    for run in batch.runs:
+        counts[run.status] = counts.get(run.status, 0) + 1
+        runs.append(
+            {
+                "name": run.spec.name,
+                "group": groups.get(run.spec.item_id, ""),
+                "item_id": run.spec.item_id,
+                "shell": run.spec.shell,
+                "target": run.spec.target["name"] if run.spec.target else None,
+                "status": run.status,
+                "return_code": run.return_code,
+                "duration_s": round(run.duration, 3) if run.duration is not None else None,
+                "metrics": run.metrics,
+            }
+        )
+    return {
+        "succeeded": batch.succeeded,
+        "elapsed_s": round(elapsed, 3),
+        "counts": counts,
+        "runs": runs,
+    }
+
+
+def cmd_list(data, args):
+    if args.json:
+        print(json.dumps(data["groups"], indent=2, ensure_ascii=False))
+        return 0
+    for group in data["groups"]:
+        print(f"{group['name']}  ({group['id']})")
+        for item in group["items"]:
+            workdir = f" {item['working_dir']}" if item.get("working_dir") else ""
+            print(f"  {item['name']}  [{item.get('shell', 'cmd')}]{workdir}  ({item['id']})")
+    return 0
+
+
+def make_pool(data, args, listener):
+    """按命令行参数和界面中的设置创建执行池，返回 (执行池, 执行历史或 None)"""
+    # asyncio 等模块只在真正执行时才需要，list 不必为它们付出启动时间
+    from env_profiles import EnvironmentCache
+    from execution_pool import ExecutionPool
+    from process_control import GRACE_PERIOD
+    from run_history import HistoryStore, RetentionPolicy
+    from run_metrics import MetricsLog
+
+    history = None
+    if not args.no_history and data.get("record_history", True):
+        history = HistoryStore(retention=RetentionPolicy.from_settings(data))
+    pool = ExecutionPool(
+        max_workers=args.jobs or data.get("max_parallel_runs", 4),
+        listener=listener,
+        env_cache=EnvironmentCache(),
+        metrics_log=None if args.no_metrics else MetricsLog(),
+        history=history,
+        grace_period=(
+            args.grace if args.grace is not None else data.get("cancel_grace_seconds", GRACE_PERIOD)
+        ),
+    )
+    listener.pool = pool
+    return pool, history
+
+
+def cmd_run(data, args):
+    from execution_pool import RunSpec, FINISHED, FAILED, CANCELLED, SKIPPED
+    from pipeline import plan, report, format_report, PipelineError
+
+    selected = []
+    seen = set()
+    try:
+        for target in args.targets:
+            for group, item in find_items(data, target):
+                if item["id"] not in seen:
+                    seen.add(item["id"])
+                    selected.append((group, item))
+    except TargetError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not selected:
+        print("所选分组中没有项目", file=sys.stderr)
+        return 2
+
+    profiles = {p["id"]: p for p in data.get("env_profiles", [])}
+    agents = {a["id"]: a for a in data.get("agents", [])}
+    groups = {i["id"]: g["name"] for g in data["groups"] for i in g["items"]}
+    dependencies = None
+    if args.pipeline:
+        items = {i["id"]: i for g in data["groups"] for i in g["items"]}
+        try:
+            specs, dependencies, missing = plan(
+                [i["id"] for _, i in selected], items, profiles, agents=agents
+            )
+        except PipelineError as e:
+            print(e, file=sys.stderr)
+            return 2
+        for item, dep in missing:
+            print(f"已忽略 “{item['name']}” 指向已删除项目的依赖 {dep}", file=sys.stderr)
+    else:
+        specs = [s for _, item in selected for s in RunSpec.for_targets(item, profiles, agents)]
+    if not specs:
+        print("所选项目的执行目标都已被删除", file=sys.stderr)
+        return 2
+    # 摘要写到标准输出时，命令输出改写到标准错误，保证标准输出是完整的 JSON
+    out = sys.stderr if args.summary == "-" else sys.stdout
+    listener = CliListener(out, prefix=not args.no_prefix)
+    pool, history = make_pool(data, args, listener)
+    start = time.perf_counter()
+    batch = pool.submit(specs, fail_fast=args.fail_fast, dependencies=dependencies)
+    listener.set_runs(batch.runs)
+    interrupted = False
+    try:
+        while not listener.done.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        interrupted = True
+        print("正在停止所有执行，再次按 Ctrl+C 立即强制结束", file=sys.stderr)
+        pool.cancel_all()
+        try:
+            listener.done.wait(pool.grace_period + 10)
+        except KeyboardInterrupt:
+            pool.cancel_all(force=True)
+            listener.done.wait(10)
+    pool.shutdown()
+    if history is not None:
+        history.close()
+
+    summary = summarize(batch, groups, time.perf_counter() - start)
+    if args.pipeline:
+        summary["pipeline"] = report(batch)
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.summary == "-":
+        print(text)
+    elif args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        counts = summary["counts"]
+        print(
+            f"成功 {counts[FINISHED]}, 失败 {counts[FAILED]}, 取消 {counts[CANCELLED]}, "
+            f"跳过 {counts[SKIPPED]}, 总耗时 {summary['elapsed_s']:.2f}s",
+            file=out,
+        )
+        if args.pipeline:
+            print(format_report(summary["pipeline"]), file=out)
+    if interrupted:
+        return 130
+    return 0 if batch.succeeded else 1
+
+
+def select_items(data, targets):
+    """常驻命令的目标，没有指定时为所有项目；返回 [(分组, 项目), ...]"""
+    if targets:
+        return [pair for target in targets for pair in find_items(data, target)]
+    return [(g, i) for g in data["groups"] for i in g["items"]]
+
+
+def serve(pool, history, close):
+    """常驻运行直到按下 Ctrl+C，然后调用 close() 停止触发新的执行，并停止所有执行"""
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("正在停止，再次按 Ctrl+C 立即强制结束", file=sys.stderr)
+    close()
+    pool.cancel_all()
+    try:
+        pool.shutdown(timeout=pool.grace_period + 10)
+    except KeyboardInterrupt:
+        pool.cancel_all(force=True)
+        pool.shutdown()
+    if history is not None:
+        history.close()
+
+
+def cmd_schedule(data, args):
+    """按项目的计划常驻运行，直到按下 Ctrl+C"""
+    from execution_pool import RunSpec
+    from scheduler import Schedule, ScheduleError, Scheduler
+
+    try:
+        selected = select_items(data, args.targets)
+    except TargetError as e:
+        print(e, file=sys.stderr)
+        return 2
+    items = {}
+    entries = []
+    for group, item in selected:
+        try:
+            schedule = Schedule.from_item(item)
+        except ScheduleError as e:
+            print(f"“{_item_path(group, item)}”的计划无效: {e}", file=sys.stderr)
+            return 2
+        if schedule is not None and item["id"] not in items:
+            items[item["id"]] = (group, item, schedule)
+            entries.append((item["id"], schedule, group["id"]))
+    if not entries:
+        print("所选项目都没有设置计划", file=sys.stderr)
+        return 2
+
+    profiles = {p["id"]: p for p in data.get("env_profiles", [])}
+    agents = {a["id"]: a for a in data.get("agents", [])}
+    width = max(
+        (
+            len(spec.name)
+            for _, item, _ in items.values()
+            for spec in RunSpec.for_targets(item, profiles, agents)
+        ),
+        default=0,
+    )
+    listener = ServiceListener(sys.stdout, width, prefix=not args.no_prefix)
+    pool, history = make_pool(data, args, listener)
+    # 项目 id -> 本次到期尚未结束的执行数，在所有执行目标上都结束后才通知计划
+    remaining = {}
+    lock = threading.Lock()
+
+    def on_due(item_id):
+        item_specs = RunSpec.for_targets(items[item_id][1], profiles, agents)
+        if not item_specs:
+            scheduler.run_finished(item_id)
+            return
+        with lock:
+            remaining[item_id] = len(item_specs)
+        pool.submit(item_specs)
+
+    def on_finished(run):
+        item_id = run.spec.item_id
+        with lock:
+            remaining[item_id] -= 1
+            if remaining[item_id]:
+                return
+            del remaining[item_id]
+        scheduler.run_finished(item_id)
+
+    scheduler = Scheduler(
+        on_due,
+        max_runs=args.max_runs or data.get("schedule_max_runs", 4),
+        max_runs_per_group=data.get("schedule_max_runs_per_group", 2),
+    )
+    listener.on_finished = on_finished
+    scheduler.load(entries)
+    for item_id, (group, item, schedule) in items.items():
+        due = time.strftime("%m-%d %H:%M:%S", time.localtime(scheduler.next_run(item_id)))
+        print(f"{_item_path(group, item)}: {schedule.describe()}，下次 {due}", file=sys.stderr)
+    print(f"已加载 {len(entries)} 个计划，按 Ctrl+C 退出", file=sys.stderr)
+    serve(pool, history, scheduler.close)
+    return 0
+
+
+def cmd_watch(data, args):
+    """监视项目的工作目录，文件改动后按项目的设置重新执行，直到按下 Ctrl+C"""
+    import os
+
+    from execution_pool import RunSpec
+    from file_watch import FileWatcher, TriggerQueue, WatchError, WatchSpec
+
+    try:
+        selected = select_items(data, args.targets)
+    except TargetError as e:
+        print(e, file=sys.stderr)
+        return 2
+    items = {}
+    for group, item in selected:
+        try:
+            spec = WatchSpec.from_item(item)
+        except WatchError as e:
+            print(f"“{_item_path(group, item)}”的文件监视无效: {e}", file=sys.stderr)
+            return 2
+        if spec is not None and item["id"] not in items:
+            items[item["id"]] = (group, item, spec)
+    if not items:
+        print("所选项目都没有设置文件监视", file=sys.stderr)
+        return 2
+
+    profiles = {p["id"]: p for p in data.get("env_profiles", [])}
+    agents = {a["id"]: a for a in data.get("agents", [])}
+    width = max(
+        (
+            len(spec.name)
+            for _, item, _ in items.values()
+            for spec in RunSpec.for_targets(item, profiles, agents)
+        ),
+        default=0,
+    )
+    listener = ServiceListener(sys.stdout, width, prefix=not args.no_prefix)
+    pool, history = make_pool(data, args, listener)
+
+    def start(item_id, extra_env):
+        specs = RunSpec.for_targets(items[item_id][1], profiles, agents)
+        for spec in specs:
+            spec.extra_env = extra_env
+        return pool.submit(specs).runs if specs else []
+
+    triggers = TriggerQueue(start, pool.cancel_run)
+    listener.on_finished = triggers.finished
+
+    def on_trigger(item_id, paths):
+        triggers.trigger(item_id, paths, items[item_id][2].policy)
+
+    watcher = FileWatcher(on_trigger, lambda message: print(message, file=sys.stderr))
+    for item_id, (group, item, spec) in items.items():
+        try:
+            watcher.set_item(item_id, item.get("working_dir", ""), spec)
+        except WatchError as e:
+            print(f"“{_item_path(group, item)}”: {e}", file=sys.stderr)
+            watcher.close()
+            pool.shutdown()
+            return 2
+        root = os.path.realpath(item.get("working_dir", "") or os.getcwd())
+        print(f"{_item_path(group, item)}: 监视 {root} 中的 {' '.join(spec.patterns)}", file=sys.stderr)
+    print(f"已监视 {len(items)} 个项目，按 Ctrl+C 退出", file=sys.stderr)
+    serve(pool, history, watcher.close)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="不启动界面，列出或运行保存的命令")
+    parser.add_argument("--data", help="数据文件（data.json 或 data.db），默认与界面相同")
+    sub = parser.add_subparsers(dest="command", required=True)
+    list_parser = sub.add_parser("list", help="列出分组和项目")
+    list_parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    run_parser = sub.add_parser("run", help="运行项目或分组")
+    run_parser.add_argument("targets", nargs="+", help="分组或项目的名称或 id，或 “分组名/项目名”")
+    run_parser.add_argument("-j", "--jobs", type=int, help="最大并发数，默认使用界面中的设置")
+    run_parser.add_argument(
+        "--pipeline", action="store_true", help="按依赖关系运行，并一起运行依赖的项目"
+    )
+    run_parser.add_argument("--fail-fast", action="store_true", help="任一项目失败时取消其余项目")
+    run_parser.add_argument("--summary", help="把 JSON 摘要写到该文件；为 - 时写到标准输出")
+    run_parser.add_argument("--no-prefix", action="store_true", help="输出行前不加执行名")
+    run_parser.add_argument(
+        "--no-metrics", action="store_true", help="不把执行指标追加到 metrics.jsonl"
+    )
+    run_parser.add_argument("--no-history", action="store_true", help="不记录到执行历史")
+    run_parser.add_argument(
+        "--grace",
+        type=float,
+        help="中断时等待进程自行退出的秒数，超时后强制结束；默认使用界面中的设置",
+    )
+    schedule_parser = sub.add_parser("schedule", help="按项目的计划常驻运行，直到按下 Ctrl+C")
+    schedule_parser.add_argument(
+        "targets", nargs="*", help="只运行这些分组或项目的计划；默认运行所有设置了计划的项目"
+    )
+    schedule_parser.add_argument("-j", "--jobs", type=int, help="执行池的最大并发数，默认使用界面中的设置")
+    schedule_parser.add_argument(
+        "--max-runs", type=int, help="计划执行的最大并发数，默认使用界面中的设置"
+    )
+    schedule_parser.add_argument("--no-prefix", action="store_true", help="输出行前不加时间和执行名")
+    schedule_parser.add_argument(
+        "--no-metrics", action="store_true", help="不把执行指标追加到 metrics.jsonl"
+    )
+    schedule_parser.add_argument("--no-history", action="store_true", help="不记录到执行历史")
+    schedule_parser.add_argument(
+        "--grace", type=float, help="退出时等待进程自行退出的秒数，超时后强制结束"
+    )
+    watch_parser = sub.add_parser("watch", help="文件改动后重新执行项目，直到按下 Ctrl+C")
+    watch_parser.add_argument(
+        "targets", nargs="*", help="只监视这些分组或项目；默认监视所有设置了文件监视的项目"
+    )
+    watch_parser.add_argument("-j", "--jobs", type=int, help="执行池的最大并发数，默认使用界面中的设置")
+    watch_parser.add_argument("--no-prefix", action="store_true", help="输出行前不加时间和执行名")
+    watch_parser.add_argument(
+        "--no-metrics", action="store_true", help="不把执行指标追加到 metrics.jsonl"
+    )
+    watch_parser.add_argument("--no-history", action="store_true", help="不记录到执行历史")
+    watch_parser.add_argument(
+        "--grace", type=float, help="取消和退出时等待进程自行退出的秒数，超时后强制结束"
+    )
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command != "list" and args.jobs is not None and args.jobs < 1:
+        print("--jobs 至少为 1", file=sys.stderr)
+        return 2
+    for stream in (sys.stdout, sys.stderr):
+        # 输出中可能有控制台编码无法表示的字符
+        if hasattr(stream, "reconfigure"):
+            stream.reconfigure(errors="replace")
+    storage = open_storage(args.data)
+    try:
+        data = storage.load()
+    finally:
+        storage.close()
+    if args.command == "list":
+        return cmd_list(data, args)
+    if args.command == "schedule":
+        return cmd_schedule(data, args)
+    if args.command == "watch":
+        return cmd_watch(data, args)
+    return cmd_run(data, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,71 +1,124 @@
-# command_runner.py (V3 - 修复编码问题)
-import subprocess
-from PySide6.QtCore import QThread, Signal
-import locale
-import re
-
-
-class CommandRunner(QThread):
-    output_signal = Signal(str)
-    finished_signal = Signal(int)
-
-    def __init__(self, command, shell, working_dir=None):
-        super().__init__()
-        self.command = command
-        self.shell = shell
-        self.working_dir = working_dir
-        self.process = None
-        # 正则表达式用于移除ANSI颜色代码
-        self.ansi_escape_pattern = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-
-    def run(self):
-        # 根据shell选择执行方式和编码
-        if self.shell == "cmd":
-            shell_executable = "cmd.exe"
-            # 在Windows的cmd中，中文环境通常使用GBK系列编码。'mbcs'是Python中对当前系统ANSI代码页的别名。
-            encoding = "mbcs"
-            full_command = [shell_executable, "/c", self.command]
-        else:  # PowerShell
-            shell_executable = "powershell.exe"
-            # 对于PowerShell，尝试使用系统首选编码，这通常能更好地处理本地化字符
-            encoding = locale.getpreferredencoding(False)
-            full_command = [shell_executable, "-Command", self.command]
-
-        try:
-            self.process = subprocess.Popen(
-                full_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                cwd=self.working_dir or None,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-                encoding=encoding,  # 使用上面确定的编码
-                errors="replace",  # 如果有无法解码的字符，用'?'替换
-            )
+# command_runner.py (V5 - 基于执行池的并发执行)
+from PySide6.QtCore import QObject, Signal
+
+from env_profiles import EnvironmentCache
+from execution_pool import ExecutionPool, FlushPolicy, PoolListener
+from process_control import GRACE_PERIOD
+from run_metrics import MetricsLog
+from shell_pool import ShellSessionPool
+
+
+class CommandRunner(QObject, PoolListener):
+    """执行池与界面之间的桥梁：把事件循环线程中的回调转换为 Qt 信号"""
+
+    # 执行状态变化（排队/运行中/结束），参数为 Run 和发出信号时的状态
+    status_signal = Signal(object, str)
+    # 合并后的一批输出：(新完成的行, 当前未完成的行)，行可能带有 ANSI 样式
+    output_signal = Signal(object, object)
+    # 一次提交的全部执行都已结束，参数为 Batch
+    batch_finished_signal = Signal(object)
+    # 一次执行的历史记录已写入，参数为 run_history 的执行记录
+    history_signal = Signal(object)
+
+    def __init__(
+        self,
+        max_workers=4,
+        flush_policy=None,
+        warm_sessions=False,
+        record_history=True,
+        history_settings=None,
+        grace_period=GRACE_PERIOD,
+        history=None,
+        parent=None,
+    ):
+        QObject.__init__(self, parent)
+        # 历史记录始终可以查看，record_history 只决定新的执行是否写入
+        self.record_history = record_history
+        self.history_settings = history_settings or {}
+        # history 为已经打开的 HistoryStore（例如界面在第一次执行前查看历史时打开的），由执行器接管
+        self._history = None
+        self.pool = ExecutionPool(
+            max_workers=max_workers,
+            flush_policy=flush_policy or FlushPolicy(),
+            listener=self,
+            shell_pool=ShellSessionPool() if warm_sessions else None,
+            env_cache=EnvironmentCache(),
+            metrics_log=MetricsLog(),
+            grace_period=grace_period,
+        )
+        if history is not None:
+            history.on_recorded = self.history_signal.emit
+            self._history = history
+            if record_history:
+                self.pool.set_history(history)
 
-            for line in iter(self.process.stdout.readline, ""):
-                # 移除ANSI颜色代码
-                cleaned_line = self.ansi_escape_pattern.sub('', line)
-                self.output_signal.emit(cleaned_line)
+    def on_run_status(self, run):
+        # Run 对象会在事件循环线程中继续变化，因此同时传递当时的状态
+        self.status_signal.emit(run, run.status)
 
-            self.process.stdout.close()
-            return_code = self.process.wait()
-            self.finished_signal.emit(return_code)
+    def on_run_output(self, run, output):
+        self.output_signal.emit(run, output)
 
-        except FileNotFoundError:
-            self.output_signal.emit(
-                f"错误: 无法找到执行程序 '{shell_executable}'。请确保它在系统的PATH中。\n"
+    def on_batch_finished(self, batch):
+        self.batch_finished_signal.emit(batch)
+
+    def history(self):
+        """执行历史在第一次执行或查看时才打开，不占用启动时间"""
+        if self._history is None:
+            from run_history import HistoryStore, RetentionPolicy
+
+            self._history = HistoryStore(
+                retention=RetentionPolicy.from_settings(self.history_settings),
+                on_recorded=self.history_signal.emit,
             )
-            self.finished_signal.emit(-1)
-        except Exception as e:
-            self.output_signal.emit(f"执行出错: {e}\n")
-            self.finished_signal.emit(-1)
+            if self.record_history:
+                self.pool.set_history(self._history)
+        return self._history
+
+    def submit(self, specs, fail_fast=False, dependencies=None):
+        if self.record_history:
+            self.history()
+        return self.pool.submit(specs, fail_fast=fail_fast, dependencies=dependencies)
+
+    def set_max_workers(self, max_workers):
+        self.pool.set_max_workers(max_workers)
+
+    def set_warm_sessions(self, enabled):
+        """启用或停用预热的 shell 会话"""
+        if enabled != (self.pool.shell_pool is not None):
+            self.pool.set_shell_pool(ShellSessionPool() if enabled else None)
+
+    def set_record_history(self, enabled):
+        self.record_history = enabled
+        self.pool.set_history(self.history() if enabled else None)
+
+    def prewarm(self, specs):
+        self.pool.prewarm(specs)
+
+    def invalidate_environment(self, profile_id):
+        self.pool.invalidate_environment(profile_id)
+
+    def mark_batch_applied(self, run):
+        self.pool.mark_batch_applied(run)
+
+    def set_grace_period(self, seconds):
+        self.pool.set_grace_period(seconds)
+
+    def cancel_run(self, run, force=False):
+        """停止一次执行：先请求整棵进程树退出，超过宽限期后强制结束"""
+        self.pool.cancel_run(run, force)
+
+    def cancel_batch(self, batch, force=False):
+        self.pool.cancel_batch(batch, force)
+
+    def cancel_all(self, force=False):
+        self.pool.cancel_all(force)
+
+    def is_busy(self):
+        return self.pool.is_busy()
 
     def stop(self):
-        if self.process and self.process.poll() is None:
-            # 终止进程及其所有子进程（在Windows上更有效）
-            subprocess.run(
-                f"taskkill /F /PID {self.process.pid} /T",
-                check=False,
-                creationflags=subprocess.CREATE_NO_WINDOW,
-            )
+        """终止所有正在运行和排队的命令"""
+        self.pool.shutdown()
+        if self._history is not None:
+            self._history.close()
@@ -1,9 +1,20 @@
 # data_manager.py
+import copy
 import json
 import os
+import threading
+import time
 import uuid
 
 DATA_FILE = "data.json"
+# 使用 SQLite 存储时的数据库文件；存在时优先于 data.json
+DATA_DB = "data.db"
+# 变更日志：每行一条 JSON 变更记录，加载时在快照之上重放
+JOURNAL_SUFFIX = ".journal"
+# 可选的运行环境；sh/bash 用于 Linux 等 POSIX 系统
+SHELL_TYPES = ["cmd", "PowerShell", "sh", "bash"]
+# 项目的执行目标中表示本机的 id，其他 id 指向设置中 "agents" 的执行主机（见 remote_agent）
+LOCAL_TARGET = "local"
 
 
 def generate_id():
@@ -11,18 +22,419 @@ def generate_id():
     return str(uuid.uuid4())
 
 
-def load_data():
-    """加载数据，如果文件不存在则创建默认结构"""
-    if not os.path.exists(DATA_FILE):
-        return {"favorites": [], "groups": []}
+def empty_data():
+    return {"favorites": [], "groups": []}
+
+
+def _read_snapshot(path):
+    if not os.path.exists(path):
+        return empty_data()
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     except (json.JSONDecodeError, FileNotFoundError):
-        return {"favorites": [], "groups": []}
+        return empty_data()
+
+
+def _read_journal(path):
+    """读取变更日志；崩溃时写了一半的最后一行会被忽略"""
+    changes = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    changes.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+    except FileNotFoundError:
+        pass
+    return changes
+
+
+def open_storage(path=None):
+    """根据文件扩展名选择存储后端；未指定路径时，存在 data.db 则使用 SQLite，否则使用 data.json"""
+    if path is None:
+        path = DATA_DB if os.path.exists(DATA_DB) else DATA_FILE
+    if path.endswith((".db", ".sqlite")):
+        from sqlite_storage import SqliteStorage
+
+        return SqliteStorage(path)
+    return JsonStorage(path)
+
+
+def load_data(path=None):
+    """加载数据，如果文件不存在则创建默认结构"""
+    storage = open_storage(path)
+    try:
+        return storage.load()
+    finally:
+        storage.close()
+
+
+def save_data(data, path=None):
+    """保存完整数据"""
+    storage = open_storage(path)
+    try:
+        storage.save(data)
+    finally:
+        storage.close()
+
+
+class JsonStorage:
+    """JSON 存储：完整快照 + 追加写入的变更日志，日志过长时压缩为快照"""
+
+    def __init__(self, path=DATA_FILE, compact_threshold=500):
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._store = None
+        self._journal_count = 0
+
+    def load(self):
+        """读取快照，并在其上重放之后的变更"""
+        data = _read_snapshot(self.path)
+        changes = _read_journal(self.path + JOURNAL_SUFFIX)
+        if changes:
+            store = CommandStore(data)
+            for change in changes:
+                store.apply(change)
+        return data
+
+    def save(self, data):
+        """将完整数据原子地保存为快照（写临时文件 + fsync + 重命名），并清空变更日志"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # 日志中的变更都是幂等的，即使在此之前崩溃，重放也不会产生重复数据
+        try:
+            os.remove(self.path + JOURNAL_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def attach(self, data):
+        """开始增量写入前调用；保留一份私有副本，压缩时从它生成快照，避免与界面线程竞争"""
+        self._store = CommandStore(copy.deepcopy(data))
+        self._journal_count = 0
+
+    def recover(self):
+        """上次运行留下的日志（可能以写了一半的行结尾）先压缩进快照，之后从空日志开始追加"""
+        if os.path.exists(self.path + JOURNAL_SUFFIX):
+            self.save(self._store.data)
+
+    def write_changes(self, changes):
+        lines = "".join(json.dumps(c, ensure_ascii=False) + "\n" for c in changes)
+        for change in changes:
+            self._store.apply(change)
+        self._journal_count += len(changes)
+        if self._journal_count >= self.compact_threshold:
+            self.save(self._store.data)
+            self._journal_count = 0
+            return
+        with open(self.path + JOURNAL_SUFFIX, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+class CommandStore:
+    """持有全部分组和项目，维护按 id 的索引，并在每次修改前后发布变更事件
+
+    每次修改都表示为一条变更记录（dict），同一条记录既用于通知界面、写入持久化日志，
+    也用于加载时重放日志，因此 apply() 中的所有操作都是幂等的。
+    """
+
+    def __init__(self, data):
+        self.data = data
+        # 分组 id -> 分组，项目 id -> 项目，项目 id -> 所在分组
+        self.groups = {}
+        self.items = {}
+        self.item_group = {}
+        self._group_rows = None
+        # 分组 id -> {项目 id: 行号}，按需建立，分组内容变化后作废
+        self._item_rows = {}
+        self._before_listeners = []
+        self._listeners = []
+        for g in data["groups"]:
+            self.groups[g["id"]] = g
+            for i in g["items"]:
+                self.items[i["id"]] = i
+                self.item_group[i["id"]] = g
+
+    def subscribe(self, listener, before=None):
+        """订阅变更事件：before 在数据修改前调用，listener 在修改后调用，参数均为变更记录"""
+        if before is not None:
+            self._before_listeners.append(before)
+        if listener is not None:
+            self._listeners.append(listener)
+
+    def group_row(self, group_id):
+        if self._group_rows is None:
+            self._group_rows = {g["id"]: row for row, g in enumerate(self.data["groups"])}
+        return self._group_rows[group_id]
+
+    def item_row(self, item_id):
+        group = self.item_group[item_id]
+        rows = self._item_rows.get(group["id"])
+        if rows is None:
+            rows = {i["id"]: row for row, i in enumerate(group["items"])}
+            self._item_rows[group["id"]] = rows
+        return rows[item_id]
+
+    # 带类型的修改操作
+
+    def add_group(self, name):
+        group = {"id": generate_id(), "name": name, "items": []}
+        self.commit({"op": "add_group", "group": group})
+        return group
+
+    def add_item(self, group_id, name, **fields):
+        item = {
+            "id": generate_id(),
+            "name": name,
+            "command": "",
+            "shell": "cmd",
+            "working_dir": "",
+        }
+        item.update(fields)
+        self.commit({"op": "add_item", "group_id": group_id, "item": item})
+        return item
+
+    def rename_group(self, group_id, name):
+        self.commit({"op": "update_group", "id": group_id, "fields": {"name": name}})
+
+    def rename_item(self, item_id, name):
+        self.update_item(item_id, {"name": name})
+
+    def update_item(self, item_id, fields):
+        self.commit({"op": "update_item", "id": item_id, "fields": fields})
+
+    def delete_group(self, group_id):
+        self.commit({"op": "delete_group", "id": group_id})
+
+    def delete_item(self, item_id):
+        self.commit({"op": "delete_item", "id": item_id})
+
+    def move_items(self, item_ids, group_id, index=None):
+        """把一批项目移动到目标分组的 index 位置（默认末尾），耗时与移动数量和涉及的分组大小成正比"""
+        self.commit({"op": "move_items", "ids": list(item_ids), "group_id": group_id, "index": index})
+
+    def reorder_items(self, group_id, item_ids):
+        self.commit({"op": "reorder_items", "group_id": group_id, "ids": list(item_ids)})
+
+    def reorder_groups(self, group_ids):
+        self.commit({"op": "reorder_groups", "ids": list(group_ids)})
+
+    def set_setting(self, key, value):
+        self.commit({"op": "setting", "key": key, "value": value})
+
+    def commit(self, change):
+        """发布修改前事件，应用变更，再发布修改后事件"""
+        for listener in self._before_listeners:
+            listener(change)
+        self.apply(change)
+        for listener in self._listeners:
+            listener(change)
+
+    def apply(self, change):
+        """应用一条变更记录；所有操作都是幂等的，重复应用结果不变"""
+        op = change["op"]
+        if op == "setting":
+            self.data[change["key"]] = change["value"]
+        elif op == "add_group":
+            group = change["group"]
+            old = self.groups.get(group["id"])
+            if old is not None:
+                # 重放到已包含该分组的快照上：保留之后加入的项目，只更新分组自身的字段
+                old.update({k: v for k, v in group.items() if k != "items"})
+                group = old
+            else:
+                self.data["groups"].append(group)
+                self._group_rows = None
+            self.groups[group["id"]] = group
+            self._item_rows.pop(group["id"], None)
+            for i in group["items"]:
+                self.items[i["id"]] = i
+                self.item_group[i["id"]] = group
+        elif op == "update_group":
+            group = self.groups.get(change["id"])
+            if group is not None:
+                group.update(change["fields"])
+        elif op == "delete_group":
+            group = self.groups.pop(change["id"], None)
+            if group is not None:
+                self.data["groups"] = [g for g in self.data["groups"] if g is not group]
+                self._group_rows = None
+                self._item_rows.pop(group["id"], None)
+                for i in group["items"]:
+                    self.items.pop(i["id"], None)
+                    self.item_group.pop(i["id"], None)
+        elif op == "add_item":
+            item = change["item"]
+            group = self.groups.get(change["group_id"])
+            if group is None:
+                return
+            old = self.items.get(item["id"])
+            if old is not None:
+                old.update(item)
+            else:
+                group["items"].append(item)
+                self.items[item["id"]] = item
+                self.item_group[item["id"]] = group
+                rows = self._item_rows.get(group["id"])
+                if rows is not None:
+                    rows[item["id"]] = len(group["items"]) - 1
+        elif op == "update_item":
+            item = self.items.get(change["id"])
+            if item is not None:
+                item.update(change["fields"])
+        elif op == "delete_item":
+            item = self.items.pop(change["id"], None)
+            if item is not None:
+                group = self.item_group.pop(change["id"])
+                group["items"] = [i for i in group["items"] if i is not item]
+                self._item_rows.pop(group["id"], None)
+        elif op == "move_items":
+            target = self.groups.get(change["group_id"])
+            if target is None:
+                return
+            moving = [self.items[i] for i in change["ids"] if i in self.items]
+            moving_ids = {id(i) for i in moving}
+            # 每个来源分组只过滤一次
+            for group in {id(self.item_group[i["id"]]): self.item_group[i["id"]] for i in moving}.values():
+                group["items"] = [i for i in group["items"] if id(i) not in moving_ids]
+                self._item_rows.pop(group["id"], None)
+            index = change.get("index")
+            if index is None or index >= len(target["items"]):
+                target["items"].extend(moving)
+            else:
+                target["items"][index:index] = moving
+            self._item_rows.pop(target["id"], None)
+            for i in moving:
+                self.item_group[i["id"]] = target
+        elif op == "reorder_items":
+            group = self.groups.get(change["group_id"])
+            if group is None:
+                return
+            by_id = {i["id"]: i for i in group["items"]}
+            ordered = [by_id.pop(i) for i in change["ids"] if i in by_id]
+            # 未出现在新顺序中的项目保持原有相对顺序排在最后
+            group["items"] = ordered + [i for i in group["items"] if i["id"] in by_id]
+            self._item_rows.pop(group["id"], None)
+        elif op == "reorder_groups":
+            by_id = {g["id"]: g for g in self.data["groups"]}
+            ordered = [by_id.pop(g) for g in change["ids"] if g in by_id]
+            self.data["groups"] = ordered + [g for g in self.data["groups"] if g["id"] in by_id]
+            self._group_rows = None
+
+
+class DataPersistence:
+    """防抖的后台持久化：界面线程只记录变更，后台线程把变更批量交给存储后端写入
+
+    写入失败（文件被占用、磁盘已满等）时变更保留在队列中，按指数退避重试；
+    on_error(异常) 在后台线程中调用，error 为最近一次失败的原因，写入成功后清除。
+    """
+
+    # 写入失败后第一次重试的等待时间和最长等待时间（秒）
+    RETRY_DELAY = 1.0
+    MAX_RETRY_DELAY = 60.0
+
+    def __init__(self, data, storage=None, delay=0.3, on_error=None):
+        self.storage = storage or open_storage()
+        self.delay = delay
+        self.on_error = on_error
+        self.error = None
+        self.storage.attach(data)
+        self._pending = []
+        self._writing = False
+        self._urgent = False
+        self._closed = False
+        self._failures = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="DataPersistence", daemon=True)
+        self._thread.start()
+
+    def record(self, op, **fields):
+        """记录一条变更，立即返回；实际写入由后台线程合并完成"""
+        change = {"op": op}
+        change.update(fields)
+        self.record_change(change)
+
+    def record_change(self, change):
+        """记录一条变更记录，可直接作为 CommandStore 的订阅者"""
+        # 复制一份，之后界面线程继续修改原对象也不会影响待写入的记录
+        change = copy.deepcopy(change)
+        with self._cond:
+            self._pending.append(change)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """等待所有已记录的变更写入磁盘；写入失败时不再等待，返回 False"""
+        with self._cond:
+            # 没有待写入的变更时不设置，否则下一次修改会跳过防抖
+            if self._pending:
+                self._urgent = True
+                self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: not self._writing and (not self._pending or self.error is not None),
+                timeout,
+            )
+            return not self._pending and not self._writing
 
+    def close(self):
+        """写入剩余的变更并停止后台线程；有变更最终未能写入时返回 False"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        return not self._pending
 
-def save_data(data):
-    """将数据保存到JSON文件"""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    def _run(self):
+        self.storage.recover()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    break
+                if self._failures:
+                    # 上次写入失败：退避等待后重试，关闭时立即做最后一次尝试
+                    delay = min(self.RETRY_DELAY * 2 ** (self._failures - 1), self.MAX_RETRY_DELAY)
+                    self._cond.wait_for(lambda: self._closed, delay)
+                else:
+                    # 防抖：收到第一条变更后再等待一小段时间，把连续的修改合并成一次写入
+                    deadline = time.monotonic() + self.delay
+                    while not self._closed and not self._urgent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                changes, self._pending = self._pending, []
+                self._urgent = False
+                self._writing = True
+            error = None
+            try:
+                self.storage.write_changes(changes)
+            except Exception as e:
+                # 任何写入错误都不能让后台线程退出，否则之后的修改都只会停留在队列中
+                error = e
+            with self._cond:
+                self._writing = False
+                if error is None:
+                    self.error = None
+                    self._failures = 0
+                else:
+                    # 变更都是幂等的，重试时整批重新写入
+                    self._pending[:0] = changes
+                    self.error = error
+                    self._failures += 1
+                self._cond.notify_all()
+                give_up = error is not None and self._closed
+            if error is not None and self.on_error is not None:
+                self.on_error(error)
+            if give_up:
+                break
+        self.storage.close()
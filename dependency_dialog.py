@@ -0,0 +1,89 @@
+# dependency_dialog.py
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QVBoxLayout,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+    QLabel,
+)
+
+# 列表中最多显示的候选项目数，项目很多时通过筛选缩小范围
+MAX_CANDIDATES = 500
+
+
+class DependencyDialog(QDialog):
+    """选择一个项目依赖的其他项目：按依赖运行时，这些项目成功之后才会运行它"""
+
+    def __init__(self, store, item_id, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.item_id = item_id
+        item = store.items[item_id]
+        self.selected = list(item.get("depends_on") or [])
+        self.setWindowTitle(f"“{item['name']}”的依赖")
+        self.resize(460, 480)
+        layout = QVBoxLayout(self)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("按名称或分组筛选")
+        self.filter_edit.textChanged.connect(self.refresh)
+        layout.addWidget(self.filter_edit)
+        self.list_widget = QListWidget()
+        self.list_widget.setUniformItemSizes(True)
+        self.list_widget.itemChanged.connect(self.on_item_changed)
+        layout.addWidget(self.list_widget)
+        self.hint_label = QLabel()
+        layout.addWidget(self.hint_label)
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.refresh()
+
+    def _label(self, item_id):
+        group = self.store.item_group[item_id]
+        return f"{group['name']} / {self.store.items[item_id]['name']}"
+
+    def refresh(self):
+        text = self.filter_edit.text().strip().lower()
+        self.list_widget.blockSignals(True)
+        self.list_widget.clear()
+        # 已选中的依赖总是列在最前面
+        candidates = [i for i in self.selected if i in self.store.items]
+        shown = 0
+        for item_id in self.store.items:
+            if item_id == self.item_id or item_id in self.selected:
+                continue
+            if text and text not in self._label(item_id).lower():
+                continue
+            if shown == MAX_CANDIDATES:
+                break
+            candidates.append(item_id)
+            shown += 1
+        for item_id in candidates:
+            entry = QListWidgetItem(self._label(item_id))
+            entry.setData(Qt.ItemDataRole.UserRole, item_id)
+            entry.setFlags(entry.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            entry.setCheckState(
+                Qt.CheckState.Checked if item_id in self.selected else Qt.CheckState.Unchecked
+            )
+            self.list_widget.addItem(entry)
+        self.list_widget.blockSignals(False)
+        self.hint_label.setText(
+            f"只显示前 {MAX_CANDIDATES} 个匹配的项目，请输入筛选条件" if shown == MAX_CANDIDATES else ""
+        )
+
+    def on_item_changed(self, entry):
+        item_id = entry.data(Qt.ItemDataRole.UserRole)
+        if entry.checkState() == Qt.CheckState.Checked:
+            if item_id not in self.selected:
+                self.selected.append(item_id)
+        elif item_id in self.selected:
+            self.selected.remove(item_id)
+
+    def dependencies(self):
+        return list(self.selected)
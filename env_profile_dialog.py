@@ -0,0 +1,65 @@
+# env_profile_dialog.py
+from PySide6.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QFormLayout,
+    QLineEdit,
+    QComboBox,
+    QPlainTextEdit,
+    QMessageBox,
+)
+
+from data_manager import SHELL_TYPES
+
+
+class EnvProfileDialog(QDialog):
+    """新建或编辑一个环境配置"""
+
+    def __init__(self, profile=None, parent=None):
+        super().__init__(parent)
+        profile = profile or {}
+        self.setWindowTitle("编辑环境配置" if profile else "新建环境配置")
+        self.resize(520, 380)
+        layout = QFormLayout(self)
+        layout.setRowWrapPolicy(QFormLayout.RowWrapPolicy.WrapLongRows)
+        self.name_edit = QLineEdit(profile.get("name", ""))
+        self.shell_combo = QComboBox()
+        self.shell_combo.addItems(SHELL_TYPES)
+        self.shell_combo.setCurrentText(profile.get("shell", "cmd"))
+        self.workdir_edit = QLineEdit(profile.get("working_dir", ""))
+        self.workdir_edit.setPlaceholderText("激活脚本的工作目录，留空则使用程序默认目录")
+        self.script_edit = QPlainTextEdit(profile.get("script", ""))
+        self.script_edit.setPlaceholderText(
+            "例如: source .venv/bin/activate 或 call C:\\SDK\\setenv.bat"
+        )
+        self.watch_edit = QPlainTextEdit("\n".join(profile.get("watch_files", [])))
+        self.watch_edit.setPlaceholderText("每行一个文件；这些文件修改后重新运行激活脚本")
+        self.watch_edit.setMaximumHeight(80)
+        layout.addRow("名称:", self.name_edit)
+        layout.addRow("运行环境:", self.shell_combo)
+        layout.addRow("工作目录:", self.workdir_edit)
+        layout.addRow("激活脚本:", self.script_edit)
+        layout.addRow("额外监视的文件:", self.watch_edit)
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
+        )
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def accept(self):
+        if not self.name_edit.text().strip():
+            QMessageBox.warning(self, "提示", "请填写环境配置的名称。")
+            return
+        super().accept()
+
+    def values(self):
+        return {
+            "name": self.name_edit.text().strip(),
+            "shell": self.shell_combo.currentText(),
+            "working_dir": self.workdir_edit.text().strip(),
+            "script": self.script_edit.toPlainText(),
+            "watch_files": [
+                line.strip() for line in self.watch_edit.toPlainText().splitlines() if line.strip()
+            ],
+        }
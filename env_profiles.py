@@ -0,0 +1,320 @@
+# env_profiles.py
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from data_manager import generate_id
+from execution_pool import build_shell_command, popen_kwargs
+
+# 捕获结果的缓存目录，每个环境配置一个 JSON 文件
+ENV_CACHE_DIR = "env_cache"
+# 激活脚本最长运行时间（秒）
+CAPTURE_TIMEOUT = 300
+# 这些变量由 shell 自身维护，不属于激活脚本带来的变化
+VOLATILE_VARS = {"_", "SHLVL", "PWD", "OLDPWD", "PS1", "PS2", "PS4", "PROMPT", "RANDOM", "LINENO"}
+# 脚本中这些扩展名的参数被视为它读取的文件
+SCRIPT_EXTENSIONS = (".sh", ".bash", ".bat", ".cmd", ".ps1", ".env", ".fish", ".csh")
+
+
+class EnvironmentCaptureError(Exception):
+    pass
+
+
+def new_profile(name, shell, script, working_dir="", watch_files=()):
+    return {
+        "id": generate_id(),
+        "name": name,
+        "shell": shell,
+        "script": script,
+        "working_dir": working_dir,
+        "watch_files": list(watch_files),
+    }
+
+
+def profile_key(profile):
+    """脚本内容及其运行方式的哈希；任何一项改变，缓存都失效"""
+    payload = json.dumps(
+        [
+            profile.get("shell", ""),
+            profile.get("script", ""),
+            profile.get("working_dir", ""),
+            sorted(profile.get("watch_files", [])),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def script_files(profile):
+    """激活脚本引用的文件：脚本中存在的文件路径参数，加上配置中额外列出的文件
+
+    conda activate 这类不直接引用文件的命令无法识别，可以把环境目录中的文件（如 conda-meta/history）
+    加入 watch_files。
+    """
+    shell = profile.get("shell", "")
+    script = profile.get("script", "")
+    base = profile.get("working_dir") or os.getcwd()
+    try:
+        words = shlex.split(script, comments=True, posix=shell in ("sh", "bash"))
+    except ValueError:
+        words = script.split()
+    candidates = [
+        w.strip("\"'")
+        for w in words
+        if "/" in w or "\\" in w or w.lower().endswith(SCRIPT_EXTENSIONS) or w == "activate"
+    ]
+    candidates.extend(profile.get("watch_files", []))
+    files = []
+    for word in candidates:
+        path = os.path.expanduser(os.path.expandvars(word))
+        path = os.path.normpath(os.path.join(base, path))
+        if path not in files and os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def file_stamps(paths):
+    stamps = {}
+    for path in paths:
+        try:
+            stamps[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def apply_environment(entry, base=None):
+    """在 base（默认为当前进程的环境）上应用捕获到的变化，返回完整的环境变量字典"""
+    env = dict(os.environ if base is None else base)
+    changes = entry["set"]
+    removed = entry["unset"]
+    if sys.platform == "win32":
+        # Windows 的变量名不区分大小写，先去掉名称相同、大小写不同的旧值
+        names = {k.upper() for k in changes} | {k.upper() for k in removed}
+        env = {k: v for k, v in env.items() if k.upper() not in names}
+    else:
+        for name in removed:
+            env.pop(name, None)
+    env.update(changes)
+    return env
+
+
+def _capture_script(shell, script, token):
+    """生成捕获脚本：输出激活前的环境、标记行、脚本输出、带返回码的标记行和激活后的环境"""
+    if shell in ("sh", "bash"):
+        return (
+            "env -0\n"
+            f"printf '\\n%s\\n' {token}\n"
+            f"{script}\n"
+            f"printf '\\n%s %d\\n' {token} $?\n"
+            "env -0\n"
+        ), ".sh"
+    if shell == "cmd":
+        return (
+            "@echo off\r\n"
+            "set\r\n"
+            f"echo {token}\r\n"
+            + script.replace("\r\n", "\n").replace("\n", "\r\n")
+            + f"\r\necho.& echo {token} %ERRORLEVEL%\r\n"
+            "set\r\n"
+        ), ".bat"
+    dump = (
+        "foreach ($__gs_e in [Environment]::GetEnvironmentVariables().GetEnumerator()) "
+        "{ [Console]::Out.Write($__gs_e.Key + '=' + $__gs_e.Value + [char]0) }"
+    )
+    return (
+        f"{dump}\n"
+        f"[Console]::Out.Write(\"`n{token}`n\")\n"
+        f"$global:LASTEXITCODE = 0\n"
+        f"{script}\n"
+        f"$__gs_rc = if ($LASTEXITCODE) {{ $LASTEXITCODE }} else {{ 0 }}\n"
+        f"[Console]::Out.Write(\"`n{token} $__gs_rc`n\")\n"
+        f"{dump}\n"
+    ), ".ps1"
+
+
+def _capture_argv(shell, path):
+    if shell == "bash":
+        return ["bash", "--noprofile", "--norc", path]
+    if shell == "sh":
+        return ["sh", path]
+    if shell == "cmd":
+        return ["cmd.exe", "/d", "/c", path]
+    return ["powershell.exe", "-NoLogo", "-NoProfile", "-NonInteractive",
+            "-ExecutionPolicy", "Bypass", "-File", path]
+
+
+def _with_output(message, output):
+    """错误信息后附上脚本输出的末尾部分"""
+    output = output.strip()[-2000:]
+    return f"{message}:\n{output}" if output else message
+
+
+def _parse_dump(text, separator):
+    env = {}
+    for entry in text.split(separator):
+        name, sep, value = entry.partition("=")
+        # cmd 的 set 会列出 "=C:" 这类以等号开头的内部变量
+        if sep and name:
+            env[name] = value
+    return env
+
+
+def parse_capture(output, shell, token):
+    """解析捕获脚本的输出，返回 (返回码, 脚本输出, 激活前的环境, 激活后的环境)"""
+    text = output.replace("\r\n", "\n")
+    separator = "\n" if shell == "cmd" else "\0"
+    before, sep, rest = text.partition(f"\n{token}\n")
+    if not sep:
+        raise EnvironmentCaptureError("没有读到激活前的环境")
+    script_output, sep, rest = rest.rpartition(f"\n{token} ")
+    if not sep:
+        raise EnvironmentCaptureError(_with_output("激活脚本提前退出", rest))
+    code_text, _, after = rest.partition("\n")
+    try:
+        code = int(code_text.strip())
+    except ValueError:
+        code = -1
+    return code, script_output, _parse_dump(before, separator), _parse_dump(after, separator)
+
+
+class EnvironmentCache:
+    """环境配置的捕获结果缓存
+
+    第一次使用某个配置时运行一次激活脚本，记录它对环境变量的修改并写入磁盘；
+    之后只要脚本内容和它引用的文件的修改时间不变，就直接使用缓存的环境启动进程，不再运行激活脚本。
+    只应在 ExecutionPool 的事件循环线程中使用。
+    """
+
+    def __init__(self, directory=ENV_CACHE_DIR):
+        self.directory = directory
+        self._entries = {}
+        self._pending = {}
+        self.stats = {"hits": 0, "captures": 0}
+
+    def _path(self, profile_id):
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def lookup(self, profile):
+        """返回仍然有效的缓存记录，没有时返回 None"""
+        entry = self._entries.get(profile["id"])
+        if entry is None:
+            try:
+                with open(self._path(profile["id"]), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+        if entry.get("key") != profile_key(profile) or file_stamps(entry["files"]) != entry["files"]:
+            self._entries.pop(profile["id"], None)
+            return None
+        self._entries[profile["id"]] = entry
+        return entry
+
+    async def resolve(self, profile):
+        """返回 (缓存记录, 本次是否运行了激活脚本)；同一配置同时只运行一次捕获"""
+        entry = self.lookup(profile)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry, False
+        key = (profile["id"], profile_key(profile))
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_task(self.capture(profile))
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future), True
+
+    async def environment(self, profile):
+        """返回 (应用配置后的完整环境, 捕获结果的标识, 本次新捕获的记录或 None)"""
+        entry, captured = await self.resolve(profile)
+        return apply_environment(entry), environment_id(entry), entry if captured else None
+
+    def invalidate(self, profile_id):
+        self._entries.pop(profile_id, None)
+        try:
+            os.remove(self._path(profile_id))
+        except OSError:
+            pass
+
+    async def capture(self, profile):
+        shell = profile.get("shell", "cmd")
+        name = profile.get("name", "")
+        token = "__GSENV_%s__" % secrets.token_hex(8)
+        script, suffix = _capture_script(shell, profile.get("script", ""), token)
+        encoding = build_shell_command("", shell)[1]
+        files = script_files(profile)
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix="gui_shell_env_")
+        start = time.perf_counter()
+        try:
+            with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+                f.write(script)
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *_capture_argv(shell, path),
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    cwd=profile.get("working_dir") or None,
+                    **popen_kwargs(),
+                )
+            except OSError as e:
+                raise EnvironmentCaptureError(f"环境配置“{name}”无法启动 {shell}: {e}")
+            try:
+                output, _ = await asyncio.wait_for(process.communicate(), CAPTURE_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise EnvironmentCaptureError(f"环境配置“{name}”的激活脚本超过 {CAPTURE_TIMEOUT} 秒未结束")
+        finally:
+            os.remove(path)
+        try:
+            code, script_output, before, after = parse_capture(
+                output.decode(encoding, errors="replace"), shell, token
+            )
+        except EnvironmentCaptureError as e:
+            raise EnvironmentCaptureError(f"环境配置“{name}”捕获失败: {e}")
+        if code != 0:
+            raise EnvironmentCaptureError(
+                _with_output(f"环境配置“{name}”的激活脚本返回 {code}", script_output)
+            )
+        entry = {
+            "profile_id": profile["id"],
+            "key": profile_key(profile),
+            "files": file_stamps(files),
+            "set": {
+                k: v for k, v in after.items() if before.get(k) != v and k not in VOLATILE_VARS
+            },
+            "unset": [k for k in before if k not in after and k not in VOLATILE_VARS],
+            "captured_at": time.time(),
+            "capture_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        self._entries[profile["id"]] = entry
+        self._save(entry)
+        self.stats["captures"] += 1
+        return entry
+
+    def _save(self, entry):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(entry["profile_id"])
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            # 写不了磁盘时仍在内存中使用本次的结果
+            pass
+
+
+def environment_id(entry):
+    """一次捕获结果的标识，用于区分不同环境下的 shell 会话"""
+    if entry is None:
+        return ""
+    return "%s:%s" % (entry["key"][:16], entry["captured_at"])
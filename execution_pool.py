@@ -0,0 +1,763 @@
+# execution_pool.py
+import asyncio
+import itertools
+import locale
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from ansi_parser import AnsiParser
+from data_manager import LOCAL_TARGET
+from process_control import GRACE_PERIOD, ProcessTree
+from run_metrics import ResourceSampler, SAMPLE_INTERVAL, build_metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+# 流水线中依赖的执行失败或被取消，未运行
+SKIPPED = "skipped"
+
+# 正则表达式用于移除ANSI颜色代码（旧的纯文本输出方式，基准测试中作为对照）
+ANSI_ESCAPE_PATTERN = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+
+def build_shell_command(command, shell):
+    """根据shell选择执行方式和编码，返回 (参数列表, 输出编码)"""
+    if shell == "cmd":
+        # 在Windows的cmd中，中文环境通常使用GBK系列编码。'mbcs'是Python中对当前系统ANSI代码页的别名。
+        return ["cmd.exe", "/c", command], "mbcs"
+    if shell in ("sh", "bash"):
+        return [shell, "-c", command], locale.getpreferredencoding(False)
+    # 对于PowerShell，尝试使用系统首选编码，这通常能更好地处理本地化字符
+    return ["powershell.exe", "-Command", command], locale.getpreferredencoding(False)
+
+
+def popen_kwargs():
+    """创建子进程时与平台相关的参数"""
+    if sys.platform == "win32":
+        # 独立的进程组可以接收 CTRL_BREAK_EVENT（见 process_control）
+        return {
+            "creationflags": subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+        }
+    # 让子进程拥有独立的进程组，便于一次终止整棵进程树
+    return {"start_new_session": True}
+
+
+class FlushPolicy:
+    """输出刷新策略：距上次刷新超过 interval_ms 或缓冲超过 max_bytes，满足其一即向界面发送一批输出"""
+
+    def __init__(
+        self,
+        interval_ms=30,
+        max_bytes=64 * 1024,
+        read_size=64 * 1024,
+        max_pending_batches=2,
+        max_buffer_bytes=None,
+    ):
+        self.interval_ms = interval_ms
+        self.max_bytes = max_bytes
+        # 每次从管道读取的最大字节数
+        self.read_size = read_size
+        # 界面尚未处理完的批次数达到该值时，继续在后台合并而不再发送
+        self.max_pending_batches = max_pending_batches
+        # 界面长时间跟不上时，缓冲超过该值则丢弃最旧的输出；None 表示从不丢弃
+        self.max_buffer_bytes = max_buffer_bytes
+
+    @classmethod
+    def from_settings(cls, data):
+        """从 data.json 的设置项构造刷新策略"""
+        max_buffer_kb = data.get("output_max_buffer_kb")
+        return cls(
+            interval_ms=data.get("output_flush_interval_ms", 30),
+            max_bytes=data.get("output_flush_max_kb", 64) * 1024,
+            max_buffer_bytes=max_buffer_kb * 1024 if max_buffer_kb else None,
+        )
+
+
+class RunSpec:
+    """一次执行的输入：要运行的命令及其环境"""
+
+    def __init__(
+        self, command, shell, working_dir="", name="", item_id=None, env_profile=None,
+        extra_env=None, target=None,
+    ):
+        self.command = command
+        self.shell = shell
+        self.working_dir = working_dir
+        self.name = name
+        self.item_id = item_id
+        # 环境配置（见 env_profiles），为 None 时继承本程序的环境
+        self.env_profile = env_profile
+        # 在上述环境之上额外设置的环境变量（例如文件监视传入的改动文件列表）
+        self.extra_env = extra_env
+        # 执行主机 {"id", "name", "host", "port", "token"}，为 None 时在本机执行
+        self.target = target
+
+    @classmethod
+    def from_item(cls, item_data, profiles=None):
+        """profiles 为 {环境配置 id: 环境配置}，用于查找项目引用的环境配置"""
+        return cls(
+            command=item_data.get("command", ""),
+            shell=item_data.get("shell", "cmd"),
+            working_dir=item_data.get("working_dir", ""),
+            name=item_data.get("name", ""),
+            item_id=item_data.get("id"),
+            env_profile=(profiles or {}).get(item_data.get("env_profile")),
+        )
+
+    @classmethod
+    def for_targets(cls, item_data, profiles=None, agents=None):
+        """项目在它的各个执行目标上的执行；没有设置执行目标时只在本机执行一次
+
+        agents 为 {执行主机 id: 执行主机}，已删除的执行主机被忽略，都被删除时返回空列表。
+        环境配置在本机捕获，在执行主机上执行时不使用。名称后加上目标以区分各个执行。
+        """
+        targets = item_data.get("targets") or []
+        if not targets:
+            return [cls.from_item(item_data, profiles)]
+        specs = []
+        for target_id in targets:
+            if target_id == LOCAL_TARGET:
+                spec = cls.from_item(item_data, profiles)
+                spec.name = f"{spec.name} @ 本机"
+            elif target_id in (agents or {}):
+                spec = cls.from_item(item_data)
+                spec.target = agents[target_id]
+                spec.name = f"{spec.name} @ {spec.target['name']}"
+            else:
+                continue
+            specs.append(spec)
+        return specs
+
+
+class Run:
+    """一次执行的状态：排队、运行中、返回码和耗时"""
+
+    def __init__(self, run_id, spec, batch):
+        self.run_id = run_id
+        self.spec = spec
+        self.batch = batch
+        self.status = QUEUED
+        self.return_code = None
+        self.start_time = None
+        self.end_time = None
+        self.process = None
+        # 进程启动后的整棵进程树（见 process_control.ProcessTree），取消时用它终止
+        self.tree = None
+        self.cancel_requested = False
+        # 正在进行的终止任务，及其结果 {"graceful", "forced", "remaining"}
+        self.termination = None
+        self.cancel_result = None
+        self.pending_batches = 0
+        # 流水线中必须先成功的执行，以及依赖本执行的执行
+        self.depends_on = []
+        self.dependents = []
+        self.stats = {
+            "reads": 0,
+            "batches": 0,
+            "coalesced": 0,
+            "dropped_bytes": 0,
+            "bytes": 0,
+            "lines": 0,
+            "max_pending": 0,
+            "max_ui_latency": 0.0,
+        }
+        # 各阶段的时间点（perf_counter），结束时据此计算 metrics（见 run_metrics.build_metrics）
+        self.timing = {}
+        self.metrics = None
+        # 已发送、界面尚未处理完的各批输出的发送时间
+        self.sent_times = deque()
+
+    @property
+    def duration(self):
+        if self.start_time is None:
+            return None
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def done(self):
+        return self.status in (FINISHED, FAILED, CANCELLED, SKIPPED)
+
+
+class Batch:
+    """一次提交的一组执行；fail_fast 时任一失败即取消其余"""
+
+    def __init__(self, batch_id, fail_fast=False):
+        self.batch_id = batch_id
+        self.fail_fast = fail_fast
+        self.runs = []
+        self.cancelled = False
+        self.notified = False
+
+    @property
+    def done(self):
+        return all(run.done for run in self.runs)
+
+    @property
+    def succeeded(self):
+        return all(run.status == FINISHED for run in self.runs)
+
+
+class PoolListener:
+    """执行池的回调接口；回调均在执行池的事件循环线程中调用"""
+
+    def on_run_status(self, run):
+        pass
+
+    def on_run_output(self, run, output):
+        """output 为 (新完成的行, 当前未完成的行)，行记录的格式见 ansi_parser"""
+        pass
+
+    def on_batch_finished(self, batch):
+        pass
+
+
+class _OutputPump:
+    """按时间片合并单个执行的输出块，满足刷新策略时才交给监听者"""
+
+    def __init__(self, run, encoding, policy, loop, listener, history=None):
+        self.run = run
+        self.history = history
+        self.policy = policy
+        self.loop = loop
+        self.listener = listener
+        # 解析器跨块保留解码和转义序列状态，可以正确处理被读取边界切开的字符和控制序列
+        self.parser = AnsiParser(encoding)
+        self.chunks = []
+        self.size = 0
+        self.handle = None
+        self.reported_dropped = 0
+
+    def feed(self, chunk):
+        stats = self.run.stats
+        stats["reads"] += 1
+        stats["bytes"] += len(chunk)
+        if "first_byte" not in self.run.timing:
+            self.run.timing["first_byte"] = time.perf_counter()
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        limit = self.policy.max_buffer_bytes
+        if limit:
+            while self.size > limit and len(self.chunks) > 1:
+                dropped = self.chunks.pop(0)
+                self.size -= len(dropped)
+                stats["dropped_bytes"] += len(dropped)
+        ui_busy = self.run.pending_batches >= self.policy.max_pending_batches
+        if self.size >= self.policy.max_bytes and not ui_busy:
+            self.flush()
+        elif self.handle is None:
+            self.handle = self.loop.call_later(self.policy.interval_ms / 1000.0, self._on_timer)
+
+    def _on_timer(self):
+        self.handle = None
+        if self.run.pending_batches >= self.policy.max_pending_batches:
+            # 界面仍在处理上一批时，按时间片继续合并
+            self.handle = self.loop.call_later(self.policy.interval_ms / 1000.0, self._on_timer)
+            return
+        self.flush()
+
+    def flush(self, final=False):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        chunks, self.chunks, self.size = self.chunks, [], 0
+        if not chunks and not final:
+            return
+        lines, partial = self.parser.feed(b"".join(chunks), final=final)
+        if not chunks and not lines:
+            return
+        stats = self.run.stats
+        if stats["dropped_bytes"] != self.reported_dropped:
+            self.reported_dropped = stats["dropped_bytes"]
+            lines.insert(0, f"[输出过快，已累计丢弃 {self.reported_dropped} 字节]")
+        stats["batches"] += 1
+        stats["lines"] += len(lines)
+        stats["coalesced"] = stats["reads"] - stats["batches"]
+        self.emit(lines, partial)
+
+    def emit(self, lines, partial):
+        run = self.run
+        run.pending_batches += 1
+        run.sent_times.append(time.perf_counter())
+        run.stats["max_pending"] = max(run.stats["max_pending"], run.pending_batches)
+        if self.history is not None:
+            self.history.append(run, lines, partial)
+        self.listener.on_run_output(self.run, (lines, partial))
+
+    def message(self, text):
+        """在输出末尾追加一行提示，之前未完成的行先结束"""
+        partial = self.parser.end_line()
+        self.emit([partial, text] if partial else [text], "")
+
+
+class ExecutionPool:
+    """在单个后台线程的 asyncio 事件循环中驱动所有子进程，不为每个执行单独占用线程"""
+
+    def __init__(
+        self,
+        max_workers=4,
+        flush_policy=None,
+        listener=None,
+        shell_pool=None,
+        env_cache=None,
+        metrics_log=None,
+        history=None,
+        grace_period=GRACE_PERIOD,
+    ):
+        self.max_workers = max_workers
+        self.flush_policy = flush_policy or FlushPolicy()
+        self.listener = listener or PoolListener()
+        # 可选的预热 shell 会话池（见 shell_pool），为 None 时每次执行都启动新进程
+        self.shell_pool = shell_pool
+        # 环境配置的捕获缓存（见 env_profiles），执行引用了环境配置时需要
+        self.env_cache = env_cache
+        # 每次执行结束后把指标追加到其中（见 run_metrics.MetricsLog），为 None 时只保存在 Run.metrics
+        self.metrics_log = metrics_log
+        # 执行历史（见 run_history.HistoryStore），为 None 时不记录输出
+        self.history = history
+        # 取消时先请求进程退出，等待这么多秒后再强制结束；为 0 时立即强制结束
+        self.grace_period = grace_period
+        # 到各执行主机的连接（见 remote_agent.AgentPool），第一次在执行主机上执行时创建
+        self.agents = None
+        self._sampler = ResourceSampler()
+        self._sampling = None
+        self._loop = None
+        self._thread = None
+        self._queue = deque()
+        self._running = {}
+        self._run_ids = itertools.count(1)
+        self._batch_ids = itertools.count(1)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run_loop, args=(started,), name="ExecutionPool", daemon=True
+        )
+        self._thread.start()
+        started.wait()
+
+    def _run_loop(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(started.set)
+        self._loop.run_forever()
+        self._loop.close()
+
+    def _call(self, callback, *args):
+        """把操作投递到事件循环线程执行，执行池的内部状态只在该线程中修改"""
+        self.start()
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    def submit(self, specs, fail_fast=False, dependencies=None):
+        """提交一组执行，返回 Batch；可在任意线程调用
+
+        dependencies 与 specs 一一对应，每项是必须先成功的执行在 specs 中的下标，
+        调用方需保证没有环（见 pipeline.plan）。依赖失败、被取消或被跳过的执行标记为跳过。
+        """
+        batch = Batch(next(self._batch_ids), fail_fast)
+        batch.runs = [Run(next(self._run_ids), spec, batch) for spec in specs]
+        submitted = time.perf_counter()
+        for run in batch.runs:
+            run.timing["submitted"] = submitted
+        for run, deps in zip(batch.runs, dependencies or ()):
+            run.depends_on = [batch.runs[i] for i in deps]
+            for dep in run.depends_on:
+                dep.dependents.append(run)
+        self._call(self._enqueue, batch)
+        return batch
+
+    def set_max_workers(self, max_workers):
+        self.max_workers = max(1, max_workers)
+        if self._loop is not None:
+            self._call(self._pump)
+
+    def set_history(self, history):
+        """启用或停用（None）执行历史，从之后开始的执行起生效"""
+        self._call(self._set_history, history)
+
+    def set_shell_pool(self, shell_pool):
+        """启用或停用（None）会话池；正在使用的旧会话在执行结束后关闭"""
+        self._call(self._set_shell_pool, shell_pool)
+
+    def prewarm(self, specs):
+        """在后台为这些执行的 shell、工作目录和环境配置预先启动会话"""
+        if self.shell_pool is not None:
+            self._call(self._start_prewarm, list(specs))
+
+    def invalidate_environment(self, profile_id):
+        """丢弃环境配置的缓存，下次使用时重新运行激活脚本"""
+        if self.env_cache is not None:
+            self._call(self.env_cache.invalidate, profile_id)
+
+    def mark_batch_applied(self, run):
+        """界面每处理完一批输出后调用，用于背压控制"""
+        self._call(self._ack, run)
+
+    def set_grace_period(self, seconds):
+        self._call(setattr, self, "grace_period", seconds)
+
+    def cancel_run(self, run, force=False):
+        """取消一次执行；force 为 True 或对正在终止的执行再次取消时，不再等待而是立即强制结束"""
+        self._call(self._cancel_run, run, force)
+
+    def cancel_batch(self, batch, force=False):
+        self._call(self._cancel_batch, batch, force)
+
+    def cancel_all(self, force=False):
+        self._call(self._cancel_all, force)
+
+    def is_busy(self):
+        return bool(self._queue or self._running)
+
+    def shutdown(self, timeout=5.0):
+        """取消所有执行并停止事件循环"""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # 以下方法只在事件循环线程中调用
+
+    def _enqueue(self, batch):
+        for run in batch.runs:
+            # 有依赖的执行保持排队状态，等依赖全部成功后才进入队列
+            if not run.depends_on:
+                self._queue.append(run)
+            self.listener.on_run_status(run)
+        self._check_batch(batch)
+        self._pump()
+
+    def _pump(self):
+        while self._queue and len(self._running) < self.max_workers:
+            run = self._queue.popleft()
+            self._running[run.run_id] = run
+            self._loop.create_task(self._execute(run))
+
+    def _set_history(self, history):
+        self.history = history
+
+    def _set_shell_pool(self, shell_pool):
+        old, self.shell_pool = self.shell_pool, shell_pool
+        if old is not None and old is not shell_pool:
+            self._loop.create_task(old.close())
+
+    def _start_prewarm(self, specs):
+        self._loop.create_task(self._prewarm(specs))
+
+    async def _prewarm(self, specs):
+        targets = []
+        for spec in specs:
+            shell_pool = self.shell_pool
+            if shell_pool is None:
+                return
+            if not shell_pool.supports(spec.shell):
+                continue
+            try:
+                env, env_id, _ = await self._environment(spec)
+            except Exception:
+                continue
+            targets.append((shell_pool.key(spec, env_id), env))
+        if self.shell_pool is not None:
+            await self.shell_pool.prewarm(targets)
+
+    async def _environment(self, spec):
+        """返回 (环境变量字典或 None, 捕获结果的标识, 本次新捕获的记录或 None)"""
+        if not spec.env_profile:
+            return None, "", None
+        if self.env_cache is None:
+            raise RuntimeError("未启用环境配置缓存，无法使用环境配置")
+        return await self.env_cache.environment(spec.env_profile)
+
+    def _ack(self, run):
+        if run.pending_batches > 0:
+            run.pending_batches -= 1
+        if run.sent_times:
+            latency = time.perf_counter() - run.sent_times.popleft()
+            run.stats["max_ui_latency"] = max(run.stats["max_ui_latency"], latency)
+        if run.spec.target is not None and run.tree is not None:
+            run.tree.grant()
+
+    def _track_resources(self, run):
+        """开始采样进程树的资源占用；采样任务在没有需要跟踪的执行时自行结束"""
+        if not self._sampler.available:
+            return
+        self._sampler.start(run.run_id, run.process.pid)
+        if self._sampling is None:
+            self._sampling = self._loop.create_task(self._sample_resources())
+
+    async def _sample_resources(self):
+        try:
+            while self._sampler.active:
+                await asyncio.sleep(SAMPLE_INTERVAL)
+                self._sampler.sample()
+        finally:
+            self._sampling = None
+
+    async def _execute(self, run):
+        spec = run.spec
+        argv, encoding = build_shell_command(spec.command, spec.shell)
+        if spec.target is not None:
+            # 执行主机把输出转换为 UTF-8 后发回
+            encoding = "utf-8"
+        run.status = RUNNING
+        run.start_time = time.time()
+        run.timing["start"] = time.perf_counter()
+        self.listener.on_run_status(run)
+        history = self.history
+        if history is not None:
+            history.begin(run)
+        pump = _OutputPump(run, encoding, self.flush_policy, self._loop, self.listener, history)
+        shell_pool = self.shell_pool
+        try:
+            if spec.env_profile:
+                run.timing["env_start"] = time.perf_counter()
+            env, env_id, captured = await self._environment(spec)
+            if spec.env_profile:
+                run.timing["env_end"] = time.perf_counter()
+            if captured is not None:
+                pump.message(
+                    f"[已运行环境配置“{spec.env_profile.get('name', '')}”的激活脚本"
+                    f"（{captured['capture_ms']} 毫秒），之后的执行直接使用缓存的环境]"
+                )
+            if spec.extra_env:
+                env = dict(os.environ if env is None else env)
+                env.update(spec.extra_env)
+            if spec.target is not None:
+                run.return_code = await self._execute_remote(run, pump)
+            # 会话的环境在启动时就已确定，带有额外环境变量的执行不使用会话
+            elif (
+                shell_pool is not None
+                and shell_pool.supports(spec.shell)
+                and not spec.extra_env
+            ):
+                run.return_code = await self._execute_in_session(
+                    run, shell_pool, pump, env, env_id
+                )
+            else:
+                run.return_code = await self._execute_process(run, argv, pump, env)
+        except FileNotFoundError:
+            pump.flush(final=True)
+            pump.message(f"错误: 无法找到执行程序 '{argv[0]}'。请确保它在系统的PATH中。")
+            run.return_code = -1
+        except Exception as e:
+            pump.flush(final=True)
+            pump.message(f"执行出错: {e}")
+            run.return_code = -1
+        termination = run.termination
+        while termination is not None:
+            # 确认整棵进程树都已退出后才算取消完成；等待期间可能又被要求强制结束
+            run.cancel_result = await termination
+            termination = None if termination is run.termination else run.termination
+        if run.cancel_result is not None and run.cancel_result["remaining"]:
+            pump.message("[警告: 强制结束后仍有子进程未退出]")
+        if run.tree is not None:
+            run.tree.close()
+        run.timing["end"] = time.perf_counter()
+        self._finish(run, self._sampler.stop(run.run_id), history)
+
+    async def _execute_process(self, run, argv, pump, env=None):
+        run.timing["spawn_start"] = time.perf_counter()
+        run.process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=run.spec.working_dir or None,
+            env=env,
+            **popen_kwargs(),
+        )
+        run.timing["spawned"] = time.perf_counter()
+        run.tree = ProcessTree(run.process)
+        self._track_resources(run)
+        if run.cancel_requested:
+            self._terminate(run)
+        read_size = self.flush_policy.read_size
+        while True:
+            chunk = await run.process.stdout.read(read_size)
+            if not chunk:
+                break
+            pump.feed(chunk)
+        pump.flush(final=True)
+        # 输出结束时进程可能尚未被回收，此时还能读到它的最终 CPU 时间
+        self._sampler.sample()
+        return_code = await run.process.wait()
+        # 回收后 /proc 中已没有该进程，用回收的子进程累计的 CPU 时间补上；
+        # 其他执行的进程也刚被回收、尚未计入时无法区分归属，只保留采样的结果
+        shared = any(
+            other is not run
+            and other.process is not None
+            and other.process.returncode is not None
+            and self._sampler.awaiting_reap(other.run_id)
+            for other in self._running.values()
+        )
+        self._sampler.reaped(run.run_id, shared)
+        return return_code
+
+    async def _execute_remote(self, run, pump):
+        """在执行主机上执行（见 remote_agent）；界面处理不过来时不再补充发送额度，执行主机随之暂停读取"""
+        from remote_agent import AgentPool
+
+        if self.agents is None:
+            self.agents = AgentPool()
+        spec = run.spec
+        run.timing["spawn_start"] = time.perf_counter()
+        connection = await self.agents.connection(spec.target)
+        policy = self.flush_policy
+        run.tree = connection.start(
+            {
+                "command": spec.command,
+                "shell": spec.shell,
+                "working_dir": spec.working_dir,
+                "env": spec.extra_env or {},
+            },
+            pump.feed,
+            busy=lambda: run.pending_batches >= policy.max_pending_batches,
+        )
+        run.timing["spawned"] = time.perf_counter()
+        if run.cancel_requested:
+            self._terminate(run)
+        try:
+            result = await run.tree.wait()
+        finally:
+            pump.flush(final=True)
+        return result["return_code"]
+
+    async def _execute_in_session(self, run, shell_pool, pump, env=None, env_id=""):
+        """在预热的会话中执行；取消时终止整个会话，该会话随后被丢弃"""
+        run.timing["spawn_start"] = time.perf_counter()
+        session = await shell_pool.acquire(shell_pool.key(run.spec, env_id), env)
+        run.timing["spawned"] = time.perf_counter()
+        run.timing["session"] = True
+        run.process = session.process
+        run.tree = ProcessTree(session.process)
+        self._track_resources(run)
+        code, completed = -1, False
+        try:
+            if run.cancel_requested:
+                self._terminate(run)
+            code, completed = await session.run(
+                run.spec.command, pump.feed, self.flush_policy.read_size
+            )
+        finally:
+            shell_pool.release(
+                session, completed and code == 0 and not run.cancel_requested
+            )
+        pump.flush(final=True)
+        return code
+
+    def _finish(self, run, resources=None, history=None):
+        run.end_time = time.time()
+        if run.cancel_requested:
+            run.status = CANCELLED
+        elif run.return_code == 0:
+            run.status = FINISHED
+        else:
+            run.status = FAILED
+        run.metrics = build_metrics(run, resources)
+        if self.metrics_log is not None:
+            self.metrics_log.append(run.metrics)
+        if history is not None:
+            history.finish(run)
+        self._running.pop(run.run_id, None)
+        self.listener.on_run_status(run)
+        self._release_dependents(run)
+        batch = run.batch
+        if run.status == FAILED and batch.fail_fast:
+            self._cancel_batch(batch)
+        self._check_batch(batch)
+        self._pump()
+
+    def _release_dependents(self, run):
+        """执行结束后，依赖已全部成功的执行进入队列，依赖未成功的执行被跳过"""
+        ended = [run]
+        while ended:
+            run = ended.pop()
+            for dependent in run.dependents:
+                if dependent.status != QUEUED or dependent.cancel_requested:
+                    continue
+                if run.status != FINISHED:
+                    dependent.status = SKIPPED
+                    self.listener.on_run_status(dependent)
+                    ended.append(dependent)
+                elif all(dep.status == FINISHED for dep in dependent.depends_on):
+                    self._queue.append(dependent)
+
+    def _check_batch(self, batch):
+        if batch.done and not batch.notified:
+            batch.notified = True
+            self.listener.on_batch_finished(batch)
+
+    def _cancel_run(self, run, force=False):
+        if run.done:
+            return
+        if run.cancel_requested:
+            # 再次取消正在等待退出的执行时立即强制结束
+            if run.termination is not None:
+                self._terminate(run, force=True)
+            return
+        run.cancel_requested = True
+        run.timing["cancel"] = time.perf_counter()
+        if run.status == QUEUED:
+            if run.run_id in self._running:
+                # 已交给事件循环但尚未启动，由 _execute 在启动后终止
+                return
+            try:
+                self._queue.remove(run)
+            except ValueError:
+                # 仍在等待依赖的执行不在队列中
+                pass
+            run.status = CANCELLED
+            self.listener.on_run_status(run)
+            self._release_dependents(run)
+            self._check_batch(run.batch)
+        elif run.tree is not None:
+            self._terminate(run, force)
+
+    def _cancel_batch(self, batch, force=False):
+        batch.cancelled = True
+        for run in batch.runs:
+            self._cancel_run(run, force)
+
+    def _cancel_all(self, force=False):
+        for run in list(self._queue) + list(self._running.values()):
+            self._cancel_run(run, force)
+
+    async def _shutdown(self):
+        self._cancel_all()
+        while self._running:
+            await asyncio.sleep(0.05)
+        if self._sampling is not None:
+            self._sampling.cancel()
+        if self.shell_pool is not None:
+            await self.shell_pool.close()
+        if self.agents is not None:
+            await self.agents.close()
+
+    def _terminate(self, run, force=False):
+        """开始终止执行的进程树；_execute 等待终止完成后再结束该执行"""
+        grace = 0 if force else self.grace_period
+        if run.termination is None:
+            run.termination = self._loop.create_task(run.tree.terminate(grace))
+        elif force:
+            # 正在宽限期内等待的终止任务照常结束，强制结束的结果覆盖它
+            forced = self._loop.create_task(run.tree.terminate(0))
+            run.termination = self._loop.create_task(self._settle(run.termination, forced))
+
+    @staticmethod
+    async def _settle(graceful, forced):
+        await graceful
+        return await forced
@@ -0,0 +1,641 @@
+# file_watch.py
+import os
+import re
+import select
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import watchdog.observers
+except ImportError:
+    watchdog = None
+
+# 触发的执行通过这些环境变量得到改动的文件（绝对路径，以 os.pathsep 分隔）和数量；
+# 列表过长时 CHANGED_FILES_ENV 为空，完整列表每行一个写在 CHANGED_LIST_ENV 指向的文件中
+CHANGED_FILES_ENV = "GUI_SHELL_CHANGED_FILES"
+CHANGED_COUNT_ENV = "GUI_SHELL_CHANGED_COUNT"
+CHANGED_LIST_ENV = "GUI_SHELL_CHANGED_FILES_LIST"
+MAX_ENV_CHARS = 16000
+# 最后一次改动后等待这么久（毫秒）没有新的改动才触发；持续有改动时最多合并 MAX_DELAY 秒
+DEBOUNCE_MS = 300
+MAX_DELAY = 5.0
+# 改动时上一次执行仍在进行：RESTART 取消它并在其结束后重新执行，QUEUE 等它结束后再执行
+RESTART = "restart"
+QUEUE = "queue"
+# 不监视也不匹配的目录
+IGNORED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".mypy_cache", ".pytest_cache", ".tox", ".idea", ".vs",
+}
+
+# inotify 事件（见 inotify(7)）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONTFOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+_INOTIFY_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    | IN_ONLYDIR | IN_DONTFOLLOW | IN_EXCL_UNLINK
+)
+# struct inotify_event 的固定部分：wd, mask, cookie, len，之后是 len 字节的文件名
+_EVENT = struct.Struct("iIII")
+
+
+class WatchError(Exception):
+    pass
+
+
+def _glob_regex(pattern):
+    """把一个 glob 转换为正则表达式：** 可以跨越目录，* 和 ? 不跨越目录"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def compile_globs(patterns):
+    """返回判断相对路径（以 / 分隔）是否匹配任一 glob 的函数，没有 glob 时返回 None
+
+    与 .gitignore 相同：不含 / 的 glob 匹配任意一级的名称（*.py 匹配任意目录下的 .py 文件），
+    含有 / 的 glob 从监视的目录开始匹配；匹配到目录时其中所有文件都算匹配。
+    """
+    parts = []
+    for pattern in patterns:
+        pattern = pattern.strip().replace("\\", "/")
+        if not pattern:
+            continue
+        # 结尾的 / 只表示匹配目录，目录中的文件总是随目录一起匹配
+        pattern = pattern.rstrip("/")
+        if "/" in pattern:
+            parts.append(_glob_regex(pattern.lstrip("/")))
+        elif pattern:
+            parts.append("(?:.*/)?" + _glob_regex(pattern))
+    if not parts:
+        return None
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    regex = re.compile("(?:" + "|".join(parts) + ")(?:/.*)?", flags)
+    return lambda path: regex.fullmatch(path) is not None
+
+
+class WatchSpec:
+    """一个项目的文件监视设置
+
+    保存在项目的 "watch" 字段中：{"patterns": [glob, ...], "debounce_ms": 毫秒, "policy": RESTART 或 QUEUE}。
+    以 ! 开头的 glob 表示排除，例如 ["**/*.py", "!build/"]。
+    """
+
+    def __init__(self, patterns, debounce_ms=DEBOUNCE_MS, policy=RESTART):
+        self.patterns = [p.strip() for p in patterns if p.strip()]
+        self.debounce_ms = max(0, int(debounce_ms))
+        self.policy = QUEUE if policy == QUEUE else RESTART
+        self._include = compile_globs([p for p in self.patterns if not p.startswith("!")])
+        self._exclude = compile_globs([p[1:] for p in self.patterns if p.startswith("!")])
+        if self._include is None:
+            raise WatchError("至少需要一个要监视的文件模式，例如 **/*.py")
+
+    @classmethod
+    def from_item(cls, item_data):
+        """项目没有设置文件监视时返回 None"""
+        data = item_data.get("watch")
+        if not data or not data.get("patterns"):
+            return None
+        return cls(
+            data["patterns"], data.get("debounce_ms", DEBOUNCE_MS), data.get("policy", RESTART)
+        )
+
+    @staticmethod
+    def split(text):
+        """编辑框中以空格或逗号分隔的 glob"""
+        return [p for p in re.split(r"[\s,]+", text) if p]
+
+    def to_dict(self):
+        return {"patterns": self.patterns, "debounce_ms": self.debounce_ms, "policy": self.policy}
+
+    def __eq__(self, other):
+        return isinstance(other, WatchSpec) and self.to_dict() == other.to_dict()
+
+    def matches(self, path):
+        if not self._include(path):
+            return False
+        return self._exclude is None or not self._exclude(path)
+
+
+def changed_files_env(paths):
+    """返回 (传给执行的环境变量, 需要在执行结束后删除的列表文件或 None)"""
+    text = os.pathsep.join(paths)
+    env = {CHANGED_FILES_ENV: text, CHANGED_COUNT_ENV: str(len(paths))}
+    if len(text) <= MAX_ENV_CHARS:
+        return env, None
+    # 环境变量的长度有限（Windows 上整个环境块不超过 32767 个字符）
+    fd, list_path = tempfile.mkstemp(prefix="gui-shell-changed-", suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write("\n".join(paths) + "\n")
+    env[CHANGED_FILES_ENV] = ""
+    env[CHANGED_LIST_ENV] = list_path
+    return env, list_path
+
+
+def _under(path, root):
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class _InotifyBackend:
+    """Linux inotify：为监视根目录下的每个目录添加一个监视，阻塞等待事件，空闲时不占用 CPU"""
+
+    name = "inotify"
+
+    def __init__(self, on_paths, on_error):
+        import ctypes
+        import ctypes.util
+
+        self.on_paths = on_paths
+        self.on_error = on_error
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise WatchError(f"无法初始化 inotify: {os.strerror(ctypes.get_errno())}")
+        self._wake_r, self._wake_w = os.pipe()
+        # 监视编号 -> 目录，目录 -> 监视编号；根目录 -> 引用数
+        self._dirs = {}
+        self._wds = {}
+        self._roots = {}
+        # 等待后台线程扫描的根目录：扫描大目录树较慢，不在调用 add_root 的线程（通常是界面线程）中进行
+        self._scans = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="FileWatch", daemon=True)
+        self._thread.start()
+
+    def watched_dirs(self):
+        with self._lock:
+            return len(self._wds)
+
+    def add_root(self, root):
+        """开始监视 root；目录在后台线程中扫描，之前的改动不会被报告"""
+        with self._lock:
+            self._roots[root] = self._roots.get(root, 0) + 1
+            if self._roots[root] > 1:
+                return
+            self._scans.append(root)
+        os.write(self._wake_w, b"s")
+
+    def remove_root(self, root):
+        with self._lock:
+            count = self._roots.get(root, 0) - 1
+            if count > 0:
+                self._roots[root] = count
+                return
+            self._roots.pop(root, None)
+            for path in [p for p in self._wds if _under(p, root)]:
+                if not any(_under(path, r) for r in self._roots):
+                    self._unwatch(path)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        os.write(self._wake_w, b"x")
+        self._thread.join()
+        os.close(self._fd)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _add_watch(self, path):
+        """添加一个目录的监视，返回 0 或失败时的 errno；path 已不在任何根目录下时返回 ENOENT"""
+        with self._lock:
+            if path in self._wds:
+                return 0
+            # 扫描期间根目录可能已被移除
+            if not any(_under(path, root) for root in self._roots):
+                return 2  # ENOENT
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _INOTIFY_MASK)
+            if wd < 0:
+                errno = self._ctypes.get_errno()
+                if errno == 28:  # ENOSPC
+                    self.on_error(
+                        "inotify 监视数量已达上限，部分目录未被监视；"
+                        "可以增大 /proc/sys/fs/inotify/max_user_watches"
+                    )
+                return errno
+            self._dirs[wd] = path
+            self._wds[path] = wd
+            return 0
+
+    def _unwatch(self, path):
+        wd = self._wds.pop(path, None)
+        if wd is not None:
+            self._dirs.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _watch_tree(self, top, files=None):
+        """监视 top 及其下所有目录；files 不为 None 时收集其中已有的文件
+        （新建的目录在添加监视之前可能已经写入了文件）。返回为 top 添加监视时的 errno
+
+        只在后台线程中调用；锁只在添加每个监视时持有，扫描期间其他线程仍可增删根目录。
+        """
+        error = self._add_watch(top)
+        if error:
+            return error
+        pending = [top]
+        while pending:
+            path = pending.pop()
+            if path is not top and self._add_watch(path):
+                continue
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if entry.name not in IGNORED_DIRS:
+                                pending.append(entry.path)
+                        elif files is not None:
+                            files.append(entry.path)
+            except OSError:
+                continue
+        return 0
+
+    def _scan_roots(self):
+        with self._lock:
+            roots, self._scans = self._scans, []
+        for root in roots:
+            error = self._watch_tree(root)
+            # ENOSPC 已经报告过；扫描之前根目录已被移除时不需要报告
+            if error and error != 28 and root in self._roots:
+                self.on_error(f"无法监视目录 {root}: {os.strerror(error)}")
+
+    def _run(self):
+        buffer_size = 256 * 1024
+        while True:
+            ready, _, _ = select.select([self._fd, self._wake_r], [], [])
+            if self._wake_r in ready:
+                os.read(self._wake_r, 4096)
+                if self._closed:
+                    return
+                self._scan_roots()
+            if self._fd not in ready:
+                continue
+            try:
+                data = os.read(self._fd, buffer_size)
+            except OSError:
+                continue
+            paths = []
+            new_dirs = []
+            with self._lock:
+                self._parse(data, paths, new_dirs)
+            for path in new_dirs:
+                self._watch_tree(path, paths)
+            if paths:
+                self.on_paths(paths)
+
+    def _parse(self, data, paths, new_dirs):
+        """解析事件，改动的路径加入 paths；新建或移入的目录加入 new_dirs，释放锁后再扫描"""
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，改动的文件未知，按各根目录整体有改动处理
+                paths.extend(self._roots)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                if self._wds.get(directory) == wd:
+                    del self._wds[directory]
+                continue
+            if not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if os.fsdecode(name) in IGNORED_DIRS:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    new_dirs.append(path)
+                elif mask & IN_MOVED_FROM:
+                    # 移走的目录的监视仍然有效，但已不在监视范围内
+                    for sub in [p for p in self._wds if _under(p, path)]:
+                        self._unwatch(sub)
+            paths.append(path)
+
+
+class _WatchdogBackend:
+    """安装了 watchdog 时使用，由它选择各平台的原生机制（Windows 的 ReadDirectoryChangesW 等）"""
+
+    name = "watchdog"
+
+    def __init__(self, on_paths, on_error):
+        from watchdog.events import FileSystemEventHandler
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(handler, event):
+                # 目录的修改事件只表示其中的文件有变化，文件本身也会产生事件
+                if event.is_directory and event.event_type == "modified":
+                    return
+                paths = [event.src_path]
+                if getattr(event, "dest_path", ""):
+                    paths.append(event.dest_path)
+                on_paths([os.fsdecode(p) for p in paths])
+
+        self.on_error = on_error
+        self._handler = Handler()
+        self._observer = watchdog.observers.Observer()
+        self._observer.start()
+        # 根目录 -> (监视, 引用数)，只在 _run 的线程中访问
+        self._watches = {}
+        # schedule(recursive=True) 会扫描整个目录树，增删根目录都交给后台线程按顺序处理
+        self._ops = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="FileWatchSchedule", daemon=True)
+        self._thread.start()
+
+    def watched_dirs(self):
+        return None
+
+    def add_root(self, root):
+        self._post("add", root)
+
+    def remove_root(self, root):
+        self._post("remove", root)
+
+    def _post(self, op, root):
+        with self._cond:
+            self._ops.append((op, root))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._observer.stop()
+        self._observer.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ops or self._closed)
+                if self._closed:
+                    return
+                ops, self._ops = self._ops, []
+            for op, root in ops:
+                watch, count = self._watches.pop(root, (None, 0))
+                if op == "add":
+                    if watch is None:
+                        try:
+                            watch = self._observer.schedule(self._handler, root, recursive=True)
+                        except OSError as e:
+                            self.on_error(f"无法监视目录 {root}: {e}")
+                    self._watches[root] = (watch, count + 1)
+                elif count > 1:
+                    self._watches[root] = (watch, count - 1)
+                elif watch is not None:
+                    self._observer.unschedule(watch)
+
+
+def available_backend():
+    """可用的监视机制名称，没有时返回 None"""
+    if watchdog is not None:
+        return _WatchdogBackend.name
+    if sys.platform.startswith("linux"):
+        return _InotifyBackend.name
+    return None
+
+
+class _Watch:
+    def __init__(self, root, spec):
+        self.root = root
+        self.prefix = root.rstrip(os.sep) + os.sep
+        self.spec = spec
+
+    def relative(self, path):
+        """path 在根目录下时返回以 / 分隔的相对路径，否则返回 None"""
+        if not path.startswith(self.prefix):
+            return None
+        relative = path[len(self.prefix):]
+        if os.sep != "/":
+            relative = relative.replace(os.sep, "/")
+        return relative
+
+
+class FileWatcher:
+    """监视各项目工作目录中的文件改动，合并一段时间内的改动后触发执行
+
+    使用操作系统的文件改动通知（watchdog，或 Linux 上直接使用 inotify），不轮询文件；
+    没有改动时两个后台线程都阻塞等待，空闲开销与监视的文件数量无关。
+    项目的改动在最后一次改动后 debounce_ms 毫秒内没有新的改动时（持续改动时最多 MAX_DELAY 秒）
+    通过 on_trigger(item_id, 改动的文件列表) 在后台线程中回调，通常是 Qt 信号的 emit。
+    """
+
+    def __init__(self, on_trigger, on_error=None):
+        self.on_trigger = on_trigger
+        self.on_error = on_error or (lambda message: None)
+        self.backend = None
+        self._items = {}
+        self._pending = {}
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="FileWatchDebounce", daemon=True)
+        self._thread.start()
+
+    def _backend(self):
+        if self.backend is None:
+            name = available_backend()
+            if name is None:
+                raise WatchError("当前系统没有可用的文件监视机制，请安装 watchdog")
+            backend_class = _WatchdogBackend if name == _WatchdogBackend.name else _InotifyBackend
+            self.backend = backend_class(self._on_paths, self.on_error)
+        return self.backend
+
+    def set_item(self, item_id, root, spec):
+        """开始、更新或（spec 为 None 时）停止监视一个项目；root 不存在时抛出 WatchError
+
+        目录树由监视机制在后台线程中扫描，这里立即返回；之后无法监视时通过 on_error 报告。
+        """
+        if spec is not None:
+            root = os.path.realpath(root or os.getcwd())
+            if not os.path.isdir(root):
+                raise WatchError(f"工作目录不存在: {root}")
+        with self._cond:
+            old = self._items.get(item_id)
+            if old is not None and spec is not None and old.root == root:
+                old.spec = spec
+                return
+            if old is not None:
+                del self._items[item_id]
+                self._pending.pop(item_id, None)
+                self.backend.remove_root(old.root)
+            if spec is not None:
+                self._backend().add_root(root)
+                self._items[item_id] = _Watch(root, spec)
+
+    def remove(self, item_id):
+        self.set_item(item_id, None, None)
+
+    def item_ids(self):
+        with self._cond:
+            return list(self._items)
+
+    def watched_dirs(self):
+        """监视的目录数（inotify），其他监视机制返回 None"""
+        return None if self.backend is None else self.backend.watched_dirs()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self.backend is not None:
+            self.backend.close()
+
+    def _on_paths(self, paths):
+        """监视机制的线程中调用：把改动的文件归入监视它们的项目"""
+        now = time.monotonic()
+        with self._cond:
+            changed = False
+            for item_id, watch in self._items.items():
+                for path in paths:
+                    relative = watch.relative(path)
+                    if relative is None:
+                        if path != watch.root:
+                            continue
+                        # 事件队列溢出时整个根目录视为有改动
+                        relative = ""
+                    elif IGNORED_DIRS.intersection(relative.split("/")[:-1]):
+                        continue
+                    elif not watch.spec.matches(relative):
+                        continue
+                    pending = self._pending.get(item_id)
+                    if pending is None:
+                        pending = self._pending[item_id] = {"paths": {}, "first": now, "last": now}
+                    pending["paths"][path] = None
+                    pending["last"] = now
+                    changed = True
+            if changed:
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                ready = []
+                timeout = None
+                for item_id, pending in list(self._pending.items()):
+                    spec = self._items[item_id].spec
+                    deadline = min(
+                        pending["last"] + spec.debounce_ms / 1000.0, pending["first"] + MAX_DELAY
+                    )
+                    if deadline <= now:
+                        del self._pending[item_id]
+                        ready.append((item_id, list(pending["paths"])))
+                    elif timeout is None or deadline - now < timeout:
+                        timeout = deadline - now
+                if not ready:
+                    self._cond.wait(timeout)
+                    continue
+            for item_id, paths in ready:
+                self.on_trigger(item_id, paths)
+
+
+class TriggerQueue:
+    """按项目的策略处理监视触发的执行
+
+    start(item_id, extra_env) 开始一次执行并返回其 Run 列表（项目有多个执行目标时每个目标一个），
+    cancel(run) 取消执行；每个执行结束后调用 finished(run)。上一次执行仍在进行时改动合并到
+    下一次执行中，RESTART 策略同时取消正在进行的执行。可以在任意线程中调用。
+    """
+
+    def __init__(self, start, cancel):
+        self.start = start
+        self.cancel = cancel
+        # 项目 id -> {"runs": 未结束的执行, "paths": 本次执行的改动, "list_file", "pending": 等待下一次执行的改动}
+        self._states = {}
+        # start 可能同步地报告执行状态，进而调用 finished
+        self._lock = threading.RLock()
+
+    def trigger(self, item_id, paths, policy=RESTART):
+        with self._lock:
+            state = self._states.get(item_id)
+            if state is not None:
+                state["pending"].update(dict.fromkeys(paths))
+                if policy == RESTART and not state["cancelled"]:
+                    # 被取消的执行没有处理完它的改动，一起交给下一次执行
+                    state["cancelled"] = True
+                    state["pending"].update(dict.fromkeys(state["paths"]))
+                    for run in state["runs"]:
+                        self.cancel(run)
+                return
+            self._start(item_id, paths)
+
+    def finished(self, run):
+        """执行结束后调用；不是由本队列开始的执行被忽略"""
+        with self._lock:
+            item_id = run.spec.item_id
+            state = self._states.get(item_id)
+            if state is None or run not in state["runs"]:
+                return
+            state["runs"].remove(run)
+            if state["runs"]:
+                return
+            del self._states[item_id]
+            if state["list_file"] is not None:
+                try:
+                    os.remove(state["list_file"])
+                except OSError:
+                    pass
+            if state["pending"]:
+                self._start(item_id, list(state["pending"]))
+
+    def _start(self, item_id, paths):
+        env, list_file = changed_files_env(sorted(paths))
+        runs = self.start(item_id, env)
+        if not runs:
+            if list_file is not None:
+                os.remove(list_file)
+            return
+        self._states[item_id] = {
+            "runs": list(runs),
+            "paths": paths,
+            "list_file": list_file,
+            "pending": {},
+            "cancelled": False,
+        }
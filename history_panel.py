@@ -0,0 +1,63 @@
+# history_panel.py
+import time
+
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtWidgets import QTreeWidget, QTreeWidgetItem
+
+# 历史记录中保存的状态字符串；前三种与 execution_pool 的状态常量相同，这里直接写出，
+# 查看历史时不必导入执行池。后两种状态只出现在历史记录中（见 run_history）
+STATUS_TEXT = {
+    "finished": "成功",
+    "failed": "失败",
+    "cancelled": "已取消",
+    "interrupted": "中断",
+    "running": "运行中",
+}
+
+
+def _size(value):
+    if value < 1024 * 1024:
+        return f"{value / 1024:.1f} KB"
+    return f"{value / 1024 / 1024:.1f} MB"
+
+
+class HistoryPanel(QTreeWidget):
+    """列出一个项目过去的执行，双击重新打开该次执行的输出"""
+
+    # 参数为 run_history 的执行记录
+    open_requested = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHeaderLabels(["开始时间", "状态", "返回码", "耗时", "行数", "归档大小"])
+        self.setRootIsDecorated(False)
+        self.setUniformRowHeights(True)
+        self.setAlternatingRowColors(True)
+        self.itemActivated.connect(self._on_activated)
+
+    def show_runs(self, records):
+        self.clear()
+        entries = []
+        for record in records:
+            duration = ""
+            if record["ended_at"] is not None:
+                duration = f"{record['ended_at'] - record['started_at']:.1f}s"
+            return_code = record["return_code"]
+            entry = QTreeWidgetItem(
+                [
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["started_at"])),
+                    STATUS_TEXT.get(record["status"], record["status"]),
+                    "" if return_code is None else str(return_code),
+                    duration,
+                    str(record["lines"]),
+                    _size(record["archive_bytes"]),
+                ]
+            )
+            entry.setData(0, Qt.ItemDataRole.UserRole, record)
+            entries.append(entry)
+        self.addTopLevelItems(entries)
+        for column in range(self.columnCount()):
+            self.resizeColumnToContents(column)
+
+    def _on_activated(self, entry, column):
+        self.open_requested.emit(entry.data(0, Qt.ItemDataRole.UserRole))
@@ -0,0 +1,193 @@
+# log_buffer.py
+import json
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+
+from ansi_parser import line_text
+
+# 溢出文件中带样式的行以该字符开头，后接片段列表的 JSON
+STYLED_MARK = "\x1e"
+
+
+def encode_entry(entry):
+    """把行记录编码为不含换行符的一行文本，用于溢出文件和执行历史的归档"""
+    if isinstance(entry, str) and not entry.startswith(STYLED_MARK):
+        return entry
+    if isinstance(entry, str):
+        entry = ((entry, None),)
+    return STYLED_MARK + json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_entry(text):
+    if not text.startswith(STYLED_MARK):
+        return text
+    return tuple(
+        (span, tuple(style) if style is not None else None)
+        for span, style in json.loads(text[1:])
+    )
+
+
+class LogBuffer:
+    """按行存储命令输出：内存中只保留最近 max_lines 行，更早的行溢出到临时文件，按页读回
+
+    每行是一个行记录：无样式的行为 str，带样式的行为 ((文本, 样式), ...)（见 ansi_parser）。
+    """
+
+    def __init__(self, max_lines=10000, page_lines=1024, cache_pages=8):
+        self.max_lines = max(1, max_lines)
+        self.page_lines = page_lines
+        self.cache_pages = cache_pages
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._lines = deque()
+        # 尚未遇到换行符的最后半行
+        self._partial = ""
+        self._spill_file = None
+        self._spill_end = 0
+        # 已溢出到文件的行数；_lines[0] 的全局行号即为该值
+        self._spilled = 0
+        # 每一页（page_lines 行）在临时文件中的起始偏移
+        self._page_offsets = []
+        self._page_cache = OrderedDict()
+
+    def clear(self):
+        with self._lock:
+            self.close()
+            self._reset()
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def line_count(self):
+        """已完成（以换行结尾）的行数"""
+        with self._lock:
+            return self._spilled + len(self._lines)
+
+    def partial(self):
+        with self._lock:
+            return self._partial
+
+    def display_count(self):
+        """显示行数，包括末尾未完成的半行"""
+        with self._lock:
+            return self._spilled + len(self._lines) + (1 if self._partial else 0)
+
+    def append_text(self, text):
+        """追加一段原始输出，可能以半行开头或结尾"""
+        if not text:
+            return
+        with self._lock:
+            parts = text.split("\n")
+            partial = line_text(self._partial)
+            if len(parts) == 1:
+                self._partial = partial + parts[0]
+                return
+            parts[0] = partial + parts[0]
+            self._partial = parts.pop()
+            self._lines.extend(line.rstrip("\r") for line in parts)
+            self._evict()
+
+    def append_output(self, lines, partial):
+        """追加解析器输出的已完成行，并用 partial 替换末尾未完成的行"""
+        with self._lock:
+            if lines:
+                self._lines.extend(lines)
+                self._evict()
+            self._partial = partial
+
+    def append_line(self, line):
+        """追加一个完整的行；若有未完成的半行则先将其结束"""
+        with self._lock:
+            if self._partial:
+                partial = self._partial
+                self._lines.append(partial.rstrip("\r") if isinstance(partial, str) else partial)
+                self._partial = ""
+            self._lines.append(line)
+            self._evict()
+
+    def line(self, index):
+        """按全局行号取一行的文本；index 等于 line_count() 时返回半行"""
+        return line_text(self.entry(index))
+
+    def texts(self, start, end):
+        """取已完成的第 start 到 end-1 行的文本，整段只加一次锁，溢出的部分按页读回"""
+        with self._lock:
+            end = min(end, self._spilled + len(self._lines))
+            result = []
+            index = start
+            while index < min(end, self._spilled):
+                page_index = index // self.page_lines
+                page = self._read_page(page_index)
+                offset = index - page_index * self.page_lines
+                count = min(len(page) - offset, self._spilled - index, end - index)
+                if count <= 0:
+                    # 页内容与溢出的行数不一致，继续循环会在持有锁的情况下原地空转
+                    raise RuntimeError(f"溢出文件第 {page_index} 页只有 {len(page)} 行，缺少第 {index} 行")
+                result.extend(line_text(entry) for entry in page[offset:offset + count])
+                index += count
+            if index < end:
+                memory = islice(self._lines, index - self._spilled, end - self._spilled)
+                result.extend(line_text(entry) for entry in memory)
+            return result
+
+    def entry(self, index):
+        """按全局行号取行记录"""
+        with self._lock:
+            if index >= self._spilled:
+                offset = index - self._spilled
+                if offset < len(self._lines):
+                    return self._lines[offset]
+                return self._partial
+            page = self._read_page(index // self.page_lines)
+            return page[index % self.page_lines]
+
+    def _evict(self):
+        overflow = len(self._lines) - self.max_lines
+        if overflow <= 0:
+            return
+        evicted = [self._lines.popleft() for _ in range(overflow)]
+        self._spill(evicted)
+
+    def _spill(self, lines):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="gui_shell_log_")
+        # 本次写入从这一页开始；它以及之后的页在缓存中的旧版本都需要作废
+        first = self._spilled // self.page_lines
+        chunks = []
+        pos = self._spill_end
+        for line in lines:
+            if self._spilled % self.page_lines == 0:
+                self._page_offsets.append(pos)
+            data = encode_entry(line).encode("utf-8", "replace") + b"\n"
+            chunks.append(data)
+            pos += len(data)
+            self._spilled += 1
+        self._spill_file.seek(self._spill_end)
+        self._spill_file.write(b"".join(chunks))
+        self._spill_end = pos
+        for page_index in [p for p in self._page_cache if p >= first]:
+            del self._page_cache[page_index]
+
+    def _read_page(self, page_index):
+        page = self._page_cache.get(page_index)
+        if page is not None:
+            self._page_cache.move_to_end(page_index)
+            return page
+        start = self._page_offsets[page_index]
+        if page_index + 1 < len(self._page_offsets):
+            end = self._page_offsets[page_index + 1]
+        else:
+            end = self._spill_end
+        self._spill_file.seek(start)
+        data = self._spill_file.read(end - start)
+        page = [decode_entry(text) for text in data.decode("utf-8", "replace").split("\n")[:-1]]
+        self._page_cache[page_index] = page
+        if len(self._page_cache) > self.cache_pages:
+            self._page_cache.popitem(last=False)
+        return page
@@ -1,11 +1,25 @@
 # main.py (最终美学定制版)
+# 用法: python main.py [--profile-startup]
+#   --profile-startup  显示窗口后以 JSON 输出启动各阶段耗时并退出
+import time
+
+START_TIME = time.perf_counter()
+
 import sys
-from PySide6.QtWidgets import QApplication
-from main_window import MainWindow
-from PySide6.QtCore import Qt
 import os
 
 if __name__ == "__main__":
+    profile_startup = "--profile-startup" in sys.argv
+
+    # 界面相关的模块较大，在解析完参数后再导入
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import Qt, QTimer
+    from startup_profiler import StartupProfiler, FirstPaintWatcher
+    from main_window import MainWindow
+
+    profiler = StartupProfiler(START_TIME)
+    profiler.mark("imports")
+
     # 强制启用高DPI缩放，解决Windows 1080p 125%缩放问题
     os.environ["QT_ENABLE_HIGHDPI_SCALING"] = "1"
     QApplication.setHighDpiScaleFactorRoundingPolicy(
@@ -17,8 +31,17 @@ if __name__ == "__main__":
     # 关键步骤：为了获得最佳的明暗主题效果，强烈建议使用 Fusion 样式。
     # 某些原生系统样式可能不支持颜色方案切换。
     app.setStyle("Fusion")
+    profiler.mark("qapplication")
 
     # 移除加载和设置自定义字体的代码，这部分功能将移至 main_window.py
-    window = MainWindow()
+    window = MainWindow(profiler)
+
+    def on_first_paint():
+        profiler.mark("first_paint")
+        if profile_startup:
+            print(profiler.dumps())
+            QTimer.singleShot(0, window.close)
+
+    FirstPaintWatcher(window, on_first_paint)
     window.show()
     sys.exit(app.exec())
@@ -16,23 +16,37 @@ from PySide6.QtWidgets import (
     QInputDialog,
     QLabel,
     QSplitter,
-    QTextBrowser,
     QFormLayout,
+    QTabWidget,
+    QAbstractItemView,
+    QListWidget,
+    QListWidgetItem,
+    QCheckBox,
+    QSpinBox,
 )
 from PySide6.QtGui import (
-    QStandardItemModel,
-    QStandardItem,
     QIcon,
     QAction,
     QFont,
+    QFontInfo,
     QFontDatabase,
+    QKeySequence,
+    QShortcut,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal, QTimer
 
-from data_manager import load_data, save_data, generate_id
-from command_runner import CommandRunner
+# 执行相关的模块（执行池、asyncio、执行历史等）在第一次执行或选中项目时才导入，不占用启动时间
+from data_manager import open_storage, CommandStore, DataPersistence, LOCAL_TARGET, SHELL_TYPES
+from startup_profiler import StartupProfiler
+from tree_model import CommandTreeModel, ID_ROLE, TYPE_ROLE
+from collections import Counter
 import sys
 import os
+import time
+
+
+# 项目总数不超过该值时启动后展开全部分组
+AUTO_EXPAND_LIMIT = 1000
 
 
 def resource_path(relative_path):
@@ -47,23 +61,83 @@ def resource_path(relative_path):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # 后台搜索线程的结果：查询编号、查询文本、匹配总数、[(得分, 项目 id)]、耗时（毫秒）
+    search_results_signal = Signal(int, str, int, object, float)
+    # 输出搜索线程的一段结果：查询编号、新的匹配行号、已扫描行数、缓冲区行数
+    output_search_signal = Signal(int, object, int, int)
+    # 计划执行到期的项目 id，由计划线程发出
+    schedule_due_signal = Signal(str)
+    # 文件监视触发的项目 id 和改动的文件列表，以及监视出错时的提示，由监视线程发出
+    watch_trigger_signal = Signal(str, object)
+    watch_error_signal = Signal(str)
+    # 后台线程测试执行主机连接的结果
+    agent_check_signal = Signal(str)
+    # 后台写入数据文件失败的提示，由持久化线程发出
+    save_error_signal = Signal(str)
+
+    def __init__(self, profiler=None):
         super().__init__()
+        # 记录启动各阶段耗时，main.py --profile-startup 时输出
+        self.profiler = profiler or StartupProfiler()
         self.setWindowTitle("命令行工具箱")
         self.setWindowIcon(QIcon(resource_path("icons/terminal.ico")))
         self.setGeometry(100, 100, 1000, 630)
-        self.current_selected_item = None
-        self.command_runner = None
+        self.current_item_id = None
         self.font_families = []
-        self.item_map = {}
+        # 执行编号 -> 该次执行的输出视图
+        self.run_views = {}
+        # 计划执行和文件监视触发的执行每个项目（及执行目标）只占一个标签页：(项目 id, 执行名称) -> 输出视图
+        self.trigger_views = {}
+        # 按依赖运行的批次编号，结束时报告关键路径
+        self.pipeline_batches = set()
+        # 项目 id -> 最近一次执行的指标，第一次打开编辑页时从指标文件末尾读取
+        self.last_metrics = None
+        # 计划执行（见 scheduler），以及由它开始、尚未结束的执行编号 -> 项目 id
+        self.scheduler = None
+        self.scheduled_runs = {}
+        # 文件监视（见 file_watch）在第一个设置了监视的项目出现时才创建；
+        # 按项目的策略开始监视触发的执行
+        self.file_watcher = None
+        self.watch_triggers = None
 
         # 优化：先加载数据和应用设置，再初始化UI，避免渲染问题
-        self.data = load_data()
-        self.load_fonts()
+        storage = open_storage()
+        self.data = storage.load()
+        # 修改只记录为变更，由后台线程合并写入
+        self.persistence = DataPersistence(
+            self.data,
+            storage,
+            on_error=lambda e: self.save_error_signal.emit(f"保存数据失败，稍后自动重试: {e}"),
+        )
+        # 所有修改都通过 store 完成，持久化和树模型订阅它的变更事件
+        self.store = CommandStore(self.data)
+        self.store.subscribe(self.persistence.record_change)
+        self.profiler.mark("data_load")
         self.apply_saved_settings()
+        self.profiler.mark("settings")
+
+        # 执行器见 command_runner 属性，执行历史见 run_history
+        self._command_runner = None
+        self._run_history = None
 
         self.init_ui()
 
+        # 搜索索引在后台线程中建立和查询；窗口显示后再开始建立，不与启动争抢时间
+        self.search_service = None
+        self.search_results_signal.connect(self.show_search_results)
+        QTimer.singleShot(0, self.start_search_service)
+        QTimer.singleShot(0, self.prewarm_shell_sessions)
+        self.schedule_due_signal.connect(self.run_scheduled_item)
+        # 只订阅一次：计划执行关闭时 sync_schedules 直接返回，重新启用不会重复订阅
+        self.store.subscribe(self.sync_schedules)
+        QTimer.singleShot(0, self.start_scheduler)
+        self.watch_trigger_signal.connect(self.on_watch_trigger)
+        self.watch_error_signal.connect(self.statusBar().showMessage)
+        self.agent_check_signal.connect(self.statusBar().showMessage)
+        self.save_error_signal.connect(self.statusBar().showMessage)
+        self.store.subscribe(self.sync_watches)
+        QTimer.singleShot(0, self.start_file_watcher)
+
         menu_bar = self.menuBar()
         theme_menu = menu_bar.addMenu("主题")
         light_theme_action = QAction("浅色主题", self)
@@ -73,23 +147,119 @@ class MainWindow(QMainWindow):
         dark_theme_action.triggered.connect(lambda: self.update_theme("dark"))
         theme_menu.addAction(dark_theme_action)
 
-        font_menu = menu_bar.addMenu("字体")
-        for font_family in self.font_families[:50]:
-            font_action = QAction(font_family, self)
-            font_action.triggered.connect(
-                lambda checked, f=font_family: self.update_font(f)
-            )
-            font_menu.addAction(font_action)
+        # 字体和字号菜单在第一次打开时才填充，启动时不枚举系统字体
+        self.font_menu = menu_bar.addMenu("字体")
+        self.font_menu.aboutToShow.connect(self.populate_font_menu)
+        self.font_size_menu = menu_bar.addMenu("字号")
+        self.font_size_menu.aboutToShow.connect(self.populate_font_size_menu)
 
-        font_size_menu = menu_bar.addMenu("字号")
-        for size in [8, 9, 10, 11, 12, 14, 16, 18, 20]:
-            size_action = QAction(str(size), self)
-            size_action.triggered.connect(
-                lambda checked, s=size: self.update_font(font_size=s)
+        run_menu = menu_bar.addMenu("执行")
+        run_selected_action = QAction("运行选中项", self)
+        run_selected_action.triggered.connect(self.run_selected)
+        run_menu.addAction(run_selected_action)
+        self.fail_fast_action = QAction("失败时停止其余", self)
+        self.fail_fast_action.setCheckable(True)
+        self.fail_fast_action.setChecked(self.data.get("fail_fast", False))
+        self.fail_fast_action.toggled.connect(self.update_fail_fast)
+        run_menu.addAction(self.fail_fast_action)
+        self.warm_sessions_action = QAction("复用预热的 Shell 会话", self)
+        self.warm_sessions_action.setCheckable(True)
+        self.warm_sessions_action.setChecked(self.data.get("warm_shell_sessions", False))
+        self.warm_sessions_action.toggled.connect(self.update_warm_sessions)
+        run_menu.addAction(self.warm_sessions_action)
+        parallel_menu = run_menu.addMenu("最大并发数")
+        for count in [1, 2, 4, 8, 16, 32]:
+            count_action = QAction(str(count), self)
+            count_action.triggered.connect(
+                lambda checked, c=count: self.update_max_parallel_runs(c)
             )
-            font_size_menu.addAction(size_action)
+            parallel_menu.addAction(count_action)
+        self.scheduler_action = QAction("启用计划执行", self)
+        self.scheduler_action.setCheckable(True)
+        self.scheduler_action.setChecked(self.data.get("scheduler_enabled", True))
+        self.scheduler_action.toggled.connect(self.update_scheduler_enabled)
+        run_menu.addAction(self.scheduler_action)
+        schedule_limit_menu = run_menu.addMenu("计划执行最大并发数")
+        for count in [1, 2, 4, 8, 16]:
+            limit_action = QAction(str(count), self)
+            limit_action.triggered.connect(
+                lambda checked, c=count: self.update_schedule_max_runs(c)
+            )
+            schedule_limit_menu.addAction(limit_action)
+        self.file_watch_action = QAction("启用文件监视", self)
+        self.file_watch_action.setCheckable(True)
+        self.file_watch_action.setChecked(self.data.get("file_watch_enabled", True))
+        self.file_watch_action.toggled.connect(self.update_file_watch_enabled)
+        run_menu.addAction(self.file_watch_action)
+        run_menu.addSeparator()
+        stop_run_action = QAction("停止当前输出的执行", self)
+        stop_run_action.setShortcut(QKeySequence("Ctrl+."))
+        stop_run_action.triggered.connect(self.stop_current_run)
+        run_menu.addAction(stop_run_action)
+        stop_batch_action = QAction("停止当前输出所在的批次", self)
+        stop_batch_action.triggered.connect(self.stop_current_batch)
+        run_menu.addAction(stop_batch_action)
+        stop_all_action = QAction("停止全部执行", self)
+        stop_all_action.setShortcut(QKeySequence("Ctrl+Shift+."))
+        stop_all_action.triggered.connect(self.stop_all_runs)
+        run_menu.addAction(stop_all_action)
+        # 停止时先请求进程退出，超过宽限时间仍未退出再强制结束
+        grace_menu = run_menu.addMenu("停止前等待退出")
+        for seconds in [0, 1, 3, 10, 30]:
+            grace_action = QAction("立即强制结束" if seconds == 0 else f"{seconds} 秒", self)
+            grace_action.triggered.connect(
+                lambda checked, s=seconds: self.update_cancel_grace(s)
+            )
+            grace_menu.addAction(grace_action)
+        run_menu.addSeparator()
+        self.record_history_action = QAction("记录执行历史", self)
+        self.record_history_action.setCheckable(True)
+        self.record_history_action.setChecked(self.data.get("record_history", True))
+        self.record_history_action.toggled.connect(self.update_record_history)
+        run_menu.addAction(self.record_history_action)
+        clear_history_action = QAction("清空执行历史...", self)
+        clear_history_action.triggered.connect(self.clear_history)
+        run_menu.addAction(clear_history_action)
+        close_finished_action = QAction("关闭已结束的输出", self)
+        close_finished_action.triggered.connect(self.close_finished_tabs)
+        run_menu.addAction(close_finished_action)
+
+        # 环境配置菜单同样在打开时才填充
+        self.env_menu = menu_bar.addMenu("环境")
+        self.env_menu.aboutToShow.connect(self.populate_env_menu)
+        self.agents_menu = menu_bar.addMenu("主机")
+        self.agents_menu.aboutToShow.connect(self.populate_agents_menu)
 
         self.load_and_display_data()
+        self.profiler.mark("ui_build")
+
+    @property
+    def command_runner(self):
+        """执行器在第一次使用时才创建；它的设置都从 data.json 读取"""
+        if self._command_runner is None:
+            from command_runner import CommandRunner
+            from execution_pool import FlushPolicy
+            from process_control import GRACE_PERIOD
+
+            runner = CommandRunner(
+                max_workers=self.data.get("max_parallel_runs", 4),
+                flush_policy=FlushPolicy.from_settings(self.data),
+                warm_sessions=self.data.get("warm_shell_sessions", False),
+                record_history=self.data.get("record_history", True),
+                history_settings=self.data,
+                grace_period=self.data.get("cancel_grace_seconds", GRACE_PERIOD),
+                history=self._run_history,
+                parent=self,
+            )
+            runner.status_signal.connect(self.on_run_status)
+            runner.output_signal.connect(self.append_output_batch)
+            runner.batch_finished_signal.connect(self.on_batch_finished)
+            runner.history_signal.connect(self.on_history_recorded)
+            self._command_runner = runner
+        return self._command_runner
+
+    def runner_busy(self):
+        return self._command_runner is not None and self._command_runner.is_busy()
 
     def init_ui(self):
         main_widget = QWidget()
@@ -100,14 +270,34 @@ class MainWindow(QMainWindow):
         left_panel = QWidget()
         left_layout = QVBoxLayout(left_panel)
         left_layout.setContentsMargins(0, 0, 0, 0)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索名称、命令或工作目录 (Ctrl+F)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.on_search_text_changed)
+        self.search_edit.returnPressed.connect(self.open_first_search_result)
+        QShortcut(QKeySequence.StandardKey.Find, self, self.focus_search)
+        escape = QShortcut(QKeySequence(Qt.Key.Key_Escape), self.search_edit, self.search_edit.clear)
+        escape.setContext(Qt.ShortcutContext.WidgetShortcut)
+        left_layout.addWidget(self.search_edit)
         self.tree_view = QTreeView()
-        self.tree_model = QStandardItemModel()
-        self.tree_model.setHorizontalHeaderLabels(["分组和项目"])
+        self.tree_model = CommandTreeModel(self.store, self)
         self.tree_view.setModel(self.tree_model)
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.tree_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.tree_view.customContextMenuRequested.connect(self.show_context_menu)
         self.tree_view.selectionModel().selectionChanged.connect(self.on_item_selected)
-        left_layout.addWidget(self.tree_view)
+        # 有搜索内容时用结果列表代替树
+        self.search_results = QListWidget()
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.currentItemChanged.connect(self.on_search_result_selected)
+        self.search_results.itemActivated.connect(
+            lambda entry: self.reveal_item(entry.data(ID_ROLE))
+        )
+        self.left_stack = QStackedWidget()
+        self.left_stack.addWidget(self.tree_view)
+        self.left_stack.addWidget(self.search_results)
+        left_layout.addWidget(self.left_stack)
         self.stacked_widget = QStackedWidget()
         self.home_page = QWidget()
         home_layout = QVBoxLayout(self.home_page)
@@ -120,7 +310,7 @@ class MainWindow(QMainWindow):
         home_layout.addWidget(welcome_label)
         self.editor_log_page = QWidget()
         editor_log_layout = QVBoxLayout(self.editor_log_page)
-        right_splitter = QSplitter(Qt.Orientation.Vertical)
+        editor_log_layout.setContentsMargins(0, 0, 0, 0)
         editor_area = QWidget()
         editor_layout = QFormLayout(editor_area)
         editor_layout.setContentsMargins(5, 10, 5, 5)
@@ -138,7 +328,7 @@ class MainWindow(QMainWindow):
         self.command_edit = QTextEdit()
         self.command_edit.setAcceptRichText(False)
         self.shell_combo = QComboBox()
-        self.shell_combo.addItems(["cmd", "PowerShell"])
+        self.shell_combo.addItems(SHELL_TYPES)
         self.workdir_edit = QLineEdit()
         self.workdir_edit.setPlaceholderText("留空则使用程序默认目录")
         editor_layout.addRow("名称:", self.name_edit)
@@ -149,19 +339,141 @@ class MainWindow(QMainWindow):
         config_layout.addSpacing(20)
         config_layout.addWidget(QLabel("工作目录:"))
         config_layout.addWidget(self.workdir_edit, 1)
+        config_layout.addSpacing(20)
+        config_layout.addWidget(QLabel("环境配置:"))
+        self.env_combo = QComboBox()
+        self.refresh_env_combo()
+        config_layout.addWidget(self.env_combo)
         editor_layout.addRow(config_layout)
-        self.output_browser = QTextBrowser()
-        self.output_browser.setPlaceholderText("命令执行输出将显示在这里...")
-        right_splitter.addWidget(editor_area)
-        right_splitter.addWidget(self.output_browser)
-        right_splitter.setSizes([350, 350])
-        editor_log_layout.addWidget(right_splitter)
+        depends_layout = QHBoxLayout()
+        depends_layout.addWidget(QLabel("依赖:"))
+        self.depends_label = QLabel()
+        self.depends_label.setWordWrap(True)
+        depends_layout.addWidget(self.depends_label, 1)
+        self.depends_button = QPushButton("编辑依赖...")
+        self.depends_button.clicked.connect(self.edit_dependencies)
+        depends_layout.addWidget(self.depends_button)
+        editor_layout.addRow(depends_layout)
+        targets_layout = QHBoxLayout()
+        targets_layout.addWidget(QLabel("执行目标:"))
+        self.targets_label = QLabel()
+        self.targets_label.setWordWrap(True)
+        targets_layout.addWidget(self.targets_label, 1)
+        self.targets_button = QPushButton("选择执行目标...")
+        self.targets_button.clicked.connect(self.edit_targets)
+        targets_layout.addWidget(self.targets_button)
+        editor_layout.addRow(targets_layout)
+        self.metrics_label = QLabel()
+        self.metrics_label.setWordWrap(True)
+        schedule_layout = QHBoxLayout()
+        self.schedule_edit = QLineEdit()
+        self.schedule_edit.setPlaceholderText("留空则不定时执行；例如 10m、1h30m，或 cron 表达式 */5 * * * *")
+        schedule_layout.addWidget(self.schedule_edit, 1)
+        schedule_layout.addWidget(QLabel("随机延迟:"))
+        self.schedule_jitter_spin = QSpinBox()
+        self.schedule_jitter_spin.setRange(0, 86400)
+        self.schedule_jitter_spin.setSuffix(" 秒")
+        self.schedule_jitter_spin.setToolTip("每次在预定时间后随机延迟至多这么久，避免大量项目同时开始")
+        schedule_layout.addWidget(self.schedule_jitter_spin)
+        self.schedule_missed_combo = QComboBox()
+        self.schedule_missed_combo.addItem("错过后补执行一次", "catch_up")
+        self.schedule_missed_combo.addItem("跳过错过的执行", "skip")
+        self.schedule_missed_combo.setToolTip("电脑休眠或程序未响应期间错过的执行如何处理")
+        schedule_layout.addWidget(self.schedule_missed_combo)
+        self.schedule_label = QLabel()
+        schedule_layout.addWidget(self.schedule_label)
+        editor_layout.addRow("计划执行:", schedule_layout)
+
+        watch_layout = QHBoxLayout()
+        self.watch_edit = QLineEdit()
+        self.watch_edit.setPlaceholderText("留空则不监视；工作目录中匹配的文件改动后自动执行，例如 *.py !build/")
+        self.watch_edit.setToolTip(
+            "以空格分隔的 glob，以 ! 开头表示排除；不含 / 的 glob 匹配任意一级目录中的名称。\n"
+            "改动的文件通过环境变量 GUI_SHELL_CHANGED_FILES 传给命令"
+        )
+        watch_layout.addWidget(self.watch_edit, 1)
+        watch_layout.addWidget(QLabel("合并:"))
+        self.watch_debounce_spin = QSpinBox()
+        self.watch_debounce_spin.setRange(0, 60000)
+        self.watch_debounce_spin.setSingleStep(100)
+        self.watch_debounce_spin.setSuffix(" 毫秒")
+        self.watch_debounce_spin.setToolTip("最后一次改动后这么久没有新的改动才执行，期间的改动合并为一次执行")
+        watch_layout.addWidget(self.watch_debounce_spin)
+        self.watch_policy_combo = QComboBox()
+        self.watch_policy_combo.addItem("改动时重新开始", "restart")
+        self.watch_policy_combo.addItem("等本次执行结束后再执行", "queue")
+        self.watch_policy_combo.setToolTip("改动时上一次执行仍在进行的处理方式")
+        watch_layout.addWidget(self.watch_policy_combo)
+        editor_layout.addRow("文件监视:", watch_layout)
+        editor_layout.addRow("上次执行:", self.metrics_label)
+        # 执行历史面板在第一次显示某个项目的历史时才创建
+        self.history_panel = None
+        self.history_container = QWidget()
+        self.history_container.setMaximumHeight(160)
+        history_layout = QVBoxLayout(self.history_container)
+        history_layout.setContentsMargins(0, 0, 0, 0)
+        editor_layout.addRow("执行历史:", self.history_container)
+        editor_log_layout.addWidget(editor_area)
+        # 每次执行都有自己的输出标签页，可同时运行多个命令
+        self.output_tabs = QTabWidget()
+        self.output_tabs.setTabsClosable(True)
+        self.output_tabs.setDocumentMode(True)
+        self.output_tabs.setToolTip("命令执行输出将显示在这里...")
+        self.output_tabs.tabCloseRequested.connect(self.close_output_tab)
+        self.output_tabs.currentChanged.connect(self.start_output_search)
+        # 输出搜索栏作用于当前标签页，在后台线程中搜索，不阻塞界面
+        self.output_search = None
+        self.output_search_state = None
+        self.output_search_signal.connect(self.on_output_search_results)
+        output_panel = QWidget()
+        output_layout = QVBoxLayout(output_panel)
+        output_layout.setContentsMargins(0, 0, 0, 0)
+        output_search_layout = QHBoxLayout()
+        self.output_search_edit = QLineEdit()
+        self.output_search_edit.setPlaceholderText("在输出中搜索 (Ctrl+Shift+F)")
+        self.output_search_edit.setClearButtonEnabled(True)
+        self.output_search_edit.textChanged.connect(self.start_output_search)
+        self.output_search_edit.returnPressed.connect(lambda: self.next_output_match(1))
+        QShortcut(QKeySequence("Ctrl+Shift+F"), self, self.focus_output_search)
+        output_escape = QShortcut(
+            QKeySequence(Qt.Key.Key_Escape), self.output_search_edit, self.output_search_edit.clear
+        )
+        output_escape.setContext(Qt.ShortcutContext.WidgetShortcut)
+        output_search_layout.addWidget(self.output_search_edit, 1)
+        self.output_regex_check = QCheckBox("正则")
+        self.output_case_check = QCheckBox("区分大小写")
+        self.output_filter_check = QCheckBox("只显示匹配行")
+        for check in (self.output_regex_check, self.output_case_check, self.output_filter_check):
+            check.toggled.connect(self.start_output_search)
+            output_search_layout.addWidget(check)
+        self.output_match_label = QLabel()
+        output_search_layout.addWidget(self.output_match_label)
+        previous_match_button = QPushButton("上一个")
+        previous_match_button.clicked.connect(lambda: self.next_output_match(-1))
+        output_search_layout.addWidget(previous_match_button)
+        next_match_button = QPushButton("下一个")
+        next_match_button.clicked.connect(lambda: self.next_output_match(1))
+        output_search_layout.addWidget(next_match_button)
+        stop_button = QPushButton("⏹ 停止")
+        stop_button.setToolTip("停止当前输出的执行；再次点击立即强制结束 (Ctrl+.)")
+        stop_button.clicked.connect(self.stop_current_run)
+        output_search_layout.addWidget(stop_button)
+        stop_all_button = QPushButton("全部停止")
+        stop_all_button.setToolTip("停止所有正在运行和排队的执行 (Ctrl+Shift+.)")
+        stop_all_button.clicked.connect(self.stop_all_runs)
+        output_search_layout.addWidget(stop_all_button)
+        output_layout.addLayout(output_search_layout)
+        output_layout.addWidget(self.output_tabs)
         self.save_button.clicked.connect(self.save_item_details)
         self.execute_button.clicked.connect(self.execute_current_command)
         self.stacked_widget.addWidget(self.home_page)
         self.stacked_widget.addWidget(self.editor_log_page)
+        right_splitter = QSplitter(Qt.Orientation.Vertical)
+        right_splitter.addWidget(self.stacked_widget)
+        right_splitter.addWidget(output_panel)
+        right_splitter.setSizes([350, 350])
         main_splitter.addWidget(left_panel)
-        main_splitter.addWidget(self.stacked_widget)
+        main_splitter.addWidget(right_splitter)
         main_splitter.setSizes([300, 900])
 
     def create_theme_menu(self):
@@ -169,9 +481,38 @@ class MainWindow(QMainWindow):
 
     def load_fonts(self):
         # 获取所有可用的字体家族
-        self.font_families = QFontDatabase().families()
+        self.font_families = QFontDatabase.families()
         self.font_families.sort()  # 排序以便于显示
 
+    def populate_font_menu(self):
+        if self.font_menu.actions():
+            return
+        self.load_fonts()
+        for font_family in self.font_families[:50]:
+            font_action = QAction(font_family, self)
+            font_action.triggered.connect(
+                lambda checked, f=font_family: self.update_font(f)
+            )
+            self.font_menu.addAction(font_action)
+
+    def populate_font_size_menu(self):
+        if self.font_size_menu.actions():
+            return
+        for size in [8, 9, 10, 11, 12, 14, 16, 18, 20]:
+            size_action = QAction(str(size), self)
+            size_action.triggered.connect(
+                lambda checked, s=size: self.update_font(font_size=s)
+            )
+            self.font_size_menu.addAction(size_action)
+
+    def start_search_service(self):
+        from search_index import SearchService
+
+        self.search_service = SearchService(self.store, self.search_results_signal.emit)
+        self.store.subscribe(self.refresh_search)
+        if self.search_edit.text().strip():
+            self.search_service.search(self.search_edit.text())
+
     def update_theme(self, theme_name, save=True):
         app = QApplication.instance()
 
@@ -182,9 +523,10 @@ class MainWindow(QMainWindow):
 
         app.styleHints().setColorScheme(scheme)
 
-        self.data["theme"] = theme_name
         if save:
-            save_data(self.data)
+            self.save_setting("theme", theme_name)
+        else:
+            self.data["theme"] = theme_name
 
     def update_font(self, font_family=None, font_size=None, save=True):
         app = QApplication.instance()
@@ -193,21 +535,26 @@ class MainWindow(QMainWindow):
         if font_family:
             current_font.setFamily(font_family)
             self.data["font_family"] = font_family
+            if save:
+                self.save_setting("font_family", font_family)
         if font_size:
             current_font.setPointSize(font_size)
             self.data["font_size"] = font_size
-
+            if save:
+                self.save_setting("font_size", font_size)
         app.setFont(current_font)
-        if save:
-            save_data(self.data)
 
     def apply_saved_settings(self):
         saved_theme = self.data.get("theme", "dark")
         self.update_theme(saved_theme, save=False)
 
-        # 如果保存的字体家族不在当前系统字体列表中，则使用默认字体
+        # 如果系统中没有保存的字体家族，则使用默认字体；
+        # 通过字体匹配的结果判断，不需要枚举全部字体
         saved_font_family = self.data.get("font_family")
-        if saved_font_family not in self.font_families:
+        if not saved_font_family or (
+            QFontInfo(QFont(saved_font_family)).family().casefold()
+            != saved_font_family.casefold()
+        ):
             saved_font_family = (
                 QApplication.font().family()
             )  # 获取当前应用程序的默认字体
@@ -215,83 +562,1013 @@ class MainWindow(QMainWindow):
         saved_font_size = self.data.get("font_size", 10)
         self.update_font(saved_font_family, saved_font_size, save=False)
 
-    def append_output(self, text):
-        self.output_browser.append(text.strip())
-        self.output_browser.verticalScrollBar().setValue(
-            self.output_browser.verticalScrollBar().maximum()
+    def save_setting(self, key, value):
+        self.store.set_setting(key, value)
+
+    def update_fail_fast(self, checked):
+        self.save_setting("fail_fast", checked)
+
+    def update_record_history(self, checked):
+        if self._command_runner is not None:
+            self._command_runner.set_record_history(checked)
+        self.save_setting("record_history", checked)
+
+    def clear_history(self):
+        reply = QMessageBox.question(
+            self,
+            "确认",
+            "确定要删除所有已结束的执行历史及其输出吗？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        history = self.run_history()
+        history.clear()
+        history.flush()
+        if self.current_item_id:
+            self.show_history(self.current_item_id)
+
+    def update_warm_sessions(self, checked):
+        if self._command_runner is not None:
+            self._command_runner.set_warm_sessions(checked)
+        self.save_setting("warm_shell_sessions", checked)
+        if checked:
+            self.prewarm_shell_sessions()
+
+    def prewarm_shell_sessions(self):
+        """按使用的项目数从多到少，为最常用的几种 shell、工作目录和环境配置组合预先启动会话"""
+        if not self.data.get("warm_shell_sessions", False):
+            return
+        from execution_pool import RunSpec
+        from shell_pool import ShellSessionPool, PREWARM_SESSIONS
+
+        counts = Counter(
+            (item.get("shell", "cmd"), item.get("working_dir", ""), item.get("env_profile", ""))
+            for item in self.store.items.values()
+            if item.get("shell", "cmd") in ShellSessionPool.SHELLS
+        )
+        profiles = self.env_profiles()
+        self.command_runner.prewarm(
+            RunSpec("", shell, working_dir, env_profile=profiles.get(profile_id))
+            for (shell, working_dir, profile_id), _ in counts.most_common(PREWARM_SESSIONS)
+        )
+
+    def env_profiles(self):
+        """{环境配置 id: 环境配置}"""
+        return {p["id"]: p for p in self.data.get("env_profiles", [])}
+
+    def refresh_env_combo(self):
+        current = self.env_combo.currentData()
+        self.env_combo.clear()
+        self.env_combo.addItem("(无)", "")
+        for profile in self.data.get("env_profiles", []):
+            self.env_combo.addItem(profile["name"], profile["id"])
+        self.env_combo.setCurrentIndex(max(0, self.env_combo.findData(current or "")))
+
+    def populate_env_menu(self):
+        self.env_menu.clear()
+        self.env_menu.addAction("新建环境配置...", self.new_env_profile)
+        profiles = self.data.get("env_profiles", [])
+        if profiles:
+            self.env_menu.addSeparator()
+        for profile in profiles:
+            profile_id = profile["id"]
+            submenu = self.env_menu.addMenu(f"{profile['name']} ({profile['shell']})")
+            submenu.addAction("编辑...", lambda p=profile_id: self.edit_env_profile(p))
+            submenu.addAction("重新捕获环境", lambda p=profile_id: self.recapture_env_profile(p))
+            submenu.addAction("删除", lambda p=profile_id: self.delete_env_profile(p))
+
+    def save_env_profiles(self, profiles):
+        self.save_setting("env_profiles", profiles)
+        self.refresh_env_combo()
+
+    def new_env_profile(self):
+        from env_profile_dialog import EnvProfileDialog
+
+        dialog = EnvProfileDialog(parent=self)
+        if dialog.exec():
+            from env_profiles import new_profile
+
+            values = dialog.values()
+            profile = new_profile(
+                values["name"],
+                values["shell"],
+                values["script"],
+                values["working_dir"],
+                values["watch_files"],
+            )
+            self.save_env_profiles(self.data.get("env_profiles", []) + [profile])
+
+    def edit_env_profile(self, profile_id):
+        from env_profile_dialog import EnvProfileDialog
+
+        profiles = [dict(p) for p in self.data.get("env_profiles", [])]
+        for profile in profiles:
+            if profile["id"] == profile_id:
+                dialog = EnvProfileDialog(profile, parent=self)
+                if dialog.exec():
+                    # 脚本或监视的文件改变后缓存的键随之改变，下次使用时自动重新捕获
+                    profile.update(dialog.values())
+                    self.save_env_profiles(profiles)
+                return
+
+    def recapture_env_profile(self, profile_id):
+        if self._command_runner is not None:
+            self._command_runner.invalidate_environment(profile_id)
+        self.statusBar().showMessage("环境缓存已清除，下次执行时重新运行激活脚本")
+
+    def delete_env_profile(self, profile_id):
+        profiles = self.data.get("env_profiles", [])
+        users = sum(1 for i in self.store.items.values() if i.get("env_profile") == profile_id)
+        reply = QMessageBox.question(
+            self,
+            "确认删除",
+            f"确定要删除该环境配置吗？有 {users} 个项目引用它，删除后这些项目将使用默认环境。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            if self._command_runner is not None:
+                self._command_runner.invalidate_environment(profile_id)
+            self.save_env_profiles([p for p in profiles if p["id"] != profile_id])
+
+    def agents(self):
+        """{执行主机 id: 执行主机}"""
+        return {a["id"]: a for a in self.data.get("agents", [])}
+
+    def item_specs(self, item_ids):
+        """项目在各自执行目标上的执行；执行目标都已删除的项目不执行并在状态栏提示"""
+        from execution_pool import RunSpec
+
+        profiles = self.env_profiles()
+        agents = self.agents()
+        specs = []
+        skipped = []
+        for item_id in item_ids:
+            item_specs = RunSpec.for_targets(self.store.items[item_id], profiles, agents)
+            if not item_specs:
+                skipped.append(self.store.items[item_id]["name"])
+            specs.extend(item_specs)
+        if skipped:
+            self.statusBar().showMessage(f"执行目标都已删除，未执行: {'、'.join(skipped)}")
+        return specs
+
+    def populate_agents_menu(self):
+        self.agents_menu.clear()
+        self.agents_menu.addAction("添加执行主机...", self.new_agent)
+        agents = self.data.get("agents", [])
+        if agents:
+            self.agents_menu.addSeparator()
+        for agent in agents:
+            agent_id = agent["id"]
+            submenu = self.agents_menu.addMenu(f"{agent['name']} ({agent['host']}:{agent['port']})")
+            submenu.addAction("编辑...", lambda a=agent_id: self.edit_agent(a))
+            submenu.addAction("测试连接", lambda a=agent_id: self.check_agent(a))
+            submenu.addAction("删除", lambda a=agent_id: self.delete_agent(a))
+
+    def new_agent(self):
+        from agent_dialog import AgentDialog
+        from remote_agent import new_agent
+
+        dialog = AgentDialog(parent=self)
+        if dialog.exec():
+            values = dialog.values()
+            agent = new_agent(values["name"], values["host"], values["port"], values["token"])
+            self.save_setting("agents", self.data.get("agents", []) + [agent])
+
+    def edit_agent(self, agent_id):
+        from agent_dialog import AgentDialog
+
+        agents = [dict(a) for a in self.data.get("agents", [])]
+        for agent in agents:
+            if agent["id"] == agent_id:
+                dialog = AgentDialog(agent, parent=self)
+                if dialog.exec():
+                    # 已有的连接按地址和令牌区分，修改后下次执行时建立新的连接
+                    agent.update(dialog.values())
+                    self.save_setting("agents", agents)
+                    if self.current_item_id:
+                        self.show_targets(self.store.items[self.current_item_id])
+                return
+
+    def check_agent(self, agent_id):
+        """在后台线程中连接执行主机，结果显示在状态栏"""
+        import threading
+        from remote_agent import AgentError, check
+
+        agent = self.agents().get(agent_id)
+        if agent is None:
+            return
+
+        def run():
+            try:
+                info = check(agent)
+            except AgentError as e:
+                self.agent_check_signal.emit(f"“{agent['name']}”连接失败: {e}")
+            else:
+                self.agent_check_signal.emit(
+                    f"“{agent['name']}”连接正常: {info['host']} ({info['platform']})"
+                )
+
+        self.statusBar().showMessage(f"正在连接“{agent['name']}”...")
+        threading.Thread(target=run, daemon=True).start()
+
+    def delete_agent(self, agent_id):
+        agents = self.data.get("agents", [])
+        users = sum(1 for i in self.store.items.values() if agent_id in (i.get("targets") or []))
+        reply = QMessageBox.question(
+            self,
+            "确认删除",
+            f"确定要删除该执行主机吗？有 {users} 个项目以它为执行目标，删除后这些项目不再在它上面执行。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.save_setting("agents", [a for a in agents if a["id"] != agent_id])
+            if self.current_item_id:
+                self.show_targets(self.store.items[self.current_item_id])
+
+    def update_max_parallel_runs(self, count):
+        if self._command_runner is not None:
+            self._command_runner.set_max_workers(count)
+        self.save_setting("max_parallel_runs", count)
+
+    def start_scheduler(self):
+        """有计划的项目由同一个后台线程按到期时间触发；关闭计划执行时不创建该线程"""
+        if not self.data.get("scheduler_enabled", True) or self.scheduler is not None:
+            return
+        from scheduler import Scheduler
+
+        self.scheduler = Scheduler(
+            self.schedule_due_signal.emit,
+            max_runs=self.data.get("schedule_max_runs", 4),
+            max_runs_per_group=self.data.get("schedule_max_runs_per_group", 2),
+        )
+        self.scheduler.load(self.scheduled_items(self.store.items))
+
+    def scheduled_items(self, item_ids):
+        """[(项目 id, Schedule, 分组 id)]；计划无效的项目不参与并在状态栏提示"""
+        from scheduler import Schedule, ScheduleError
+
+        entries = []
+        for item_id in item_ids:
+            item_data = self.store.items.get(item_id)
+            if item_data is None or not item_data.get("schedule"):
+                continue
+            try:
+                schedule = Schedule.from_item(item_data)
+            except ScheduleError as e:
+                self.statusBar().showMessage(f"“{item_data['name']}”的计划无效: {e}")
+                continue
+            if schedule is not None:
+                entries.append((item_id, schedule, self.store.item_group[item_id]["id"]))
+        return entries
+
+    def sync_schedules(self, change):
+        """项目修改、移动或删除后更新计划"""
+        if self.scheduler is None:
+            return
+        op = change["op"]
+        if op == "update_item" and "schedule" not in change["fields"]:
+            return
+        if op not in ("update_item", "add_item", "add_group", "move_items", "delete_item", "delete_group"):
+            return
+        scheduled = set(self.scheduler.item_ids())
+        if op in ("delete_item", "delete_group"):
+            for item_id in scheduled - self.store.items.keys():
+                self.scheduler.remove(item_id)
+            return
+        if op == "add_item":
+            item_ids = [change["item"]["id"]]
+        elif op == "add_group":
+            item_ids = [i["id"] for i in change["group"]["items"]]
+        elif op == "move_items":
+            item_ids = [i for i in change["ids"] if i in scheduled]
+        else:
+            item_ids = [change["id"]]
+            if not self.store.items.get(change["id"], {}).get("schedule"):
+                self.scheduler.remove(change["id"])
+                return
+        for item_id, schedule, group_id in self.scheduled_items(item_ids):
+            self.scheduler.set_item(item_id, schedule, group_id)
+
+    def run_scheduled_item(self, item_id):
+        item_data = self.store.items.get(item_id)
+        if item_data is None or self.scheduler is None:
+            if self.scheduler is not None:
+                self.scheduler.run_finished(item_id)
+            return
+        specs = self.item_specs([item_id])
+        if not specs:
+            self.scheduler.run_finished(item_id)
+            return
+        # 计划执行在后台的标签页中输出，不打断正在查看的输出；每个项目复用同一个标签页
+        for run in self.run_specs(specs, focus=False, trigger_mark="⏰").runs:
+            self.scheduled_runs[run.run_id] = item_id
+        self.statusBar().showMessage(f"计划执行: {item_data['name']}")
+
+    def show_next_run(self, item_id):
+        due = self.scheduler.next_run(item_id) if self.scheduler is not None else None
+        if due is None:
+            self.schedule_label.setText("")
+            return
+        self.schedule_label.setText(
+            f"<font color='gray'>下次: {time.strftime('%m-%d %H:%M:%S', time.localtime(due))}</font>"
+        )
+
+    def update_scheduler_enabled(self, checked):
+        self.save_setting("scheduler_enabled", checked)
+        if checked:
+            self.start_scheduler()
+        elif self.scheduler is not None:
+            # 已经开始的执行照常进行，只是不再触发新的执行
+            self.scheduler.close()
+            self.scheduler = None
+        if self.current_item_id:
+            self.show_next_run(self.current_item_id)
+
+    def update_schedule_max_runs(self, count):
+        self.save_setting("schedule_max_runs", count)
+        if self.scheduler is not None:
+            self.scheduler.set_limits(count, self.data.get("schedule_max_runs_per_group", 2))
+
+    def start_file_watcher(self):
+        if self.data.get("file_watch_enabled", True):
+            self.watch_items([i for i, item in self.store.items.items() if item.get("watch")])
+
+    def file_watch(self):
+        if self.file_watcher is None:
+            from file_watch import FileWatcher, TriggerQueue
+
+            self.file_watcher = FileWatcher(
+                self.watch_trigger_signal.emit, self.watch_error_signal.emit
+            )
+            if self.watch_triggers is None:
+                # 取消执行时执行器一定已经存在，不必为此提前创建
+                self.watch_triggers = TriggerQueue(
+                    self.start_watch_run,
+                    lambda run: self._command_runner is not None and self._command_runner.cancel_run(run),
+                )
+        return self.file_watcher
+
+    def watch_items(self, item_ids):
+        """按项目当前的设置开始、更新或停止监视；设置无效的项目不监视并在状态栏提示"""
+        from file_watch import WatchError, WatchSpec
+
+        for item_id in item_ids:
+            item_data = self.store.items.get(item_id)
+            try:
+                spec = WatchSpec.from_item(item_data) if item_data is not None else None
+                if spec is not None:
+                    self.file_watch().set_item(item_id, item_data.get("working_dir", ""), spec)
+                elif self.file_watcher is not None:
+                    self.file_watcher.remove(item_id)
+            except WatchError as e:
+                self.statusBar().showMessage(f"“{item_data['name']}”的文件监视无效: {e}")
+
+    def sync_watches(self, change):
+        """项目的监视设置或工作目录修改、项目删除后更新监视"""
+        if not self.data.get("file_watch_enabled", True):
+            return
+        op = change["op"]
+        if op == "update_item":
+            if "watch" in change["fields"] or "working_dir" in change["fields"]:
+                self.watch_items([change["id"]])
+        elif op == "add_item":
+            if change["item"].get("watch"):
+                self.watch_items([change["item"]["id"]])
+        elif op == "add_group":
+            self.watch_items([i["id"] for i in change["group"]["items"] if i.get("watch")])
+        elif op in ("delete_item", "delete_group") and self.file_watcher is not None:
+            self.watch_items([i for i in self.file_watcher.item_ids() if i not in self.store.items])
+
+    def on_watch_trigger(self, item_id, paths):
+        item_data = self.store.items.get(item_id)
+        if item_data is None or not item_data.get("watch") or self.file_watcher is None:
+            return
+        self.watch_triggers.trigger(item_id, paths, item_data["watch"].get("policy", "restart"))
+        self.statusBar().showMessage(f"文件改动: {item_data['name']}（{len(paths)} 个文件）")
+
+    def start_watch_run(self, item_id, extra_env):
+        """由 watch_triggers 调用，开始一次带有改动文件列表的执行"""
+        if item_id not in self.store.items:
+            return []
+        specs = self.item_specs([item_id])
+        for spec in specs:
+            spec.extra_env = extra_env
+        # 与按重启策略复用执行位置一样，每次触发复用该项目的标签页
+        return self.run_specs(specs, focus=False, trigger_mark="👁").runs if specs else []
+
+    def update_file_watch_enabled(self, checked):
+        self.save_setting("file_watch_enabled", checked)
+        if checked:
+            self.start_file_watcher()
+        elif self.file_watcher is not None:
+            # 已经开始和排队的执行照常进行，只是不再监视改动
+            self.file_watcher.close()
+            self.file_watcher = None
+
+    def update_cancel_grace(self, seconds):
+        if self._command_runner is not None:
+            self._command_runner.set_grace_period(seconds)
+        self.save_setting("cancel_grace_seconds", seconds)
+
+    def current_run(self):
+        """当前输出标签页对应的执行；历史输出没有执行"""
+        view = self.output_tabs.currentWidget()
+        return None if view is None else view.run
+
+    def stop_current_run(self):
+        run = self.current_run()
+        if run is None or run.done:
+            self.statusBar().showMessage("当前输出没有正在进行的执行")
+            return
+        if run.cancel_requested:
+            self.statusBar().showMessage(f"正在强制结束“{run.spec.name}”")
+        else:
+            self.statusBar().showMessage(f"正在停止“{run.spec.name}”，再次停止将立即强制结束")
+        self.command_runner.cancel_run(run)
+
+    def stop_current_batch(self):
+        run = self.current_run()
+        if run is None or run.batch.done:
+            self.statusBar().showMessage("当前输出所在的批次已经结束")
+            return
+        self.statusBar().showMessage(f"正在停止该批次的 {len(run.batch.runs)} 个执行")
+        self.command_runner.cancel_batch(run.batch)
+
+    def stop_all_runs(self):
+        if not self.runner_busy():
+            self.statusBar().showMessage("没有正在进行的执行")
+            return
+        self.statusBar().showMessage("正在停止所有执行，再次停止将立即强制结束")
+        self.command_runner.cancel_all()
+
+    def append_output(self, run, text):
+        view = self.run_views.get(run.run_id)
+        if view is not None:
+            view.append_line(text.strip())
+            self.resume_output_search(view)
+
+    def append_output_batch(self, run, output):
+        """一次性追加一批输出，只滚动一次"""
+        view = self.run_views.get(run.run_id)
+        if view is not None:
+            view.append_output(*output)
+            self.resume_output_search(view)
+        self.command_runner.mark_batch_applied(run)
+
+    def focus_output_search(self):
+        self.output_search_edit.setFocus()
+        self.output_search_edit.selectAll()
+
+    def start_output_search(self, *args):
+        """按搜索栏的内容重新搜索当前标签页的输出"""
+        from output_search import OutputSearchService, QueryError, compile_query
+
+        state = self.output_search_state
+        if state is not None:
+            if self.output_search is not None:
+                self.output_search.cancel()
+            if state["filter"]:
+                state["view"].set_filter(None)
+            self.output_search_state = None
+        view = self.output_tabs.currentWidget()
+        text = self.output_search_edit.text()
+        self.output_match_label.clear()
+        if not text or view is None:
+            return
+        try:
+            matcher = compile_query(
+                text, self.output_regex_check.isChecked(), self.output_case_check.isChecked()
+            )
+        except QueryError as e:
+            self.output_match_label.setText(str(e))
+            return
+        if self.output_search is None:
+            self.output_search = OutputSearchService(self.output_search_signal.emit)
+        filter_lines = self.output_filter_check.isChecked()
+        if filter_lines:
+            view.set_filter([])
+        self.output_search_state = {
+            "generation": self.output_search.search(view.log_model.buffer, matcher),
+            "view": view,
+            "filter": filter_lines,
+            "matches": [],
+            "current": -1,
+            "scanned": 0,
+            "total": 0,
+        }
+
+    def resume_output_search(self, view):
+        """有新的输出时只搜索新增的行"""
+        state = self.output_search_state
+        if state is not None and state["view"] is view:
+            self.output_search.resume()
+
+    def on_output_search_results(self, generation, matches, scanned, total):
+        state = self.output_search_state
+        if state is None or generation != state["generation"]:
+            return
+        state["matches"].extend(matches)
+        state["scanned"] = scanned
+        state["total"] = total
+        if state["filter"]:
+            state["view"].add_filtered(matches)
+        elif state["current"] < 0 and state["matches"]:
+            # 找到第一个匹配时跳过去，之后由用户决定
+            self.next_output_match(1)
+            return
+        self.show_output_match_count()
+
+    def show_output_match_count(self):
+        state = self.output_search_state
+        count = len(state["matches"])
+        text = f"{state['current'] + 1}/{count}" if state["current"] >= 0 else f"{count} 个匹配"
+        if state["scanned"] < state["total"]:
+            text += f"（已搜索 {state['scanned']}/{state['total']} 行）"
+        self.output_match_label.setText(text)
+
+    def next_output_match(self, step):
+        state = self.output_search_state
+        if state is None or not state["matches"]:
+            return
+        state["current"] = (state["current"] + step) % len(state["matches"])
+        state["view"].show_line(state["matches"][state["current"]])
+        self.show_output_match_count()
+
+    def run_tab_title(self, run):
+        from execution_pool import QUEUED, RUNNING, CANCELLED, SKIPPED
+
+        name = run.spec.name or "命令"
+        mark = getattr(self.run_views.get(run.run_id), "trigger_mark", "")
+        if mark:
+            name = f"{mark} {name}"
+        if run.status == QUEUED:
+            return f"{name} [排队中]"
+        if run.status == RUNNING:
+            return f"{name} [运行中]"
+        if run.status == CANCELLED:
+            return f"{name} [已取消]"
+        if run.status == SKIPPED:
+            return f"{name} [已跳过]"
+        return f"{name} [{run.return_code}, {run.duration:.1f}s]"
+
+    def on_run_status(self, run, status):
+        from execution_pool import RUNNING, FINISHED, FAILED, CANCELLED, SKIPPED
+        from run_metrics import format_metrics
+
+        if status in (FINISHED, FAILED, CANCELLED, SKIPPED) and run.run_id in self.scheduled_runs:
+            item_id = self.scheduled_runs.pop(run.run_id)
+            # 在所有执行目标上都结束后才算这次计划执行结束
+            if self.scheduler is not None and item_id not in self.scheduled_runs.values():
+                self.scheduler.run_finished(item_id)
+            if item_id == self.current_item_id:
+                self.show_next_run(item_id)
+        if status in (FINISHED, FAILED, CANCELLED, SKIPPED) and self.watch_triggers is not None:
+            self.watch_triggers.finished(run)
+        if status in (FINISHED, FAILED, CANCELLED) and run.metrics and run.spec.item_id:
+            self.latest_metrics()[run.spec.item_id] = run.metrics
+            if run.spec.item_id == self.current_item_id:
+                self.show_metrics(run.spec.item_id)
+        view = self.run_views.get(run.run_id)
+        if view is None:
+            return
+        index = self.output_tabs.indexOf(view)
+        if index >= 0:
+            self.output_tabs.setTabText(index, self.run_tab_title(run))
+        if status == RUNNING:
+            profile = run.spec.env_profile
+            env = f", 环境: {profile['name']}" if profile else ""
+            self.append_output(run, f"--- 开始执行命令 ({run.spec.shell}{env}) ---")
+        elif status in (FINISHED, FAILED):
+            self.append_output(run, f"--- 命令执行完毕, 返回码: {run.return_code} ---")
+            self.statusBar().showMessage(f"{run.spec.name}: " + format_metrics(run.metrics))
+        elif status == CANCELLED and run.start_time is not None:
+            self.append_output(run, "--- 命令已取消 ---")
+        elif status == SKIPPED:
+            self.append_output(run, "--- 依赖的项目未成功，已跳过 ---")
+
+    def on_batch_finished(self, batch):
+        from execution_pool import FINISHED, FAILED, CANCELLED, SKIPPED
+
+        pipeline = batch.batch_id in self.pipeline_batches
+        self.pipeline_batches.discard(batch.batch_id)
+        if len(batch.runs) < 2:
+            return
+        counts = {FINISHED: 0, FAILED: 0, CANCELLED: 0, SKIPPED: 0}
+        for run in batch.runs:
+            counts[run.status] = counts.get(run.status, 0) + 1
+        message = (
+            f"批量执行结束: 成功 {counts[FINISHED]}, 失败 {counts[FAILED]}, "
+            f"取消 {counts[CANCELLED]}"
         )
+        failed_targets = [
+            run.spec.target["name"] for run in batch.runs if run.spec.target and run.status == FAILED
+        ]
+        if failed_targets:
+            message += f"（失败的执行主机: {'、'.join(sorted(set(failed_targets)))}）"
+        if pipeline:
+            from pipeline import report, format_report
+
+            message += f", 跳过 {counts[SKIPPED]}。" + format_report(report(batch))
+        self.statusBar().showMessage(message)
+
+    def run_specs(self, specs, dependencies=None, focus=True, trigger_mark=""):
+        """提交一组执行，每个执行打开一个输出标签页；focus 为 False 时不切换到新标签页
 
-    def on_command_finished(self, return_code):
-        self.append_output(f"\n--- 命令执行完毕, 返回码: {return_code} ---")
-        self.execute_button.setEnabled(True)
-        self.command_runner = None
+        trigger_mark 非空时为计划或监视触发的执行：同一项目在同一目标上的执行复用同一个标签页，
+        清空上一次的输出（上一次的输出可以在执行历史中查看），标签页不会无限增加。
+        """
+        # 输出视图只在第一次执行命令时才需要
+        from output_view import LogView
+
+        batch = self.command_runner.submit(
+            specs, fail_fast=self.data.get("fail_fast", False), dependencies=dependencies
+        )
+        max_lines = self.data.get("output_max_lines", 10000)
+        for run in batch.runs:
+            key = (run.spec.item_id, run.spec.name)
+            view = self.reuse_trigger_view(key) if trigger_mark else None
+            if view is None:
+                view = LogView(max_lines=max_lines)
+                self.output_tabs.addTab(view, "")
+                if trigger_mark:
+                    self.trigger_views[key] = view
+            view.run = run
+            view.trigger_mark = trigger_mark
+            self.run_views[run.run_id] = view
+            index = self.output_tabs.indexOf(view)
+            self.output_tabs.setTabText(index, self.run_tab_title(run))
+        if batch.runs and focus:
+            self.output_tabs.setCurrentIndex(index)
+        return batch
+
+    def reuse_trigger_view(self, key):
+        """取出上一次触发的执行仍然打开着的标签页并清空；已关闭时返回 None"""
+        view = self.trigger_views.get(key)
+        if view is None or self.output_tabs.indexOf(view) < 0:
+            return None
+        self.stop_output_search(view)
+        # 上一次的执行（例如按重启策略被取消、仍在退出的执行）之后的输出不再显示到这里
+        if view.run is not None:
+            self.run_views.pop(view.run.run_id, None)
+        view.clear()
+        return view
+
+    def stop_output_search(self, view):
+        """停止针对该输出视图的搜索"""
+        state = self.output_search_state
+        if state is not None and state["view"] is view:
+            self.output_search.cancel()
+            if state["filter"]:
+                view.set_filter(None)
+            self.output_search_state = None
+            self.output_match_label.clear()
+
+    def close_output_tab(self, index):
+        view = self.output_tabs.widget(index)
+        run = view.run
+        self.stop_output_search(view)
+        # 打开的历史输出没有对应的执行
+        if run is not None:
+            if not run.done:
+                self.command_runner.cancel_run(run)
+            self.run_views.pop(run.run_id, None)
+        for key in [k for k, v in self.trigger_views.items() if v is view]:
+            del self.trigger_views[key]
+        self.output_tabs.removeTab(index)
+        view.log_model.buffer.close()
+        view.deleteLater()
+
+    def close_finished_tabs(self):
+        for index in reversed(range(self.output_tabs.count())):
+            run = self.output_tabs.widget(index).run
+            if run is None or run.done:
+                self.close_output_tab(index)
+
+    def run_group(self, group_id):
+        group = self.store.groups.get(group_id)
+        if group is not None:
+            self.run_specs(self.item_specs([i["id"] for i in group["items"]]))
+
+    def selected_item_ids(self):
+        """树中选中的项目 id；选中分组则包括其中所有项目"""
+        ids = []
+        seen = set()
+        for index in self.tree_view.selectionModel().selectedIndexes():
+            node_type, node = self.tree_model.node(index)
+            children = node["items"] if node_type == "group" else [node]
+            for item_data in children:
+                if item_data["id"] not in seen:
+                    seen.add(item_data["id"])
+                    ids.append(item_data["id"])
+        return ids
+
+    def run_selected(self):
+        """运行树中选中的项目；选中分组则运行其中所有项目"""
+        ids = self.selected_item_ids()
+        if not ids:
+            QMessageBox.warning(self, "提示", "请先在左侧选择要执行的项目或分组。")
+            return
+        self.run_specs(self.item_specs(ids))
+
+    def run_selected_pipeline(self):
+        ids = self.selected_item_ids()
+        if not ids:
+            QMessageBox.warning(self, "提示", "请先在左侧选择要执行的项目或分组。")
+            return
+        self.run_pipeline(ids)
+
+    def run_group_pipeline(self, group_id):
+        group = self.store.groups.get(group_id)
+        if group is not None and group["items"]:
+            self.run_pipeline([i["id"] for i in group["items"]])
+
+    def run_pipeline(self, item_ids):
+        """按依赖关系运行项目及其（递归的）依赖：依赖成功后才开始，失败则跳过下游"""
+        from pipeline import plan, PipelineError
+
+        try:
+            specs, dependencies, missing = plan(
+                item_ids, self.store.items, self.env_profiles(), agents=self.agents()
+            )
+        except PipelineError as e:
+            QMessageBox.warning(self, "无法运行", str(e))
+            return
+        if missing:
+            names = "、".join(sorted({item["name"] for item, _ in missing}))
+            self.statusBar().showMessage(f"已忽略指向已删除项目的依赖: {names}")
+        batch = self.run_specs(specs, dependencies)
+        self.pipeline_batches.add(batch.batch_id)
 
     def load_and_display_data(self):
-        self.data = load_data()
-        self.tree_model.clear()
-        self.item_map.clear()
-        self.tree_model.setHorizontalHeaderLabels(["分组和项目"])
-        root_node = self.tree_model.invisibleRootItem()
-        for group_data in self.data["groups"]:
-            group_item = QStandardItem(group_data["name"])
-            group_item.setData(group_data["id"], Qt.ItemDataRole.UserRole)
-            group_item.setData("group", Qt.ItemDataRole.UserRole + 1)
-            group_item.setEditable(False)
-            for item_data in group_data["items"]:
-                self.item_map[item_data["id"]] = item_data
-                command_item = QStandardItem(item_data["name"])
-                command_item.setData(item_data["id"], Qt.ItemDataRole.UserRole)
-                command_item.setData("item", Qt.ItemDataRole.UserRole + 1)
-                command_item.setEditable(False)
-                group_item.appendRow(command_item)
-            root_node.appendRow(group_item)
-        self.tree_view.expandAll()
+        """树模型直接读取 store，之后的修改由模型根据变更事件增量更新"""
+        # 分组的子项在展开时才加载；项目不多时保持原来全部展开的效果
+        if len(self.store.items) <= AUTO_EXPAND_LIMIT:
+            self.tree_view.expandAll()
+
+    def focus_search(self):
+        self.search_edit.setFocus()
+        self.search_edit.selectAll()
+
+    def on_search_text_changed(self, text):
+        if self.search_service is None:
+            return
+        if text.strip():
+            self.search_service.search(text)
+        else:
+            self.search_service.cancel()
+            self.search_results.clear()
+            self.left_stack.setCurrentWidget(self.tree_view)
+
+    def refresh_search(self, change):
+        """数据变化后重新执行当前的搜索，使结果列表保持最新"""
+        if change["op"] != "setting" and self.search_edit.text().strip():
+            self.search_service.search(self.search_edit.text())
+
+    def show_search_results(self, generation, query, total, results, elapsed_ms):
+        # 输入已经改变时，旧查询的结果直接丢弃
+        if generation != self.search_service.generation:
+            return
+        self.search_results.clear()
+        for score, item_id in results:
+            item_data = self.store.items.get(item_id)
+            if item_data is None:
+                continue
+            group = self.store.item_group[item_id]
+            entry = QListWidgetItem(f"{item_data['name']}  —  {group['name']}")
+            entry.setToolTip(item_data.get("command", ""))
+            entry.setData(ID_ROLE, item_id)
+            self.search_results.addItem(entry)
+        self.left_stack.setCurrentWidget(self.search_results)
+        self.statusBar().showMessage(
+            f"搜索 “{query}”: {total} 个匹配, 显示 {self.search_results.count()} 个 ({elapsed_ms:.1f} ms)"
+        )
+
+    def on_search_result_selected(self, current, previous):
+        if current is None:
+            return
+        self.current_item_id = current.data(ID_ROLE)
+        self.stacked_widget.setCurrentWidget(self.editor_log_page)
+        self.populate_editor(self.current_item_id)
+
+    def open_first_search_result(self):
+        if self.search_results.count():
+            self.reveal_item(self.search_results.item(0).data(ID_ROLE))
+
+    def reveal_item(self, item_id):
+        """清空搜索，在树中展开所在分组并选中该项目"""
+        group = self.store.item_group.get(item_id)
+        if group is None:
+            return
+        self.search_edit.clear()
+        group_index = self.tree_model.group_index(group["id"])
+        if self.tree_model.canFetchMore(group_index):
+            self.tree_model.fetchMore(group_index)
+        self.tree_view.expand(group_index)
+        index = self.tree_model.item_index(item_id)
+        self.tree_view.setCurrentIndex(index)
+        self.tree_view.scrollTo(index)
+        self.tree_view.setFocus()
 
     def on_item_selected(self, selected, deselected):
-        indexes = selected.indexes()
-        if not indexes:
-            self.current_selected_item = None
+        indexes = self.tree_view.selectionModel().selectedIndexes()
+        if len(indexes) != 1:
+            self.current_item_id = None
             self.stacked_widget.setCurrentWidget(self.home_page)
             return
         index = indexes[0]
-        item = self.tree_model.itemFromIndex(index)
-        item_type = item.data(Qt.ItemDataRole.UserRole + 1)
-        if item_type == "item":
-            self.current_selected_item = item
+        if index.data(TYPE_ROLE) == "item":
+            self.current_item_id = index.data(ID_ROLE)
             self.stacked_widget.setCurrentWidget(self.editor_log_page)
-            self.populate_editor(item)
+            self.populate_editor(self.current_item_id)
         else:
-            self.current_selected_item = None
+            self.current_item_id = None
             self.stacked_widget.setCurrentWidget(self.home_page)
 
-    def populate_editor(self, item):
-        item_id = item.data(Qt.ItemDataRole.UserRole)
-        item_data = self.item_map.get(item_id)
+    def populate_editor(self, item_id):
+        item_data = self.store.items.get(item_id)
         if item_data:
             self.id_label.setText(f"<font color='gray'>{item_data['id']}</font>")
             self.name_edit.setText(item_data["name"])
             self.command_edit.setText(item_data.get("command", ""))
             self.shell_combo.setCurrentText(item_data["shell"])
             self.workdir_edit.setText(item_data.get("working_dir", ""))
+            self.env_combo.setCurrentIndex(
+                max(0, self.env_combo.findData(item_data.get("env_profile", "")))
+            )
+            self.show_dependencies(item_data)
+            self.show_targets(item_data)
+            schedule = item_data.get("schedule") or {}
+            self.schedule_edit.setText(schedule.get("spec", ""))
+            self.schedule_jitter_spin.setValue(int(schedule.get("jitter", 0)))
+            self.schedule_missed_combo.setCurrentIndex(
+                max(0, self.schedule_missed_combo.findData(schedule.get("missed", "catch_up")))
+            )
+            self.show_next_run(item_id)
+            watch = item_data.get("watch") or {}
+            self.watch_edit.setText(" ".join(watch.get("patterns", [])))
+            self.watch_debounce_spin.setValue(int(watch.get("debounce_ms", 300)))
+            self.watch_policy_combo.setCurrentIndex(
+                max(0, self.watch_policy_combo.findData(watch.get("policy", "restart")))
+            )
+            self.show_metrics(item_id)
+            self.show_history(item_id)
+
+    def latest_metrics(self):
+        if self.last_metrics is None:
+            # 直接读取指标文件，查看指标不需要创建执行器
+            from run_metrics import MetricsLog
+
+            self.last_metrics = MetricsLog().latest()
+        return self.last_metrics
+
+    def show_metrics(self, item_id):
+        metrics = self.latest_metrics().get(item_id)
+        if metrics is None:
+            self.metrics_label.setText("<font color='gray'>尚无记录</font>")
+            return
+        from run_metrics import format_metrics
+
+        self.metrics_label.setText(f"返回码 {metrics['return_code']}, " + format_metrics(metrics))
+
+    def show_history(self, item_id):
+        if self.history_panel is None:
+            from history_panel import HistoryPanel
+
+            self.history_panel = HistoryPanel()
+            self.history_panel.setToolTip("双击打开该次执行的输出")
+            self.history_panel.open_requested.connect(self.open_history_run)
+            self.history_container.layout().addWidget(self.history_panel)
+        self.history_panel.show_runs(self.run_history().list_runs(item_id, limit=100))
+
+    def run_history(self):
+        """执行历史；执行器创建前查看历史时直接打开，之后交给执行器继续写入"""
+        if self._command_runner is not None:
+            return self._command_runner.history()
+        if self._run_history is None:
+            from run_history import HistoryStore, RetentionPolicy
+
+            self._run_history = HistoryStore(retention=RetentionPolicy.from_settings(self.data))
+        return self._run_history
+
+    def on_history_recorded(self, record):
+        if record["item_id"] == self.current_item_id:
+            self.show_history(record["item_id"])
+
+    def open_history_run(self, record):
+        """在新的标签页中打开一次过去执行的输出，只解压正在查看的部分"""
+        from output_view import LogView
+        from run_history import ArchiveBuffer
+
+        try:
+            reader = self.run_history().open_archive(record)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "无法打开", f"无法打开该次执行的输出: {e}")
+            return
+        view = LogView(buffer=ArchiveBuffer(reader))
+        view.run = None
+        started = time.strftime("%m-%d %H:%M", time.localtime(record["started_at"]))
+        index = self.output_tabs.addTab(view, f"{record['name']} [历史 {started}]")
+        self.output_tabs.setCurrentIndex(index)
+
+    def show_dependencies(self, item_data):
+        names = [
+            self.store.items[d]["name"]
+            for d in item_data.get("depends_on") or []
+            if d in self.store.items
+        ]
+        self.depends_label.setText(
+            "、".join(names) if names else "<font color='gray'>无（按依赖运行时可以直接开始）</font>"
+        )
+
+    def show_targets(self, item_data):
+        agents = self.agents()
+        names = [
+            "本机" if t == LOCAL_TARGET else agents[t]["name"]
+            for t in item_data.get("targets") or []
+            if t == LOCAL_TARGET or t in agents
+        ]
+        if not item_data.get("targets"):
+            self.targets_label.setText("<font color='gray'>本机</font>")
+        else:
+            self.targets_label.setText("、".join(names) if names else "<font color='red'>执行目标都已删除</font>")
+
+    def edit_targets(self):
+        from agent_dialog import TargetDialog
+
+        item_id = self.current_item_id
+        if item_id not in self.store.items:
+            return
+        dialog = TargetDialog(self.store.items[item_id], self.data.get("agents", []), self)
+        if dialog.exec():
+            self.store.update_item(item_id, {"targets": dialog.targets()})
+            self.show_targets(self.store.items[item_id])
+
+    def edit_dependencies(self):
+        from dependency_dialog import DependencyDialog
+        from pipeline import find_cycle
+
+        item_id = self.current_item_id
+        if item_id not in self.store.items:
+            return
+        dialog = DependencyDialog(self.store, item_id, self)
+        if not dialog.exec():
+            return
+        depends_on = dialog.dependencies()
+        edges = {i: item.get("depends_on") or [] for i, item in self.store.items.items()}
+        edges[item_id] = depends_on
+        cycle = find_cycle([item_id], edges)
+        if cycle is not None:
+            names = " → ".join(self.store.items[i]["name"] for i in reversed(cycle))
+            QMessageBox.warning(self, "依赖中存在环", f"这样设置会形成环: {names}")
+            return
+        self.store.update_item(item_id, {"depends_on": depends_on})
+        self.show_dependencies(self.store.items[item_id])
 
     def save_item_details(self):
-        if not self.current_selected_item:
+        if not self.current_item_id:
             QMessageBox.warning(self, "提示", "请先在左侧选择一个项目进行保存。")
             return
 
-        item_id = self.current_selected_item.data(Qt.ItemDataRole.UserRole)
-        item_data = self.item_map.get(item_id)
+        item_id = self.current_item_id
+        if item_id in self.store.items:
+            from scheduler import Schedule, ScheduleError
 
-        if item_data:
-            new_name = self.name_edit.text()
-            item_data["name"] = new_name
-            item_data["command"] = self.command_edit.toPlainText()
-            item_data["shell"] = self.shell_combo.currentText()
-            item_data["working_dir"] = self.workdir_edit.text()
-
-            self.current_selected_item.setText(new_name)
+            schedule = None
+            if self.schedule_edit.text().strip():
+                try:
+                    schedule = Schedule(
+                        self.schedule_edit.text(),
+                        self.schedule_jitter_spin.value(),
+                        self.schedule_missed_combo.currentData(),
+                    ).to_dict()
+                except ScheduleError as e:
+                    QMessageBox.warning(self, "计划无效", str(e))
+                    return
+            from file_watch import WatchError, WatchSpec
 
-            save_data(self.data)
+            watch = None
+            if self.watch_edit.text().strip():
+                try:
+                    watch = WatchSpec(
+                        WatchSpec.split(self.watch_edit.text()),
+                        self.watch_debounce_spin.value(),
+                        self.watch_policy_combo.currentData(),
+                    ).to_dict()
+                except WatchError as e:
+                    QMessageBox.warning(self, "文件监视无效", str(e))
+                    return
+            fields = {
+                "name": self.name_edit.text(),
+                "command": self.command_edit.toPlainText(),
+                "shell": self.shell_combo.currentText(),
+                "working_dir": self.workdir_edit.text(),
+                "env_profile": self.env_combo.currentData() or "",
+                "schedule": schedule,
+                "watch": watch,
+            }
+            self.store.update_item(item_id, fields)
+            self.show_next_run(item_id)
             QMessageBox.information(self, "成功", "更改已保存！")
 
     def show_context_menu(self, position):
@@ -301,146 +1578,140 @@ class MainWindow(QMainWindow):
         if not index.isValid():
             menu.addAction("添加分组", self.add_group)
         else:
-            item = self.tree_model.itemFromIndex(index)
-            item_type = item.data(Qt.ItemDataRole.UserRole + 1)
+            node_id = index.data(ID_ROLE)
+            node_name = index.data()
+            item_type = index.data(TYPE_ROLE)
 
+            if len(self.tree_view.selectionModel().selectedIndexes()) > 1:
+                menu.addAction("运行选中项", self.run_selected)
+                menu.addAction("按依赖运行选中项", self.run_selected_pipeline)
+                menu.addSeparator()
             if item_type == "group":
-                menu.addAction("添加项目", lambda: self.add_item(item))
-                menu.addAction("重命名分组", lambda: self.rename_group(item))
-                menu.addAction("删除分组", lambda: self.delete_group(item))
+                menu.addAction("运行分组", lambda: self.run_group(node_id))
+                menu.addAction("按依赖运行分组", lambda: self.run_group_pipeline(node_id))
+                menu.addSeparator()
+                menu.addAction("添加项目", lambda: self.add_item(node_id))
+                menu.addAction("重命名分组", lambda: self.rename_group(node_id, node_name))
+                menu.addAction("删除分组", lambda: self.delete_group(node_id, node_name))
             elif item_type == "item":
-                menu.addAction("重命名项目", lambda: self.rename_item(item))
-                menu.addAction("删除项目", lambda: self.delete_item(item))
+                menu.addAction("按依赖运行", lambda: self.run_pipeline([node_id]))
+                menu.addAction("移动到分组...", self.move_selected_items)
+                menu.addAction("重命名项目", lambda: self.rename_item(node_id, node_name))
+                menu.addAction("删除项目", lambda: self.delete_item(node_id, node_name))
 
         menu.exec(self.tree_view.viewport().mapToGlobal(position))
 
     def add_group(self):
         group_name, ok = QInputDialog.getText(self, "新建分组", "请输入分组名称:")
         if ok and group_name:
-            new_group = {
-                "id": generate_id(),
-                "name": group_name,
-                "items": [],
-            }
-            self.data["groups"].append(new_group)
-            save_data(self.data)
-            self.load_and_display_data()
+            self.store.add_group(group_name)
 
-    def add_item(self, group_item):
+    def add_item(self, group_id):
         item_name, ok = QInputDialog.getText(self, "新建项目", "请输入项目名称:")
         if ok and item_name:
-            group_id = group_item.data(Qt.ItemDataRole.UserRole)
-            for g in self.data["groups"]:
-                if g["id"] == group_id:
-                    new_item = {
-                        "id": generate_id(),
-                        "name": item_name,
-                        "command": "",
-                        "shell": "cmd",
-                        "working_dir": "",
-                    }
-                    g["items"].append(new_item)
-                    break
-            save_data(self.data)
-            self.load_and_display_data()
-
-    def rename_group(self, group_item):
-        group_id = group_item.data(Qt.ItemDataRole.UserRole)
-        old_name = group_item.text()
+            self.store.add_item(group_id, item_name)
+            self.tree_view.expand(self.tree_model.group_index(group_id))
+
+    def rename_group(self, group_id, old_name):
         new_name, ok = QInputDialog.getText(
             self, "重命名分组", "请输入新的分组名称:", QLineEdit.Normal, old_name
         )
         if ok and new_name and new_name != old_name:
-            for g in self.data["groups"]:
-                if g["id"] == group_id:
-                    g["name"] = new_name
-                    break
-            save_data(self.data)
-            self.load_and_display_data()
-
-    def rename_item(self, item):
-        item_id = item.data(Qt.ItemDataRole.UserRole)
-        group_id = item.parent().data(Qt.ItemDataRole.UserRole)
-        old_name = item.text()
+            self.store.rename_group(group_id, new_name)
+
+    def rename_item(self, item_id, old_name):
         new_name, ok = QInputDialog.getText(
             self, "重命名项目", "请输入新的项目名称:", QLineEdit.Normal, old_name
         )
         if ok and new_name and new_name != old_name:
-            for g in self.data["groups"]:
-                if g["id"] == group_id:
-                    for i in g["items"]:
-                        if i["id"] == item_id:
-                            i["name"] = new_name
-                            break
-                    break
-            save_data(self.data)
-            self.load_and_display_data()
-
-    def delete_group(self, group_item):
+            self.store.rename_item(item_id, new_name)
+            if item_id == self.current_item_id:
+                self.name_edit.setText(new_name)
+
+    def delete_group(self, group_id, name):
         reply = QMessageBox.question(
             self,
             "删除确认",
-            f"确定要删除分组 '{group_item.text()}' 吗？",
+            f"确定要删除分组 '{name}' 吗？",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
         if reply == QMessageBox.StandardButton.Yes:
-            group_id = group_item.data(Qt.ItemDataRole.UserRole)
-            self.data["groups"] = [
-                g for g in self.data["groups"] if g["id"] != group_id
-            ]
-            save_data(self.data)
-            self.load_and_display_data()
-            self.stacked_widget.setCurrentWidget(self.home_page)
+            self.store.delete_group(group_id)
 
-    def delete_item(self, item):
+    def delete_item(self, item_id, name):
         reply = QMessageBox.question(
             self,
             "删除确认",
-            f"确定要删除项目 '{item.text()}' 吗？",
+            f"确定要删除项目 '{name}' 吗？",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
         if reply == QMessageBox.StandardButton.Yes:
-            item_id = item.data(Qt.ItemDataRole.UserRole)
-            group_id = item.parent().data(Qt.ItemDataRole.UserRole)
-            for g in self.data["groups"]:
-                if g["id"] == group_id:
-                    g["items"] = [i for i in g["items"] if i["id"] != item_id]
-                    break
-            save_data(self.data)
-            self.load_and_display_data()
-            self.stacked_widget.setCurrentWidget(self.home_page)
+            self.store.delete_item(item_id)
 
-    def execute_current_command(self):
-        if self.command_runner and self.command_runner.isRunning():
-            QMessageBox.warning(self, "提示", "已有命令正在执行中，请稍候。")
+    def move_selected_items(self):
+        """把选中的项目一次性移动到另一个分组的末尾"""
+        item_ids = [
+            index.data(ID_ROLE)
+            for index in self.tree_view.selectionModel().selectedIndexes()
+            if index.data(TYPE_ROLE) == "item"
+        ]
+        groups = self.data["groups"]
+        if not item_ids or not groups:
             return
+        names = [g["name"] for g in groups]
+        name, ok = QInputDialog.getItem(self, "移动项目", "目标分组:", names, 0, False)
+        if ok:
+            group_id = groups[names.index(name)]["id"]
+            self.store.move_items(item_ids, group_id)
+            self.tree_view.expand(self.tree_model.group_index(group_id))
+
+    def execute_current_command(self):
         if self.stacked_widget.currentWidget() != self.editor_log_page:
             QMessageBox.warning(self, "提示", "请先在左侧选择一个要执行的项目。")
             return
-        self.output_browser.clear()
-        self.append_output(f"--- 开始执行命令 ({self.shell_combo.currentText()}) ---")
-        self.command_runner = CommandRunner(
-            command=self.command_edit.toPlainText(),
-            shell=self.shell_combo.currentText(),
-            working_dir=self.workdir_edit.text(),
-        )
-        self.command_runner.output_signal.connect(self.append_output)
-        self.command_runner.finished_signal.connect(self.on_command_finished)
-        self.command_runner.start()
-        self.execute_button.setEnabled(False)
+        from execution_pool import RunSpec
+
+        # 直接使用编辑器中的内容，未保存的修改也会生效
+        item_data = {
+            "id": self.current_item_id,
+            "command": self.command_edit.toPlainText(),
+            "shell": self.shell_combo.currentText(),
+            "working_dir": self.workdir_edit.text(),
+            "name": self.name_edit.text(),
+            "env_profile": self.env_combo.currentData(),
+            "targets": self.store.items.get(self.current_item_id, {}).get("targets"),
+        }
+        specs = RunSpec.for_targets(item_data, self.env_profiles(), self.agents())
+        if not specs:
+            QMessageBox.warning(self, "无法运行", "该项目的执行目标都已被删除，请重新选择执行目标。")
+            return
+        self.run_specs(specs)
 
     def closeEvent(self, event):
-        if self.command_runner and self.command_runner.isRunning():
+        if self.runner_busy():
             reply = QMessageBox.question(
                 self,
                 "确认",
                 "命令仍在运行中，确定要关闭并终止它吗？",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             )
-            if reply == QMessageBox.StandardButton.Yes:
-                self.command_runner.stop()
-                event.accept()
-            else:
+            if reply != QMessageBox.StandardButton.Yes:
                 event.ignore()
-        else:
-            event.accept()
+                return
+        if self.scheduler is not None:
+            self.scheduler.close()
+        if self.file_watcher is not None:
+            self.file_watcher.close()
+        if self._command_runner is not None:
+            self._command_runner.stop()
+        elif self._run_history is not None:
+            self._run_history.close()
+        if self.search_service is not None:
+            self.search_service.close()
+        if self.output_search is not None:
+            self.output_search.close()
+        if not self.persistence.close():
+            QMessageBox.warning(
+                self, "保存失败", f"部分修改未能写入数据文件，将会丢失。\n\n{self.persistence.error}"
+            )
+        event.accept()
@@ -0,0 +1,119 @@
+# output_search.py
+import re
+import threading
+import time
+
+# 每次从缓冲区取出并匹配的行数；每处理完一段就回调一次，结果因此逐步出现
+SLICE_LINES = 20000
+# 最多记录的匹配行数，避免过于宽泛的查询占用大量内存
+MAX_MATCHES = 1000000
+
+
+class QueryError(Exception):
+    pass
+
+
+def compile_query(text, regex=False, case_sensitive=False):
+    """返回判断一行文本是否匹配的函数；正则表达式无效时抛出 QueryError"""
+    if regex:
+        try:
+            pattern = re.compile(text, 0 if case_sensitive else re.IGNORECASE)
+        except re.error as e:
+            raise QueryError(f"正则表达式无效: {e}")
+        return lambda line: pattern.search(line) is not None
+    if case_sensitive:
+        return lambda line: text in line
+    folded = text.casefold()
+    if folded.isascii():
+        # 纯 ASCII 的关键词只需把行转为小写，比 casefold 快
+        folded = text.lower()
+        return lambda line: folded in line.lower()
+    return lambda line: folded in line.casefold()
+
+
+class OutputSearchService:
+    """在后台线程中搜索一个输出缓冲区（log_buffer.LogBuffer 或 run_history.ArchiveBuffer）
+
+    search() 开始新的查询并使旧查询作废；查询扫描到缓冲区末尾后保持有效，缓冲区有新的行时
+    调用 resume()，只会继续扫描新增的行，已经搜索过的部分不会重新扫描。
+    每扫描完一段通过 on_results(generation, 新的匹配行号, 已扫描行数, 缓冲区行数) 在后台线程中回调。
+    """
+
+    def __init__(self, on_results, slice_lines=SLICE_LINES):
+        self.on_results = on_results
+        self.slice_lines = slice_lines
+        self.generation = 0
+        self._job = None
+        self._wake = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="OutputSearch", daemon=True)
+        self._thread.start()
+
+    def search(self, buffer, matcher):
+        """提交查询，返回其编号；只有编号最新的查询结果才有意义"""
+        with self._cond:
+            self.generation += 1
+            self._job = {
+                "generation": self.generation,
+                "buffer": buffer,
+                "matcher": matcher,
+                "position": 0,
+                "matches": 0,
+            }
+            self._wake = True
+            self._cond.notify_all()
+            return self.generation
+
+    def resume(self):
+        """缓冲区追加了新行后调用，继续扫描当前查询"""
+        with self._cond:
+            if self._job is not None:
+                self._wake = True
+                self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            self.generation += 1
+            self._job = None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self.generation += 1
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not (self._wake and self._job is not None):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._wake = False
+                job = self._job
+            self._scan(job)
+
+    def _scan(self, job):
+        generation = job["generation"]
+        buffer = job["buffer"]
+        matcher = job["matcher"]
+        while self.generation == generation:
+            total = buffer.line_count()
+            start = job["position"]
+            if start >= total:
+                return
+            end = min(total, start + self.slice_lines)
+            matches = []
+            if job["matches"] < MAX_MATCHES:
+                texts = buffer.texts(start, end)
+                matches = [n for n, text in enumerate(texts, start) if matcher(text)]
+                matches = matches[:MAX_MATCHES - job["matches"]]
+            job["position"] = end
+            job["matches"] += len(matches)
+            if self.generation != generation:
+                return
+            self.on_results(generation, matches, end, total)
+            # 让出 GIL，界面线程在大量输出时仍能及时处理事件
+            time.sleep(0)
@@ -0,0 +1,269 @@
+# output_view.py
+import bisect
+
+from PySide6.QtWidgets import (
+    QListView,
+    QAbstractItemView,
+    QApplication,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+)
+from PySide6.QtGui import QColor, QFont, QFontDatabase, QFontMetrics, QKeySequence, QPalette
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect
+
+from ansi_parser import RGB_BASE, BOLD, DIM, ITALIC, UNDERLINE, INVERSE, STRIKE
+from log_buffer import LogBuffer
+
+# 行记录（str 或带样式的片段元组）
+ENTRY_ROLE = Qt.ItemDataRole.UserRole
+
+# 16 种基本颜色，之后是 6x6x6 色块和 24 级灰度，与 xterm 的 256 色调色板一致
+_BASIC_COLORS = [
+    0x000000, 0xCD3131, 0x0DBC79, 0xE5E510, 0x2472C8, 0xBC3FBC, 0x11A8CD, 0xE5E5E5,
+    0x666666, 0xF14C4C, 0x23D18B, 0xF5F543, 0x3B8EEA, 0xD670D6, 0x29B8DB, 0xFFFFFF,
+]
+
+
+def _palette_rgb(index):
+    if index < 16:
+        return _BASIC_COLORS[index]
+    if index < 232:
+        index -= 16
+        levels = [0, 95, 135, 175, 215, 255]
+        return levels[index // 36] << 16 | levels[index // 6 % 6] << 8 | levels[index % 6]
+    gray = 8 + (index - 232) * 10
+    return gray << 16 | gray << 8 | gray
+
+
+def ansi_color(color):
+    """把 ansi_parser 的颜色值转换为 QColor"""
+    rgb = color - RGB_BASE if color >= RGB_BASE else _palette_rgb(color)
+    return QColor((rgb >> 16) & 0xFF, (rgb >> 8) & 0xFF, rgb & 0xFF)
+
+
+class LogModel(QAbstractListModel):
+    """将 LogBuffer 以列表模型的形式提供给视图，视图只会请求可见行"""
+
+    def __init__(self, buffer, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        # 视图看到的行数只在 begin/endInsertRows 之间更新
+        self._row_count = 0
+        # 只显示匹配行时，视图中的行号 -> 缓冲区中的行号；为 None 时显示所有行
+        self.rows = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._row_count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.buffer.line(self.line_index(index.row()))
+        if role == ENTRY_ROLE:
+            return self.buffer.entry(self.line_index(index.row()))
+        return None
+
+    def line_index(self, row):
+        """视图中的行对应的缓冲区行号"""
+        return row if self.rows is None else self.rows[row]
+
+    def set_filter(self, rows):
+        """只显示缓冲区中的这些行（按行号递增）；rows 为 None 时恢复显示所有行"""
+        self.beginResetModel()
+        self.rows = None if rows is None else list(rows)
+        self._row_count = self.buffer.display_count() if rows is None else len(self.rows)
+        self.endResetModel()
+
+    def add_filtered(self, rows):
+        """只显示匹配行时，追加新找到的匹配行"""
+        if self.rows is None or not rows:
+            return
+        self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(rows) - 1)
+        self.rows.extend(rows)
+        self._row_count = len(self.rows)
+        self.endInsertRows()
+
+    def sync(self):
+        """缓冲区追加内容后调用：插入新行，并刷新被续写的最后一行"""
+        if self.rows is not None:
+            # 只显示匹配行时，新的行由搜索确认匹配后通过 add_filtered 加入
+            return
+        old_count = self._row_count
+        new_count = self.buffer.display_count()
+        if new_count < old_count:
+            # 未完成的行被擦除
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            self._row_count = new_count
+            self.endRemoveRows()
+            return
+        if old_count > 0:
+            last = self.index(old_count - 1)
+            self.dataChanged.emit(last, last)
+        if new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self._row_count = new_count
+            self.endInsertRows()
+
+    def reset(self):
+        self.beginResetModel()
+        self.buffer.clear()
+        self.rows = None
+        self._row_count = 0
+        self.endResetModel()
+
+
+class AnsiDelegate(QStyledItemDelegate):
+    """绘制带样式的行；每种样式对应的字体和颜色只计算一次并缓存，无样式的行按默认方式绘制"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._formats = {}
+
+    def clear_cache(self):
+        self._formats.clear()
+
+    def _format(self, style, font):
+        fmt = self._formats.get(style)
+        if fmt is None:
+            fg, bg, flags = style or (None, None, 0)
+            font = QFont(font)
+            font.setBold(bool(flags & BOLD))
+            font.setItalic(bool(flags & ITALIC))
+            font.setUnderline(bool(flags & UNDERLINE))
+            font.setStrikeOut(bool(flags & STRIKE))
+            fg_color = ansi_color(fg) if fg is not None else None
+            if fg_color is not None and flags & DIM:
+                fg_color.setAlpha(160)
+            bg_color = ansi_color(bg) if bg is not None else None
+            fmt = (font, QFontMetrics(font), fg_color, bg_color, bool(flags & INVERSE))
+            self._formats[style] = fmt
+        return fmt
+
+    def paint(self, painter, option, index):
+        entry = index.data(ENTRY_ROLE)
+        if entry is None or isinstance(entry, str):
+            super().paint(painter, option, index)
+            return
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        widget = opt.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        opt.text = ""
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, widget)
+        rect = style.subElementRect(QStyle.SubElement.SE_ItemViewItemText, opt, widget)
+        margin = style.pixelMetric(QStyle.PixelMetric.PM_FocusFrameHMargin, None, widget) + 1
+        selected = bool(opt.state & QStyle.StateFlag.State_Selected)
+        group = QPalette.ColorGroup.Normal
+        default_fg = opt.palette.color(
+            group, QPalette.ColorRole.HighlightedText if selected else QPalette.ColorRole.Text
+        )
+        default_bg = opt.palette.color(group, QPalette.ColorRole.Base)
+        painter.save()
+        x = rect.left() + margin
+        top, height = rect.top(), rect.height()
+        for text, span_style in entry:
+            font, metrics, fg, bg, inverse = self._format(span_style, opt.font)
+            fg = fg or default_fg
+            if inverse:
+                fg, bg = bg or default_bg, fg
+            width = metrics.horizontalAdvance(text)
+            span_rect = QRect(x, top, width, height)
+            if bg is not None:
+                painter.fillRect(span_rect, bg)
+            painter.setFont(font)
+            painter.setPen(fg)
+            painter.drawText(span_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+            x += width
+            if x > rect.right():
+                break
+        painter.restore()
+
+
+class LogView(QListView):
+    """虚拟化的输出视图：内存占用有上限，追加为常数时间，只渲染可见行"""
+
+    def __init__(self, max_lines=10000, parent=None, buffer=None):
+        super().__init__(parent)
+        # buffer 可以是任何提供 LogBuffer 读取接口的对象，例如执行历史的归档（run_history.ArchiveBuffer）
+        self.log_model = LogModel(buffer or LogBuffer(max_lines=max_lines), self)
+        self.setModel(self.log_model)
+        self.log_model.sync()
+        # 所有行高度相同，视图无需逐行测量
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        # 带颜色的行由委托按片段绘制
+        self.ansi_delegate = AnsiDelegate(self)
+        self.setItemDelegate(self.ansi_delegate)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+
+    def _at_bottom(self):
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum()
+
+    def append_text(self, text):
+        """追加一批原始输出；只有用户停留在底部时才自动滚动"""
+        follow = self._at_bottom()
+        self.log_model.buffer.append_text(text)
+        self.log_model.sync()
+        if follow:
+            self.scrollToBottom()
+
+    def append_output(self, lines, partial):
+        """追加解析器输出的一批行；partial 替换末尾未完成的行"""
+        follow = self._at_bottom()
+        self.log_model.buffer.append_output(lines, partial)
+        self.log_model.sync()
+        if follow:
+            self.scrollToBottom()
+
+    def append_line(self, line):
+        follow = self._at_bottom()
+        self.log_model.buffer.append_line(line)
+        self.log_model.sync()
+        if follow:
+            self.scrollToBottom()
+
+    def clear(self):
+        self.log_model.reset()
+
+    def show_line(self, line):
+        """选中并滚动到缓冲区中的某一行；只显示匹配行时该行必须在匹配结果中"""
+        model = self.log_model
+        row = line
+        if model.rows is not None:
+            row = bisect.bisect_left(model.rows, line)
+            if row >= len(model.rows) or model.rows[row] != line:
+                return
+        index = model.index(row)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QAbstractItemView.ScrollHint.PositionAtCenter)
+
+    def set_filter(self, rows):
+        self.log_model.set_filter(rows)
+
+    def add_filtered(self, rows):
+        follow = self._at_bottom()
+        self.log_model.add_filtered(rows)
+        if follow:
+            self.scrollToBottom()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == event.Type.FontChange:
+            self.ansi_delegate.clear_cache()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            model = self.log_model
+            QApplication.clipboard().setText(
+                "\n".join(model.buffer.line(model.line_index(r)) for r in rows)
+            )
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,150 @@
+# pipeline.py
+import heapq
+
+from execution_pool import RunSpec
+
+
+class PipelineError(Exception):
+    pass
+
+
+def _dependencies(item):
+    return item.get("depends_on") or []
+
+
+def find_cycle(ids, edges):
+    """edges 为 {id: [依赖的 id, ...]}；返回环上的 id 列表（首尾为同一个 id），没有环时返回 None"""
+    state = {}
+    for start in ids:
+        if start in state:
+            continue
+        # 迭代的深度优先搜索：state 为 1 表示在当前路径上，2 表示已经检查完
+        path = [start]
+        iters = [iter(edges.get(start, ()))]
+        state[start] = 1
+        while iters:
+            dep = next(iters[-1], None)
+            if dep is None:
+                state[path.pop()] = 2
+                iters.pop()
+            elif state.get(dep) == 1:
+                return path[path.index(dep):] + [dep]
+            elif dep not in state:
+                state[dep] = 1
+                path.append(dep)
+                iters.append(iter(edges.get(dep, ())))
+    return None
+
+
+def plan(selected_ids, items, profiles=None, include_dependencies=True, agents=None):
+    """把选中的项目排成流水线，返回 (执行列表, 依赖下标列表, 缺失的依赖)
+
+    items 为 {项目 id: 项目}。include_dependencies 为真时把依赖的项目（递归地）一起加入，
+    否则只保留选中项目之间的依赖。执行列表按拓扑顺序排列，同一层中保持选中的顺序。
+    依赖中存在环时抛出 PipelineError，此时什么都不会运行；引用已删除项目的依赖被忽略并在
+    缺失的依赖中列出 (项目, 依赖 id)。
+    设置了多个执行目标的项目在每个目标上各执行一次（见 RunSpec.for_targets），
+    依赖它的项目要等它在所有目标上都成功后才开始。
+    """
+    ids = []
+    seen = set()
+    missing = []
+    pending = list(dict.fromkeys(selected_ids))
+    while pending:
+        item_id = pending.pop(0)
+        if item_id in seen or item_id not in items:
+            continue
+        seen.add(item_id)
+        ids.append(item_id)
+        if include_dependencies:
+            pending.extend(_dependencies(items[item_id]))
+
+    edges = {}
+    for item_id in ids:
+        deps = []
+        for dep in _dependencies(items[item_id]):
+            if dep not in items:
+                missing.append((items[item_id], dep))
+            elif dep in seen and dep not in deps:
+                deps.append(dep)
+        edges[item_id] = deps
+
+    cycle = find_cycle(ids, edges)
+    if cycle is not None:
+        names = " → ".join(items[i].get("name", i) for i in reversed(cycle))
+        raise PipelineError(f"依赖中存在环: {names}")
+
+    # Kahn 拓扑排序；可以开始的项目中总是先取选中顺序靠前的
+    position = {item_id: n for n, item_id in enumerate(ids)}
+    waiting = {item_id: len(deps) for item_id, deps in edges.items()}
+    dependents = {item_id: [] for item_id in ids}
+    for item_id, deps in edges.items():
+        for dep in deps:
+            dependents[dep].append(item_id)
+    ready = [position[i] for i in ids if not waiting[i]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        item_id = ids[heapq.heappop(ready)]
+        order.append(item_id)
+        for dependent in dependents[item_id]:
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+                heapq.heappush(ready, position[dependent])
+    specs = []
+    dependencies = []
+    index = {}
+    for item_id in order:
+        item_specs = RunSpec.for_targets(items[item_id], profiles, agents)
+        deps = [n for d in edges[item_id] for n in index[d]]
+        index[item_id] = list(range(len(specs), len(specs) + len(item_specs)))
+        specs.extend(item_specs)
+        dependencies.extend([deps] * len(item_specs))
+    return specs, dependencies, missing
+
+
+def critical_path(batch):
+    """返回 (关键路径耗时, [Run, ...])：沿依赖关系耗时之和最长的一条执行链
+
+    它是并发数不受限时整个流水线的最短耗时；实际耗时明显更长时，说明增加并发数会有收益。
+    未运行的执行耗时按 0 计。batch.runs 需按拓扑顺序排列（见 plan）。
+    """
+    best = {}
+    for run in batch.runs:
+        previous = max(run.depends_on, key=lambda d: best[d.run_id][0], default=None)
+        total = (run.duration or 0.0) + (best[previous.run_id][0] if previous else 0.0)
+        best[run.run_id] = (total, previous)
+    if not best:
+        return 0.0, []
+    run = max(batch.runs, key=lambda r: best[r.run_id][0])
+    total = best[run.run_id][0]
+    path = []
+    while run is not None:
+        path.append(run)
+        run = best[run.run_id][1]
+    path.reverse()
+    return total, path
+
+
+def report(batch):
+    """流水线结束后的统计：实际耗时、各执行耗时之和与关键路径"""
+    started = [r for r in batch.runs if r.start_time is not None]
+    elapsed = 0.0
+    if started:
+        elapsed = max(r.end_time or r.start_time for r in started) - min(
+            r.start_time for r in started
+        )
+    total, path = critical_path(batch)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "serial_s": round(sum(r.duration or 0.0 for r in started), 3),
+        "critical_path_s": round(total, 3),
+        "critical_path": [r.spec.name for r in path],
+    }
+
+
+def format_report(stats):
+    return (
+        f"流水线耗时 {stats['elapsed_s']:.2f}s，各步骤合计 {stats['serial_s']:.2f}s，"
+        f"关键路径 {stats['critical_path_s']:.2f}s: " + " → ".join(stats["critical_path"])
+    )
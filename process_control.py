@@ -0,0 +1,263 @@
+# process_control.py
+import asyncio
+import os
+import signal
+import sys
+import time
+
+# 发出终止信号后等待进程自行退出的时间（秒），超时后强制结束
+GRACE_PERIOD = 3.0
+# 强制结束后确认进程树已全部退出的最长等待时间（秒）
+VERIFY_TIMEOUT = 2.0
+# /proc 进程表至少缓存这么久（秒），扫描本身较慢时按其耗时延长；同时取消大量执行时共用一次扫描
+PROC_CACHE_SECONDS = 0.02
+
+# (扫描完成时间, 扫描耗时, 进程表)
+_proc_cache = (0.0, 0.0, None)
+_children_cache = (None, None)
+
+
+def _proc_table():
+    """Linux 上返回 {pid: (ppid, 进程组, 状态)}，其他系统返回 None"""
+    global _proc_cache
+    now = time.monotonic()
+    stamp, cost, table = _proc_cache
+    if table is not None and now - stamp < max(PROC_CACHE_SECONDS, cost * 5):
+        return table
+    if not os.path.isdir("/proc/self"):
+        return None
+    table = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能含有空格和括号，从最后一个右括号之后开始解析
+        fields = stat[stat.rfind(b")") + 2:].split()
+        try:
+            table[int(name)] = (int(fields[1]), int(fields[2]), fields[0])
+        except (IndexError, ValueError):
+            continue
+    done = time.monotonic()
+    _proc_cache = (done, done - now, table)
+    return table
+
+
+def _running(pid):
+    """进程存在且不是僵尸进程（Linux）"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return False
+    return stat[stat.rfind(b")") + 2:stat.rfind(b")") + 3] != b"Z"
+
+
+def descendants(pid, table):
+    """进程表中 pid 的所有后代"""
+    global _children_cache
+    cached, children = _children_cache
+    if cached is not table:
+        children = {}
+        for child, (ppid, _, _) in table.items():
+            children.setdefault(ppid, []).append(child)
+        _children_cache = (table, children)
+    result = []
+    pending = list(children.get(pid, ()))
+    while pending:
+        child = pending.pop()
+        result.append(child)
+        pending.extend(children.get(child, ()))
+    return result
+
+
+class ProcessTree:
+    """一次执行启动的整棵进程树
+
+    POSIX 上子进程以独立的进程组启动（见 execution_pool.popen_kwargs），整组一起发信号；
+    Linux 上还会找出离开了该进程组的后代（例如调用了 setsid 的守护进程）单独处理。
+    Windows 上把进程加入一个作业对象，通过作业结束整棵树并确认其中已没有进程。
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self.pid = process.pid
+        # 开始终止时离开了进程组的后代，以及需要确认退出的进程
+        self._escaped = []
+        self._members = []
+        self._job = None
+        if sys.platform == "win32":
+            self._job = _WindowsJob.create(self.pid)
+
+    def close(self):
+        if self._job is not None:
+            self._job.close()
+            self._job = None
+
+    def alive(self):
+        """树中是否还有未退出的进程；僵尸进程视为已退出"""
+        if self._job is not None:
+            return self._job.active_processes() > 0
+        if sys.platform == "win32":
+            return self.process.returncode is None
+        try:
+            os.killpg(self.pid, 0)
+        except ProcessLookupError:
+            # 进程组已经没有任何进程（常见情况），只需再看离开了进程组的后代
+            return any(_running(pid) for pid in self._escaped)
+        except PermissionError:
+            return True
+        if not os.path.isdir("/proc/self"):
+            return True
+        # 进程组中只剩僵尸进程（没有被回收的孤儿进程）时也算已经退出。
+        # 先逐个检查开始终止时记下的进程，都退出后才扫描一次 /proc 确认没有新加入的进程
+        if any(_running(pid) for pid in self._members):
+            return True
+        table = _proc_table()
+        self._members = [
+            pid
+            for pid, (_, group, state) in table.items()
+            if state != b"Z" and (group == self.pid or pid in self._escaped)
+        ]
+        return bool(self._members)
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        for pid in self._escaped:
+            try:
+                os.kill(pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    async def _wait_gone(self, timeout):
+        """等待进程树退出，返回是否已全部退出"""
+        deadline = time.monotonic() + timeout
+        delay = 0.002
+        while self.alive():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        return True
+
+    async def terminate(self, grace=GRACE_PERIOD):
+        """先请求进程树退出，超过 grace 秒仍未退出则强制结束，最后确认所有进程都已退出
+
+        返回 {"graceful": 是否在宽限期内自行退出, "forced": 是否强制结束, "remaining": 是否仍有进程残留}
+        """
+        if sys.platform == "win32":
+            return await self._terminate_windows(grace)
+        table = _proc_table()
+        if table is not None:
+            tree = descendants(self.pid, table)
+            self._escaped = [pid for pid in tree if table[pid][1] != self.pid]
+            self._members = [self.pid] + tree
+        result = {"graceful": False, "forced": False, "remaining": False}
+        if grace > 0:
+            self._signal(signal.SIGTERM)
+            # 被暂停的进程收不到 SIGTERM，让它们继续运行以便处理信号
+            self._signal(signal.SIGCONT)
+            if await self._wait_gone(grace):
+                result["graceful"] = True
+                return result
+        self._signal(signal.SIGKILL)
+        result["forced"] = True
+        result["remaining"] = not await self._wait_gone(VERIFY_TIMEOUT)
+        return result
+
+    async def _terminate_windows(self, grace):
+        result = {"graceful": False, "forced": False, "remaining": False}
+        if grace > 0:
+            try:
+                # 进程以新的进程组启动；没有共享控制台时发送会失败，此时直接强制结束
+                os.kill(self.pid, signal.CTRL_BREAK_EVENT)
+            except OSError:
+                pass
+            else:
+                if await self._wait_gone(grace):
+                    result["graceful"] = True
+                    return result
+        result["forced"] = True
+        if self._job is not None:
+            self._job.terminate()
+        else:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        result["remaining"] = not await self._wait_gone(VERIFY_TIMEOUT)
+        return result
+
+
+class _WindowsJob:
+    """Windows 作业对象：加入其中的进程及其之后创建的子进程可以一起结束"""
+
+    def __init__(self, kernel32, handle):
+        self.kernel32 = kernel32
+        self.handle = handle
+
+    @classmethod
+    def create(cls, pid):
+        """创建作业并加入进程，失败时返回 None（之后退回到只结束该进程）"""
+        import ctypes
+        from ctypes import wintypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        job = kernel32.CreateJobObjectW(None, None)
+        if not job:
+            return None
+        # PROCESS_TERMINATE | PROCESS_SET_QUOTA
+        process = kernel32.OpenProcess(0x0001 | 0x0100, False, pid)
+        ok = bool(process) and kernel32.AssignProcessToJobObject(
+            wintypes.HANDLE(job), wintypes.HANDLE(process)
+        )
+        if process:
+            kernel32.CloseHandle(wintypes.HANDLE(process))
+        if not ok:
+            kernel32.CloseHandle(wintypes.HANDLE(job))
+            return None
+        # 进程在加入作业之前就已启动，这期间创建的子进程不在作业中
+        return cls(kernel32, job)
+
+    def active_processes(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class BasicAccounting(ctypes.Structure):
+            _fields_ = [
+                ("TotalUserTime", ctypes.c_int64),
+                ("TotalKernelTime", ctypes.c_int64),
+                ("ThisPeriodTotalUserTime", ctypes.c_int64),
+                ("ThisPeriodTotalKernelTime", ctypes.c_int64),
+                ("TotalPageFaultCount", wintypes.DWORD),
+                ("TotalProcesses", wintypes.DWORD),
+                ("ActiveProcesses", wintypes.DWORD),
+                ("TotalTerminatedProcesses", wintypes.DWORD),
+            ]
+
+        info = BasicAccounting()
+        # JobObjectBasicAccountingInformation
+        if not self.kernel32.QueryInformationJobObject(
+            wintypes.HANDLE(self.handle), 1, ctypes.byref(info), ctypes.sizeof(info), None
+        ):
+            return 0
+        return info.ActiveProcesses
+
+    def terminate(self):
+        from ctypes import wintypes
+
+        self.kernel32.TerminateJobObject(wintypes.HANDLE(self.handle), 1)
+
+    def close(self):
+        from ctypes import wintypes
+
+        self.kernel32.CloseHandle(wintypes.HANDLE(self.handle))
@@ -0,0 +1,496 @@
+# remote_agent.py
+# 用法: python -m remote_agent [--bind 地址] [--port 端口] [--token 令牌] [-j 最大并发数] [--grace 秒]
+# 在执行主机上运行的代理：接受执行请求，在本机运行命令并把输出流式发回。在界面的“主机”菜单或
+# data.json 的 "agents" 中添加它之后，项目可以同时在多台主机上执行（见 RunSpec.for_targets）。
+# 默认只监听 127.0.0.1；不指定 --token 时生成一个随机令牌并打印，连接时必须提供该令牌。
+# 令牌和输出都以明文传输，跨主机使用时应通过 SSH 隧道或可信网络。
+# 同一台机器上可以用不同端口运行多个代理来测试。
+import argparse
+import asyncio
+import codecs
+import hmac
+import itertools
+import json
+import os
+import secrets
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from data_manager import generate_id
+from execution_pool import build_shell_command, popen_kwargs
+from process_control import GRACE_PERIOD, VERIFY_TIMEOUT, ProcessTree
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7321
+# 帧：类型（1 字节）、通道号（4 字节）、负载长度（4 字节），网络字节序，之后是负载。
+# 通道 0 用于握手，每次执行使用客户端分配的一个新通道，同一连接上的多个执行互不阻塞
+_HEADER = struct.Struct("!BII")
+_CREDIT = struct.Struct("!I")
+MAX_PAYLOAD = 1 << 20
+HELLO = 1  # 客户端 → 代理：{"token", "version"}
+WELCOME = 2  # 代理 → 客户端：{"version", "host", "platform"}
+RUN = 3  # 客户端 → 代理：{"command", "shell", "working_dir", "env"}
+OUTPUT = 4  # 代理 → 客户端：一段输出，UTF-8 编码
+CREDIT = 5  # 客户端 → 代理：允许再发送的输出字节数
+CANCEL = 6  # 客户端 → 代理：{"grace"}，宽限期为 0 时立即强制结束
+EXIT = 7  # 代理 → 客户端：{"return_code", "cancel"}，该通道结束
+ERROR = 8  # 代理 → 客户端：{"message"}；通道 0 上出错后连接被关闭
+# 每个通道的发送窗口：代理最多发出这么多客户端尚未处理的输出，之后暂停读取子进程的输出，
+# 子进程写满管道后随之阻塞；客户端处理了半个窗口并且界面跟得上时补充额度
+WINDOW = 256 * 1024
+READ_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 5.0
+# 客户端没有执行的连接保持这么久（秒）后关闭
+IDLE_TIMEOUT = 60.0
+
+
+class AgentError(Exception):
+    pass
+
+
+def new_agent(name, host, port=DEFAULT_PORT, token=""):
+    return {"id": generate_id(), "name": name, "host": host, "port": port, "token": token}
+
+
+def pack(kind, channel, payload=b""):
+    return _HEADER.pack(kind, channel, len(payload)) + payload
+
+
+def pack_json(kind, channel, value):
+    return pack(kind, channel, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+async def read_frame(reader):
+    """返回 (类型, 通道号, 负载)；连接关闭时抛出 asyncio.IncompleteReadError"""
+    kind, channel, length = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if length > MAX_PAYLOAD:
+        raise AgentError(f"帧过大: {length} 字节")
+    return kind, channel, (await reader.readexactly(length) if length else b"")
+
+
+def _no_delay(writer):
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def check(target, timeout=CONNECT_TIMEOUT):
+    """同步地连接执行主机并完成握手，返回它的 {"version", "host", "platform"}；失败时抛出 AgentError"""
+    address = (target["host"], int(target.get("port", DEFAULT_PORT)))
+    try:
+        with socket.create_connection(address, timeout) as sock:
+            sock.sendall(
+                pack_json(HELLO, 0, {"token": target.get("token", ""), "version": PROTOCOL_VERSION})
+            )
+            stream = sock.makefile("rb")
+            header = stream.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise AgentError("连接被关闭")
+            kind, _, length = _HEADER.unpack(header)
+            reply = json.loads(stream.read(length) or b"{}")
+    except (OSError, ValueError) as e:
+        raise AgentError(f"无法连接 {address[0]}:{address[1]}: {e}") from None
+    if kind != WELCOME:
+        raise AgentError(reply.get("message", "握手失败"))
+    return reply
+
+
+class _AgentRun:
+    """代理上的一次执行：发送额度和终止状态"""
+
+    def __init__(self):
+        self.credit = WINDOW
+        self.credit_event = asyncio.Event()
+        self.tree = None
+        self.termination = None
+        # 进程启动前收到的取消请求的宽限期
+        self.cancel_grace = None
+        # 客户端已断开，之后的输出直接丢弃
+        self.closed = False
+
+    def add_credit(self, size):
+        self.credit += size
+        self.credit_event.set()
+
+
+class Agent:
+    """执行代理：每个连接可以同时进行多个执行，客户端断开后它的执行都被强制结束"""
+
+    def __init__(self, token, grace_period=GRACE_PERIOD, max_runs=0):
+        self.token = token
+        self.grace_period = grace_period
+        self.max_runs = max_runs
+        self._slots = None
+        self.stats = {"connections": 0, "runs": 0}
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """开始监听，返回 asyncio.Server"""
+        if self.max_runs:
+            self._slots = asyncio.Semaphore(self.max_runs)
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader, writer):
+        _no_delay(writer)
+        runs = {}
+        tasks = set()
+        try:
+            kind, _, payload = await asyncio.wait_for(read_frame(reader), CONNECT_TIMEOUT)
+            hello = json.loads(payload) if kind == HELLO else {}
+            token = str(hello.get("token", "")).encode("utf-8")
+            if not hmac.compare_digest(token, self.token.encode("utf-8")):
+                writer.write(pack_json(ERROR, 0, {"message": "令牌错误"}))
+                await writer.drain()
+                return
+            if hello.get("version") != PROTOCOL_VERSION:
+                writer.write(pack_json(ERROR, 0, {"message": "协议版本不一致，请升级执行主机上的代理"}))
+                await writer.drain()
+                return
+            writer.write(
+                pack_json(
+                    WELCOME,
+                    0,
+                    {"version": PROTOCOL_VERSION, "host": socket.gethostname(), "platform": sys.platform},
+                )
+            )
+            self.stats["connections"] += 1
+            while True:
+                kind, channel, payload = await read_frame(reader)
+                if kind == RUN and channel not in runs:
+                    state = runs[channel] = _AgentRun()
+                    task = asyncio.create_task(
+                        self._run(writer, channel, json.loads(payload), state, runs)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif kind == CREDIT and channel in runs:
+                    runs[channel].add_credit(_CREDIT.unpack(payload)[0])
+                elif kind == CANCEL and channel in runs:
+                    self._cancel(runs[channel], json.loads(payload).get("grace", self.grace_period))
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, AgentError, ValueError):
+            pass
+        finally:
+            # 客户端断开后没有人接收输出，也没有人能再取消这些执行
+            for state in runs.values():
+                state.closed = True
+                state.credit_event.set()
+                self._cancel(state, 0)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _run(self, writer, channel, request, state, runs):
+        try:
+            if self._slots is not None:
+                async with self._slots:
+                    frame = await self._execute(writer, channel, request, state)
+            else:
+                frame = await self._execute(writer, channel, request, state)
+        except Exception as e:
+            frame = pack_json(ERROR, channel, {"message": f"执行出错: {e}"})
+        finally:
+            runs.pop(channel, None)
+            if state.tree is not None:
+                state.tree.close()
+        await self._send(writer, state, frame)
+
+    async def _send(self, writer, state, frame):
+        if state.closed:
+            return
+        try:
+            writer.write(frame)
+            await writer.drain()
+        except ConnectionError:
+            state.closed = True
+
+    async def _execute(self, writer, channel, request, state):
+        argv, encoding = build_shell_command(request.get("command", ""), request.get("shell", ""))
+        env = None
+        if request.get("env"):
+            env = dict(os.environ)
+            env.update(request["env"])
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=request.get("working_dir") or None,
+                env=env,
+                **popen_kwargs(),
+            )
+        except FileNotFoundError:
+            return pack_json(ERROR, channel, {"message": f"执行主机上找不到 '{argv[0]}'"})
+        self.stats["runs"] += 1
+        state.tree = ProcessTree(process)
+        if state.cancel_grace is not None:
+            self._cancel(state, state.cancel_grace)
+        # 输出统一以 UTF-8 发送，客户端不需要知道执行主机的控制台编码
+        decoder = None
+        if codecs.lookup(encoding).name != "utf-8":
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        while True:
+            # 终止开始后不再等待额度，否则客户端不再处理输出时进程退出后也读不到输出结束
+            while state.credit <= 0 and not state.closed and state.termination is None:
+                state.credit_event.clear()
+                await state.credit_event.wait()
+            size = READ_SIZE if state.credit <= 0 else min(READ_SIZE, state.credit)
+            chunk = await process.stdout.read(size)
+            if decoder is not None:
+                chunk = decoder.decode(chunk, final=not chunk).encode("utf-8")
+            if chunk:
+                state.credit -= len(chunk)
+                await self._send(writer, state, pack(OUTPUT, channel, chunk))
+            elif process.stdout.at_eof():
+                break
+        return_code = await process.wait()
+        cancel = None
+        termination = state.termination
+        while termination is not None:
+            cancel = await termination
+            termination = None if termination is state.termination else state.termination
+        return pack_json(EXIT, channel, {"return_code": return_code, "cancel": cancel})
+
+    def _cancel(self, state, grace):
+        if state.tree is None:
+            state.cancel_grace = grace if state.cancel_grace is None else min(grace, state.cancel_grace)
+            return
+        loop = asyncio.get_running_loop()
+        state.credit_event.set()
+        if state.termination is None:
+            state.termination = loop.create_task(state.tree.terminate(grace))
+        elif grace == 0:
+            forced = loop.create_task(state.tree.terminate(0))
+            state.termination = loop.create_task(_settle(state.termination, forced))
+
+
+async def _settle(graceful, forced):
+    await graceful
+    return await forced
+
+
+class RemoteRun:
+    """执行主机上的一次执行，接口与 process_control.ProcessTree 相同，取消时由执行主机终止进程树
+
+    on_output(输出块) 在事件循环中调用；busy() 为真（界面还没处理完之前的输出）时暂不补充额度，
+    之后调用 grant() 补充，执行主机随之暂停或继续读取输出。
+    """
+
+    def __init__(self, connection, channel, on_output, busy=None):
+        self.connection = connection
+        self.channel = channel
+        self.on_output = on_output
+        self.busy = busy or (lambda: False)
+        self.unacked = 0
+        self.result = asyncio.get_running_loop().create_future()
+
+    def alive(self):
+        return not self.result.done()
+
+    def close(self):
+        pass
+
+    async def wait(self):
+        """返回执行主机报告的 {"return_code", "cancel"}；连接断开或执行主机出错时抛出 AgentError"""
+        return await self.result
+
+    def grant(self):
+        if self.unacked >= WINDOW // 2 and not self.busy() and self.alive():
+            self.connection.send(pack(CREDIT, self.channel, _CREDIT.pack(self.unacked)))
+            self.unacked = 0
+
+    async def terminate(self, grace=GRACE_PERIOD):
+        if self.alive():
+            self.connection.send(pack_json(CANCEL, self.channel, {"grace": grace}))
+        try:
+            exit = await asyncio.wait_for(
+                asyncio.shield(self.result), grace + VERIFY_TIMEOUT + CONNECT_TIMEOUT
+            )
+        except AgentError:
+            # 连接已断开，执行主机会强制结束该连接上的所有执行
+            return {"graceful": False, "forced": True, "remaining": False}
+        except asyncio.TimeoutError:
+            return {"graceful": False, "forced": True, "remaining": True}
+        return exit.get("cancel") or {"graceful": True, "forced": False, "remaining": False}
+
+    def _output(self, data):
+        self.on_output(data)
+        self.unacked += len(data)
+        self.grant()
+
+    def _finish(self, exit=None, error=None):
+        if self.result.done():
+            return
+        if error is not None:
+            self.result.set_exception(AgentError(error))
+        else:
+            self.result.set_result(exit)
+
+
+class AgentConnection:
+    """到一个执行主机的连接；同一主机上的执行共用它，各占一个通道"""
+
+    def __init__(self, reader, writer, info):
+        self.reader = reader
+        self.writer = writer
+        self.info = info
+        self.channels = {}
+        self.closed = False
+        self.last_used = time.monotonic()
+        self._channel_ids = itertools.count(1)
+        self._reading = asyncio.get_running_loop().create_task(self._read())
+
+    @classmethod
+    async def open(cls, target):
+        host, port = target["host"], int(target.get("port", DEFAULT_PORT))
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), CONNECT_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise AgentError(f"无法连接执行主机 {host}:{port}: {e or '超时'}") from None
+        _no_delay(writer)
+        writer.write(
+            pack_json(HELLO, 0, {"token": target.get("token", ""), "version": PROTOCOL_VERSION})
+        )
+        try:
+            kind, _, payload = await asyncio.wait_for(read_frame(reader), CONNECT_TIMEOUT)
+            reply = json.loads(payload or b"{}")
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError):
+            writer.close()
+            raise AgentError(f"执行主机 {host}:{port} 没有完成握手") from None
+        if kind != WELCOME:
+            writer.close()
+            raise AgentError(f"执行主机 {host}:{port} 拒绝连接: {reply.get('message', '握手失败')}")
+        return cls(reader, writer, reply)
+
+    def start(self, request, on_output, busy=None):
+        """开始一次执行，返回 RemoteRun"""
+        if self.closed:
+            raise AgentError("与执行主机的连接已断开")
+        channel = next(self._channel_ids)
+        remote = RemoteRun(self, channel, on_output, busy)
+        self.channels[channel] = remote
+        self.send(pack_json(RUN, channel, request))
+        return remote
+
+    def send(self, frame):
+        # 客户端只发送很小的控制帧，不需要等待写缓冲区排空
+        if not self.closed:
+            self.writer.write(frame)
+
+    def close(self):
+        self._reading.cancel()
+
+    async def _read(self):
+        try:
+            while True:
+                kind, channel, payload = await read_frame(self.reader)
+                remote = self.channels.get(channel)
+                if remote is None:
+                    continue
+                if kind == OUTPUT:
+                    remote._output(payload)
+                elif kind in (EXIT, ERROR):
+                    del self.channels[channel]
+                    self.last_used = time.monotonic()
+                    reply = json.loads(payload)
+                    if kind == EXIT:
+                        remote._finish(exit=reply)
+                    else:
+                        remote._finish(error=reply.get("message", "执行主机出错"))
+        except (asyncio.IncompleteReadError, ConnectionError, AgentError, ValueError):
+            pass
+        finally:
+            self.closed = True
+            for remote in self.channels.values():
+                remote._finish(error="与执行主机的连接已断开")
+            self.channels.clear()
+            self.writer.close()
+
+
+class AgentPool:
+    """按执行主机复用连接；连接断开后下一次执行重新连接，空闲超过 IDLE_TIMEOUT 的连接被关闭"""
+
+    def __init__(self):
+        self._connections = {}
+        self._connecting = {}
+        self._pruning = None
+
+    async def connection(self, target):
+        key = (target["host"], int(target.get("port", DEFAULT_PORT)), target.get("token", ""))
+        connection = self._connections.get(key)
+        if connection is not None and not connection.closed:
+            return connection
+        # 同时开始的多个执行只建立一个连接
+        connecting = self._connecting.get(key)
+        if connecting is None:
+            connecting = self._connecting[key] = asyncio.ensure_future(AgentConnection.open(target))
+            connecting.add_done_callback(lambda _, k=key: self._connecting.pop(k, None))
+        connection = await asyncio.shield(connecting)
+        self._connections[key] = connection
+        if self._pruning is None:
+            self._pruning = asyncio.get_running_loop().call_later(IDLE_TIMEOUT, self._prune)
+        return connection
+
+    def _prune(self):
+        self._pruning = None
+        now = time.monotonic()
+        for key, connection in list(self._connections.items()):
+            if connection.closed or (
+                not connection.channels and now - connection.last_used >= IDLE_TIMEOUT
+            ):
+                connection.close()
+                del self._connections[key]
+        if self._connections:
+            self._pruning = asyncio.get_running_loop().call_later(IDLE_TIMEOUT, self._prune)
+
+    async def close(self):
+        if self._pruning is not None:
+            self._pruning.cancel()
+            self._pruning = None
+        connections = list(self._connections.values())
+        self._connections.clear()
+        for connection in connections:
+            connection.close()
+        await asyncio.gather(*(c._reading for c in connections), return_exceptions=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m remote_agent", description="在本机接受执行请求，作为其他机器的执行主机"
+    )
+    parser.add_argument("--bind", default="127.0.0.1", help="监听的地址，默认只接受本机连接")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听的端口，默认 {DEFAULT_PORT}")
+    parser.add_argument("--token", help="连接时必须提供的令牌，默认随机生成")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="同时执行的最大数量，默认不限制")
+    parser.add_argument(
+        "--grace", type=float, default=GRACE_PERIOD, help="取消时等待进程自行退出的秒数"
+    )
+    args = parser.parse_args(argv)
+    token = args.token or os.environ.get("GUI_SHELL_AGENT_TOKEN") or secrets.token_urlsafe(18)
+    agent = Agent(token, grace_period=args.grace, max_runs=args.jobs)
+
+    async def serve():
+        server = await agent.start(args.bind, args.port)
+        addresses = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        print(f"执行代理已在 {addresses} 上监听", file=sys.stderr)
+        if not args.token and not os.environ.get("GUI_SHELL_AGENT_TOKEN"):
+            print(f"令牌: {token}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"无法监听 {args.bind}:{args.port}: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
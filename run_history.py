@@ -0,0 +1,501 @@
+# run_history.py
+import bisect
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from ansi_parser import line_text
+from data_manager import generate_id
+from log_buffer import encode_entry, decode_entry
+
+# 历史目录：索引数据库和每次执行一个的输出归档
+HISTORY_DIR = "history"
+INDEX_FILE = "history.db"
+ARCHIVE_SUFFIX = ".gslog"
+# 每个压缩块最多包含的行数和未压缩字节数
+CHUNK_LINES = 4096
+CHUNK_BYTES = 256 * 1024
+COMPRESS_LEVEL = 1
+# 程序退出时仍在运行的执行，下次启动时标记为该状态
+INTERRUPTED = "interrupted"
+
+# 归档格式：文件头，之后是若干 (块头 + zlib 压缩的行)，正常结束时在末尾追加块索引和文件尾。
+# 块头为 (标记, 压缩后字节数, 行数)，没有文件尾时（写入中途退出）通过依次跳过各块重建索引，无需解压。
+ARCHIVE_MAGIC = b"GSLOG1\n\0"
+INDEX_MAGIC = b"GSIDX1\n\0"
+CHUNK_MAGIC = b"GSCK"
+_CHUNK_HEADER = struct.Struct("<4sII")
+_INDEX_ENTRY = struct.Struct("<QI")
+_TRAILER = struct.Struct("<QI8s")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id TEXT,
+    name TEXT NOT NULL,
+    shell TEXT NOT NULL,
+    command TEXT NOT NULL,
+    status TEXT NOT NULL,
+    return_code INTEGER,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    lines INTEGER NOT NULL DEFAULT 0,
+    archive TEXT NOT NULL,
+    archive_bytes INTEGER NOT NULL DEFAULT 0,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_item ON runs(item_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+"""
+
+RUN_COLUMNS = (
+    "id", "item_id", "name", "shell", "command", "status", "return_code",
+    "started_at", "ended_at", "lines", "archive", "archive_bytes", "metrics",
+)
+
+
+class RetentionPolicy:
+    """历史保留策略：每个项目最多保留 max_runs 次，保留 max_days 天，归档总大小不超过 max_bytes
+
+    任一项为 None 或 0 表示不限制；超出时先删除最旧的记录。
+    """
+
+    def __init__(self, max_runs=100, max_days=30, max_bytes=2048 * 1024 * 1024):
+        self.max_runs = max_runs
+        self.max_days = max_days
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls, data):
+        """从 data.json 的设置项构造保留策略"""
+        max_mb = data.get("history_max_mb", 2048)
+        return cls(
+            max_runs=data.get("history_max_runs", 100),
+            max_days=data.get("history_max_days", 30),
+            max_bytes=max_mb * 1024 * 1024 if max_mb else None,
+        )
+
+
+class ArchiveWriter:
+    """把行记录按块压缩后追加到归档文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(ARCHIVE_MAGIC)
+        self.index = []
+        self.lines = 0
+        self._pending = []
+        self._pending_bytes = 0
+
+    def append(self, entries):
+        for entry in entries:
+            data = encode_entry(entry)
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            if len(self._pending) >= CHUNK_LINES or self._pending_bytes >= CHUNK_BYTES:
+                self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._pending:
+            return
+        raw = ("\n".join(self._pending) + "\n").encode("utf-8", "replace")
+        data = zlib.compress(raw, COMPRESS_LEVEL)
+        self.index.append((self.file.tell(), len(self._pending)))
+        self.file.write(_CHUNK_HEADER.pack(CHUNK_MAGIC, len(data), len(self._pending)))
+        self.file.write(data)
+        # 让正在查看该执行的读取者能看到已完成的块
+        self.file.flush()
+        self.lines += len(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+
+    def close(self):
+        """写入剩余的行和块索引，返回归档大小"""
+        self._write_chunk()
+        index_offset = self.file.tell()
+        for offset, count in self.index:
+            self.file.write(_INDEX_ENTRY.pack(offset, count))
+        self.file.write(_TRAILER.pack(index_offset, len(self.index), INDEX_MAGIC))
+        size = self.file.tell()
+        self.file.close()
+        return size
+
+
+class ArchiveReader:
+    """按行号随机读取归档，只解压需要的块，最近用过的块缓存在内存中"""
+
+    def __init__(self, path, cache_chunks=8):
+        self.path = path
+        self.cache_chunks = cache_chunks
+        self.file = open(path, "rb")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        """读取块索引：有文件尾时直接读取，否则逐块跳过重建"""
+        if self.file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+            raise ValueError(f"{self.path} 不是执行历史归档")
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        index = None
+        if size >= len(ARCHIVE_MAGIC) + _TRAILER.size:
+            self.file.seek(size - _TRAILER.size)
+            index_offset, count, magic = _TRAILER.unpack(self.file.read(_TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(index_offset)
+                data = self.file.read(count * _INDEX_ENTRY.size)
+                index = list(_INDEX_ENTRY.iter_unpack(data))
+        if index is None:
+            index = []
+            offset = len(ARCHIVE_MAGIC)
+            while offset + _CHUNK_HEADER.size <= size:
+                self.file.seek(offset)
+                magic, length, count = _CHUNK_HEADER.unpack(self.file.read(_CHUNK_HEADER.size))
+                if magic != CHUNK_MAGIC or offset + _CHUNK_HEADER.size + length > size:
+                    # 最后一块没有写完整，或者已经到了不完整的块索引
+                    break
+                index.append((offset, count))
+                offset += _CHUNK_HEADER.size + length
+        self.offsets = [offset for offset, _ in index]
+        # 各块第一行的行号
+        self.starts = []
+        total = 0
+        for _, count in index:
+            self.starts.append(total)
+            total += count
+        self.total = total
+
+    def line_count(self):
+        return self.total
+
+    def entry(self, index):
+        number = self._chunk_number(index)
+        return self._chunk(number)[index - self.starts[number]]
+
+    def _chunk_number(self, index):
+        # 按字节数提前结束的块少于 CHUNK_LINES 行，因此按各块的起始行号二分查找
+        return bisect.bisect_right(self.starts, index) - 1
+
+    def texts(self, start, end):
+        """取第 start 到 end-1 行的文本，逐块解压"""
+        end = min(end, self.total)
+        result = []
+        index = start
+        while index < end:
+            number = self._chunk_number(index)
+            chunk = self._chunk(number)
+            offset = index - self.starts[number]
+            count = min(len(chunk) - offset, end - index)
+            result.extend(line_text(entry) for entry in chunk[offset:offset + count])
+            index += count
+        return result
+
+    def _chunk(self, number):
+        with self._lock:
+            chunk = self._cache.get(number)
+            if chunk is not None:
+                self._cache.move_to_end(number)
+                return chunk
+            self.file.seek(self.offsets[number])
+            _, length, _ = _CHUNK_HEADER.unpack(self.file.read(_CHUNK_HEADER.size))
+            raw = zlib.decompress(self.file.read(length)).decode("utf-8", "replace")
+            chunk = [decode_entry(text) for text in raw.split("\n")[:-1]]
+            self._cache[number] = chunk
+            if len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+            return chunk
+
+    def close(self):
+        self.file.close()
+
+
+class ArchiveBuffer:
+    """以 LogBuffer 的读取接口提供归档内容，供 output_view.LogModel 显示历史输出"""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def line_count(self):
+        return self.reader.line_count()
+
+    def display_count(self):
+        return self.reader.line_count()
+
+    def partial(self):
+        return ""
+
+    def entry(self, index):
+        return self.reader.entry(index)
+
+    def line(self, index):
+        return line_text(self.entry(index))
+
+    def texts(self, start, end):
+        return self.reader.texts(start, end)
+
+    def clear(self):
+        self.reader.close()
+
+    def close(self):
+        self.reader.close()
+
+
+class HistoryStore:
+    """执行历史：每次执行的记录写入 SQLite 索引，完整输出写入压缩归档
+
+    begin/append/finish 只把操作放入队列后立即返回，可在执行池的事件循环线程中调用；
+    压缩和写入在后台线程完成。on_recorded(记录) 在一次执行的记录写完后于后台线程中调用。
+    """
+
+    def __init__(self, directory=HISTORY_DIR, retention=None, on_recorded=None):
+        self.directory = directory
+        self.retention = retention or RetentionPolicy()
+        self.on_recorded = on_recorded
+        os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+        # 上次退出时未结束的执行
+        self._conn.execute("UPDATE runs SET status = ? WHERE status = 'running'", (INTERRUPTED,))
+        self._conn.commit()
+        self._read_conn = None
+        self._read_lock = threading.Lock()
+        self._writers = {}
+        self._partials = {}
+        self._pending = []
+        self._closed = False
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="RunHistory", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.directory, INDEX_FILE), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def archive_path(self, record):
+        return os.path.join(self.directory, record["archive"])
+
+    # 以下方法可在任意线程调用
+
+    def begin(self, run):
+        spec = run.spec
+        record = {
+            "item_id": spec.item_id,
+            "name": spec.name,
+            "shell": spec.shell,
+            "command": spec.command,
+            "started_at": run.start_time,
+            "archive": generate_id() + ARCHIVE_SUFFIX,
+        }
+        self._post(("begin", run.run_id, record))
+
+    def append(self, run, lines, partial):
+        """lines 为新完成的行，partial 为当前未完成的行（执行结束时补记）"""
+        self._post(("append", run.run_id, (list(lines), partial)))
+
+    def finish(self, run):
+        self._post(
+            (
+                "finish",
+                run.run_id,
+                {
+                    "status": run.status,
+                    "return_code": run.return_code,
+                    "ended_at": run.end_time,
+                    "metrics": run.metrics,
+                },
+            )
+        )
+
+    def set_retention(self, retention):
+        self._post(("retention", None, retention))
+
+    def clear(self):
+        """删除全部历史记录和归档"""
+        self._post(("clear", None, None))
+
+    def _post(self, op):
+        with self._cond:
+            if self._closed:
+                return
+            self._pending.append(op)
+            self._cond.notify_all()
+
+    def list_runs(self, item_id=None, limit=200):
+        """按开始时间倒序返回执行记录；item_id 为 None 时返回所有项目的记录"""
+        query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs"
+        params = ()
+        if item_id is not None:
+            query += " WHERE item_id = ?"
+            params = (item_id,)
+        query += " ORDER BY started_at DESC, id DESC LIMIT ?"
+        with self._read_lock:
+            if self._read_conn is None:
+                self._read_conn = sqlite3.connect(
+                    os.path.join(self.directory, INDEX_FILE), check_same_thread=False
+                )
+            rows = self._read_conn.execute(query, params + (limit,)).fetchall()
+        records = []
+        for row in rows:
+            record = dict(zip(RUN_COLUMNS, row))
+            record["metrics"] = json.loads(record["metrics"]) if record["metrics"] else None
+            records.append(record)
+        return records
+
+    def open_archive(self, record):
+        """打开一次执行的归档，返回 ArchiveReader；仍在运行的执行只能读到已写完的块"""
+        return ArchiveReader(self.archive_path(record))
+
+    def flush(self, timeout=None):
+        """等待已提交的操作全部写入"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._read_conn is not None:
+            self._read_conn.close()
+
+    # 以下方法只在后台线程中调用
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    break
+                ops, self._pending = self._pending, []
+                self._busy = True
+            recorded = []
+            try:
+                for op, run_id, payload in ops:
+                    record = self._apply(op, run_id, payload)
+                    if record is not None:
+                        recorded.append(record)
+                if recorded:
+                    self._enforce_retention()
+                self._conn.commit()
+            except (OSError, sqlite3.Error):
+                # 历史只用于回看，写入失败不影响执行
+                pass
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+            if self.on_recorded is not None:
+                for record in recorded:
+                    self.on_recorded(record)
+        # 退出时仍在运行的执行保留已写入的部分，状态在下次启动时标记为中断
+        for writer, _ in self._writers.values():
+            writer.close()
+        self._conn.close()
+
+    def _apply(self, op, run_id, payload):
+        if op == "begin":
+            cur = self._conn.execute(
+                "INSERT INTO runs (item_id, name, shell, command, status, started_at, archive) "
+                "VALUES (?, ?, ?, ?, 'running', ?, ?)",
+                (
+                    payload["item_id"], payload["name"], payload["shell"],
+                    payload["command"], payload["started_at"], payload["archive"],
+                ),
+            )
+            writer = ArchiveWriter(os.path.join(self.directory, payload["archive"]))
+            self._writers[run_id] = (writer, cur.lastrowid)
+        elif op == "append":
+            entry = self._writers.get(run_id)
+            if entry is not None:
+                lines, self._partials[run_id] = payload
+                entry[0].append(lines)
+        elif op == "finish":
+            entry = self._writers.pop(run_id, None)
+            if entry is None:
+                return None
+            writer, history_id = entry
+            partial = self._partials.pop(run_id, "")
+            if partial:
+                writer.append([partial])
+            size = writer.close()
+            self._conn.execute(
+                "UPDATE runs SET status = ?, return_code = ?, ended_at = ?, lines = ?, "
+                "archive_bytes = ?, metrics = ? WHERE id = ?",
+                (
+                    payload["status"], payload["return_code"], payload["ended_at"],
+                    writer.lines, size,
+                    json.dumps(payload["metrics"], ensure_ascii=False) if payload["metrics"] else None,
+                    history_id,
+                ),
+            )
+            return self._record(history_id)
+        elif op == "retention":
+            self.retention = payload
+            self._enforce_retention()
+        elif op == "clear":
+            rows = self._conn.execute(
+                "SELECT id, archive FROM runs WHERE status != 'running'"
+            ).fetchall()
+            self._delete(rows)
+        return None
+
+    def _record(self, history_id):
+        row = self._conn.execute(
+            f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE id = ?", (history_id,)
+        ).fetchone()
+        record = dict(zip(RUN_COLUMNS, row))
+        record["metrics"] = json.loads(record["metrics"]) if record["metrics"] else None
+        return record
+
+    def _enforce_retention(self):
+        policy = self.retention
+        doomed = []
+        # 只清理已结束或中断的执行，正在写入的归档不受影响
+        if policy.max_runs:
+            doomed += self._conn.execute(
+                "SELECT id, archive FROM ("
+                " SELECT id, archive, ROW_NUMBER() OVER ("
+                "  PARTITION BY item_id ORDER BY started_at DESC, id DESC) AS n"
+                " FROM runs WHERE status != 'running'"
+                ") WHERE n > ?",
+                (policy.max_runs,),
+            ).fetchall()
+        if policy.max_days:
+            doomed += self._conn.execute(
+                "SELECT id, archive FROM runs WHERE status != 'running' AND started_at < ?",
+                (time.time() - policy.max_days * 86400,),
+            ).fetchall()
+        self._delete(doomed)
+        if policy.max_bytes:
+            total = self._conn.execute("SELECT COALESCE(SUM(archive_bytes), 0) FROM runs").fetchone()[0]
+            if total > policy.max_bytes:
+                doomed = []
+                for row_id, archive, size in self._conn.execute(
+                    "SELECT id, archive, archive_bytes FROM runs WHERE status != 'running' "
+                    "ORDER BY started_at, id"
+                ):
+                    if total <= policy.max_bytes:
+                        break
+                    doomed.append((row_id, archive))
+                    total -= size
+                self._delete(doomed)
+
+    def _delete(self, rows):
+        if not rows:
+            return
+        self._conn.executemany("DELETE FROM runs WHERE id = ?", [(row_id,) for row_id, _ in rows])
+        for _, archive in rows:
+            try:
+                os.remove(os.path.join(self.directory, archive))
+            except OSError:
+                pass
@@ -0,0 +1,454 @@
+# run_metrics.py
+# 用法: python -m run_metrics [指标文件] [--item 项目id或名称] [--recent N] [--json]
+# 按项目汇总 metrics.jsonl 中的执行指标；最近 N 次的中位耗时明显高于之前的记录时标记为回归。
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import unicodedata
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，进程被回收后的资源占用无法补记
+    resource = None
+
+# 每次执行结束后追加一行 JSON 的指标文件
+METRICS_FILE = "metrics.jsonl"
+# 资源占用的采样间隔（秒）
+SAMPLE_INTERVAL = 0.2
+# 一次 /proc 扫描结果至少复用这么久（秒）；扫描本身较慢时按其耗时延长
+SCAN_REUSE_SECONDS = 0.02
+# 最近若干次的中位耗时超过之前中位耗时的该倍数时视为回归
+REGRESSION_RATIO = 1.5
+
+
+def _ms(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start) * 1000, 2)
+
+
+class ResourceSampler:
+    """定期采样各执行的进程树的 CPU 时间和内存占用
+
+    有 psutil 时使用它（各平台可用），否则在 Linux 上读取 /proc，其他平台不记录。
+    进程树按进程组识别（子进程以独立的进程组启动）；CPU 时间包含已被回收的子进程，
+    但采样之间刚结束的进程可能漏记，因此得到的是下限。峰值内存为各次采样中进程树常驻内存之和的最大值。
+    直接启动的进程结束后会立即被 asyncio 回收，之后 /proc 中就没有它了；回收后调用 reaped()，
+    从本进程回收的子进程累计的 CPU 时间（RUSAGE_CHILDREN）的增量补上最后一段，很短的执行也能记录。
+    内存无法这样补记（子进程的 ru_maxrss 包含 fork 时复制的本进程内存），第一次采样前就结束的进程没有内存数据。
+    只应在 ExecutionPool 的事件循环线程中使用。
+    """
+
+    def __init__(self):
+        self._tracked = {}
+        # 上一次读取的 RUSAGE_CHILDREN CPU 秒数，见 reaped()
+        self._children_cpu = _children_cpu()
+        if psutil is not None:
+            self.backend = "psutil"
+        elif os.path.isdir("/proc/self"):
+            self.backend = "proc"
+            self._tick = os.sysconf("SC_CLK_TCK")
+            self._page = os.sysconf("SC_PAGE_SIZE")
+            # (扫描完成时间, 扫描耗时, 结果)
+            self._scan = (0.0, 0.0, {})
+        else:
+            self.backend = None
+
+    @property
+    def available(self):
+        return self.backend is not None
+
+    @property
+    def active(self):
+        return bool(self._tracked)
+
+    def start(self, key, pid):
+        """开始跟踪以 pid 为首的进程树；复用的会话在开始前已有的 CPU 时间不计入本次"""
+        if self.backend is None:
+            return
+        if not self._tracked:
+            # 没有其他执行时，之前回收的子进程（例如关闭的会话）都与之后的执行无关
+            self._children_cpu = _children_cpu()
+        state = {"pid": pid, "base_cpu": None, "cpu": None, "peak_rss": 0, "reaped": False}
+        self._tracked[key] = state
+        # 缓存的扫描中没有该进程时，扫描早于进程启动，必须重新扫描
+        self._update({key: state}, fresh=True)
+        state["base_cpu"] = state["cpu"]
+
+    def awaiting_reap(self, key):
+        """该执行仍在跟踪、其进程尚未调用 reaped()"""
+        state = self._tracked.get(key)
+        return state is not None and not state["reaped"]
+
+    def reaped(self, key, shared=False):
+        """直接启动的进程被回收后调用：把上次读取以来回收的子进程 CPU 时间记为该进程树的用量
+
+        shared 为真（同一时间段内还有其他执行的进程被回收）时无法区分各自的用量，只更新读数，
+        仍使用采样得到的下限。
+        """
+        before, self._children_cpu = self._children_cpu, _children_cpu()
+        state = self._tracked.get(key)
+        if state is None:
+            return
+        state["reaped"] = True
+        if before is None or self._children_cpu is None or shared:
+            return
+        # 新启动的进程开始时的 CPU 时间可以忽略，回收时的累计值就是整棵进程树的用量
+        state["cpu"] = max(state["cpu"] or 0.0, (state["base_cpu"] or 0.0) + self._children_cpu - before)
+
+    def stop(self, key):
+        """结束跟踪并返回 {"cpu_s", "peak_rss_kb"}；无法采样时返回空字典"""
+        state = self._tracked.get(key)
+        if state is None:
+            return {}
+        self._update({key: state})
+        del self._tracked[key]
+        if state["cpu"] is None:
+            return {}
+        return {
+            "cpu_s": round(max(0.0, state["cpu"] - (state["base_cpu"] or 0.0)), 3),
+            # 进程在第一次采样前就已结束时只有 CPU 时间
+            "peak_rss_kb": state["peak_rss"] // 1024 if state["peak_rss"] else None,
+        }
+
+    def sample(self):
+        if self._tracked:
+            self._update(self._tracked)
+
+    def _update(self, tracked, fresh=False):
+        if self.backend == "psutil":
+            for state in tracked.values():
+                usage = self._psutil_tree(state["pid"])
+                if usage is not None:
+                    self._record(state, *usage)
+        else:
+            usage = self._proc_usage()
+            if fresh and any(state["pid"] not in usage for state in tracked.values()):
+                usage = self._proc_usage(fresh=True)
+            for state in tracked.values():
+                if state["pid"] in usage:
+                    self._record(state, *usage[state["pid"]])
+
+    def _record(self, state, cpu, rss):
+        # 已结束的子进程从进程树中消失后，它们的 CPU 时间要等父进程回收才计入，取最大值避免倒退
+        state["cpu"] = cpu if state["cpu"] is None else max(state["cpu"], cpu)
+        state["peak_rss"] = max(state["peak_rss"], rss)
+
+    def _psutil_tree(self, pid):
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+        cpu = 0.0
+        rss = 0
+        for process in processes:
+            try:
+                times = process.cpu_times()
+                cpu += times.user + times.system
+                cpu += getattr(times, "children_user", 0.0) + getattr(times, "children_system", 0.0)
+                rss += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return cpu, rss
+
+    def _proc_usage(self, fresh=False):
+        """最近一次 /proc 扫描的结果；大量执行同时启动或结束时共用同一次扫描，不为每个执行各扫描一次"""
+        now = time.monotonic()
+        stamp, cost, usage = self._scan
+        if not fresh and now - stamp < max(SCAN_REUSE_SECONDS, cost * 5):
+            return usage
+        usage = self._proc_groups()
+        done = time.monotonic()
+        self._scan = (done, done - now, usage)
+        return usage
+
+    def _proc_groups(self):
+        """扫描一次 /proc，返回 {进程组 id: (CPU 秒数, 常驻内存字节数)}"""
+        ticks = {}
+        pages = {}
+        try:
+            names = os.listdir("/proc")
+        except OSError:
+            return {}
+        for name in names:
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "rb") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # 进程名可能含有空格和括号，从最后一个右括号之后开始解析
+            fields = stat[stat.rfind(b")") + 2:].split()
+            try:
+                group = int(fields[2])
+                # utime stime cutime cstime，cutime/cstime 为已回收子进程的累计时间
+                ticks[group] = ticks.get(group, 0) + sum(int(v) for v in fields[11:15])
+                pages[group] = pages.get(group, 0) + int(fields[21])
+            except (IndexError, ValueError):
+                continue
+        return {
+            group: (ticks[group] / self._tick, pages[group] * self._page) for group in ticks
+        }
+
+
+def _children_cpu():
+    """本进程已回收的全部子进程（及其回收的后代）的 CPU 秒数；不支持时返回 None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def build_metrics(run, resources=None):
+    """根据执行记录的时间点和统计计算指标，返回可写入指标文件的字典"""
+    timing = run.timing
+    stats = run.stats
+    start = timing.get("start")
+    end = timing.get("end")
+    wall = (end - start) if start is not None and end is not None else None
+    metrics = {
+        "ts": round(run.end_time or time.time(), 3),
+        "item_id": run.spec.item_id,
+        "name": run.spec.name,
+        "shell": run.spec.shell,
+        "target": run.spec.target["name"] if run.spec.target else None,
+        "status": run.status,
+        "return_code": run.return_code,
+        "session": timing.get("session", False),
+        "queue_ms": _ms(timing.get("submitted"), start),
+        "env_ms": _ms(timing.get("env_start"), timing.get("env_end")),
+        "spawn_ms": _ms(timing.get("spawn_start"), timing.get("spawned")),
+        "first_byte_ms": _ms(timing.get("spawned"), timing.get("first_byte")),
+        "wall_ms": _ms(start, end),
+        "bytes": stats["bytes"],
+        "lines": stats["lines"],
+        "bytes_per_s": round(stats["bytes"] / wall) if wall else None,
+        "lines_per_s": round(stats["lines"] / wall) if wall else None,
+        "ui_batches": stats["batches"],
+        "ui_max_pending": stats["max_pending"],
+        "ui_max_latency_ms": round(stats["max_ui_latency"] * 1000, 2),
+        "dropped_bytes": stats["dropped_bytes"],
+        "cpu_s": None,
+        "peak_rss_kb": None,
+        # 从请求取消到整棵进程树退出的时间，以及是否超过宽限期被强制结束
+        "cancel_ms": _ms(timing.get("cancel"), end) if run.cancel_result else None,
+        "cancel_forced": run.cancel_result["forced"] if run.cancel_result else None,
+    }
+    metrics.update(resources or {})
+    return metrics
+
+
+def _size(value):
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024.0
+    return f"{value:.1f} GB"
+
+
+def _duration(ms):
+    return f"{ms:.0f} 毫秒" if ms < 1000 else f"{ms / 1000:.2f}s"
+
+
+def format_metrics(metrics):
+    """一行文字描述一次执行的指标，用于状态栏和编辑页"""
+    parts = []
+    if metrics.get("wall_ms") is not None:
+        parts.append(f"耗时 {_duration(metrics['wall_ms'])}")
+    if metrics.get("spawn_ms") is not None:
+        label = "取得会话" if metrics.get("session") else "启动"
+        parts.append(f"{label} {_duration(metrics['spawn_ms'])}")
+    if metrics.get("first_byte_ms") is not None:
+        parts.append(f"首字节 {_duration(metrics['first_byte_ms'])}")
+    if metrics.get("bytes"):
+        rate = ""
+        if metrics.get("bytes_per_s") is not None:
+            rate = f"（{_size(metrics['bytes_per_s'])}/s, {metrics['lines_per_s']} 行/s）"
+        parts.append(f"输出 {_size(metrics['bytes'])}, {metrics['lines']} 行{rate}")
+    if metrics.get("cpu_s") is not None:
+        parts.append(f"CPU {metrics['cpu_s']:.2f}s")
+    if metrics.get("peak_rss_kb"):
+        parts.append(f"峰值内存 {_size(metrics['peak_rss_kb'] * 1024)}")
+    # 只有一批在途是正常情况，两批以上说明界面跟不上输出
+    if (metrics.get("ui_max_pending") or 0) > 1:
+        parts.append(
+            f"界面积压最多 {metrics['ui_max_pending']} 批（最长 {_duration(metrics['ui_max_latency_ms'])}）"
+        )
+    if metrics.get("dropped_bytes"):
+        parts.append(f"丢弃 {_size(metrics['dropped_bytes'])}")
+    if metrics.get("cancel_ms") is not None:
+        how = "强制结束" if metrics.get("cancel_forced") else "自行退出"
+        parts.append(f"取消后 {_duration(metrics['cancel_ms'])} {how}")
+    return ", ".join(parts)
+
+
+class MetricsLog:
+    """把每次执行的指标追加到 JSON lines 文件；可在任意线程调用"""
+
+    def __init__(self, path=METRICS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, metrics):
+        line = json.dumps(metrics, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                # 指标只用于分析，写不了磁盘时不影响执行
+                pass
+
+    def read(self, tail_bytes=None):
+        """读取全部记录；tail_bytes 不为 None 时只读取文件末尾的这么多字节"""
+        try:
+            with open(self.path, "rb") as f:
+                if tail_bytes is not None:
+                    f.seek(0, os.SEEK_END)
+                    size = f.tell()
+                    f.seek(max(0, size - tail_bytes))
+                    if size > tail_bytes:
+                        # 丢弃被截断的第一行
+                        f.readline()
+                data = f.read()
+        except OSError:
+            return []
+        records = []
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def latest(self, tail_bytes=1024 * 1024):
+        """返回 {项目 id: 最近一次的指标}，只读取文件末尾"""
+        latest = {}
+        for record in self.read(tail_bytes):
+            if record.get("item_id"):
+                latest[record["item_id"]] = record
+        return latest
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def _percentile(values, fraction):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def aggregate(records, recent=5):
+    """按项目汇总指标，返回按名称排序的列表
+
+    regression 为最近 recent 次成功执行的中位耗时与之前成功执行的中位耗时之比，
+    超过 REGRESSION_RATIO 时 regressed 为真；记录不足时为 None。
+    """
+    by_item = {}
+    for record in records:
+        key = record.get("item_id") or record.get("name", "")
+        by_item.setdefault(key, []).append(record)
+    summary = []
+    for key, runs in by_item.items():
+        ok = [r for r in runs if r.get("status") == "finished"]
+        walls = [r.get("wall_ms") for r in ok]
+        regression = None
+        if len(walls) > recent:
+            before = _median(walls[:-recent])
+            after = _median(walls[-recent:])
+            if before and after:
+                regression = round(after / before, 2)
+        summary.append(
+            {
+                "item_id": runs[-1].get("item_id"),
+                "name": runs[-1].get("name", ""),
+                "runs": len(runs),
+                "failed": len(runs) - len(ok),
+                "wall_ms_median": _median(walls),
+                "wall_ms_p95": _percentile(walls, 0.95),
+                "spawn_ms_median": _median([r.get("spawn_ms") for r in ok]),
+                "first_byte_ms_median": _median([r.get("first_byte_ms") for r in ok]),
+                "bytes_per_s_median": _median([r.get("bytes_per_s") for r in ok]),
+                "cpu_s_median": _median([r.get("cpu_s") for r in ok]),
+                "peak_rss_kb_max": max(
+                    (r["peak_rss_kb"] for r in ok if r.get("peak_rss_kb") is not None), default=None
+                ),
+                "regression": regression,
+                "regressed": regression is not None and regression >= REGRESSION_RATIO,
+            }
+        )
+    summary.sort(key=lambda s: s["name"])
+    return summary
+
+
+def _pad(text, width, right=True):
+    """按显示宽度补齐，中文等全角字符占两列"""
+    shown = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+    fill = " " * max(0, width - shown)
+    return fill + text if right else text + fill
+
+
+def _cell(value, digits=0):
+    if value is None:
+        return "-"
+    return f"{value:.{digits}f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m run_metrics", description="按项目汇总执行指标，发现耗时回归"
+    )
+    parser.add_argument("path", nargs="?", default=METRICS_FILE, help="指标文件，默认 metrics.jsonl")
+    parser.add_argument("--item", help="只汇总该项目（id 或名称）")
+    parser.add_argument("--recent", type=int, default=5, help="与之前记录比较的最近执行次数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    args = parser.parse_args(argv)
+    records = MetricsLog(args.path).read()
+    if args.item:
+        records = [r for r in records if args.item in (r.get("item_id"), r.get("name"))]
+    summary = aggregate(records, max(1, args.recent))
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        return 1 if any(s["regressed"] for s in summary) else 0
+    if not summary:
+        print(f"{args.path} 中没有执行记录", file=sys.stderr)
+        return 0
+    widths = (6, 6, 12, 10, 10, 10, 8, 10)
+    header = ("次数", "失败", "中位耗时ms", "P95 ms", "启动 ms", "首字节ms", "CPU s", "峰值 KB")
+    print(_pad("项目", 24, right=False) + "".join(map(_pad, header, widths)) + "  回归")
+    for s in summary:
+        flag = ""
+        if s["regression"] is not None:
+            flag = f"{s['regression']:.2f}x" + (" ←" if s["regressed"] else "")
+        cells = (
+            str(s["runs"]),
+            str(s["failed"]),
+            _cell(s["wall_ms_median"]),
+            _cell(s["wall_ms_p95"]),
+            _cell(s["spawn_ms_median"], 1),
+            _cell(s["first_byte_ms_median"], 1),
+            _cell(s["cpu_s_median"], 2),
+            _cell(s["peak_rss_kb_max"]),
+        )
+        print(_pad(s["name"][:24], 24, right=False) + "".join(map(_pad, cells, widths)) + f"  {flag}")
+    return 1 if any(s["regressed"] for s in summary) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
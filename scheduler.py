@@ -0,0 +1,403 @@
+# scheduler.py
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+# 错过的执行（例如休眠期间到期）的处理方式：补执行一次，或者跳过
+CATCH_UP = "catch_up"
+SKIP = "skip"
+# 比预定时间晚这么多秒才轮到的执行视为错过（通常是机器休眠或程序被挂起）
+MISSED_TOLERANCE = 60.0
+# 空闲时最长的等待时间（秒）；等待按单调时钟计时，休眠期间不走，
+# 因此至少这么久检查一次系统时间，唤醒后及时处理错过的执行
+MAX_WAIT = 60.0
+# 计划执行默认的全局并发上限，以及每个分组的并发上限
+MAX_RUNS = 4
+MAX_RUNS_PER_GROUP = 2
+
+_INTERVAL_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([smhd])")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+}
+_MONTH_NAMES = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_DAY_NAMES = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+_cron_cache = {}
+
+
+class ScheduleError(Exception):
+    pass
+
+
+def parse_interval(text):
+    """把 "90s"、"5m"、"1h30m" 这样的间隔解析为秒数，不是间隔时返回 None"""
+    text = text.strip().lower()
+    if not text or _INTERVAL_PATTERN.sub("", text).strip():
+        return None
+    return sum(float(n) * _UNIT_SECONDS[unit] for n, unit in _INTERVAL_PATTERN.findall(text))
+
+
+class CronExpression:
+    """五个字段的 cron 表达式：分 时 日 月 星期，按本地时间计算
+
+    支持 *、数值、a-b 范围、/步长、逗号分隔的列表、月份和星期的英文缩写，以及 @daily 等别名。
+    日和星期都被限定时与常见的 cron 相同，满足其中之一即可。
+    """
+
+    def __init__(self, text):
+        self.text = text.strip()
+        fields = _CRON_ALIASES.get(self.text.lower(), self.text).split()
+        if len(fields) != 5:
+            raise ScheduleError(f"cron 表达式应有 5 个字段（分 时 日 月 星期）: {text}")
+        self.minutes = self._field(fields[0], 0, 59)
+        self.hours = self._field(fields[1], 0, 23)
+        self.days = self._field(fields[2], 1, 31)
+        self.months = self._field(fields[3], 1, 12, _MONTH_NAMES, 1)
+        # 星期中 0 和 7 都表示星期日
+        self.weekdays = {d % 7 for d in self._field(fields[4], 0, 7, _DAY_NAMES, 0)}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+        self._sorted_minutes = sorted(self.minutes)
+        # 最近一次计算：(起始分钟, 结果)；大量项目共用同一表达式时同一分钟内只计算一次
+        self._last = (None, None)
+
+    @classmethod
+    def parse(cls, text):
+        """解析表达式；相同的表达式共用同一个对象"""
+        expression = _cron_cache.get(text)
+        if expression is None:
+            expression = _cron_cache[text] = cls(text)
+        return expression
+
+    @staticmethod
+    def _field(text, low, high, names=None, first=0):
+        values = set()
+        for part in text.lower().split(","):
+            value, slash, step = part.partition("/")
+            try:
+                step = int(step) if slash else 1
+                if value == "*":
+                    start, end = low, high
+                else:
+                    bounds = [
+                        names.index(v) + first if names and v in names else int(v)
+                        for v in value.split("-", 1)
+                    ]
+                    # 单个数值带步长时表示从该值开始到最大值，例如 5/15
+                    start = bounds[0]
+                    end = bounds[1] if len(bounds) == 2 else (high if slash else start)
+            except ValueError:
+                raise ScheduleError(f"无法解析 cron 字段: {text}")
+            if step < 1 or not low <= start <= end <= high:
+                raise ScheduleError(f"cron 字段超出范围 {low}-{high}: {text}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day:
+            return weekday
+        if self.any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, ts):
+        """ts 之后（不含）第一个符合表达式的时间戳"""
+        minute_key = int(ts // 60)
+        cached_key, cached = self._last
+        if cached_key == minute_key:
+            return cached
+        moment = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment.year + 5
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                # 跳到下个月的第一天
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+                continue
+            if not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+                continue
+            for minute in self._sorted_minutes:
+                if minute >= moment.minute:
+                    result = moment.replace(minute=minute).timestamp()
+                    self._last = (minute_key, result)
+                    return result
+            moment = (moment + timedelta(hours=1)).replace(minute=0)
+        raise ScheduleError(f"cron 表达式在五年内不会触发: {self.text}")
+
+
+class Schedule:
+    """一个项目的执行计划：固定间隔或 cron 表达式，加上随机延迟和错过时的处理方式
+
+    保存在项目的 "schedule" 字段中：{"spec": "10m" 或 cron 表达式, "jitter": 秒, "missed": 处理方式}
+    """
+
+    def __init__(self, spec, jitter=0, missed=CATCH_UP):
+        self.spec = spec.strip()
+        self.jitter = max(0.0, float(jitter or 0))
+        self.missed = SKIP if missed == SKIP else CATCH_UP
+        self.interval = parse_interval(self.spec)
+        self.cron = None
+        if self.interval is None:
+            self.cron = CronExpression.parse(self.spec)
+            # 例如 2 月 30 日这样永远不会触发的表达式在这里就报错
+            self.cron.next_after(time.time())
+        elif self.interval < 1:
+            raise ScheduleError("执行间隔至少为 1 秒")
+
+    @classmethod
+    def from_item(cls, item_data):
+        """项目没有计划时返回 None；计划无效时抛出 ScheduleError"""
+        data = item_data.get("schedule")
+        if not data or not data.get("spec", "").strip():
+            return None
+        return cls(data["spec"], data.get("jitter", 0), data.get("missed", CATCH_UP))
+
+    def to_dict(self):
+        return {"spec": self.spec, "jitter": self.jitter, "missed": self.missed}
+
+    def __eq__(self, other):
+        return isinstance(other, Schedule) and self.to_dict() == other.to_dict()
+
+    def first_after(self, now):
+        return now + self.interval if self.cron is None else self.cron.next_after(now)
+
+    def next_after(self, previous, now):
+        """上次预定时间为 previous 时，now 之后的下次预定时间；固定间隔按原来的节拍，不随执行耗时漂移"""
+        if self.cron is not None:
+            return self.cron.next_after(max(previous, now))
+        if now < previous:
+            return previous + self.interval
+        return previous + (int((now - previous) // self.interval) + 1) * self.interval
+
+    def describe(self):
+        if self.cron is None:
+            return f"每 {_describe_interval(self.interval)}"
+        return f"cron {self.spec}"
+
+
+def _describe_interval(seconds):
+    for unit, label in ((86400, "天"), (3600, "小时"), (60, "分钟")):
+        if seconds >= unit and seconds % unit == 0:
+            return f"{seconds // unit:g} {label}"
+    return f"{seconds:g} 秒"
+
+
+class _Entry:
+    def __init__(self, item_id, schedule, group_id):
+        self.item_id = item_id
+        self.schedule = schedule
+        self.group_id = group_id
+        # 预定时间（不含随机延迟）和实际到期时间
+        self.nominal = None
+        self.due = None
+        # 计划变化后旧的堆元素随之作废
+        self.version = 0
+        # 到期时上一次执行仍在进行，结束后再补一次（多次到期只补一次）
+        self.pending = False
+        # 已到期，正在等待并发上限空出位置
+        self.waiting = False
+
+
+class Scheduler:
+    """按计划触发项目的执行
+
+    所有计划放在一个按到期时间排序的堆中，由一个后台线程等待最早的到期时间，
+    不为每个项目单独设置计时器；项目数量多时空闲开销仍然可以忽略。
+    到期的项目通过 on_due(item_id) 在后台线程中回调（通常是 Qt 信号的 emit），
+    调用方开始执行，执行结束后必须调用 run_finished(item_id)。
+    同一项目上一次执行尚未结束时，之后的到期合并为结束后的一次执行；
+    超过全局或分组并发上限的执行按到期顺序等待。
+    """
+
+    def __init__(self, on_due, max_runs=MAX_RUNS, max_runs_per_group=MAX_RUNS_PER_GROUP, clock=time.time):
+        self.on_due = on_due
+        self.max_runs = max_runs
+        # 为 0 时分组不单独限制
+        self.max_runs_per_group = max_runs_per_group
+        self.clock = clock
+        self.stats = {"fired": 0, "coalesced": 0, "deferred": 0, "caught_up": 0, "skipped": 0}
+        self._entries = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._ready = deque()
+        # 正在执行的项目 -> 开始执行时所在的分组
+        self._running = {}
+        self._group_running = {}
+        self._random = random.Random()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="Scheduler", daemon=True)
+        self._thread.start()
+
+    def load(self, entries):
+        """一次加载多个 (项目 id, Schedule, 分组 id)，用于启动时，比逐个 set_item 快"""
+        with self._cond:
+            now = self.clock()
+            for item_id, schedule, group_id in entries:
+                self._set(item_id, schedule, group_id, now, push=False)
+            self._heap = [
+                (e.due, next(self._seq), e.item_id, e.version) for e in self._entries.values()
+            ]
+            heapq.heapify(self._heap)
+            self._wake()
+
+    def set_item(self, item_id, schedule, group_id=None):
+        """添加、修改或（schedule 为 None 时）移除一个项目的计划；计划未变时只更新所在分组"""
+        with self._cond:
+            if schedule is None:
+                self._entries.pop(item_id, None)
+            else:
+                self._set(item_id, schedule, group_id, self.clock())
+            self._wake()
+
+    def remove(self, item_id):
+        self.set_item(item_id, None)
+
+    def item_ids(self):
+        with self._cond:
+            return list(self._entries)
+
+    def next_run(self, item_id):
+        """项目下次到期的时间戳，没有计划时返回 None"""
+        with self._cond:
+            entry = self._entries.get(item_id)
+            return None if entry is None else entry.due
+
+    def set_limits(self, max_runs, max_runs_per_group):
+        with self._cond:
+            self.max_runs = max_runs
+            self.max_runs_per_group = max_runs_per_group
+            self._wake()
+
+    def run_finished(self, item_id):
+        """由 on_due 开始的执行结束后调用，释放并发名额"""
+        with self._cond:
+            group_id = self._running.pop(item_id, _MISSING)
+            if group_id is _MISSING:
+                return
+            self._group_running[group_id] -= 1
+            entry = self._entries.get(item_id)
+            if entry is not None and entry.pending:
+                entry.pending = False
+                self._make_ready(entry)
+            self._wake()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    # 以下方法在持有锁时调用
+
+    def _wake(self):
+        self._cond.notify_all()
+
+    def _set(self, item_id, schedule, group_id, now, push=True):
+        entry = self._entries.get(item_id)
+        if entry is not None and entry.schedule == schedule:
+            entry.group_id = group_id
+            return
+        if entry is None:
+            entry = self._entries[item_id] = _Entry(item_id, schedule, group_id)
+        entry.schedule = schedule
+        entry.group_id = group_id
+        entry.version += 1
+        self._plan(entry, schedule.first_after(now), push)
+
+    def _plan(self, entry, nominal, push=True):
+        entry.nominal = nominal
+        entry.due = nominal
+        if entry.schedule.jitter:
+            # 随机延迟把同一时刻到期的大量执行分散开
+            entry.due += self._random.uniform(0, entry.schedule.jitter)
+        if push:
+            heapq.heappush(self._heap, (entry.due, next(self._seq), entry.item_id, entry.version))
+
+    def _make_ready(self, entry):
+        if entry.item_id in self._running:
+            if entry.pending:
+                self.stats["coalesced"] += 1
+            entry.pending = True
+        elif entry.waiting:
+            self.stats["coalesced"] += 1
+        else:
+            entry.waiting = True
+            self._ready.append(entry)
+
+    def _take_ready(self):
+        """按到期顺序取出并发上限允许开始的执行"""
+        started = []
+        blocked = deque()
+        while self._ready and len(self._running) < self.max_runs:
+            entry = self._ready.popleft()
+            if self._entries.get(entry.item_id) is not entry:
+                continue
+            group = entry.group_id
+            if self.max_runs_per_group and self._group_running.get(group, 0) >= self.max_runs_per_group:
+                blocked.append(entry)
+                continue
+            entry.waiting = False
+            self._running[entry.item_id] = group
+            self._group_running[group] = self._group_running.get(group, 0) + 1
+            started.append(entry.item_id)
+        if blocked:
+            self.stats["deferred"] += len(blocked)
+        # 因分组上限而等待的执行保持在最前面
+        blocked.extend(self._ready)
+        self._ready = blocked
+        return started
+
+    def _collect_due(self, now):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due, _, item_id, version = heapq.heappop(heap)
+            entry = self._entries.get(item_id)
+            if entry is None or entry.version != version:
+                continue
+            missed = now - due > MISSED_TOLERANCE
+            self._plan(entry, entry.schedule.next_after(entry.nominal, now))
+            if missed:
+                if entry.schedule.missed == SKIP:
+                    self.stats["skipped"] += 1
+                    continue
+                # 错过的多次执行只补一次
+                self.stats["caught_up"] += 1
+            self.stats["fired"] += 1
+            self._make_ready(entry)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = self.clock()
+                self._collect_due(now)
+                started = self._take_ready()
+                if not started:
+                    timeout = MAX_WAIT
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - now)
+                    self._cond.wait(timeout)
+                    continue
+            for item_id in started:
+                self.on_due(item_id)
+
+
+_MISSING = object()
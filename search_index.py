@@ -0,0 +1,332 @@
+# search_index.py
+import heapq
+import threading
+import time
+from collections import Counter
+from itertools import chain
+
+# 各字段在排序中的权重
+FIELD_WEIGHTS = (3.0, 1.0, 0.5)
+# 默认最多返回的结果数
+SEARCH_LIMIT = 200
+# 未完整出现的关键词至少要命中这一比例的三元组才算模糊匹配
+FUZZY_MIN_RATIO = 0.7
+# 评分时每处理这么多候选检查一次查询是否已过期
+CANCEL_CHECK_EVERY = 512
+# 最多为这么多候选评分；更宽泛的查询只在按树中顺序靠前的候选中排序，并报告估计的匹配总数
+MAX_SCORED = 5000
+
+
+def _fields(item):
+    return (
+        item.get("name", "").lower(),
+        item.get("command", "").lower(),
+        item.get("working_dir", "").lower(),
+    )
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def short_grams(text):
+    """名称中的单字和双字片段，用于不足三个字符的关键词"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _add_postings(postings, grams, doc):
+    get = postings.get
+    for g in grams:
+        ids = get(g)
+        if ids is None:
+            postings[g] = {doc}
+        else:
+            ids.add(doc)
+
+
+def _remove_postings(postings, grams, doc):
+    for g in grams:
+        ids = postings.get(g)
+        if ids is not None:
+            ids.discard(doc)
+            if not ids:
+                del postings[g]
+
+
+def _intersect(grams, postings):
+    lists = sorted((postings.get(g, ()) for g in grams), key=len)
+    if not lists or not lists[0]:
+        return set(), lists
+    result = set(lists[0])
+    for ids in lists[1:]:
+        result &= ids
+        if not result:
+            break
+    return result, lists
+
+
+def _token_score(name, command, working_dir, token, grams, name_only):
+    """一个关键词的加权得分：完整出现时按位置计分，否则按命中的三元组比例给少量分数"""
+    name_weight, command_weight, dir_weight = FIELD_WEIGHTS
+    score = 0.0
+    pos = name.find(token)
+    if pos == 0:
+        score = name_weight * 1.5
+    elif pos > 0:
+        score = name_weight * (1.25 if not name[pos - 1].isalnum() else 1.0)
+    if not name_only:
+        pos = command.find(token)
+        if pos == 0:
+            score += command_weight * 1.5
+        elif pos > 0:
+            score += command_weight * (1.25 if not command[pos - 1].isalnum() else 1.0)
+        pos = working_dir.find(token)
+        if pos >= 0:
+            score += dir_weight
+    if score or not grams:
+        return score
+    # 拼写有误的关键词：三个字段合起来命中足够多的三元组也算匹配，但得分很低
+    text = name + "\n" + command + "\n" + working_dir
+    ratio = sum(1 for g in grams if g in text) / len(grams)
+    return ratio * 0.25 if ratio >= FUZZY_MIN_RATIO else 0.0
+
+
+class SearchIndex:
+    """名称、命令内容和工作目录的三元组倒排索引，支持逐项增量更新
+
+    每个项目分配一个按加入顺序递增的整数文档号，倒排表中保存文档号，
+    因此候选集合大致按树中的顺序遍历。该类本身不加锁，只应在一个线程中使用（见 SearchService）。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def clear(self):
+        # 项目 id <-> 文档号
+        self._docnos = {}
+        self._ids = {}
+        self._next_doc = 0
+        # 文档号 -> 小写后的 (名称, 命令, 工作目录)
+        self._docs = {}
+        # 三元组 -> 文档号集合；名称另有一份，并为短关键词保存名称的单字和双字片段
+        self._postings = {}
+        self._name_postings = {}
+        self._short_postings = {}
+        # 字段文本 -> 三元组；工作目录等字段常有重复，建立索引时复用
+        self._gram_cache = {}
+
+    def build(self, items):
+        self.clear()
+        for item in items:
+            self.add(item)
+        self._gram_cache = {}
+
+    def _grams(self, text):
+        grams = self._gram_cache.get(text)
+        if grams is None:
+            grams = trigrams(text)
+            if len(self._gram_cache) < 100000:
+                self._gram_cache[text] = grams
+        return grams
+
+    def add(self, item):
+        """加入或重新索引一个项目；重新索引时保留原来的文档号"""
+        item_id = item["id"]
+        doc = self._docnos.get(item_id)
+        if doc is None:
+            doc = self._next_doc
+            self._next_doc += 1
+            self._docnos[item_id] = doc
+            self._ids[doc] = item_id
+        else:
+            self._unindex(doc)
+        fields = _fields(item)
+        self._docs[doc] = fields
+        name_grams = self._grams(fields[0])
+        _add_postings(self._postings, name_grams | self._grams(fields[1]) | self._grams(fields[2]), doc)
+        _add_postings(self._name_postings, name_grams, doc)
+        _add_postings(self._short_postings, short_grams(fields[0]), doc)
+
+    def remove(self, item_id):
+        doc = self._docnos.pop(item_id, None)
+        if doc is None:
+            return
+        self._unindex(doc)
+        del self._ids[doc]
+
+    def _unindex(self, doc):
+        name, command, working_dir = self._docs.pop(doc)
+        name_grams = trigrams(name)
+        _remove_postings(self._postings, name_grams | trigrams(command) | trigrams(working_dir), doc)
+        _remove_postings(self._name_postings, name_grams, doc)
+        _remove_postings(self._short_postings, short_grams(name), doc)
+
+    def _token_candidates(self, token, grams):
+        if not grams:
+            return _intersect((token,), self._short_postings)[0]
+        result, lists = _intersect(grams, self._postings)
+        if result:
+            return result
+        # 没有项目包含全部三元组时，退回到命中足够比例三元组的项目（容忍拼写错误）
+        need = max(1, int(len(grams) * FUZZY_MIN_RATIO + 0.999))
+        counts = Counter(chain.from_iterable(lists))
+        return {doc for doc, n in counts.items() if n >= need}
+
+    def search(self, query, limit=SEARCH_LIMIT, should_stop=None):
+        """返回 (匹配总数, [(得分, 项目 id), ...])，按得分从高到低排列
+
+        查询按空白拆成多个关键词，每个关键词都必须匹配；不足三个字符的关键词只在名称中查找。
+        候选超过 MAX_SCORED 个时，匹配总数为估计值。
+        should_stop() 返回真时放弃本次查询并返回 None。
+        """
+        tokens = query.lower().split()
+        if not tokens:
+            return 0, []
+        token_grams = [trigrams(t) for t in tokens]
+        candidates = None
+        for token, grams in zip(tokens, token_grams):
+            ids = self._token_candidates(token, grams)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return 0, []
+
+        # 名称中包含全部关键词三元组的候选最可能得高分，先为它们评分
+        name_ids = None
+        for grams in token_grams:
+            if grams:
+                ids = _intersect(grams, self._name_postings)[0]
+                name_ids = ids if name_ids is None else name_ids & ids
+        if name_ids and len(candidates) > MAX_SCORED:
+            name_ids &= candidates
+            ordered = list(name_ids)
+            if len(ordered) < MAX_SCORED:
+                ordered.extend(doc for doc in candidates if doc not in name_ids)
+        else:
+            ordered = candidates
+
+        docs = self._docs
+        scored = []
+        for n, doc in enumerate(ordered):
+            if n == MAX_SCORED:
+                break
+            if should_stop is not None and n % CANCEL_CHECK_EVERY == 0 and should_stop():
+                return None
+            name, command, working_dir = docs[doc]
+            total = 0.0
+            for token, grams in zip(tokens, token_grams):
+                score = _token_score(name, command, working_dir, token, grams, not grams)
+                if not score:
+                    break
+                total += score
+            else:
+                scored.append((total, -len(name), -doc))
+        matches = len(scored) if len(candidates) <= MAX_SCORED else len(candidates)
+        best = heapq.nlargest(limit, scored)
+        return matches, [(score, self._ids[-doc]) for score, _, doc in best]
+
+
+class SearchService:
+    """在后台线程中维护 SearchIndex 并执行查询
+
+    界面线程只把存储的变更和查询交给后台线程；新的查询会使进行中的旧查询作废。
+    查询结果通过 on_results(generation, query, total, results, elapsed_ms) 在后台线程中回调。
+    """
+
+    def __init__(self, store, on_results, limit=SEARCH_LIMIT):
+        self.store = store
+        self.on_results = on_results
+        self.limit = limit
+        self.index = SearchIndex()
+        self.generation = 0
+        self._tasks = [("build", list(store.items.values()))]
+        self._query = None
+        self._closed = False
+        self._cond = threading.Condition()
+        store.subscribe(self._after_change, before=self._before_change)
+        self._thread = threading.Thread(target=self._run, name="SearchService", daemon=True)
+        self._thread.start()
+
+    def search(self, query):
+        """提交查询，返回其编号；只有编号最新的查询结果才有意义"""
+        with self._cond:
+            self.generation += 1
+            self._query = (self.generation, query)
+            self._cond.notify_all()
+            return self.generation
+
+    def cancel(self):
+        with self._cond:
+            self.generation += 1
+            self._query = None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self.generation += 1
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _add_task(self, task):
+        with self._cond:
+            self._tasks.append(task)
+            self._cond.notify_all()
+
+    def _before_change(self, change):
+        # 删除前记下受影响的项目 id，修改后这些信息就不在了
+        op = change["op"]
+        if op == "delete_item":
+            self._add_task(("remove", [change["id"]]))
+        elif op == "delete_group":
+            group = self.store.groups.get(change["id"])
+            if group is not None:
+                self._add_task(("remove", [i["id"] for i in group["items"]]))
+
+    def _after_change(self, change):
+        op = change["op"]
+        if op == "add_item":
+            self._add_task(("add", [change["item"]]))
+        elif op == "add_group":
+            if change["group"]["items"]:
+                self._add_task(("add", list(change["group"]["items"])))
+        elif op == "update_item":
+            item = self.store.items.get(change["id"])
+            if item is not None and {"name", "command", "working_dir"} & change["fields"].keys():
+                self._add_task(("add", [item]))
+
+    def _apply_tasks(self, tasks):
+        for kind, payload in tasks:
+            if kind == "build":
+                self.index.build(payload)
+            elif kind == "add":
+                for item in payload:
+                    self.index.add(item)
+            else:
+                for item_id in payload:
+                    self.index.remove(item_id)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._tasks and self._query is None:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                tasks, self._tasks = self._tasks, []
+                query, self._query = self._query, None
+            self._apply_tasks(tasks)
+            if query is None:
+                continue
+            generation, text = query
+            start = time.perf_counter()
+            result = self.index.search(
+                text, self.limit, should_stop=lambda: self.generation != generation
+            )
+            if result is None or self.generation != generation:
+                continue
+            total, results = result
+            self.on_results(generation, text, total, results, (time.perf_counter() - start) * 1000)
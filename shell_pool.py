@@ -0,0 +1,265 @@
+# shell_pool.py
+import asyncio
+import base64
+import os
+import secrets
+import shlex
+import signal
+import subprocess
+import sys
+from collections import deque
+
+from execution_pool import build_shell_command, popen_kwargs
+
+# 复用的会话执行多少条命令后回收
+SESSION_MAX_USES = 50
+# 最多保留的空闲会话数（所有键合计），超出时关闭最早空闲的会话
+MAX_IDLE_SESSIONS = 8
+# 启动时最多预热这么多个不同的会话键
+PREWARM_SESSIONS = 4
+
+
+def session_key(spec, env_id=""):
+    """会话按 shell 类型、工作目录和环境配置的捕获结果区分，只有键相同的执行才能共用一个会话"""
+    return (spec.shell, spec.working_dir or "", env_id)
+
+
+class ShellSession:
+    """一个常驻的 shell 进程，通过标准输入逐条执行命令
+
+    每条命令之后写出一行 "\\n<标记> <返回码>"，读到该行即得到返回码并知道命令的输出到此为止。
+    标记对每个会话随机生成，命令的正常输出不会与之混淆。
+    """
+
+    def __init__(self, key, env=None):
+        self.key = key
+        self.shell, self.working_dir, _ = key
+        # 为 None 时继承当前进程的环境，否则为环境配置应用后的完整环境
+        self.env = env
+        self.encoding = build_shell_command("", self.shell)[1]
+        self.token = "__GS_%s__" % secrets.token_hex(8)
+        self._marker = b"\n" + self.token.encode("ascii") + b" "
+        self.process = None
+        self.uses = 0
+
+    def argv(self):
+        if self.shell == "bash":
+            return ["bash", "--noprofile", "--norc", "-s"]
+        if self.shell == "sh":
+            return ["sh", "-s"]
+        return ["powershell.exe", "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-"]
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.argv(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=self.working_dir or None,
+            env=self.env,
+            **popen_kwargs(),
+        )
+        return self
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    def script(self, command):
+        """把一条命令包装成发送给会话的脚本"""
+        if self.shell in ("bash", "sh"):
+            # 在子 shell 中执行，cd、变量和 exit 都不会影响会话本身；命令的标准输入为空，与单独启动时一致
+            return (
+                "( eval %s ) </dev/null\n"
+                "printf '\\n%%s %%d\\n' %s $?\n" % (shlex.quote(command), self.token)
+            )
+        # PowerShell：命令以 Base64 传递，整段脚本只占一行，避免引号和多行语句的问题
+        encoded = base64.b64encode(command.encode("utf-8")).decode("ascii")
+        return (
+            "$__gs_ok = $true; $global:LASTEXITCODE = 0; Push-Location; "
+            "try { Invoke-Expression ([Text.Encoding]::UTF8.GetString("
+            "[Convert]::FromBase64String('%s'))) } "
+            "catch { $__gs_ok = $false; $_ | Out-Host } finally { Pop-Location }; "
+            "$__gs_rc = if ($LASTEXITCODE) { $LASTEXITCODE } elseif ($__gs_ok) { 0 } else { 1 }; "
+            "[Console]::Out.Write(\"`n%s $__gs_rc`n\"); [Console]::Out.Flush()\n"
+            % (encoded, self.token)
+        )
+
+    async def run(self, command, on_output, read_size=64 * 1024):
+        """执行一条命令，输出块交给 on_output，返回 (返回码, 是否读到结束标记)
+
+        会话在命令执行期间退出（例如被取消时终止）时，返回 shell 进程的返回码。
+        """
+        self.uses += 1
+        try:
+            self.process.stdin.write(self.script(command).encode(self.encoding))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            return await self.process.wait(), False
+        marker = self._marker
+        # 末尾可能是被读取边界切开的标记，保留到下一块再判断
+        keep = len(marker) - 1
+        buffer = b""
+        stdout = self.process.stdout
+        while True:
+            chunk = await stdout.read(read_size)
+            if not chunk:
+                if buffer:
+                    on_output(buffer)
+                return await self.process.wait(), False
+            buffer += chunk
+            pos = buffer.find(marker)
+            if pos >= 0:
+                end = buffer.find(b"\n", pos + len(marker))
+                if end < 0:
+                    # 返回码所在的行还没读完
+                    if pos:
+                        on_output(buffer[:pos])
+                        buffer = buffer[pos:]
+                    continue
+                if pos:
+                    on_output(buffer[:pos])
+                try:
+                    code = int(buffer[pos + len(marker):end].strip())
+                except ValueError:
+                    code = -1
+                return code, True
+            if len(buffer) > keep:
+                on_output(buffer[:-keep])
+                buffer = buffer[-keep:]
+
+    async def close(self):
+        if not self.alive:
+            return
+        try:
+            # 关闭标准输入后 shell 自行退出；超时则强制终止整个进程组
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), 1.0)
+        except (asyncio.TimeoutError, OSError):
+            self.kill()
+            await self.process.wait()
+
+    def kill(self):
+        if not self.alive:
+            return
+        if sys.platform == "win32":
+            self.process.kill()
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class ShellSessionPool:
+    """预先启动的 shell 会话池，由 ExecutionPool 在其事件循环线程中使用
+
+    取出会话时在后台为同一个键补充一个新会话，下一次执行不必等待 shell 启动。
+    会话执行 max_uses 条命令、命令失败或被取消后不再复用。cmd 没有可靠的方式逐条执行并取得返回码，
+    不使用会话池，仍为每次执行启动新进程。
+    """
+
+    SHELLS = ("bash", "sh", "PowerShell")
+
+    def __init__(self, max_uses=SESSION_MAX_USES, max_idle=MAX_IDLE_SESSIONS):
+        self.max_uses = max_uses
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._tasks = set()
+        self._closed = False
+        self.stats = {"spawned": 0, "reused": 0, "recycled": 0}
+
+    def supports(self, shell):
+        return shell in self.SHELLS
+
+    def key(self, spec, env_id=""):
+        return session_key(spec, env_id)
+
+    async def acquire(self, key, env=None):
+        """取出键为 key 的空闲会话，没有时以环境 env 启动新会话"""
+        session = self._take(key)
+        if session is not None:
+            self.stats["reused"] += 1
+        else:
+            session = await self._spawn(key, env)
+        self._refill(key, env)
+        return session
+
+    def release(self, session, reusable):
+        """命令结束后归还会话；不再复用的会话被关闭"""
+        if (
+            self._closed
+            or not reusable
+            or not session.alive
+            or session.uses >= self.max_uses
+        ):
+            self.stats["recycled"] += 1
+            self._close_later(session)
+            return
+        self._put(session)
+
+    async def prewarm(self, targets, limit=PREWARM_SESSIONS):
+        """targets 为 [(键, 环境), ...]，为其中前 limit 个不同的键各准备一个空闲会话"""
+        unique = {}
+        for key, env in targets:
+            unique.setdefault(key, env)
+        for key, env in list(unique.items())[:min(limit, self.max_idle)]:
+            if not self._has_idle(key):
+                try:
+                    self._put(await self._spawn(key, env))
+                except OSError:
+                    pass
+
+    async def close(self):
+        self._closed = True
+        sessions, self._idle = list(self._idle), deque()
+        for session in sessions:
+            self._close_later(session)
+        # 正在启动的补充会话完成后也会被关闭
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def _take(self, key):
+        for session in list(self._idle):
+            if session.key == key:
+                self._idle.remove(session)
+                if session.alive:
+                    return session
+        return None
+
+    def _has_idle(self, key):
+        return any(s.key == key and s.alive for s in self._idle)
+
+    def _put(self, session):
+        if self._closed:
+            self._close_later(session)
+            return
+        self._idle.append(session)
+        while len(self._idle) > self.max_idle:
+            self._close_later(self._idle.popleft())
+
+    async def _spawn(self, key, env=None):
+        session = await ShellSession(key, env).start()
+        self.stats["spawned"] += 1
+        return session
+
+    def _refill(self, key, env):
+        if self._closed or self._has_idle(key):
+            return
+
+        async def refill():
+            try:
+                session = await self._spawn(key, env)
+            except OSError:
+                return
+            self._put(session)
+
+        self._track(refill())
+
+    def _close_later(self, session):
+        self._track(session.close())
+
+    def _track(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,287 @@
+# sqlite_storage.py
+# 用法:
+#   python -m sqlite_storage import data.json data.db   从 data.json 导入
+#   python -m sqlite_storage export data.db data.json   导出为 data.json 格式
+import json
+import sqlite3
+import sys
+
+from data_manager import JsonStorage, empty_data
+
+# 项目中有独立列的字段，其余字段以 JSON 形式存放在 extra 列中
+ITEM_COLUMNS = ("name", "command", "shell", "working_dir")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    group_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    command TEXT NOT NULL DEFAULT '',
+    shell TEXT NOT NULL DEFAULT 'cmd',
+    working_dir TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_groups_position ON groups(position);
+CREATE INDEX IF NOT EXISTS idx_groups_name ON groups(name);
+CREATE INDEX IF NOT EXISTS idx_items_group ON items(group_id, position);
+CREATE INDEX IF NOT EXISTS idx_items_name ON items(name);
+"""
+
+
+def _split_extra(record, columns):
+    extra = {k: v for k, v in record.items() if k not in columns and k not in ("id", "items")}
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+
+class SqliteStorage:
+    """SQLite 存储：分组、项目和设置分表保存，每条变更只更新受影响的行"""
+
+    def __init__(self, path):
+        self.path = path
+        # 连接在加载时由界面线程使用，之后只由持久化线程使用，不会并发访问
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def load(self):
+        data = empty_data()
+        cur = self.conn.cursor()
+        groups = {}
+        for gid, name, extra in cur.execute(
+            "SELECT id, name, extra FROM groups ORDER BY position"
+        ):
+            group = {"id": gid, "name": name, "items": []}
+            if extra:
+                group.update(json.loads(extra))
+            groups[gid] = group
+            data["groups"].append(group)
+        for iid, gid, name, command, shell, working_dir, extra in cur.execute(
+            "SELECT id, group_id, name, command, shell, working_dir, extra "
+            "FROM items ORDER BY group_id, position"
+        ):
+            item = {
+                "id": iid,
+                "name": name,
+                "command": command,
+                "shell": shell,
+                "working_dir": working_dir,
+            }
+            if extra:
+                item.update(json.loads(extra))
+            group = groups.get(gid)
+            if group is not None:
+                group["items"].append(item)
+        for key, value in cur.execute("SELECT key, value FROM settings"):
+            data[key] = json.loads(value)
+        return data
+
+    def save(self, data):
+        """用完整数据替换数据库内容"""
+        with self.conn:
+            self.conn.execute("DELETE FROM items")
+            self.conn.execute("DELETE FROM groups")
+            self.conn.execute("DELETE FROM settings")
+            for position, group in enumerate(data["groups"]):
+                self._insert_group(group, position)
+            self.conn.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, ?)",
+                [
+                    (k, json.dumps(v, ensure_ascii=False))
+                    for k, v in data.items()
+                    if k != "groups"
+                ],
+            )
+
+    def attach(self, data):
+        pass
+
+    def recover(self):
+        pass
+
+    def write_changes(self, changes):
+        """在一个事务中应用一批变更"""
+        with self.conn:
+            for change in changes:
+                self._apply(change)
+
+    def close(self):
+        self.conn.close()
+
+    def _insert_group(self, group, position):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO groups (id, name, position, extra) VALUES (?, ?, ?, ?)",
+            (group["id"], group["name"], position, _split_extra(group, ("name",))),
+        )
+        for item_position, item in enumerate(group["items"]):
+            self._insert_item(group["id"], item, item_position)
+
+    def _insert_item(self, group_id, item, position):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO items "
+            "(id, group_id, name, command, shell, working_dir, position, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                item["id"],
+                group_id,
+                item.get("name", ""),
+                item.get("command", ""),
+                item.get("shell", "cmd"),
+                item.get("working_dir", ""),
+                position,
+                _split_extra(item, ITEM_COLUMNS),
+            ),
+        )
+
+    def _next_position(self, table, where="", args=()):
+        row = self.conn.execute(
+            f"SELECT MAX(position) FROM {table} {where}", args
+        ).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def _update_fields(self, table, row_id, fields, columns):
+        """更新一行：有独立列的字段直接更新，其余字段合并进 extra"""
+        assignments = [(k, v) for k, v in fields.items() if k in columns]
+        if assignments:
+            self.conn.execute(
+                f"UPDATE {table} SET {', '.join(f'{k} = ?' for k, _ in assignments)} WHERE id = ?",
+                [v for _, v in assignments] + [row_id],
+            )
+        others = {k: v for k, v in fields.items() if k not in columns and k != "id"}
+        if others:
+            row = self.conn.execute(
+                f"SELECT extra FROM {table} WHERE id = ?", (row_id,)
+            ).fetchone()
+            if row is None:
+                return
+            extra = json.loads(row[0]) if row[0] else {}
+            extra.update(others)
+            self.conn.execute(
+                f"UPDATE {table} SET extra = ? WHERE id = ?",
+                (json.dumps(extra, ensure_ascii=False), row_id),
+            )
+
+    def _apply(self, change):
+        op = change["op"]
+        if op == "setting":
+            self.conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                (change["key"], json.dumps(change["value"], ensure_ascii=False)),
+            )
+        elif op == "add_group":
+            group = change["group"]
+            row = self.conn.execute(
+                "SELECT position FROM groups WHERE id = ?", (group["id"],)
+            ).fetchone()
+            position = row[0] if row else self._next_position("groups")
+            self._insert_group(group, position)
+        elif op == "update_group":
+            self._update_fields("groups", change["id"], change["fields"], ("name",))
+        elif op == "delete_group":
+            self.conn.execute("DELETE FROM items WHERE group_id = ?", (change["id"],))
+            self.conn.execute("DELETE FROM groups WHERE id = ?", (change["id"],))
+        elif op == "add_item":
+            item = change["item"]
+            row = self.conn.execute(
+                "SELECT position FROM items WHERE id = ?", (item["id"],)
+            ).fetchone()
+            if row:
+                self._update_fields("items", item["id"], item, ITEM_COLUMNS)
+            else:
+                position = self._next_position(
+                    "items", "WHERE group_id = ?", (change["group_id"],)
+                )
+                self._insert_item(change["group_id"], item, position)
+        elif op == "update_item":
+            self._update_fields("items", change["id"], change["fields"], ITEM_COLUMNS)
+        elif op == "delete_item":
+            self.conn.execute("DELETE FROM items WHERE id = ?", (change["id"],))
+        elif op == "move_items":
+            self._move_items(change["ids"], change["group_id"], change.get("index"))
+        elif op == "reorder_items":
+            self._reorder("items", change["ids"], "WHERE group_id = ?", (change["group_id"],))
+        elif op == "reorder_groups":
+            self._reorder("groups", change["ids"])
+
+    def _reorder(self, table, ids, where="", params=()):
+        """按 ids 重新编号；未出现在 ids 中的行保持原有相对顺序排在最后（与 CommandStore 一致）"""
+        listed = set(ids)
+        rest = [
+            row[0]
+            for row in self.conn.execute(f"SELECT id FROM {table} {where} ORDER BY position", params)
+            if row[0] not in listed
+        ]
+        self.conn.executemany(
+            f"UPDATE {table} SET position = ? WHERE id = ? {where.replace('WHERE', 'AND')}",
+            [(pos, row_id) + tuple(params) for pos, row_id in enumerate(list(ids) + rest)],
+        )
+
+    def _move_items(self, item_ids, group_id, index):
+        """只更新被移动的行，以及插入位置之后需要后移的行"""
+        if index is None:
+            start = self._next_position("items", "WHERE group_id = ?", (group_id,))
+        else:
+            placeholders = ", ".join("?" * len(item_ids))
+            row = self.conn.execute(
+                f"SELECT position FROM items WHERE group_id = ? AND id NOT IN ({placeholders}) "
+                "ORDER BY position LIMIT 1 OFFSET ?",
+                [group_id, *item_ids, index],
+            ).fetchone()
+            if row is None:
+                start = self._next_position("items", "WHERE group_id = ?", (group_id,))
+            else:
+                start = row[0]
+                self.conn.execute(
+                    "UPDATE items SET position = position + ? WHERE group_id = ? AND position >= ?",
+                    (len(item_ids), group_id, start),
+                )
+        self.conn.executemany(
+            "UPDATE items SET group_id = ?, position = ? WHERE id = ?",
+            [(group_id, start + offset, iid) for offset, iid in enumerate(item_ids)],
+        )
+
+
+def import_json(json_path, db_path):
+    """把 data.json 格式的数据导入 SQLite 数据库"""
+    data = JsonStorage(json_path).load()
+    storage = SqliteStorage(db_path)
+    try:
+        storage.save(data)
+    finally:
+        storage.close()
+    return data
+
+
+def export_json(db_path, json_path):
+    """把 SQLite 数据库导出为 data.json 格式"""
+    storage = SqliteStorage(db_path)
+    try:
+        data = storage.load()
+    finally:
+        storage.close()
+    JsonStorage(json_path).save(data)
+    return data
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print("用法: python -m sqlite_storage import data.json data.db")
+        print("      python -m sqlite_storage export data.db data.json")
+        sys.exit(2)
+    if sys.argv[1] == "import":
+        data = import_json(sys.argv[2], sys.argv[3])
+    else:
+        data = export_json(sys.argv[2], sys.argv[3])
+    count = sum(len(g["items"]) for g in data["groups"])
+    print(f"完成: {len(data['groups'])} 个分组, {count} 个项目")
@@ -0,0 +1,44 @@
+# startup_profiler.py
+import json
+import time
+
+from PySide6.QtCore import QObject, QEvent
+
+
+class StartupProfiler:
+    """记录启动各阶段的耗时；mark(name) 结束名为 name 的阶段并开始下一阶段"""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.phases = {}
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases[name] = round((now - self._last) * 1000, 3)
+        self._last = now
+
+    def report(self):
+        return {
+            "phases_ms": dict(self.phases),
+            "total_ms": round((self._last - self.start) * 1000, 3),
+        }
+
+    def dumps(self):
+        return json.dumps(self.report(), ensure_ascii=False, indent=2)
+
+
+class FirstPaintWatcher(QObject):
+    """窗口第一次收到绘制事件时调用 callback"""
+
+    def __init__(self, widget, callback):
+        super().__init__(widget)
+        self._widget = widget
+        self._callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self._widget and event.type() == QEvent.Type.Paint:
+            self._widget.removeEventFilter(self)
+            self._callback()
+        return False
@@ -0,0 +1,13 @@
+# tests/conftest.py
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """整个测试会话共用一个 QApplication；未指定平台时使用 offscreen"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
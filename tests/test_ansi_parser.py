@@ -0,0 +1,23 @@
+# tests/test_ansi_parser.py
+from ansi_parser import AnsiParser, line_text
+
+
+def _text(data):
+    lines, partial = AnsiParser().feed(data)
+    return [line_text(line) for line in lines], line_text(partial)
+
+
+def test_charset_designation_is_dropped():
+    # tput sgr0 输出 ESC ( B ESC [ m
+    assert _text(b"\x1b[31mred\x1b(B\x1b[m\n") == (["red"], "")
+
+
+def test_fp_escapes_are_dropped():
+    assert _text(b"a\x1b7b\x1b8c\x1b=d\x1b>\n") == (["abcd"], "")
+
+
+def test_escape_split_across_chunks():
+    parser = AnsiParser()
+    assert parser.feed(b"x\x1b(") == ([], "x")
+    lines, partial = parser.feed(b"By\n")
+    assert [line_text(line) for line in lines] == ["xy"]
@@ -0,0 +1,96 @@
+# tests/test_cli.py
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from cli import TargetError, find_items
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+needs_bash = pytest.mark.skipif(
+    sys.platform == "win32" or shutil.which("bash") is None, reason="需要 bash"
+)
+
+
+def _item(item_id, name, command="true"):
+    return {"id": item_id, "name": name, "command": command, "shell": "bash", "working_dir": ""}
+
+
+def _data():
+    return {
+        "favorites": [],
+        "groups": [
+            {"id": "g1", "name": "构建", "items": [_item("i1", "编译", "echo built"), _item("i2", "测试")]},
+            {"id": "g2", "name": "部署", "items": [_item("i3", "测试", "exit 3"), _item("i4", "a/b")]},
+            {"id": "g3", "name": "部署", "items": []},
+        ],
+    }
+
+
+def _ids(pairs):
+    return [item["id"] for _, item in pairs]
+
+
+def test_find_items_by_id_and_name():
+    data = _data()
+    assert _ids(find_items(data, "g1")) == ["i1", "i2"]
+    assert _ids(find_items(data, "i3")) == ["i3"]
+    assert _ids(find_items(data, "构建")) == ["i1", "i2"]
+    assert _ids(find_items(data, "编译")) == ["i1"]
+    assert _ids(find_items(data, "部署/测试")) == ["i3"]
+    # 项目名本身含有 "/"
+    assert _ids(find_items(data, "a/b")) == ["i4"]
+
+
+def test_find_items_reports_ambiguity():
+    data = _data()
+    with pytest.raises(TargetError, match="多个项目名为"):
+        find_items(data, "测试")
+    with pytest.raises(TargetError, match="多个分组名为"):
+        find_items(data, "部署")
+    with pytest.raises(TargetError, match="找不到"):
+        find_items(data, "不存在")
+
+
+def _cli(tmp_path, *args):
+    with open(os.path.join(tmp_path, "data.json"), "w", encoding="utf-8") as f:
+        json.dump(_data(), f)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # 检查整个执行过程中没有导入 Qt
+    code = "import sys, cli; rc = cli.main(sys.argv[1:]); print('QT', 'PySide6' in sys.modules, file=sys.stderr); sys.exit(rc)"
+    return subprocess.run(
+        [sys.executable, "-c", code, *args], cwd=tmp_path, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60,
+    )
+
+
+@needs_bash
+def test_run_writes_summary_and_exit_code(tmp_path):
+    result = _cli(tmp_path, "run", "构建", "i3", "--summary", "-", "--no-history")
+    assert result.returncode == 1
+    summary = json.loads(result.stdout)
+    assert summary["counts"]["finished"] == 2 and summary["counts"]["failed"] == 1
+    assert {r["item_id"]: r["return_code"] for r in summary["runs"]} == {"i1": 0, "i2": 0, "i3": 3}
+    # 摘要写到标准输出时，命令输出带着执行名前缀改写到标准错误
+    assert "[编译] built" in result.stderr
+    assert "QT False" in result.stderr
+
+
+@needs_bash
+def test_run_success_and_invalid_target(tmp_path):
+    result = _cli(tmp_path, "run", "编译", "--no-prefix", "--no-metrics", "--no-history")
+    assert result.returncode == 0
+    assert result.stdout.splitlines()[0] == "built"
+    assert not os.path.exists(os.path.join(tmp_path, "metrics.jsonl"))
+    assert _cli(tmp_path, "run", "测试").returncode == 2
+
+
+def test_list_does_not_import_qt(tmp_path):
+    result = _cli(tmp_path, "list")
+    assert result.returncode == 0
+    assert "编译  [bash]  (i1)" in result.stdout
+    assert "QT False" in result.stderr
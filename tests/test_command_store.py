@@ -0,0 +1,84 @@
+# tests/test_command_store.py
+import json
+
+from data_manager import CommandStore
+
+
+def _library():
+    return {
+        "favorites": [],
+        "groups": [
+            {"id": g, "name": g, "items": [{"id": f"{g}{n}", "name": f"{g}{n}"} for n in range(3)]}
+            for g in ("a", "b")
+        ],
+    }
+
+
+def _order(store):
+    return {g["id"]: [i["id"] for i in g["items"]] for g in store.data["groups"]}
+
+
+def test_indexes_follow_changes():
+    store = CommandStore(_library())
+    item = store.add_item("b", "新项目", command="make")
+    assert store.items[item["id"]] is item
+    assert store.item_group[item["id"]]["id"] == "b"
+    assert store.item_row(item["id"]) == 3
+    store.delete_item("b0")
+    assert "b0" not in store.items
+    assert store.item_row(item["id"]) == 2
+    store.delete_group("a")
+    assert "a1" not in store.items and "a1" not in store.item_group
+    assert store.group_row("b") == 0
+
+
+def test_before_and_after_events():
+    store = CommandStore(_library())
+    seen = []
+    store.subscribe(
+        lambda change: seen.append(("after", change["op"], store.item_group["a1"]["id"])),
+        before=lambda change: seen.append(("before", change["op"], store.item_group["a1"]["id"])),
+    )
+    store.move_items(["a1"], "b")
+    # 修改前事件看到的是移动前的状态，修改后事件看到移动后的状态
+    assert seen == [("before", "move_items", "a"), ("after", "move_items", "b")]
+
+
+def test_move_items_between_groups():
+    store = CommandStore(_library())
+    store.move_items(["b2", "a0"], "a", 1)
+    assert _order(store) == {"a": ["a1", "b2", "a0", "a2"], "b": ["b0", "b1"]}
+    assert store.item_group["b2"]["id"] == "a"
+    assert store.item_row("a2") == 3
+    store.move_items(["a1"], "b", 99)
+    assert _order(store)["b"] == ["b0", "b1", "a1"]
+
+
+def test_reorder_keeps_unlisted_entries_last():
+    store = CommandStore(_library())
+    store.reorder_items("a", ["a2", "a0"])
+    store.reorder_groups(["b"])
+    assert [g["id"] for g in store.data["groups"]] == ["b", "a"]
+    assert _order(store)["a"] == ["a2", "a0", "a1"]
+    assert store.item_row("a1") == 2
+    assert store.group_row("a") == 1
+
+
+def test_replaying_changes_is_idempotent():
+    store = CommandStore(_library())
+    log = []
+    # 与变更日志相同，每条变更序列化为一行 JSON，重放时重新解析
+    store.subscribe(lambda change: log.append(json.dumps(change)))
+    group = store.add_group("c")
+    store.add_item(group["id"], "x")
+    store.move_items(["a0"], group["id"])
+    store.update_item("a0", {"command": "ls"})
+    store.set_setting("theme", "dark")
+    replayed = CommandStore(_library())
+    for line in log:
+        replayed.apply(json.loads(line))
+    assert replayed.data == store.data
+    # 快照已包含这些变更时（保存快照后、删除日志前崩溃）再次重放，结果不变
+    for line in log:
+        replayed.apply(json.loads(line))
+    assert replayed.data == store.data
@@ -0,0 +1,68 @@
+# tests/test_data_persistence.py
+import os
+import time
+
+from data_manager import CommandStore, DataPersistence, JsonStorage, empty_data
+
+
+class FlakyStorage(JsonStorage):
+    """前 failures 次写入抛出 OSError，之后正常写入的 JSON 存储"""
+
+    def __init__(self, path, failures):
+        super().__init__(path)
+        self.failures = failures
+        self.written = []
+
+    def write_changes(self, changes):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("磁盘已满")
+        super().write_changes(changes)
+        self.written.extend(changes)
+
+
+def _persistence(storage, errors):
+    store = CommandStore(empty_data())
+    persistence = DataPersistence(store.data, storage, delay=0, on_error=errors.append)
+    persistence.RETRY_DELAY = 0.01
+    # 与主窗口相同：持久化直接订阅 store 的变更记录
+    store.subscribe(persistence.record_change)
+    return store, persistence
+
+
+def test_failed_write_is_retried(tmp_path):
+    path = os.path.join(tmp_path, "data.json")
+    storage = FlakyStorage(path, failures=2)
+    errors = []
+    store, persistence = _persistence(storage, errors)
+    store.set_setting("theme", "dark")
+    group = store.add_group("构建")
+    store.add_item(group["id"], "编译", command="make")
+    # 写入失败时 flush 立即返回 False，之后的重试成功后返回 True
+    for _ in range(500):
+        if persistence.flush(timeout=5):
+            break
+        time.sleep(0.01)
+    assert persistence.close()
+    assert [c["op"] for c in storage.written] == ["setting", "add_group", "add_item"]
+    assert len(errors) == 2
+    assert persistence.error is None
+    data = JsonStorage(path).load()
+    assert data["theme"] == "dark"
+    assert [i["command"] for i in data["groups"][0]["items"]] == ["make"]
+
+
+def test_close_reports_unsaved_changes(tmp_path):
+    storage = FlakyStorage(os.path.join(tmp_path, "data.json"), failures=10**6)
+    store, persistence = _persistence(storage, [])
+    store.set_setting("theme", "dark")
+    assert not persistence.close()
+    assert isinstance(persistence.error, OSError)
+    assert storage.written == []
+
+
+def test_flush_without_pending_changes_keeps_debounce(tmp_path):
+    _, persistence = _persistence(FlakyStorage(os.path.join(tmp_path, "data.json"), failures=0), [])
+    assert persistence.flush(timeout=5)
+    assert not persistence._urgent
+    persistence.close()
@@ -0,0 +1,101 @@
+# tests/test_env_profiles.py
+import asyncio
+import os
+import shutil
+import sys
+
+import pytest
+
+from env_profiles import (
+    EnvironmentCache,
+    EnvironmentCaptureError,
+    apply_environment,
+    new_profile,
+    parse_capture,
+    script_files,
+)
+
+needs_bash = pytest.mark.skipif(
+    sys.platform == "win32" or shutil.which("bash") is None, reason="需要 bash"
+)
+
+
+def _profile(tmp_path, script):
+    (tmp_path / "activate.sh").write_text("export FROM_FILE=yes\n")
+    return new_profile("测试", "bash", script, working_dir=str(tmp_path))
+
+
+def test_parse_capture():
+    token = "__T__"
+    output = "A=1\0B=2\0\n__T__\nhello\n\n__T__ 0\nA=1\0C=3\0"
+    code, script_output, before, after = parse_capture(output, "bash", token)
+    assert code == 0
+    assert script_output == "hello\n"
+    assert before == {"A": "1", "B": "2"}
+    assert after == {"A": "1", "C": "3"}
+    with pytest.raises(EnvironmentCaptureError):
+        parse_capture("A=1\0\n__T__\nexiting", "bash", token)
+
+
+def test_apply_environment_sets_and_unsets():
+    entry = {"set": {"NEW": "1", "KEEP": "changed"}, "unset": ["GONE"]}
+    env = apply_environment(entry, {"KEEP": "old", "GONE": "x", "OTHER": "y"})
+    assert env == {"KEEP": "changed", "NEW": "1", "OTHER": "y"}
+
+
+def test_script_files_finds_referenced_files(tmp_path):
+    profile = _profile(tmp_path, ". ./activate.sh  # 注释中的 other.sh 不算\nexport X=1")
+    assert script_files(profile) == [str(tmp_path / "activate.sh")]
+
+
+@needs_bash
+def test_capture_is_cached_until_a_script_file_changes(tmp_path):
+    profile = _profile(tmp_path, ". ./activate.sh\nexport GS_TEST=on\nunset GS_REMOVED")
+    os.environ["GS_REMOVED"] = "1"
+    try:
+        cache = EnvironmentCache(str(tmp_path / "cache"))
+
+        async def resolve(cache):
+            return await cache.resolve(profile)
+
+        entry, captured = asyncio.run(resolve(cache))
+        assert captured
+        assert entry["set"]["GS_TEST"] == "on" and entry["set"]["FROM_FILE"] == "yes"
+        assert entry["unset"] == ["GS_REMOVED"]
+        assert "SHLVL" not in entry["set"]
+
+        # 新的缓存对象从磁盘读取上次的结果，不再运行激活脚本
+        again, captured = asyncio.run(resolve(EnvironmentCache(str(tmp_path / "cache"))))
+        assert not captured and again == entry
+
+        path = tmp_path / "activate.sh"
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert cache.lookup(profile) is None
+        profile["script"] += "\nexport MORE=1"
+        _, captured = asyncio.run(resolve(cache))
+        assert captured
+    finally:
+        os.environ.pop("GS_REMOVED", None)
+
+
+@needs_bash
+def test_concurrent_users_share_one_capture(tmp_path):
+    profile = _profile(tmp_path, "sleep 0.2; export GS_TEST=on")
+    cache = EnvironmentCache(str(tmp_path / "cache"))
+
+    async def main():
+        return await asyncio.gather(*(cache.resolve(profile) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert cache.stats["captures"] == 1
+    assert all(entry is results[0][0] for entry, _ in results)
+
+
+@needs_bash
+def test_failing_script_reports_its_output(tmp_path):
+    cache = EnvironmentCache(str(tmp_path / "cache"))
+    profile = _profile(tmp_path, "echo 找不到环境; false")
+    with pytest.raises(EnvironmentCaptureError, match="返回 1(.|\n)*找不到环境"):
+        asyncio.run(cache.capture(profile))
+    assert cache.lookup(profile) is None
@@ -0,0 +1,267 @@
+# tests/test_file_watch.py
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import file_watch
+from file_watch import (
+    CHANGED_COUNT_ENV,
+    CHANGED_FILES_ENV,
+    CHANGED_LIST_ENV,
+    QUEUE,
+    RESTART,
+    FileWatcher,
+    TriggerQueue,
+    WatchError,
+    WatchSpec,
+    changed_files_env,
+    compile_globs,
+)
+
+needs_backend = pytest.mark.skipif(
+    file_watch.available_backend() != "inotify", reason="需要 inotify"
+)
+
+
+def test_compile_globs():
+    match = compile_globs(["*.py", "src/*.c", "docs/**/*.md", "build/", "[!t]*.txt"])
+    assert match("a.py") and match("pkg/sub/a.py")
+    assert match("src/a.c") and not match("src/sub/a.c") and not match("lib/src/a.c")
+    assert match("docs/a.md") and match("docs/x/y/a.md") and not match("a.md")
+    # 匹配到目录时其中所有文件都算匹配
+    assert match("build/out/app.o") and match("x/build/app.o")
+    assert match("notes.txt") and not match("todo.txt")
+    assert compile_globs(["", "  "]) is None
+
+
+def test_watch_spec_from_item():
+    assert WatchSpec.from_item({"name": "x"}) is None
+    assert WatchSpec.from_item({"watch": {"patterns": []}}) is None
+    spec = WatchSpec.from_item(
+        {"watch": {"patterns": ["**/*.py", "!build/", "!**/test_*.py"], "debounce_ms": "50", "policy": "other"}}
+    )
+    assert spec.debounce_ms == 50
+    assert spec.policy == RESTART
+    assert spec.matches("app/main.py")
+    assert not spec.matches("build/gen.py")
+    assert not spec.matches("tests/test_main.py")
+    assert not spec.matches("README.md")
+    assert WatchSpec.from_item({"watch": spec.to_dict()}) == spec
+    assert WatchSpec.split("*.py, src/**  !build/") == ["*.py", "src/**", "!build/"]
+    with pytest.raises(WatchError):
+        WatchSpec(["!build/"])
+
+
+def test_changed_files_env(monkeypatch):
+    env, list_file = changed_files_env(["/a/x.py", "/a/y.py"])
+    assert env == {CHANGED_FILES_ENV: os.pathsep.join(["/a/x.py", "/a/y.py"]), CHANGED_COUNT_ENV: "2"}
+    assert list_file is None
+    monkeypatch.setattr(file_watch, "MAX_ENV_CHARS", 10)
+    env, list_file = changed_files_env(["/a/x.py", "/a/y.py"])
+    try:
+        assert env[CHANGED_FILES_ENV] == "" and env[CHANGED_COUNT_ENV] == "2"
+        assert env[CHANGED_LIST_ENV] == list_file
+        with open(list_file, encoding="utf-8") as f:
+            assert f.read() == "/a/x.py\n/a/y.py\n"
+    finally:
+        os.remove(list_file)
+
+
+class Triggers:
+    """记录 on_trigger 回调的假执行入口"""
+
+    def __init__(self):
+        self.calls = []
+        self.cond = threading.Condition()
+
+    def __call__(self, item_id, paths):
+        with self.cond:
+            self.calls.append((item_id, sorted(paths), time.monotonic()))
+            self.cond.notify_all()
+
+    def wait(self, count, timeout=5):
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.calls) >= count, timeout)
+            return [(item_id, paths) for item_id, paths, _ in self.calls]
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _write(path, text="x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+@needs_backend
+def test_changes_are_batched_and_filtered(tmp_path):
+    root = os.path.realpath(tmp_path)
+    for sub in ("src", "src/pkg", "node_modules/lib"):
+        os.makedirs(os.path.join(root, sub))
+    triggers = Triggers()
+    watcher = FileWatcher(triggers)
+    try:
+        watcher.set_item("a", root, WatchSpec(["**/*.py"], debounce_ms=150))
+        # node_modules 不被监视
+        assert _wait_for(lambda: watcher.watched_dirs() == 3)
+        changed = [os.path.join(root, "src", "a.py"), os.path.join(root, "src", "pkg", "b.py")]
+        for path in changed:
+            _write(path)
+        _write(os.path.join(root, "src", "notes.txt"))
+        _write(os.path.join(root, "node_modules", "lib", "c.py"))
+        # 监视开始后新建的目录中的文件也会被报告
+        new_dir_file = os.path.join(root, "new", "deep", "d.py")
+        _write(new_dir_file)
+        assert triggers.wait(1) == [("a", sorted(changed + [new_dir_file]))]
+        time.sleep(0.3)
+        assert len(triggers.calls) == 1
+        assert watcher.watched_dirs() == 5
+    finally:
+        watcher.close()
+
+
+@needs_backend
+def test_tree_is_scanned_off_the_calling_thread(tmp_path, monkeypatch):
+    root = os.path.realpath(tmp_path)
+    os.makedirs(os.path.join(root, "a", "b"))
+    threads = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        threads.append(threading.current_thread().name)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    watcher = FileWatcher(Triggers())
+    try:
+        watcher.set_item("a", root, WatchSpec(["*"]))
+        assert _wait_for(lambda: watcher.watched_dirs() == 3)
+        assert set(threads) == {"FileWatch"}
+    finally:
+        watcher.close()
+
+
+@needs_backend
+def test_scan_failure_is_reported(tmp_path, monkeypatch):
+    missing = os.path.join(os.path.realpath(tmp_path), "gone")
+    errors = []
+    # 目录在检查之后、扫描之前被删除
+    monkeypatch.setattr(os.path, "isdir", lambda path: True)
+    watcher = FileWatcher(Triggers(), errors.append)
+    try:
+        watcher.set_item("a", missing, WatchSpec(["*"]))
+        assert _wait_for(lambda: errors)
+        assert missing in errors[0]
+        assert watcher.watched_dirs() == 0
+    finally:
+        watcher.close()
+
+
+@needs_backend
+def test_continuous_changes_trigger_after_max_delay(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_watch, "MAX_DELAY", 0.3)
+    root = os.path.realpath(tmp_path)
+    triggers = Triggers()
+    watcher = FileWatcher(triggers)
+    try:
+        watcher.set_item("a", root, WatchSpec(["*.log"], debounce_ms=200))
+        started = time.monotonic()
+        # 每次改动的间隔都短于 debounce_ms，只有 MAX_DELAY 能让它触发
+        for n in range(20):
+            watcher._on_paths([os.path.join(root, f"{n}.log"), os.path.join(root, "skip.txt")])
+            time.sleep(0.05)
+        calls = triggers.wait(3)
+        assert len(calls) >= 3
+        first_at = triggers.calls[0][2] - started
+        assert 0.25 <= first_at < 0.6
+        reported = [path for _, paths in calls for path in paths]
+        assert len(reported) == len(set(reported))
+        assert all(path.endswith(".log") for path in reported)
+    finally:
+        watcher.close()
+
+
+class FakeRun:
+    """与 Run 一样按对象本身比较"""
+
+    def __init__(self, item_id):
+        self.spec = SimpleNamespace(item_id=item_id)
+
+
+def _queue(runs_per_start=1):
+    started = []
+    cancelled = []
+
+    def start(item_id, env):
+        runs = [FakeRun(item_id) for _ in range(runs_per_start)]
+        started.append((env, runs))
+        return runs
+
+    return TriggerQueue(start, cancelled.append), started, cancelled
+
+
+def _files(env):
+    return env[CHANGED_FILES_ENV].split(os.pathsep), int(env[CHANGED_COUNT_ENV])
+
+
+def test_restart_policy_cancels_and_reruns_with_all_changes():
+    queue, started, cancelled = _queue()
+    queue.trigger("a", ["/r/1.py"], RESTART)
+    env, runs = started[0]
+    assert _files(env) == (["/r/1.py"], 1)
+    queue.trigger("a", ["/r/2.py"], RESTART)
+    queue.trigger("a", ["/r/3.py"], RESTART)
+    # 只取消一次；被取消的执行没有处理完的改动交给下一次执行
+    assert cancelled == runs
+    assert len(started) == 1
+    queue.finished(runs[0])
+    assert _files(started[1][0]) == (["/r/1.py", "/r/2.py", "/r/3.py"], 3)
+    queue.finished(started[1][1][0])
+    assert len(started) == 2
+
+
+def test_queue_policy_waits_for_the_running_execution():
+    queue, started, cancelled = _queue(runs_per_start=2)
+    queue.trigger("a", ["/r/1.py"], QUEUE)
+    queue.trigger("a", ["/r/2.py"], QUEUE)
+    queue.trigger("b", ["/r/3.py"], QUEUE)
+    assert cancelled == []
+    assert len(started) == 2
+    first_runs = started[0][1]
+    # 项目有多个执行目标时等全部结束
+    queue.finished(first_runs[0])
+    assert len(started) == 2
+    queue.finished(first_runs[1])
+    assert _files(started[2][0]) == (["/r/2.py"], 1)
+
+
+def test_unknown_runs_and_failed_starts_are_ignored(monkeypatch):
+    queue, started, _ = _queue(runs_per_start=0)
+    monkeypatch.setattr(file_watch, "MAX_ENV_CHARS", 1)
+    queue.trigger("a", ["/r/1.py"])
+    # 没有开始执行时不留下状态和列表文件，下一次改动照常开始
+    list_file = started[0][0][CHANGED_LIST_ENV]
+    assert not os.path.exists(list_file)
+    queue.trigger("a", ["/r/2.py"])
+    assert len(started) == 2
+
+    queue, started, _ = _queue()
+    queue.trigger("a", ["/r/1.py", "/r/2.py"])
+    list_file = started[0][0][CHANGED_LIST_ENV]
+    assert os.path.exists(list_file)
+    queue.finished(FakeRun("a"))
+    queue.finished(FakeRun("b"))
+    assert os.path.exists(list_file)
+    queue.finished(started[0][1][0])
+    assert not os.path.exists(list_file)
+    assert len(started) == 1
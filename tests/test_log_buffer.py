@@ -0,0 +1,14 @@
+# tests/test_log_buffer.py
+from log_buffer import LogBuffer
+
+
+def test_spill_past_page_boundary_after_cached_read():
+    buffer = LogBuffer()
+    buffer.append_output([f"line {n}" for n in range(10500)], "")
+    # 读取一次，使部分写入的第 0 页进入缓存
+    assert buffer.line(100) == "line 100"
+    # 一批溢出的行填满缓存中的第 0 页并开始第 1 页
+    buffer.append_output([f"line {n}" for n in range(10500, 11500)], "")
+    assert buffer.line(600) == "line 600"
+    assert buffer.line(1100) == "line 1100"
+    assert buffer.texts(0, 1500) == [f"line {n}" for n in range(1500)]
@@ -0,0 +1,34 @@
+# tests/test_output_search.py
+import threading
+
+from log_buffer import LogBuffer
+from output_search import OutputSearchService, compile_query
+
+
+def _search(service, buffer, text):
+    """等待查询扫描完整个缓冲区，返回匹配的行号"""
+    done = threading.Event()
+    matches = []
+
+    def on_results(generation, found, scanned, total):
+        matches.extend(found)
+        if scanned >= total:
+            done.set()
+
+    service.on_results = on_results
+    service.search(buffer, compile_query(f"^{text}$", regex=True))
+    assert done.wait(5), "搜索没有结束"
+    return matches
+
+
+def test_search_again_after_more_output():
+    buffer = LogBuffer()
+    buffer.append_output([f"line {n}" for n in range(10500)], "")
+    service = OutputSearchService(None)
+    try:
+        assert _search(service, buffer, "line 600") == [600]
+        buffer.append_output([f"line {n}" for n in range(10500, 11500)], "")
+        assert _search(service, buffer, "line 600") == [600]
+        assert _search(service, buffer, "line 11499") == [11499]
+    finally:
+        service.close()
@@ -0,0 +1,113 @@
+# tests/test_pipeline.py
+import shutil
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from execution_pool import ExecutionPool, PoolListener, FINISHED, FAILED, SKIPPED
+from pipeline import PipelineError, critical_path, find_cycle, plan, report
+
+
+def _items(**deps):
+    """deps 为 {项目 id: "依赖 id ..."}"""
+    return {
+        item_id: {
+            "id": item_id, "name": item_id.upper(), "command": "true", "shell": "bash",
+            "depends_on": text.split(),
+        }
+        for item_id, text in deps.items()
+    }
+
+
+def _order(specs):
+    return [spec.item_id for spec in specs]
+
+
+def test_plan_orders_topologically_and_pulls_in_dependencies():
+    items = _items(test="build lint", build="fetch", lint="", fetch="", docs="")
+    specs, dependencies, missing = plan(["test", "docs"], items)
+    # 可以开始的项目中先取选中（及加入）顺序靠前的
+    assert _order(specs) == ["docs", "lint", "fetch", "build", "test"]
+    assert dependencies == [[], [], [], [2], [3, 1]]
+    assert missing == []
+
+
+def test_plan_without_dependencies_keeps_only_internal_edges():
+    items = _items(test="build", build="fetch", fetch="")
+    specs, dependencies, _ = plan(["test", "build"], items, include_dependencies=False)
+    assert _order(specs) == ["build", "test"]
+    assert dependencies == [[], [0]]
+
+
+def test_plan_reports_missing_and_cyclic_dependencies():
+    items = _items(a="b gone", b="")
+    specs, _, missing = plan(["a"], items)
+    assert _order(specs) == ["b", "a"]
+    assert [(item["id"], dep) for item, dep in missing] == [("a", "gone")]
+    items = _items(a="b", b="c", c="a", d="")
+    with pytest.raises(PipelineError, match="依赖中存在环"):
+        plan(["d", "a"], items)
+
+
+def test_find_cycle():
+    assert find_cycle(["a", "b", "c"], {"a": ["b"], "b": ["c"], "c": []}) is None
+    assert find_cycle(["a"], {"a": ["b"], "b": ["c"], "c": ["b"]}) == ["b", "c", "b"]
+    assert find_cycle(["a"], {"a": ["a"]}) == ["a", "a"]
+
+
+def test_multi_target_items_wait_for_every_target():
+    items = _items(deploy="build", build="")
+    items["build"]["targets"] = ["local", "h1"]
+    agents = {"h1": {"id": "h1", "name": "h1", "host": "127.0.0.1", "port": 1, "token": ""}}
+    specs, dependencies, _ = plan(["deploy"], items, agents=agents)
+    assert [s.name for s in specs] == ["BUILD @ 本机", "BUILD @ h1", "DEPLOY"]
+    assert dependencies == [[], [], [0, 1]]
+
+
+def _run(run_id, duration, depends_on=(), name=None):
+    return SimpleNamespace(
+        run_id=run_id, duration=duration, depends_on=list(depends_on),
+        spec=SimpleNamespace(name=name or str(run_id)), start_time=None, end_time=None,
+    )
+
+
+def test_critical_path_follows_the_longest_chain():
+    fetch = _run(1, 1.0)
+    lint = _run(2, 5.0)
+    build = _run(3, 3.0, [fetch])
+    test = _run(4, 2.0, [build, lint])
+    skipped = _run(5, None, [test])
+    total, path = critical_path(SimpleNamespace(runs=[fetch, lint, build, test, skipped]))
+    assert total == 7.0
+    # 未运行的执行不增加耗时，路径在耗时相同的执行中止于先出现的一个
+    assert [r.run_id for r in path] == [2, 4]
+    assert critical_path(SimpleNamespace(runs=[])) == (0.0, [])
+
+
+class _Listener(PoolListener):
+    def __init__(self):
+        self.done = threading.Event()
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+@pytest.mark.skipif(sys.platform == "win32" or shutil.which("bash") is None, reason="需要 bash")
+def test_failure_skips_dependents_only():
+    items = _items(build="", test="build", package="test", lint="")
+    items["build"]["command"] = "exit 1"
+    specs, dependencies, _ = plan(["package", "lint"], items)
+    listener = _Listener()
+    pool = ExecutionPool(max_workers=2, listener=listener)
+    try:
+        batch = pool.submit(specs, dependencies=dependencies)
+        assert listener.done.wait(30)
+    finally:
+        pool.shutdown()
+    status = {run.spec.item_id: run.status for run in batch.runs}
+    assert status == {"lint": FINISHED, "build": FAILED, "test": SKIPPED, "package": SKIPPED}
+    assert not batch.succeeded
+    assert all(run.start_time is None for run in batch.runs if run.status == SKIPPED)
+    assert set(report(batch)) == {"elapsed_s", "serial_s", "critical_path_s", "critical_path"}
@@ -0,0 +1,88 @@
+# tests/test_process_control.py
+import asyncio
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+import process_control
+from process_control import ProcessTree, descendants
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32" or shutil.which("bash") is None, reason="需要 bash"
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_proc_table(monkeypatch):
+    # 进程表有短暂缓存，上一个测试留下的进程表里没有本测试启动的进程
+    monkeypatch.setattr(process_control, "_proc_cache", (0.0, 0.0, None))
+
+
+def _terminate(script, grace, ready_lines=1):
+    """启动脚本并读到 ready_lines 行输出后终止其进程树，返回 (结果, 耗时, 输出的各行, 进程树)"""
+
+    async def main():
+        process = await asyncio.create_subprocess_exec(
+            "bash", "-c", script, stdout=asyncio.subprocess.PIPE, start_new_session=True
+        )
+        lines = [(await process.stdout.readline()).decode().strip() for _ in range(ready_lines)]
+        tree = ProcessTree(process)
+        started = time.monotonic()
+        result = await tree.terminate(grace)
+        elapsed = time.monotonic() - started
+        await process.wait()
+        return result, elapsed, lines, tree
+
+    return asyncio.run(main())
+
+
+def test_descendants_walks_the_whole_tree():
+    table = {
+        10: (1, 10, b"S"),
+        11: (10, 10, b"S"),
+        12: (11, 10, b"S"),
+        13: (12, 13, b"S"),
+        20: (1, 20, b"S"),
+    }
+    assert sorted(descendants(10, table)) == [11, 12, 13]
+    assert descendants(20, table) == []
+    # 进程表变化后重新建立父子关系
+    table = {**table, 21: (20, 20, b"S")}
+    assert descendants(20, table) == [21]
+
+
+def test_tree_exits_within_grace_period():
+    result, elapsed, _, tree = _terminate("echo ready; sleep 30 & wait", grace=5)
+    assert result == {"graceful": True, "forced": False, "remaining": False}
+    assert elapsed < 2
+    assert not tree.alive()
+
+
+def test_term_is_escalated_to_kill():
+    # 忽略 SIGTERM 的设置会被子进程继承，整棵树都不会响应
+    result, elapsed, _, tree = _terminate("trap '' TERM; echo ready; sleep 30 & wait", grace=0.3)
+    assert result == {"graceful": False, "forced": True, "remaining": False}
+    assert elapsed >= 0.3
+    assert not tree.alive()
+
+
+def test_zero_grace_kills_immediately():
+    result, elapsed, _, _ = _terminate("trap '' TERM; echo ready; sleep 30", grace=0)
+    assert result["forced"] and not result["graceful"] and not result["remaining"]
+    assert elapsed < 2
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/proc/self") or shutil.which("setsid") is None, reason="需要 /proc 和 setsid"
+)
+def test_descendant_that_left_the_group_is_killed():
+    # 离开进程组之后才输出自己的 pid，此时开始终止
+    script = "setsid bash -c 'trap \"\" TERM; echo $$; sleep 30' & wait"
+    result, _, lines, tree = _terminate(script, grace=0.3)
+    escaped = int(lines[0])
+    assert escaped in tree._escaped
+    assert result["forced"] and not result["remaining"]
+    assert not process_control._running(escaped)
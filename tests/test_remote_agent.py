@@ -0,0 +1,269 @@
+# tests/test_remote_agent.py
+import asyncio
+import shutil
+import struct
+import sys
+
+import pytest
+
+import remote_agent
+from process_control import _running
+from remote_agent import (
+    CREDIT,
+    HELLO,
+    OUTPUT,
+    WINDOW,
+    Agent,
+    AgentConnection,
+    AgentError,
+    RemoteRun,
+    _AgentRun,
+    check,
+    pack,
+    pack_json,
+    read_frame,
+)
+
+TOKEN = "test-token"
+
+needs_bash = pytest.mark.skipif(
+    sys.platform == "win32" or shutil.which("bash") is None, reason="需要 bash"
+)
+
+
+def _with_agent(body, **options):
+    """在本机随机端口上运行代理，调用 body(agent, target)"""
+
+    async def main():
+        agent = Agent(TOKEN, **options)
+        server = await agent.start("127.0.0.1", 0)
+        target = {"host": "127.0.0.1", "port": server.sockets[0].getsockname()[1], "token": TOKEN}
+        try:
+            return await body(agent, target)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+async def _close(connection):
+    connection.close()
+    await asyncio.gather(connection._reading, return_exceptions=True)
+
+
+def _request(command):
+    return {"command": command, "shell": "bash", "working_dir": "", "env": {}}
+
+
+def test_frames_survive_arbitrary_splits():
+    async def main():
+        data = (
+            pack_json(HELLO, 0, {"token": "令牌"})
+            + pack(OUTPUT, 7, b"")
+            + pack(CREDIT, 2**32 - 1, struct.pack("!I", 5))
+        )
+        reader = asyncio.StreamReader()
+        for n in range(0, len(data), 3):
+            reader.feed_data(data[n:n + 3])
+        reader.feed_eof()
+        frames = [await read_frame(reader) for _ in range(3)]
+        with pytest.raises(asyncio.IncompleteReadError):
+            await read_frame(reader)
+        return frames
+
+    frames = asyncio.run(main())
+    assert frames[0][:2] == (HELLO, 0)
+    assert frames[0][2].decode("utf-8") == '{"token": "令牌"}'
+    assert frames[1] == (OUTPUT, 7, b"")
+    assert frames[2] == (CREDIT, 2**32 - 1, struct.pack("!I", 5))
+
+
+def test_oversized_and_truncated_frames():
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(remote_agent._HEADER.pack(OUTPUT, 1, remote_agent.MAX_PAYLOAD + 1))
+        with pytest.raises(AgentError):
+            await read_frame(reader)
+        reader = asyncio.StreamReader()
+        reader.feed_data(pack(OUTPUT, 1, b"abcdef")[:-2])
+        reader.feed_eof()
+        with pytest.raises(asyncio.IncompleteReadError):
+            await read_frame(reader)
+
+    asyncio.run(main())
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, frame):
+        self.sent.append(frame)
+
+
+def test_credit_window():
+    async def main():
+        state = _AgentRun()
+        assert state.credit == WINDOW
+        state.credit -= WINDOW
+        state.credit_event.clear()
+        state.add_credit(100)
+        assert state.credit == 100 and state.credit_event.is_set()
+
+        connection = _FakeConnection()
+        busy = [False]
+        remote = RemoteRun(connection, 3, lambda data: None, lambda: busy[0])
+        remote._output(b"x" * (WINDOW // 2 - 1))
+        assert connection.sent == []
+        remote._output(b"x")
+        assert connection.sent == [pack(CREDIT, 3, struct.pack("!I", WINDOW // 2))]
+        # 界面还没处理完时不补充额度，之后 grant() 一次补足
+        busy[0] = True
+        remote._output(b"y" * WINDOW)
+        assert len(connection.sent) == 1
+        busy[0] = False
+        remote.grant()
+        assert connection.sent[-1] == pack(CREDIT, 3, struct.pack("!I", WINDOW))
+        assert remote.unacked == 0
+        # 执行结束后不再补充
+        remote._output(b"z" * WINDOW)
+        remote._finish(exit={"return_code": 0, "cancel": None})
+        connection.sent.clear()
+        remote.grant()
+        assert connection.sent == []
+
+    asyncio.run(main())
+
+
+def test_handshake_rejects_bad_token_and_version():
+    async def body(agent, target):
+        connection = await AgentConnection.open(target)
+        assert connection.info["version"] == remote_agent.PROTOCOL_VERSION
+        await _close(connection)
+        with pytest.raises(AgentError, match="令牌错误"):
+            await AgentConnection.open(dict(target, token="wrong"))
+        reader, writer = await asyncio.open_connection(target["host"], target["port"])
+        writer.write(pack_json(HELLO, 0, {"token": TOKEN, "version": 99}))
+        kind, _, payload = await read_frame(reader)
+        writer.close()
+        assert kind == remote_agent.ERROR and "协议版本" in payload.decode("utf-8")
+        # 同步的连接检查在另一个线程中进行
+        assert (await asyncio.to_thread(check, target))["platform"] == sys.platform
+        with pytest.raises(AgentError):
+            await asyncio.to_thread(check, dict(target, token=""))
+        return agent.stats["connections"]
+
+    assert _with_agent(body) == 2
+
+
+@needs_bash
+def test_runs_are_multiplexed_on_one_connection():
+    async def body(agent, target):
+        connection = await AgentConnection.open(target)
+        outputs = {}
+        commands = {
+            "quick": "echo quick; exit 3",
+            "slow": "sleep 0.2; printf slow; exit 7",
+            "ok": "for i in 1 2 3; do echo $i; done",
+        }
+        runs = {
+            name: connection.start(_request(command), outputs.setdefault(name, bytearray()).extend)
+            for name, command in commands.items()
+        }
+        assert len({run.channel for run in runs.values()}) == 3
+        results = {name: await run.wait() for name, run in runs.items()}
+        assert connection.channels == {}
+        await _close(connection)
+        return results, outputs
+
+    results, outputs = _with_agent(body)
+    assert {name: r["return_code"] for name, r in results.items()} == {"quick": 3, "slow": 7, "ok": 0}
+    assert all(r["cancel"] is None for r in results.values())
+    assert outputs == {"quick": b"quick\n", "slow": b"slow", "ok": b"1\n2\n3\n"}
+
+
+@needs_bash
+def test_output_stops_at_the_window_until_credit_is_granted():
+    size = 3 * WINDOW
+
+    async def body(agent, target):
+        connection = await AgentConnection.open(target)
+        received = bytearray()
+        busy = [True]
+        run = connection.start(
+            _request(f"head -c {size} /dev/zero | tr '\\0' a"), received.extend, lambda: busy[0]
+        )
+        await asyncio.sleep(0.5)
+        paused_at = len(received)
+        busy[0] = False
+        run.grant()
+        exit = await run.wait()
+        await _close(connection)
+        return paused_at, len(received), exit
+
+    paused_at, total, exit = _with_agent(body)
+    assert paused_at == WINDOW
+    assert total == size
+    assert exit["return_code"] == 0
+
+
+@needs_bash
+def test_cancel_escalates_to_kill():
+    async def body(agent, target):
+        connection = await AgentConnection.open(target)
+        ready = asyncio.Event()
+        run = connection.start(
+            _request("trap '' TERM; echo ready; sleep 30 & wait"), lambda data: ready.set()
+        )
+        await asyncio.wait_for(ready.wait(), 5)
+        result = await run.terminate(grace=0.3)
+        exit = await run.wait()
+        graceful = connection.start(_request("echo ready; sleep 30"), lambda data: None)
+        await asyncio.sleep(0.2)
+        graceful_result = await graceful.terminate(grace=5)
+        await _close(connection)
+        return result, exit, graceful_result
+
+    result, exit, graceful_result = _with_agent(body)
+    assert result == {"graceful": False, "forced": True, "remaining": False}
+    assert exit["cancel"] == result
+    assert exit["return_code"] == -9
+    assert graceful_result == {"graceful": True, "forced": False, "remaining": False}
+
+
+@needs_bash
+def test_disconnect_kills_the_clients_runs():
+    async def body(agent, target):
+        connection = await AgentConnection.open(target)
+        output = bytearray()
+        run = connection.start(_request("trap '' TERM; echo $$; sleep 30"), output.extend)
+        while b"\n" not in output:
+            await asyncio.sleep(0.01)
+        pid = int(output)
+        await _close(connection)
+        with pytest.raises(AgentError):
+            await run.wait()
+        # 代理强制结束进程树并回收进程
+        for _ in range(500):
+            if not _running(pid):
+                break
+            await asyncio.sleep(0.01)
+        return pid
+
+    pid = _with_agent(body, grace_period=30)
+    assert not _running(pid)
+
+
+@needs_bash
+def test_unknown_shell_command_reports_an_error():
+    async def body(agent, target):
+        connection = await AgentConnection.open(target)
+        run = connection.start({"command": "true", "shell": "cmd"}, lambda data: None)
+        try:
+            await run.wait()
+        finally:
+            await _close(connection)
+
+    with pytest.raises(AgentError, match="cmd.exe"):
+        _with_agent(body)
@@ -0,0 +1,154 @@
+# tests/test_run_history.py
+import os
+import time
+from types import SimpleNamespace
+
+import run_history
+from run_history import ArchiveReader, ArchiveWriter, HistoryStore, RetentionPolicy
+
+
+def _write_archive(path, entries, close=True):
+    writer = ArchiveWriter(path)
+    writer.append(entries)
+    if close:
+        writer.close()
+    else:
+        # 模拟进程退出前只写完了部分块：没有块索引，最后一块也不完整
+        writer._write_chunk()
+        writer.file.write(b"GSCK\xff\xff")
+        writer.file.close()
+    return writer
+
+
+def test_archive_round_trip_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_history, "CHUNK_LINES", 10)
+    path = os.path.join(tmp_path, "run.gslog")
+    styled = (("错误", ("red", None)), (" 结束", None))
+    entries = [f"第 {i} 行" for i in range(95)] + [styled]
+    writer = _write_archive(path, entries)
+    assert writer.lines == 96
+    assert len(writer.index) == 10
+
+    reader = ArchiveReader(path, cache_chunks=2)
+    assert reader.line_count() == 96
+    # 跨块读取和随机定位
+    assert reader.texts(8, 13) == [f"第 {i} 行" for i in range(8, 13)]
+    assert reader.entry(57) == "第 57 行"
+    assert reader.entry(0) == "第 0 行"
+    assert reader.entry(95) == styled
+    assert reader.texts(94, 200) == ["第 94 行", "错误 结束"]
+    assert len(reader._cache) == 2
+    reader.close()
+
+
+def test_byte_limited_chunks_are_located_by_start_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_history, "CHUNK_BYTES", 100)
+    path = os.path.join(tmp_path, "run.gslog")
+    entries = ["x" * 60, "y" * 60, "短", "z" * 200, "末尾"]
+    _write_archive(path, entries)
+    reader = ArchiveReader(path)
+    # 各块行数不同，行号仍能对应到正确的块
+    assert reader.starts == [0, 2, 4]
+    assert [reader.entry(i) for i in range(5)] == entries
+    reader.close()
+
+
+def test_archive_without_trailer_is_recovered(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_history, "CHUNK_LINES", 10)
+    path = os.path.join(tmp_path, "run.gslog")
+    _write_archive(path, [str(i) for i in range(25)], close=False)
+    reader = ArchiveReader(path)
+    assert reader.line_count() == 25
+    assert reader.texts(18, 25) == [str(i) for i in range(18, 25)]
+    reader.close()
+
+
+def _run(run_id, item_id, lines, started_at, status="success"):
+    spec = SimpleNamespace(item_id=item_id, name=f"项目 {item_id}", shell="bash", command="make")
+    run = SimpleNamespace(
+        run_id=run_id, spec=spec, start_time=started_at, end_time=started_at + 1,
+        status=status, return_code=0, metrics={"cpu_seconds": 0.5},
+    )
+    return run, lines
+
+
+def _record(store, run, lines, partial=""):
+    store.begin(run)
+    store.append(run, lines, partial)
+    store.finish(run)
+
+
+def test_history_store_records_and_reopens_runs(tmp_path):
+    recorded = []
+    directory = os.path.join(tmp_path, "history")
+    store = HistoryStore(directory, on_recorded=recorded.append)
+    run, lines = _run(1, "a", ["构建开始", "完成"], time.time())
+    _record(store, run, lines, partial="无换行的最后一行")
+    assert store.flush(timeout=5)
+
+    records = store.list_runs("a")
+    assert len(records) == 1
+    record = records[0]
+    assert recorded == [record]
+    assert record["status"] == "success"
+    assert record["lines"] == 3
+    assert record["metrics"] == {"cpu_seconds": 0.5}
+    reader = store.open_archive(record)
+    assert reader.texts(0, 10) == ["构建开始", "完成", "无换行的最后一行"]
+    reader.close()
+    assert store.list_runs("b") == []
+    store.close()
+
+
+def test_unfinished_run_is_marked_interrupted_on_reopen(tmp_path):
+    directory = os.path.join(tmp_path, "history")
+    store = HistoryStore(directory)
+    run, _ = _run(1, "a", [], time.time())
+    store.begin(run)
+    store.append(run, ["已输出"], "")
+    store.close()
+
+    store = HistoryStore(directory)
+    record = store.list_runs()[0]
+    assert record["status"] == run_history.INTERRUPTED
+    # 关闭时写入了已有的行，仍可回看
+    reader = store.open_archive(record)
+    assert reader.texts(0, 10) == ["已输出"]
+    reader.close()
+    store.close()
+
+
+def test_retention_keeps_newest_runs_per_item(tmp_path):
+    directory = os.path.join(tmp_path, "history")
+    store = HistoryStore(directory, retention=RetentionPolicy(max_runs=2, max_days=0, max_bytes=0))
+    now = time.time()
+    for run_id in range(1, 5):
+        _record(store, *_run(run_id, "a", [f"第 {run_id} 次"], now + run_id))
+    _record(store, *_run(9, "b", ["其他项目"], now))
+    assert store.flush(timeout=5)
+
+    kept = store.list_runs("a")
+    assert [r["started_at"] for r in kept] == [now + 4, now + 3]
+    assert len(store.list_runs("b")) == 1
+    archives = {r["archive"] for r in store.list_runs()}
+    assert set(f for f in os.listdir(directory) if f.endswith(".gslog")) == archives
+
+    store.set_retention(RetentionPolicy(max_runs=0, max_days=0, max_bytes=1))
+    assert store.flush(timeout=5)
+    assert store.list_runs() == []
+    store.close()
+
+
+def test_max_days_removes_old_runs(tmp_path):
+    store = HistoryStore(
+        os.path.join(tmp_path, "history"), retention=RetentionPolicy(max_runs=0, max_days=1, max_bytes=0)
+    )
+    now = time.time()
+    _record(store, *_run(1, "a", ["旧"], now - 3 * 86400))
+    _record(store, *_run(2, "a", ["新"], now))
+    assert store.flush(timeout=5)
+    assert [r["started_at"] for r in store.list_runs()] == [now]
+    store.clear()
+    assert store.flush(timeout=5)
+    assert store.list_runs() == []
+    store.close()
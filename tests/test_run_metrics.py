@@ -0,0 +1,82 @@
+# tests/test_run_metrics.py
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import run_metrics
+from execution_pool import ExecutionPool, PoolListener, RunSpec
+from run_metrics import ResourceSampler, format_metrics
+
+needs_proc = pytest.mark.skipif(
+    not ResourceSampler().available or run_metrics.resource is None, reason="需要 /proc 或 psutil"
+)
+
+
+class _Listener(PoolListener):
+    def __init__(self):
+        self.done = threading.Event()
+
+    def on_batch_finished(self, batch):
+        self.done.set()
+
+
+def _execute(commands, max_workers=1):
+    listener = _Listener()
+    pool = ExecutionPool(max_workers=max_workers, listener=listener)
+    try:
+        batch = pool.submit([RunSpec(command, "bash", name=str(n)) for n, command in enumerate(commands)])
+        assert listener.done.wait(30)
+    finally:
+        pool.shutdown()
+    return [run.metrics for run in batch.runs]
+
+
+@needs_proc
+@pytest.mark.skipif(shutil.which("bash") is None, reason="需要 bash")
+def test_short_runs_still_report_cpu_time():
+    burn = f"{sys.executable} -c 'sum(range(3 * 10**6))'"
+    quick, busy = _execute(["true", burn])
+    # 进程结束前往往一次采样都没有，CPU 时间来自回收时的累计值
+    assert quick["cpu_s"] is not None
+    assert busy["cpu_s"] is not None and busy["cpu_s"] >= 0.03
+    assert "CPU" in format_metrics(busy)
+
+
+@needs_proc
+def test_start_rescans_when_the_cached_scan_predates_the_process():
+    sampler = ResourceSampler()
+    if sampler.backend != "proc":
+        pytest.skip("只有 /proc 后端复用扫描结果")
+    # 刚完成的一次扫描，其中还没有新进程
+    sampler._scan = (time.monotonic(), 0.0, {})
+    process = subprocess.Popen(["sleep", "5"], start_new_session=True)
+    try:
+        sampler.start("run", process.pid)
+        assert sampler._tracked["run"]["peak_rss"] > 0
+        result = sampler.stop("run")
+    finally:
+        process.kill()
+        process.wait()
+    assert result["cpu_s"] is not None and result["peak_rss_kb"] > 0
+
+
+@needs_proc
+def test_reaped_children_are_credited_unless_shared():
+    sampler = ResourceSampler()
+    burn = [sys.executable, "-c", "sum(range(3 * 10**6))"]
+
+    def run(shared):
+        process = subprocess.Popen(burn, start_new_session=True)
+        sampler.start("run", process.pid)
+        process.wait()
+        sampler.reaped("run", shared)
+        return sampler.stop("run")
+
+    assert run(shared=False)["cpu_s"] >= 0.03
+    # 无法区分归属时只保留采样得到的下限，不会把其他进程的用量算进来
+    shared = run(shared=True)
+    assert shared == {} or shared["cpu_s"] < 0.03
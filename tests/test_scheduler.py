@@ -0,0 +1,199 @@
+# tests/test_scheduler.py
+import threading
+from datetime import datetime
+
+import pytest
+
+from scheduler import (
+    CATCH_UP,
+    MISSED_TOLERANCE,
+    SKIP,
+    CronExpression,
+    Schedule,
+    ScheduleError,
+    Scheduler,
+    parse_interval,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _scheduler(clock, **limits):
+    """停掉后台线程的调度器，由 _step 在测试线程中执行一轮与后台线程相同的处理"""
+    started = []
+    scheduler = Scheduler(started.append, clock=clock, **limits)
+    scheduler.close()
+    return scheduler, started
+
+
+def _step(scheduler, started):
+    with scheduler._cond:
+        scheduler._collect_due(scheduler.clock())
+        items = scheduler._take_ready()
+    for item_id in items:
+        scheduler.on_due(item_id)
+    return items
+
+
+def _ts(*args):
+    return datetime(*args).timestamp()
+
+
+def test_parse_interval():
+    assert parse_interval("90s") == 90
+    assert parse_interval("1h30m") == 5400
+    assert parse_interval(" 1.5 m ") == 90
+    assert parse_interval("5x") is None
+    assert parse_interval("*/5 * * * *") is None
+
+
+def test_cron_fields():
+    cron = CronExpression("*/15 9-17/4 1,15 jan-mar mon-fri")
+    assert cron.minutes == {0, 15, 30, 45}
+    assert cron.hours == {9, 13, 17}
+    assert cron.days == {1, 15}
+    assert cron.months == {1, 2, 3}
+    assert cron.weekdays == {1, 2, 3, 4, 5}
+    # 单个数值带步长表示到最大值；7 和 0 都是星期日
+    assert CronExpression("5/20 * * * 7").minutes == {5, 25, 45}
+    assert CronExpression("0 * * * 7").weekdays == {0}
+    assert CronExpression("@daily").hours == {0}
+
+
+@pytest.mark.parametrize(
+    "text", ["60 * * * *", "* * *", "a * * * *", "*/0 * * * *", "5-1 * * * *", "* * 0 * *"]
+)
+def test_invalid_cron(text):
+    with pytest.raises(ScheduleError):
+        CronExpression(text)
+
+
+def test_cron_next_after():
+    # 2026-01-01 是星期四
+    start = _ts(2026, 1, 1, 0, 0)
+    assert CronExpression("30 9 * * 1-5").next_after(_ts(2026, 1, 2, 10, 0)) == _ts(2026, 1, 5, 9, 30)
+    assert CronExpression("0 0 1 mar *").next_after(start) == _ts(2026, 3, 1, 0, 0)
+    assert CronExpression("*/20 * * * *").next_after(_ts(2026, 1, 1, 8, 41, 30)) == _ts(2026, 1, 1, 9, 0)
+    # 日和星期都被限定时满足其一即可
+    assert CronExpression("0 0 13 * *").next_after(start) == _ts(2026, 1, 13)
+    assert CronExpression("0 0 * * fri").next_after(start) == _ts(2026, 1, 2)
+    assert CronExpression("0 0 13 * fri").next_after(_ts(2026, 1, 10)) == _ts(2026, 1, 13)
+    with pytest.raises(ScheduleError):
+        Schedule("0 0 30 2 *")
+
+
+def test_interval_keeps_its_grid():
+    schedule = Schedule("10m")
+    assert schedule.first_after(1000) == 1600
+    # 执行耗时或延迟不会让节拍漂移
+    assert schedule.next_after(1000, 1000 + 25 * 60 + 1) == 1000 + 30 * 60
+    assert schedule.next_after(1000, 1600) == 2200
+    assert schedule.next_after(1000, 900) == 1600
+    with pytest.raises(ScheduleError):
+        Schedule("0.5s")
+
+
+def test_jitter_stays_within_bounds():
+    clock = FakeClock()
+    scheduler, _ = _scheduler(clock)
+    scheduler._random.seed(1)
+    delays = set()
+    for n in range(200):
+        scheduler.set_item(n, Schedule("10s", jitter=5))
+        delay = scheduler.next_run(n) - (clock.now + 10)
+        assert 0 <= delay <= 5
+        delays.add(round(delay))
+    assert len(delays) > 1
+
+
+def test_overlapping_runs_are_coalesced():
+    clock = FakeClock()
+    scheduler, started = _scheduler(clock)
+    scheduler.set_item("a", Schedule("10s"))
+    clock.now += 10
+    assert _step(scheduler, started) == ["a"]
+    # 上一次执行还没结束时又到期两次，结束后只补一次
+    clock.now += 10
+    assert _step(scheduler, started) == []
+    clock.now += 10
+    assert _step(scheduler, started) == []
+    assert scheduler.stats["coalesced"] == 1
+    scheduler.run_finished("a")
+    assert _step(scheduler, started) == ["a"]
+    scheduler.run_finished("a")
+    assert _step(scheduler, started) == []
+    assert started == ["a", "a"]
+    assert scheduler.stats["fired"] == 3
+
+
+def test_group_and_global_limits():
+    clock = FakeClock()
+    scheduler, started = _scheduler(clock, max_runs=2, max_runs_per_group=1)
+    scheduler.load(
+        [
+            ("a1", Schedule("1m"), "a"),
+            ("a2", Schedule("1m"), "a"),
+            ("b1", Schedule("1m"), "b"),
+            ("b2", Schedule("1m"), "b"),
+        ]
+    )
+    clock.now += 60
+    # a2 因分组上限等待，b2 因全局上限等待
+    assert _step(scheduler, started) == ["a1", "b1"]
+    assert scheduler.stats["deferred"] == 1
+    scheduler.run_finished("b1")
+    # 因分组上限等待的执行排在前面，但 a 组仍满，轮到 b2
+    assert _step(scheduler, started) == ["b2"]
+    scheduler.run_finished("a1")
+    assert _step(scheduler, started) == ["a2"]
+
+    scheduler.set_limits(1, 0)
+    for item_id in ("a2", "b2"):
+        scheduler.run_finished(item_id)
+    clock.now += 60
+    assert _step(scheduler, started) == ["a1"]
+    scheduler.run_finished("a1")
+    assert _step(scheduler, started) == ["a2"]
+
+
+@pytest.mark.parametrize("missed", [CATCH_UP, SKIP])
+def test_missed_runs_after_wake(missed):
+    clock = FakeClock()
+    scheduler, started = _scheduler(clock)
+    scheduler.set_item("a", Schedule("10m", missed=missed))
+    first = clock.now + 600
+    # 稍晚于预定时间（例如系统繁忙）仍按时执行
+    clock.now = first + MISSED_TOLERANCE - 1
+    assert _step(scheduler, started) == ["a"]
+    scheduler.run_finished("a")
+    # 休眠了一个多小时：错过的多次执行最多补一次
+    clock.now = first + 3600 + 30
+    expected = ["a"] if missed == CATCH_UP else []
+    assert _step(scheduler, started) == expected
+    assert scheduler.stats["caught_up"] == (1 if missed == CATCH_UP else 0)
+    assert scheduler.stats["skipped"] == (1 if missed == SKIP else 0)
+    # 之后仍按原来的节拍
+    assert scheduler.next_run("a") == first + 3600 + 600
+
+
+def test_background_thread_follows_the_clock():
+    clock = FakeClock()
+    fired = threading.Event()
+    scheduler = Scheduler(lambda item_id: fired.set(), clock=clock)
+    try:
+        scheduler.set_item("a", Schedule("1h"))
+        assert not fired.wait(0.05)
+        clock.now += 3600
+        # 后台线程在被唤醒或等待超时时读取时钟，这里修改限制来唤醒它
+        scheduler.set_limits(scheduler.max_runs, scheduler.max_runs_per_group)
+        assert fired.wait(5)
+        scheduler.set_item("a", None)
+        assert scheduler.next_run("a") is None
+    finally:
+        scheduler.close()
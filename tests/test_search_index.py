@@ -0,0 +1,99 @@
+# tests/test_search_index.py
+import queue
+
+import search_index
+from data_manager import CommandStore
+from search_index import SearchIndex, SearchService
+
+
+def _item(item_id, name, command="", working_dir=""):
+    return {"id": item_id, "name": name, "command": command, "working_dir": working_dir}
+
+
+def _index():
+    index = SearchIndex()
+    index.build([
+        _item("deploy", "Deploy backend", "kubectl apply -f deploy.yaml", "/srv/app"),
+        _item("build", "Build", "make deploy-image", "/srv/app"),
+        _item("test", "Run tests", "pytest -q", "/home/dev/project"),
+        _item("logs", "Tail logs", "tail -f /var/log/syslog"),
+    ])
+    return index
+
+
+def _ids(result):
+    return [item_id for _, item_id in result[1]]
+
+
+def test_name_matches_rank_above_command_matches():
+    index = _index()
+    assert _ids(index.search("deploy")) == ["deploy", "build"]
+    assert index.search("deploy")[0] == 2
+
+
+def test_every_keyword_must_match():
+    index = _index()
+    assert _ids(index.search("run pytest")) == ["test"]
+    assert _ids(index.search("deploy pytest")) == []
+    assert index.search("   ") == (0, [])
+
+
+def test_short_keywords_only_search_names():
+    index = _index()
+    # "ku" 只出现在 deploy 的命令中，不足三个字符的关键词只查名称
+    assert _ids(index.search("ku")) == []
+    assert _ids(index.search("bu")) == ["build"]
+
+
+def test_misspelled_keyword_matches_fuzzily():
+    index = _index()
+    assert _ids(index.search("kubectl")) == ["deploy"]
+    total, results = index.search("kubectll")
+    assert [item_id for _, item_id in results] == ["deploy"]
+    # 模糊匹配的得分远低于完整出现
+    assert results[0][0] < index.search("kubectl")[1][0][0]
+
+
+def test_reindex_and_remove():
+    index = _index()
+    index.add(_item("logs", "Journal", "journalctl -f"))
+    assert _ids(index.search("tail")) == []
+    assert _ids(index.search("journal")) == ["logs"]
+    index.remove("logs")
+    index.remove("logs")
+    assert _ids(index.search("journal")) == []
+    assert len(index) == 3
+    assert index._postings.keys().isdisjoint({"jou", "tai"})
+
+
+def test_broad_query_reports_estimated_total(monkeypatch):
+    monkeypatch.setattr(search_index, "MAX_SCORED", 10)
+    index = SearchIndex()
+    index.build([_item(str(n), f"task {n}") for n in range(50)])
+    total, results = index.search("task", limit=5)
+    assert total == 50
+    assert len(results) == 5
+
+
+def test_service_follows_store_changes():
+    store = CommandStore({"groups": [{"id": "g", "name": "g", "items": [_item("a", "alpha")]}]})
+    results = queue.Queue()
+    service = SearchService(store, lambda gen, text, total, found, ms: results.put((gen, found)))
+    try:
+        def search(text):
+            generation = service.search(text)
+            while True:
+                gen, found = results.get(timeout=5)
+                if gen == generation:
+                    return [item_id for _, item_id in found]
+
+        assert search("alpha") == ["a"]
+        item = store.add_item("g", "beta")
+        assert search("beta") == [item["id"]]
+        store.update_item("a", {"name": "gamma"})
+        assert search("alpha") == []
+        assert search("gamma") == ["a"]
+        store.delete_group("g")
+        assert search("beta") == []
+    finally:
+        service.close()
@@ -0,0 +1,95 @@
+# tests/test_shell_pool.py
+import asyncio
+import shutil
+import sys
+
+import pytest
+
+from shell_pool import ShellSession, ShellSessionPool
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32" or shutil.which("bash") is None, reason="需要 bash"
+)
+
+
+def _run(commands, read_size=64 * 1024):
+    """在同一个会话中依次执行命令，返回 [(返回码, 是否读到结束标记, 输出), ...] 和会话是否仍可用"""
+
+    async def main():
+        session = await ShellSession(("bash", "", "")).start()
+        results = []
+        try:
+            for command in commands:
+                output = []
+                code, complete = await session.run(command, output.append, read_size)
+                results.append((code, complete, b"".join(output)))
+            return results, session.alive
+        finally:
+            await session.close()
+
+    return asyncio.run(main())
+
+
+def test_output_and_return_codes():
+    results, alive = _run(["echo one; echo two", "false", "printf 'no newline'"])
+    assert results == [
+        (0, True, b"one\ntwo\n"),
+        (1, True, b""),
+        # 结束标记以换行开头，没有换行结尾的输出原样保留
+        (0, True, b"no newline"),
+    ]
+    assert alive
+
+
+def test_marker_split_across_reads():
+    # 每次只读 3 个字节，结束标记一定被读取边界切开
+    results, alive = _run(["echo abc; printf 'x%.0s' $(seq 200)", "exit 7"], read_size=3)
+    assert results[0] == (0, True, b"abc\n" + b"x" * 200)
+    assert results[1] == (7, True, b"")
+    assert alive
+
+
+def test_output_resembling_the_marker_is_not_taken_as_the_end():
+    results, _ = _run(["printf '\\n__GS_ 5\\nafter\\n'"])
+    assert results == [(0, True, b"\n__GS_ 5\nafter\n")]
+
+
+def test_exit_only_leaves_the_subshell():
+    results, alive = _run(["cd /; exit 3", "pwd"])
+    assert results == [(3, True, b""), (0, True, results[1][2])]
+    assert results[1][2] != b"/\n"
+    assert alive
+
+
+def test_command_that_kills_the_session():
+    results, alive = _run(["echo before; kill -9 $$"])
+    code, complete, output = results[0]
+    assert not complete
+    assert code == -9
+    assert output == b"before\n"
+    assert not alive
+
+
+def test_pool_does_not_reuse_dead_or_failed_sessions():
+    async def main():
+        pool = ShellSessionPool(max_uses=2)
+        key = ("bash", "", "")
+        first = await pool.acquire(key)
+        code, complete = await first.run("true", lambda data: None)
+        pool.release(first, complete and code == 0)
+        # 取出的可能是后台补充的会话，也可能是刚归还的会话，都不必重新启动
+        second = await pool.acquire(key)
+        reused = pool.stats["reused"]
+        await second.run("kill -9 $$", lambda data: None)
+        pool.release(second, False)
+        third = await pool.acquire(key)
+        alive = third.alive
+        recycled = pool.stats["recycled"]
+        pool.release(third, True)
+        await pool.close()
+        return reused, third is not second and alive, recycled
+
+    reused, fresh, recycled = asyncio.run(main())
+    assert reused == 1
+    assert fresh
+    assert recycled == 1
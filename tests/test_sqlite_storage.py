@@ -0,0 +1,40 @@
+# tests/test_sqlite_storage.py
+import os
+
+from data_manager import CommandStore, JsonStorage
+from sqlite_storage import SqliteStorage
+
+
+def _library():
+    return {
+        "favorites": [],
+        "groups": [
+            {"id": g, "name": g, "items": [{"id": f"{g}{n}", "name": f"{g}{n}"} for n in range(4)]}
+            for g in ("a", "b", "c")
+        ],
+    }
+
+
+def _order(data):
+    return [(g["id"], [i["id"] for i in g["items"]]) for g in data["groups"]]
+
+
+def test_partial_reorder_matches_json_after_reload(tmp_path):
+    changes = [
+        {"op": "reorder_items", "group_id": "a", "ids": ["a2", "a0"]},
+        {"op": "reorder_groups", "ids": ["c"]},
+    ]
+    expected = _library()
+    store = CommandStore(expected)
+    for change in changes:
+        store.apply(change)
+    for backend, name in ((JsonStorage, "data.json"), (SqliteStorage, "data.db")):
+        path = os.path.join(tmp_path, name)
+        storage = backend(path)
+        storage.save(_library())
+        storage.attach(_library())
+        storage.write_changes(changes)
+        storage.close()
+        storage = backend(path)
+        assert _order(storage.load()) == _order(expected), name
+        storage.close()
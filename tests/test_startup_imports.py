@@ -0,0 +1,48 @@
+# tests/test_startup_imports.py
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 打开主窗口、开始文件监视并查看一个项目，然后报告执行器是否已被创建
+SCRIPT = """
+import sys
+from PySide6.QtWidgets import QApplication
+app = QApplication([])
+from main_window import MainWindow
+window = MainWindow()
+window.show()
+app.processEvents()
+window.populate_editor("item")
+app.processEvents()
+print(window._command_runner is None)
+print(window.file_watcher is not None)
+print(sorted(m for m in ("execution_pool", "command_runner", "process_control", "asyncio") if m in sys.modules))
+window.close()
+"""
+
+
+def test_viewing_items_does_not_create_the_runner(tmp_path):
+    data = {
+        "favorites": [],
+        "groups": [{"id": "g", "name": "g", "items": [{
+            "id": "item",
+            "name": "watched",
+            "command": "echo hi",
+            "shell": "bash",
+            "working_dir": str(tmp_path),
+            "watch": {"patterns": ["*.txt"]},
+        }]}],
+    }
+    with open(os.path.join(tmp_path, "data.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=tmp_path, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split("\n")[:3] == ["True", "True", "[]"]
@@ -0,0 +1,94 @@
+# tests/test_tree_model.py
+import pytest
+from PySide6.QtCore import QPersistentModelIndex
+
+from data_manager import CommandStore
+from tree_model import CommandTreeModel, ID_ROLE, TYPE_ROLE
+
+
+def _library():
+    return {
+        "favorites": [],
+        "groups": [
+            {"id": g, "name": g.upper(), "items": [{"id": f"{g}{n}", "name": f"{g}{n}"} for n in range(3)]}
+            for g in ("a", "b")
+        ],
+    }
+
+
+@pytest.fixture
+def model(qapp):
+    store = CommandStore(_library())
+    model = CommandTreeModel(store)
+    events = []
+    model.rowsInserted.connect(lambda parent, first, last: events.append(("insert", parent.row(), first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: events.append(("remove", parent.row(), first, last)))
+    model.dataChanged.connect(lambda top, bottom: events.append(("changed", top.data(ID_ROLE))))
+    model.events = events
+    return store, model
+
+
+def _ids(model, group_row):
+    parent = model.index(group_row, 0)
+    return [model.index(row, 0, parent).data(ID_ROLE) for row in range(model.rowCount(parent))]
+
+
+def test_children_are_fetched_on_demand(model):
+    store, model = model
+    parent = model.index(0, 0)
+    assert model.rowCount() == 2
+    assert parent.data() == "A" and parent.data(TYPE_ROLE) == "group"
+    assert model.hasChildren(parent)
+    assert model.rowCount(parent) == 0
+    assert model.canFetchMore(parent)
+    model.fetchMore(parent)
+    assert _ids(model, 0) == ["a0", "a1", "a2"]
+    assert not model.canFetchMore(parent)
+    assert model.index(1, 0, parent).parent() == parent
+
+
+def test_add_to_unfetched_group_waits_for_fetch(model):
+    store, model = model
+    item = store.add_item("a", "新项目")
+    # 分组还没有展开，新项目不单独插入，展开时一并取出
+    assert model.events == []
+    model.fetchMore(model.index(0, 0))
+    assert _ids(model, 0)[-1] == item["id"]
+
+
+def test_store_changes_become_row_notifications(model):
+    store, model = model
+    model.fetchMore(model.index(0, 0))
+    model.events.clear()
+    item = store.add_item("a", "新项目")
+    store.update_item("a1", {"name": "改名"})
+    store.delete_item("a0")
+    group = store.add_group("C")
+    assert model.events == [
+        ("insert", 0, 3, 3),
+        ("changed", "a1"),
+        ("remove", 0, 0, 0),
+        ("insert", -1, 2, 2),
+    ]
+    assert _ids(model, 0) == ["a1", "a2", item["id"]]
+    assert model.index(0, 0, model.index(0, 0)).data() == "改名"
+    assert model.index(2, 0).data(ID_ROLE) == group["id"]
+    store.delete_group("a")
+    assert model.rowCount() == 2
+    assert model.index(0, 0).data(ID_ROLE) == "b"
+
+
+def test_move_keeps_persistent_indexes(model):
+    store, model = model
+    for row in range(2):
+        model.fetchMore(model.index(row, 0))
+    moved = QPersistentModelIndex(model.item_index("a1"))
+    stayed = QPersistentModelIndex(model.item_index("a2"))
+    store.move_items(["a1"], "b", 0)
+    assert _ids(model, 0) == ["a0", "a2"]
+    assert _ids(model, 1) == ["a1", "b0", "b1", "b2"]
+    assert moved.data(ID_ROLE) == "a1" and moved.parent().data(ID_ROLE) == "b"
+    assert stayed.data(ID_ROLE) == "a2" and stayed.row() == 1
+    store.reorder_groups(["b", "a"])
+    assert moved.parent().row() == 0
+    assert model.index(1, 0).data(ID_ROLE) == "a"
@@ -0,0 +1,237 @@
+# tree_model.py
+from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex
+
+ID_ROLE = Qt.ItemDataRole.UserRole
+TYPE_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+class CommandTreeModel(QAbstractItemModel):
+    """直接建立在 CommandStore 上的分组/项目树模型
+
+    模型订阅存储的变更事件，只发出受影响行的 rowsInserted/rowsRemoved/dataChanged 通知；
+    分组的子项在第一次展开时才交给视图（canFetchMore/fetchMore）。
+    """
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self._store = store
+        # 每个分组分配一个稳定的整数键，作为其子项索引的 internalId
+        self._keys = {}
+        self._groups_by_key = {}
+        self._next_key = 1
+        # 已交给视图的子项数量
+        self._fetched = {}
+        # 修改前事件中开始、修改后事件中结束的结构变化
+        self._pending = None
+        self._pending_group = None
+        for group in store.data["groups"]:
+            self._register_group(group)
+        store.subscribe(self._after_change, before=self._before_change)
+
+    def _register_group(self, group):
+        key = self._next_key
+        self._next_key += 1
+        self._keys[group["id"]] = key
+        self._groups_by_key[key] = group
+        self._fetched[group["id"]] = 0
+
+    def _unregister_group(self, group_id):
+        key = self._keys.pop(group_id)
+        del self._groups_by_key[key]
+        del self._fetched[group_id]
+
+    # 查询接口
+
+    def group_index(self, group_id):
+        if group_id not in self._keys:
+            return QModelIndex()
+        return self.createIndex(self._store.group_row(group_id), 0, 0)
+
+    def item_index(self, item_id):
+        group = self._store.item_group.get(item_id)
+        if group is None:
+            return QModelIndex()
+        row = self._store.item_row(item_id)
+        if row >= self._fetched[group["id"]]:
+            return QModelIndex()
+        return self.createIndex(row, 0, self._keys[group["id"]])
+
+    def node(self, index):
+        """返回索引对应的 (类型, 数据字典)"""
+        if not index.isValid():
+            return None, None
+        key = index.internalId()
+        if key == 0:
+            return "group", self._store.data["groups"][index.row()]
+        return "item", self._groups_by_key[key]["items"][index.row()]
+
+    # QAbstractItemModel 接口
+
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        if not parent.isValid():
+            if row >= len(self._store.data["groups"]):
+                return QModelIndex()
+            return self.createIndex(row, 0, 0)
+        if parent.internalId() != 0:
+            return QModelIndex()
+        group = self._store.data["groups"][parent.row()]
+        if row >= self._fetched[group["id"]]:
+            return QModelIndex()
+        return self.createIndex(row, 0, self._keys[group["id"]])
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        group = self._groups_by_key[index.internalId()]
+        return self.createIndex(self._store.group_row(group["id"]), 0, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._store.data["groups"])
+        if parent.internalId() != 0:
+            return 0
+        return self._fetched[self._store.data["groups"][parent.row()]["id"]]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._store.data["groups"])
+        if parent.internalId() != 0:
+            return False
+        return bool(self._store.data["groups"][parent.row()]["items"])
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != 0:
+            return False
+        group = self._store.data["groups"][parent.row()]
+        return self._fetched[group["id"]] < len(group["items"])
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        group = self._store.data["groups"][parent.row()]
+        fetched = self._fetched[group["id"]]
+        total = len(group["items"])
+        self.beginInsertRows(parent, fetched, total - 1)
+        self._fetched[group["id"]] = total
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        node_type, node = self.node(index)
+        if node is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return node["name"]
+        if role == ID_ROLE:
+            return node["id"]
+        if role == TYPE_ROLE:
+            return node_type
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return "分组和项目"
+        return None
+
+    # 存储变更事件
+
+    def _before_change(self, change):
+        store = self._store
+        op = change["op"]
+        self._pending = None
+        if op == "add_group":
+            if change["group"]["id"] not in store.groups:
+                row = len(store.data["groups"])
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._pending = "insert"
+        elif op == "add_item":
+            group = store.groups.get(change["group_id"])
+            if group is None or change["item"]["id"] in store.items:
+                return
+            row = len(group["items"])
+            # 子项尚未全部交给视图时，新项目会在展开时一并取出
+            if self._fetched[group["id"]] == row:
+                self.beginInsertRows(self.group_index(group["id"]), row, row)
+                self._pending = "insert"
+        elif op == "delete_group":
+            if change["id"] in store.groups:
+                row = store.group_row(change["id"])
+                self.beginRemoveRows(QModelIndex(), row, row)
+                self._pending = "remove"
+        elif op == "delete_item":
+            group = store.item_group.get(change["id"])
+            if group is None:
+                return
+            row = store.item_row(change["id"])
+            if row < self._fetched[group["id"]]:
+                self.beginRemoveRows(self.group_index(group["id"]), row, row)
+                self._pending = "remove"
+                self._pending_group = group["id"]
+        elif op in ("move_items", "reorder_items", "reorder_groups"):
+            self.layoutAboutToBeChanged.emit()
+            # 记录已全部展开的分组，以及持久索引所指向的节点，变化后据此恢复
+            self._fully_fetched = {
+                gid for gid, n in self._fetched.items() if n >= len(store.groups[gid]["items"])
+            }
+            self._saved_indexes = self.persistentIndexList()
+            self._saved_nodes = [self.node(index) for index in self._saved_indexes]
+            self._pending = "layout"
+
+    def _after_change(self, change):
+        op = change["op"]
+        pending, self._pending = self._pending, None
+        if op == "add_group":
+            if pending == "insert":
+                self._register_group(change["group"])
+                self.endInsertRows()
+            else:
+                index = self.group_index(change["group"]["id"])
+                self.dataChanged.emit(index, index)
+        elif op == "add_item":
+            if pending == "insert":
+                self._fetched[change["group_id"]] += 1
+                self.endInsertRows()
+            else:
+                index = self.item_index(change["item"]["id"])
+                if index.isValid():
+                    self.dataChanged.emit(index, index)
+        elif op == "update_group":
+            index = self.group_index(change["id"])
+            if index.isValid():
+                self.dataChanged.emit(index, index)
+        elif op == "update_item":
+            index = self.item_index(change["id"])
+            if index.isValid():
+                self.dataChanged.emit(index, index)
+        elif op == "delete_group":
+            if pending == "remove":
+                self._unregister_group(change["id"])
+                self.endRemoveRows()
+        elif op == "delete_item":
+            if pending == "remove":
+                self._fetched[self._pending_group] -= 1
+                self.endRemoveRows()
+        elif pending == "layout":
+            for gid, group in self._store.groups.items():
+                if gid in self._fully_fetched:
+                    self._fetched[gid] = len(group["items"])
+                else:
+                    self._fetched[gid] = min(self._fetched[gid], len(group["items"]))
+            new_indexes = []
+            for node_type, node in self._saved_nodes:
+                if node_type == "group":
+                    new_indexes.append(self.group_index(node["id"]))
+                else:
+                    new_indexes.append(self.item_index(node["id"]))
+            self.changePersistentIndexList(self._saved_indexes, new_indexes)
+            self._saved_indexes = self._saved_nodes = None
+            self.layoutChanged.emit()